@@ -4,44 +4,34 @@
 Son 60 günün detaylı analizi - 0 TRY fiyatların etkisi
 """
 
-import pandas as pd
-import numpy as np
-from prophet.serialize import model_from_json
-import sqlite3
-import os
+from epoch_hours import to_epoch_hour
+from hourly_facts import refresh_pending_facts
+from evaluation import EvaluationEngine, mask_variants
+from price_rollups import refresh_pending_rollups, price_stats
 
-DB_PATH = os.path.join(os.path.dirname(__file__), '../../data/energy.db')
-MODEL_PATH = os.path.join(os.path.dirname(__file__), '../../models/prophet_model.json')
+# Analizin başlangıç günü
+START_DATE = '2025-08-17'
 
 def main():
     print("="*60)
     print("Son 60 Gun Detayli Analiz - 0 TRY Fiyatlarin Etkisi")
     print("="*60)
 
+    # Son 60 günün fact'leri (geç gelen üretim/tüketim dahil) güncellenir
+    refresh_pending_facts()
     # Veri yükle
-    conn = sqlite3.connect(DB_PATH)
-    query = """
-        SELECT date as ds, price as y
-        FROM mcp_data
-        WHERE date >= '2025-08-17'
-        ORDER BY date
-    """
-    df = pd.read_sql_query(query, conn)
-    conn.close()
-    df['ds'] = pd.to_datetime(df['ds']).dt.tz_localize(None)
+    engine = EvaluationEngine(start_ts=to_epoch_hour(START_DATE))
+    df = engine.df
 
     print(f"\n[*] Toplam kayit: {len(df)}")
     print(f"[*] Tarih araligi: {df['ds'].min()} -> {df['ds'].max()}")
 
-    # Model yükle
-    with open(MODEL_PATH, 'r') as f:
-        model = model_from_json(f.read())
+    # Aktif modelin fitted değerleri (model_predictions; yeniden tahmin sadece yeni sürümde)
+    frame = engine.predict_active()
+    variants = mask_variants(frame, names=('all', 'nonzero'), mape_mask='nonzero')
 
-    # Tahmin
-    forecast = model.predict(df[['ds']])
-
-    y_true = df['y'].values
-    y_pred = forecast['yhat'].values
+    y_true = frame['y'].values
+    y_pred = frame['yhat'].values
 
     # 0 ve 0 olmayan değerleri ayır
     zero_mask = y_true == 0
@@ -50,9 +40,15 @@ def main():
     zero_count = zero_mask.sum()
     nonzero_count = nonzero_mask.sum()
 
+    # Fiyat dağılımı price_rollups'tan (mcp_data taranmaz)
+    refresh_pending_rollups()
+    stats = price_stats(START_DATE).iloc[0]
+    hours, zeros = int(stats['count']), int(stats['zero_count'])
     print(f"\n[*] Fiyat dagilimi:")
-    print(f"    0 TRY fiyatlar: {zero_count} adet ({zero_count/len(df)*100:.2f}%)")
-    print(f"    Normal fiyatlar: {nonzero_count} adet ({nonzero_count/len(df)*100:.2f}%)")
+    print(f"    0 TRY fiyatlar: {zeros} adet ({zeros/hours*100:.2f}%)")
+    print(f"    Normal fiyatlar: {hours - zeros} adet ({(hours - zeros)/hours*100:.2f}%)")
+    print(f"    Ortalama: {stats['mean']:.2f} TRY (std {stats['std']:.2f}), "
+          f"aralik: {stats['min']:.2f} - {stats['max']:.2f} TRY")
 
     # 0 TRY değerler için analiz
     if zero_count > 0:
@@ -80,11 +76,7 @@ def main():
         print(f"{'='*60}")
 
         y_true_nonzero = y_true[nonzero_mask]
-        y_pred_nonzero = y_pred[nonzero_mask]
-
-        mae = np.mean(np.abs(y_true_nonzero - y_pred_nonzero))
-        rmse = np.sqrt(np.mean((y_true_nonzero - y_pred_nonzero)**2))
-        mape = np.mean(np.abs((y_true_nonzero - y_pred_nonzero) / y_true_nonzero)) * 100
+        mae, rmse, mape = (variants.loc['nonzero', key] for key in ('mae', 'rmse', 'mape'))
 
         print(f"\nMetrikler:")
         print(f"  MAE:  {mae:.2f} TRY")
@@ -101,8 +93,7 @@ def main():
     print("TUM VERI PERFORMANSI (0 TRY dahil)")
     print(f"{'='*60}")
 
-    mae_all = np.mean(np.abs(y_true - y_pred))
-    rmse_all = np.sqrt(np.mean((y_true - y_pred)**2))
+    mae_all, rmse_all = variants.loc['all', 'mae'], variants.loc['all', 'rmse']
 
     print(f"\nMetrikler:")
     print(f"  MAE:  {mae_all:.2f} TRY")
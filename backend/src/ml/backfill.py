@@ -0,0 +1,334 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+EPİAŞ MCP Fiyat Tahmini - Çok Haftalık Geriye Dönük Tahmin (Backfill)
+=====================================================================
+
+Verilen Pazartesi aralığındaki her hafta için, o haftanın başına kadar olan
+veriyle (data leakage yok) bir Prophet modeli eğitir ve 168 saatlik tahmini
+forecast_history'ye yazar. Bitmiş haftalar için gerçek fiyatlarla
+karşılaştırma tek geçişte yapılır ve weekly_performance doldurulur.
+
+- Veri DB'den BİR kez okunur; her hafta kendi kesim noktasına kadar dilimlenir
+- Haftalık modeller süreç havuzunda paralel eğitilir (Stan fit tek çekirdek)
+- Tüm tahminler tek transaction'da yazılır
+- Haftalık modeller registry'ye (aktif olmayan sürüm) kaydedilir; prophet_model.json
+  değiştirilmez, güncel model weekly_workflow'un işi
+
+Kullanım:
+    python backfill.py <ilk_pazartesi> <son_pazartesi> [--workers N]
+    python backfill.py 2024-10-21 2025-10-20 --workers 8
+"""
+
+import sys
+import os
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+# Script'in çalıştığı dizin
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(script_dir)
+
+from database import get_reader, get_writer, retry_on_lock
+from epoch_hours import to_epoch_hour
+from calendar_features import add_time_features
+from hourly_facts import refresh_pending_facts
+from train_prophet import load_data_from_db, build_holidays_frame, train_prophet_model, config_fingerprint
+from checkpoints import hash_frame
+from model_registry import register_model
+from compare_forecasts import error_metrics, save_weekly_performance
+from metric_accumulators import reset_weeks, refresh_pending_accumulators
+from quantile_store import add_quantile_columns, save_quantiles
+from forecast_blocks import refresh_blocks
+from instrumentation import pipeline_run, span
+
+# Haftalık tahmin ufku (saat)
+WEEK_HOURS = 7 * 24
+
+# Worker süreçlerinin paylaştığı eğitim verisi (initializer ile bir kez gelir)
+_history = None
+_holidays = None
+
+def week_range(first_monday, last_monday):
+    """
+    İki Pazartesi arasındaki (dahil) tüm haftalar
+
+    Returns:
+        list: [(week_start, week_end), ...] - 'YYYY-MM-DD'
+    """
+    first = datetime.strptime(first_monday, '%Y-%m-%d')
+    last = datetime.strptime(last_monday, '%Y-%m-%d')
+    for day in (first, last):
+        if day.weekday() != 0:
+            raise ValueError(f"{day.strftime('%Y-%m-%d')} Pazartesi değil")
+    if first > last:
+        raise ValueError("İlk Pazartesi son Pazartesi'den sonra olamaz")
+
+    weeks = []
+    monday = first
+    while monday <= last:
+        weeks.append((monday.strftime('%Y-%m-%d'), (monday + timedelta(days=6)).strftime('%Y-%m-%d')))
+        monday += timedelta(weeks=1)
+    return weeks
+
+def _init_worker(history, holidays):
+    """Worker süreç başlangıcı: paylaşılan veriyi global'e koyar"""
+    global _history, _holidays
+    _history = history
+    _holidays = holidays
+
+    # cmdstanpy her fit için INFO satırı basar; paralel çıktıyı boğmasın
+    import logging
+    logging.getLogger('cmdstanpy').setLevel(logging.WARNING)
+
+def forecast_week(week_start):
+    """
+    Haftanın başına kadar olan veriyle model eğitir ve haftayı tahmin eder
+
+    Args:
+        week_start (str): Pazartesi (YYYY-MM-DD)
+
+    Returns:
+        dict: forecast (ds, yhat, yhat_lower, yhat_upper + kantiller - 168 satır), model_json,
+              data_fingerprint, fit_seconds
+    """
+    from prophet.serialize import model_to_json
+
+    cutoff = pd.Timestamp(week_start)
+    train = _history[_history['ds'] < cutoff]
+    if len(train) == 0:
+        raise ValueError(f"{week_start} öncesinde eğitim verisi yok")
+
+    fit_start = time.perf_counter()
+    model = train_prophet_model(train, _holidays)
+    fit_seconds = time.perf_counter() - fit_start
+
+    # Haftanın saatleri açıkça üretilir (veri boşluklarından etkilenmez)
+    future = pd.DataFrame({'ds': pd.date_range(cutoff, periods=WEEK_HOURS, freq='h')})
+    add_time_features(future)
+    forecast = model.predict(future)[['ds', 'yhat', 'yhat_lower', 'yhat_upper']]
+    # Conformal tampon için önceki haftaların gerçekleşmesi gerekir; backfill
+    # haftaları birlikte üretildiğinden kantiller Prophet aralığından türetilir
+    add_quantile_columns(forecast, interval_width=model.interval_width)
+
+    return {
+        'forecast': forecast,
+        'model_json': model_to_json(model),
+        'data_fingerprint': hash_frame(train[['ds', 'y']]),
+        'fit_seconds': fit_seconds,
+    }
+
+def train_and_forecast(weeks, history, workers):
+    """
+    Haftalık modelleri süreç havuzunda eğitir
+
+    Args:
+        weeks (list): [(week_start, week_end), ...]
+        history (pd.DataFrame): Son kesim noktasına kadar feature'lı veri
+        workers (int): Süreç sayısı
+
+    Returns:
+        tuple: ({week_start: forecast}, [hatalı week_start, ...])
+    """
+    holidays = build_holidays_frame()
+    config_hash = config_fingerprint()
+    forecasts = {}
+    failed = []
+
+    # fork + açık SQLite/thread'ler güvenli değil; spawn kullanılır
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_worker, initargs=(history, holidays)) as pool:
+        futures = {pool.submit(forecast_week, week_start): week_start for week_start, _ in weeks}
+        for future in as_completed(futures):
+            week_start = futures[future]
+            try:
+                result = future.result()
+                forecasts[week_start] = result['forecast']
+                print(f"[+] {week_start}: {len(result['forecast'])} saatlik tahmin ({len(forecasts)}/{len(weeks)})")
+                # version_for_week(week_start) bu modeli bulur
+                register_model(
+                    result['model_json'], name='prophet', training_cutoff=week_start,
+                    data_fingerprint=result['data_fingerprint'], config_hash=config_hash,
+                    fit_seconds=result['fit_seconds'],
+                )
+            except Exception as e:
+                failed.append(week_start)
+                print(f"[!] {week_start} HATA: {e}")
+
+    return forecasts, sorted(failed)
+
+@retry_on_lock
+def write_forecasts(weeks, forecasts):
+    """
+    Tüm haftaların tahminlerini tek transaction'da forecast_history'ye yazar
+
+    Args:
+        weeks (list): [(week_start, week_end), ...]
+        forecasts (dict): {week_start: forecast DataFrame}
+
+    Returns:
+        int: Yazılan satır sayısı
+    """
+    rows = []
+    for week_start, week_end in weeks:
+        if week_start not in forecasts:
+            continue
+        forecast = forecasts[week_start]
+        rows.extend(zip(
+            [week_start] * len(forecast),
+            [week_end] * len(forecast),
+            forecast['ds'].dt.strftime('%Y-%m-%d %H:%M:%S'),
+            forecast['yhat'].astype(float),
+        ))
+
+    with get_writer() as conn:
+        conn.executemany("DELETE FROM forecast_history WHERE week_start = ?",
+                         [(week_start,) for week_start in forecasts])
+        reset_weeks(conn, list(forecasts))
+        for week_start, forecast in forecasts.items():
+            save_quantiles(conn, week_start, forecast)
+        conn.executemany("""
+            INSERT INTO forecast_history (week_start, week_end, forecast_datetime, predicted_price)
+            VALUES (?, ?, ?, ?)
+        """, rows)
+        if forecasts:
+            refresh_blocks(conn, to_epoch_hour(min(forecasts)), to_epoch_hour(max(forecasts)) + 7 * 24)
+
+    return len(rows)
+
+@retry_on_lock
+def reconcile_actuals(weeks):
+    """
+    Bitmiş haftaların tahminlerini gerçek fiyatlarla tek geçişte karşılaştırır
+
+    compare_week ile aynı metrikler (error_metrics) kullanılır; fark, tüm
+    haftaların tek sorgu ve tek transaction'da işlenmesidir.
+
+    Args:
+        weeks (list): [(week_start, week_end), ...]
+
+    Returns:
+        dict: {week_start: {'mape', 'mae', 'rmse', 'total_predictions'}}
+    """
+    # Sadece tamamen geçmişte kalan haftalar (Pazar 23:00 dahil)
+    now = datetime.now()
+    finished = [(start, end) for start, end in weeks
+                if datetime.strptime(end, '%Y-%m-%d') + timedelta(days=1) <= now]
+    if not finished:
+        return {}
+
+    start_ts = to_epoch_hour(finished[0][0])
+    end_ts = to_epoch_hour(finished[-1][1]) + 24
+    week_ends = dict(finished)
+
+    conn = get_reader()
+    comparison = pd.read_sql_query("""
+        SELECT f.week_start, f.forecast_datetime, f.predicted_price, m.price
+        FROM forecast_history f
+        JOIN mcp_data m ON m.ts = f.ts
+        WHERE f.ts >= ? AND f.ts < ?
+        ORDER BY f.week_start, f.ts
+    """, conn, params=(start_ts, end_ts))
+    conn.close()
+
+    comparison = comparison[comparison['week_start'].isin(week_ends)]
+    results = {}
+
+    with get_writer() as conn:
+        for week_start, group in comparison.groupby('week_start', sort=True):
+            y_true = group['price'].values
+            y_pred = group['predicted_price'].values
+            absolute_errors, percentage_errors, mae, rmse, mape = error_metrics(y_true, y_pred)
+
+            conn.executemany("""
+                UPDATE forecast_history
+                SET actual_price = ?, absolute_error = ?, percentage_error = ?
+                WHERE week_start = ? AND forecast_datetime = ?
+            """, zip(
+                y_true.tolist(),
+                absolute_errors.tolist(),
+                percentage_errors.tolist(),
+                [week_start] * len(group),
+                group['forecast_datetime'].tolist(),
+            ))
+            save_weekly_performance(conn, week_start, week_ends[week_start], mape, mae, rmse, len(group))
+            results[week_start] = {
+                'mape': float(mape), 'mae': float(mae), 'rmse': float(rmse),
+                'total_predictions': len(group),
+            }
+
+    return results
+
+def run_backfill(first_monday, last_monday, workers=None):
+    """
+    Pazartesi aralığı için eğitim + tahmin + karşılaştırma
+
+    Args:
+        first_monday (str): İlk hafta (YYYY-MM-DD, Pazartesi)
+        last_monday (str): Son hafta (YYYY-MM-DD, Pazartesi, dahil)
+        workers (int, optional): Süreç sayısı (varsayılan: CPU sayısı)
+
+    Returns:
+        bool: Tüm haftalar tahmin edildiyse True
+    """
+    weeks = week_range(first_monday, last_monday)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(weeks)))
+
+    print("="*70)
+    print(f"BACKFILL: {first_monday} -> {last_monday} ({len(weeks)} hafta, {workers} süreç)")
+    print("="*70)
+
+    # 1. Veri bir kez okunur: son haftanın kesimine kadar (yeni kurulumda
+    # hourly_facts burada oluşturulur; sonrasında sadece değişen saatler)
+    with span('hourly_facts') as step:
+        step.rows = refresh_pending_facts()
+    history = load_data_from_db(end_date=last_monday)
+
+    # 2. Haftalık modeller (paralel)
+    print(f"\n[*] {len(weeks)} haftalık model eğitiliyor...")
+    with span('train_forecast', rows=len(weeks)):
+        forecasts, failed = train_and_forecast(weeks, history, workers)
+
+    # 3. Toplu yazma
+    with span('db_write') as step:
+        step.rows = write_forecasts(weeks, forecasts)
+    print(f"\n[+] {step.rows} tahmin kaydı database'e yazıldı")
+
+    # 4. Bitmiş haftaların karşılaştırması (tek geçiş)
+    with span('reconcile') as step:
+        performance = reconcile_actuals([week for week in weeks if week[0] in forecasts])
+        step.rows = len(performance)
+        # Yeniden yazılan haftaların metrik toplamları
+        refresh_pending_accumulators()
+
+    print(f"\n[*] {len(performance)} bitmiş hafta karşılaştırıldı")
+    for week_start, metrics in sorted(performance.items()):
+        print(f"   {week_start}: MAPE={metrics['mape']:.2f}%  MAE={metrics['mae']:.2f} TRY  "
+              f"RMSE={metrics['rmse']:.2f} TRY  ({metrics['total_predictions']} saat)")
+
+    if failed:
+        print(f"\n[!] Tahmin edilemeyen haftalar: {', '.join(failed)}")
+    return not failed
+
+def main():
+    """Komut satırı girişi"""
+    parser = argparse.ArgumentParser(description='Çok haftalık geriye dönük tahmin ve karşılaştırma')
+    parser.add_argument('first_monday', help='İlk hafta (YYYY-MM-DD, Pazartesi)')
+    parser.add_argument('last_monday', help='Son hafta (YYYY-MM-DD, Pazartesi, dahil)')
+    parser.add_argument('--workers', type=int, default=None, help='Süreç sayısı (varsayılan: CPU sayısı)')
+    args = parser.parse_args()
+
+    with pipeline_run('backfill'):
+        success = run_backfill(args.first_monday, args.last_monday, workers=args.workers)
+    sys.exit(0 if success else 1)
+
+if __name__ == "__main__":
+    from profiling import profiled
+    with profiled('backfill'):
+        main()
@@ -0,0 +1,543 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+EPİAŞ MCP Fiyat Tahmini - Uçtan Uca Benchmark
+=============================================
+
+synthetic_data.py ile 1, 2, 5 ve 10 yıllık scratch veri tabanları üretir ve
+her boyutta ML pipeline aşamalarının sürelerini ölçer:
+
+    load_data_from_db, feature_build, train_prophet_model, make_forecast,
+    save_forecast_to_db, compare_week, export_forecasts
+
+Her aşama --repeat kez çalıştırılır; rapor medyan/p95 süre, işlenen satır,
+throughput (satır/s) ve boyuta göre ölçeklenme eğrisini (log-log eğim:
+~1 doğrusal, ~2 karesel) içerir. Gerçek veri tabanına ve public/ dosyalarına
+dokunulmaz; tüm çıktılar geçici dizine yazılır.
+
+Prophet kurulu değilse eğitim/tahmin aşamaları 'skipped' olarak raporlanır ve
+sonraki aşamalar için mevsimsel naive tahmin kullanılır.
+
+Kullanım:
+    python src/ml/benchmark.py                       # 1,2,5,10 yıl
+    python src/ml/benchmark.py --sizes 1,2 --repeat 5
+    python src/ml/benchmark.py --output benchmarks/results/run.json
+
+Regresyon kontrolü (CI):
+    python src/ml/benchmark.py --update-baseline   # benchmarks/baseline.json yazar
+    python src/ml/benchmark.py --check             # baseline ile aynı iş yükü;
+                                                   # regresyonda çıkış kodu 1
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import contextlib
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(script_dir)
+
+import database
+from synthetic_data import build_database, DEFAULT_END_DATE
+from calendar_features import add_time_features
+
+DEFAULT_SIZES = (1, 2, 5, 10)
+DEFAULT_REPEAT = 3
+
+RESULTS_DIR = os.path.join(script_dir, '../../benchmarks/results')
+BASELINE_PATH = os.path.join(script_dir, '../../benchmarks/baseline.json')
+
+# Regresyon eşikleri: medyan en az %25 VE 20 ms yavaşlamalı; baseline
+# tekrarları gürültülüyse eşik NOISE_FACTOR x göreli MAD'e genişler.
+# p95 kuyruğu daha oynak olduğu için iki kat gevşek eşikle kontrol edilir.
+REL_THRESHOLD = 0.25
+ABS_THRESHOLD = 0.02
+NOISE_FACTOR = 3.0
+P95_FACTOR = 2.0
+
+# --check'i başarısız yapan durumlar (hata veren / ölçülemeyen aşama dahil)
+FAILING_STATUSES = ('REGRESSION', 'ERROR', 'MISSING')
+
+STAGES = (
+    'load_data_from_db',
+    'feature_build',
+    'train_prophet_model',
+    'make_forecast',
+    'save_forecast_to_db',
+    'compare_week',
+    'export_forecasts',
+)
+
+class StageSkipped(Exception):
+    """Aşama bu ortamda çalıştırılamıyor (ör. prophet kurulu değil)"""
+
+def percentile(values, q):
+    """Küçük örneklem için doğrusal interpolasyonlu yüzdelik"""
+    return float(np.percentile(np.asarray(values, dtype=float), q))
+
+def summarize(times, rows):
+    """
+    Tekrar sürelerinden özet istatistik üretir
+
+    Args:
+        times (list): Saniye cinsinden süreler
+        rows (int): Aşamanın işlediği satır sayısı
+
+    Returns:
+        dict: median, p95, min, max, runs, rows, rows_per_second
+    """
+    median = percentile(times, 50)
+    return {
+        'median': round(median, 4),
+        'p95': round(percentile(times, 95), 4),
+        'min': round(min(times), 4),
+        'max': round(max(times), 4),
+        'runs': [round(t, 4) for t in times],
+        'rows': rows,
+        'rows_per_second': round(rows / median, 1) if rows and median > 0 else None,
+    }
+
+@contextlib.contextmanager
+def quiet(enabled=True):
+    """Pipeline fonksiyonlarının ayrıntılı çıktısını bastırır"""
+    if not enabled:
+        yield
+        return
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+def naive_forecast(history, week_start):
+    """
+    Prophet yokken kullanılan mevsimsel naive tahmin (geçen haftanın aynı saati)
+
+    Args:
+        history: 'ds', 'y' kolonlu DataFrame
+        week_start (str): Tahmin haftasının Pazartesi'si
+
+    Returns:
+        pd.DataFrame: make_forecast() çıktısı gibi 'ds', 'yhat' kolonları
+    """
+    start = pd.Timestamp(week_start)
+    ds = pd.date_range(start, periods=168, freq='h')
+    last_week = history.set_index('ds')['y'].reindex(ds - pd.Timedelta(weeks=1))
+    return pd.DataFrame({'ds': ds, 'yhat': last_week.to_numpy()})
+
+class Workload:
+    """Tek bir veri boyutu için aşamaları ve aralarındaki durumu tutar"""
+
+    def __init__(self, db_path, work_dir, end_date=DEFAULT_END_DATE):
+        self.db_path = db_path
+        self.work_dir = work_dir
+        # Son tam hafta tahmin edilir: gerçek değerler mevcut, compare_week anlamlı
+        self.week_start = (pd.Timestamp(end_date) - timedelta(days=7)).strftime('%Y-%m-%d')
+        self.week_end = (pd.Timestamp(end_date) - timedelta(days=1)).strftime('%Y-%m-%d')
+        self.df = None
+        self.model = None
+        self.forecast = None
+
+    def activate(self):
+        """Bağlantı katmanını ve çıktı yollarını scratch dizine yönlendirir"""
+        database.close_all()
+        database.DB_PATH = self.db_path
+
+        import export_json
+        export_json.OUTPUT_PATH = os.path.join(self.work_dir, 'forecasts.json')
+        export_json.WEEKS_DIR = os.path.join(self.work_dir, 'weeks')
+        export_json.BINARY_PATH = os.path.join(self.work_dir, 'forecasts.bin')
+
+        try:
+            import predict
+            predict.OUTPUT_DIR = self.work_dir
+        except ImportError:
+            pass
+
+        # hourly_facts ilk okumada tamamen oluşturulur; ölçümlere karışmasın
+        from hourly_facts import refresh_pending_facts
+        refresh_pending_facts()
+
+    def load_data_from_db(self):
+        from train_prophet import load_data_from_db
+        self.df = load_data_from_db(end_date=self.week_start)
+        return len(self.df)
+
+    def feature_build(self):
+        frame = self.df[['ds', 'y']].copy()
+        add_time_features(frame)
+        return len(frame)
+
+    def train_prophet_model(self):
+        try:
+            from train_prophet import train_prophet_model, create_turkish_holidays
+        except ImportError as e:
+            raise StageSkipped(f"prophet kurulu değil ({e})")
+        self.model = train_prophet_model(self.df, create_turkish_holidays())
+        return len(self.df)
+
+    def make_forecast(self):
+        if self.model is None:
+            raise StageSkipped("eğitilmiş model yok")
+        from predict import make_forecast
+        self.forecast = make_forecast(self.model, days=7).head(168)
+        # predict() tüm geçmiş + gelecek saatler üzerinde çalışır
+        return len(self.model.history) + 7 * 24
+
+    def save_forecast_to_db(self):
+        from predict import save_forecast_to_db
+        forecast = self.forecast
+        if forecast is None:
+            forecast = naive_forecast(self.df, self.week_start)
+        save_forecast_to_db(forecast, self.week_start, self.week_end)
+        return len(forecast)
+
+    def compare_week(self):
+        from compare_forecasts import compare_week
+        result = compare_week(self.week_start, self.week_end)
+        return result['total_predictions'] if result else 0
+
+    def export_forecasts(self):
+        from export_json import export_forecasts
+        # Değişmeyen dosyaları atlama optimizasyonunu değil, tam export'u ölç
+        for name in os.listdir(self.work_dir):
+            path = os.path.join(self.work_dir, name)
+            if name.startswith('forecasts') or name == 'weeks':
+                shutil.rmtree(path) if os.path.isdir(path) else os.remove(path)
+        export_forecasts()
+        conn = database.get_reader()
+        rows = conn.execute("SELECT COUNT(*) FROM forecast_history").fetchone()[0]
+        conn.close()
+        return rows
+
+def run_stage(workload, stage, repeat, verbose=False):
+    """
+    Bir aşamayı 'repeat' kez çalıştırır ve özetler
+
+    Returns:
+        dict: summarize() çıktısı veya {'skipped': sebep} / {'error': mesaj}
+    """
+    times = []
+    rows = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        try:
+            with quiet(not verbose):
+                rows = getattr(workload, stage)()
+        except StageSkipped as e:
+            return {'skipped': str(e)}
+        except Exception as e:
+            return {'error': f"{type(e).__name__}: {e}"}
+        times.append(time.perf_counter() - start)
+    return summarize(times, rows)
+
+def scaling_curves(results):
+    """
+    Aşama başına boyut-süre eğrisi ve log-log eğimi
+
+    Args:
+        results (dict): {years: {'hours': n, 'stages': {stage: summary}}}
+
+    Returns:
+        dict: {stage: {'points': [...], 'exponent': eğim}}
+    """
+    curves = {}
+    for stage in STAGES:
+        points = [
+            {'years': years, 'hours': result['hours'], 'median': result['stages'][stage]['median']}
+            for years, result in sorted(results.items())
+            if 'median' in result['stages'].get(stage, {})
+        ]
+        exponent = None
+        usable = [p for p in points if p['median'] > 0]
+        if len(usable) >= 2:
+            exponent = float(np.polyfit(
+                np.log([p['hours'] for p in usable]),
+                np.log([p['median'] for p in usable]), 1
+            )[0])
+            exponent = round(exponent, 2)
+        curves[stage] = {'points': points, 'exponent': exponent}
+    return curves
+
+def run_benchmarks(sizes=DEFAULT_SIZES, repeat=DEFAULT_REPEAT, stages=STAGES, verbose=False, keep_dir=None):
+    """
+    Tüm boyutlar için benchmark'ı çalıştırır
+
+    Args:
+        sizes: Yıl sayıları
+        repeat (int): Aşama başına tekrar
+        stages: Çalıştırılacak aşamalar (STAGES sırası korunur)
+        verbose (bool): Pipeline çıktısını göster
+        keep_dir (str, optional): Scratch veri tabanlarını bu dizinde bırak
+
+    Returns:
+        dict: JSON rapor
+    """
+    original_db_path = database.DB_PATH
+    base_dir = keep_dir or tempfile.mkdtemp(prefix='epias-bench-')
+    os.makedirs(base_dir, exist_ok=True)
+    results = {}
+
+    try:
+        for years in sizes:
+            print(f"\n[*] {years} yıllık veri hazırlanıyor...")
+            size_dir = os.path.join(base_dir, f"{years}y")
+            os.makedirs(size_dir, exist_ok=True)
+            db_path = os.path.join(size_dir, 'energy.db')
+
+            start = time.perf_counter()
+            hours = build_database(db_path, years)
+            generate_seconds = time.perf_counter() - start
+            print(f"[+] {hours} saat üretildi ({generate_seconds:.1f}s)")
+
+            workload = Workload(db_path, size_dir)
+            workload.activate()
+
+            stage_results = {}
+            for stage in STAGES:
+                # Veri yükleme diğer aşamaların girdisi; her zaman çalışır
+                if stage not in stages and stage != 'load_data_from_db':
+                    continue
+                summary = run_stage(workload, stage, repeat, verbose=verbose)
+                stage_results[stage] = summary
+                if 'median' in summary:
+                    throughput = f"{summary['rows_per_second']:,.0f} satır/s" if summary['rows_per_second'] else '-'
+                    print(f"   {stage:<22s} medyan {summary['median']:8.3f}s  p95 {summary['p95']:8.3f}s  {throughput}")
+                else:
+                    print(f"   {stage:<22s} {'atlandı: ' + summary['skipped'] if 'skipped' in summary else 'HATA: ' + summary['error']}")
+
+            results[years] = {
+                'hours': hours,
+                'generate_seconds': round(generate_seconds, 3),
+                'stages': stage_results,
+            }
+    finally:
+        database.close_all()
+        database.DB_PATH = original_db_path
+        if keep_dir is None:
+            shutil.rmtree(base_dir, ignore_errors=True)
+
+    return {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'processor': platform.processor() or platform.machine(),
+            'cpu_count': os.cpu_count(),
+        },
+        'repeat': repeat,
+        'sizes': {str(years): result for years, result in results.items()},
+        'scaling': scaling_curves(results),
+    }
+
+def print_scaling(report):
+    """Ölçeklenme eğimlerini yazdırır"""
+    print("\n[*] Ölçeklenme (log-log eğim; ~1 doğrusal):")
+    for stage, curve in report['scaling'].items():
+        if curve['exponent'] is not None:
+            print(f"   {stage:<22s} {curve['exponent']:5.2f}")
+
+def baseline_from_report(report, stages):
+    """
+    Rapordan commit'lenecek baseline'ı çıkarır (aşama başına medyan, p95, tekrarlar)
+
+    Returns:
+        dict: sizes/repeat/stages iş yükü tanımı + 'timings' {"<yıl>y/<aşama>": {...}}
+    """
+    timings = {}
+    for years, result in report['sizes'].items():
+        for stage, summary in result['stages'].items():
+            if 'median' in summary:
+                timings[f"{years}y/{stage}"] = {
+                    'median': summary['median'],
+                    'p95': summary['p95'],
+                    'runs': summary['runs'],
+                    'rows': summary['rows'],
+                }
+    return {
+        'created_at': report['generated_at'],
+        'environment': report['environment'],
+        'sizes': [int(years) for years in report['sizes']],
+        'repeat': report['repeat'],
+        'stages': list(stages),
+        'timings': timings,
+    }
+
+def stage_errors(report):
+    """
+    Hata veren aşamalar
+
+    Returns:
+        dict: {"<yıl>y/<aşama>": hata mesajı}
+    """
+    return {
+        f"{years}y/{stage}": summary['error']
+        for years, result in report['sizes'].items()
+        for stage, summary in result['stages'].items()
+        if 'error' in summary
+    }
+
+def relative_noise(runs):
+    """Tekrarların medyana göre göreli MAD'i (tek tekrar = 0)"""
+    runs = np.asarray(runs, dtype=float)
+    median = np.median(runs)
+    if len(runs) < 2 or median <= 0:
+        return 0.0
+    return float(np.median(np.abs(runs - median)) / median)
+
+def compare_to_baseline(baseline, report):
+    """
+    Ölçümleri baseline ile gürültü farkındalıklı eşiklerle karşılaştırır
+
+    Args:
+        baseline (dict): baseline_from_report() çıktısı
+        report (dict): run_benchmarks() çıktısı
+
+    Returns:
+        list: Her anahtar için {'key', 'base', 'current', 'change', 'threshold', 'status'};
+              hata veren aşamalar 'ERROR' (+ 'error'), ölçülemeyenler 'MISSING'
+    """
+    current = baseline_from_report(report, baseline.get('stages', STAGES))['timings']
+    errors = stage_errors(report)
+    rows = []
+    for key in sorted(set(baseline['timings']) | set(current) | set(errors), key=lambda k: (int(k.split('y/')[0]), STAGES.index(k.split('/')[1]))):
+        base = baseline['timings'].get(key)
+        now = current.get(key)
+        if base is None and now is not None:
+            rows.append({'key': key, 'base': None, 'current': now, 'change': None, 'threshold': None, 'status': 'new'})
+            continue
+        if now is None:
+            rows.append({'key': key, 'base': base, 'current': None, 'change': None, 'threshold': None,
+                         'status': 'ERROR' if key in errors else 'MISSING', 'error': errors.get(key)})
+            continue
+
+        threshold = max(REL_THRESHOLD, NOISE_FACTOR * relative_noise(base['runs']))
+        change = (now['median'] - base['median']) / base['median'] if base['median'] > 0 else 0.0
+        p95_change = (now['p95'] - base['p95']) / base['p95'] if base['p95'] > 0 else 0.0
+
+        status = 'ok'
+        if now['median'] - base['median'] > ABS_THRESHOLD and (
+            change > threshold or p95_change > threshold * P95_FACTOR
+        ):
+            status = 'REGRESSION'
+        elif base['median'] - now['median'] > ABS_THRESHOLD and change < -threshold:
+            status = 'faster'
+
+        rows.append({
+            'key': key, 'base': base, 'current': now,
+            'change': round(change, 4), 'p95_change': round(p95_change, 4),
+            'threshold': round(threshold, 4), 'status': status,
+        })
+    return rows
+
+def print_comparison(rows):
+    """Baseline karşılaştırmasını tablo halinde yazdırır"""
+    print(f"\n{'Aşama':<28s} {'Baseline':>10s} {'Şimdi':>10s} {'Değişim':>9s} {'p95 Δ':>8s} {'Eşik':>7s}  Durum")
+    print("-"*86)
+    for row in rows:
+        base = f"{row['base']['median']:.3f}s" if row['base'] else '-'
+        now = f"{row['current']['median']:.3f}s" if row['current'] else '-'
+        change = f"{row['change'] * 100:+.1f}%" if row['change'] is not None else '-'
+        p95 = f"{row['p95_change'] * 100:+.0f}%" if row.get('p95_change') is not None else '-'
+        threshold = f"{row['threshold'] * 100:.0f}%" if row['threshold'] is not None else '-'
+        flag = '❌ ' if row['status'] in FAILING_STATUSES else ''
+        print(f"{row['key']:<28s} {base:>10s} {now:>10s} {change:>9s} {p95:>8s} {threshold:>7s}  {flag}{row['status']}")
+        if row.get('error'):
+            print(f"{'':<28s} {row['error']}")
+
+def load_baseline(path):
+    """Baseline dosyasını okur (yoksa None)"""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def parse_sizes(value):
+    return tuple(int(part) for part in value.split(',') if part.strip())
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='EPİAŞ ML pipeline benchmark')
+    parser.add_argument('--sizes', type=parse_sizes, default=None,
+                        help='Yıl sayıları, virgülle (varsayılan 1,2,5,10; --check ile baseline\'ınki)')
+    parser.add_argument('--repeat', type=int, default=None, help=f'Aşama başına tekrar (varsayılan {DEFAULT_REPEAT})')
+    parser.add_argument('--stages', default=None, help='Çalıştırılacak aşamalar, virgülle')
+    parser.add_argument('--output', help='JSON rapor yolu (varsayılan benchmarks/results/<zaman>.json)')
+    parser.add_argument('--keep', help='Scratch veri tabanlarını bu dizinde bırak')
+    parser.add_argument('--verbose', action='store_true', help='Pipeline çıktısını göster')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='Baseline dosyası')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--check', action='store_true', help='Baseline ile karşılaştır, regresyonda çıkış kodu 1')
+    mode.add_argument('--update-baseline', action='store_true', help='Sonuçları baseline olarak kaydet')
+    return parser
+
+def main():
+    """Komut satırından benchmark çalıştırır"""
+    args = build_parser().parse_args()
+
+    baseline = load_baseline(args.baseline) if args.check else None
+    if args.check and baseline is None:
+        print(f"[!] Baseline bulunamadı: {args.baseline}")
+        print("    Önce aynı ortamda 'python src/ml/benchmark.py --update-baseline' çalıştırın.")
+        sys.exit(2)
+
+    # --check: açıkça verilmedikçe baseline ile aynı iş yükü
+    sizes = args.sizes or (tuple(baseline['sizes']) if baseline else DEFAULT_SIZES)
+    repeat = args.repeat or (baseline['repeat'] if baseline else DEFAULT_REPEAT)
+    stages_arg = args.stages or (','.join(baseline['stages']) if baseline else ','.join(STAGES))
+    stages = tuple(s.strip() for s in stages_arg.split(',') if s.strip())
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        print(f"[!] Bilinmeyen aşama: {', '.join(sorted(unknown))}")
+        sys.exit(2)
+
+    print("="*70)
+    print(f"BENCHMARK: {', '.join(f'{y} yıl' for y in sizes)} x {repeat} tekrar")
+    print("="*70)
+
+    report = run_benchmarks(sizes, repeat, stages, verbose=args.verbose, keep_dir=args.keep)
+    print_scaling(report)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n[+] Rapor kaydedildi: {output}")
+
+    errors = stage_errors(report)
+    if args.update_baseline:
+        if errors:
+            print(f"[!] {len(errors)} aşama hata verdi; baseline yazılmadı:")
+            for key, message in errors.items():
+                print(f"    {key}: {message}")
+            sys.exit(1)
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline_from_report(report, stages), f, ensure_ascii=False, indent=2)
+            f.write('\n')
+        print(f"[+] Baseline güncellendi: {args.baseline}")
+
+    if args.check:
+        if baseline['environment'].get('cpu_count') != report['environment']['cpu_count'] or \
+                baseline['environment'].get('python') != report['environment']['python']:
+            print("[!] Baseline farklı bir ortamda alınmış; karşılaştırma yanıltıcı olabilir")
+        rows = compare_to_baseline(baseline, report)
+        print_comparison(rows)
+        failures = [row for row in rows if row['status'] in FAILING_STATUSES]
+        print("="*70)
+        if failures:
+            print(f"❌ {len(failures)} aşama başarısız "
+                  f"({', '.join(row['key'] + ' ' + row['status'] for row in failures)})")
+            sys.exit(1)
+        print("✅ Regresyon yok")
+
+    print("="*70)
+
+if __name__ == "__main__":
+    main()
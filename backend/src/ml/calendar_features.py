@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+EPİAŞ MCP Fiyat Tahmini - Takvim Özellikleri
+============================================
+
+Eğitim, tahmin ve hourly_facts tablosunun ortak kullandığı takvim bilgileri:
+1. Ramazan ve Kurban Bayramı günleri (Prophet bunları otomatik eklemiyor)
+2. Saatlik feature engineering (hour, is_weekend, is_peak_hour, is_daytime, day_of_week)
+3. v2 modelinin extreme_low_risk regressor'ü (Pazar öğle saatleri)
+4. Tatil bayrağı (resmi tatiller + bayramlar)
+5. Haftanın saati (0-167) dilimi
+6. Gün / hafta / ay dönem başları (blok ve rollup tabloları)
+"""
+
+import numpy as np
+import pandas as pd
+
+from epoch_hours import EPOCH_WEEKDAY, dates_to_days, days_to_dates
+
+try:
+    import holidays as holidays_lib
+except ImportError:  # prophet ile birlikte gelir; yoksa sadece bayramlar kullanılır
+    holidays_lib = None
+
+# Ramazan ve Kurban Bayramı günleri (uzatmalar dahil)
+BAYRAM_DAYS = {
+    'Ramazan_Bayrami': [
+        # 2024 Ramazan (9 günlük uzatma)
+        '2024-04-06', '2024-04-07', '2024-04-08', '2024-04-09', '2024-04-10',
+        '2024-04-11', '2024-04-12', '2024-04-13', '2024-04-14',
+        # 2025 Ramazan
+        '2025-03-29', '2025-03-30', '2025-04-01',
+    ],
+    'Kurban_Bayrami': [
+        # 2024 Kurban
+        '2024-06-15', '2024-06-16', '2024-06-17', '2024-06-18', '2024-06-19',
+        # 2025 Kurban
+        '2025-06-05', '2025-06-06', '2025-06-07', '2025-06-08', '2025-06-09',
+    ],
+}
+
+# Peak saatler (Sabah 8-10, Akşam 18-21) ve gündüz saatleri (güneş, 10:00-16:00)
+PEAK_HOURS = [8, 9, 10, 18, 19, 20, 21]
+DAYTIME_HOURS = list(range(10, 16))
+
+# Pazar öğle saatleri: güneş üretimiyle fiyatın 0 TRY'ye düştüğü saatler (v2 modeli)
+MIDDAY_HOURS = [10, 11, 12, 13, 14]
+
+# Haftanın saat sayısı (Pazartesi 00:00 = 0, Pazar 23:00 = 167)
+HOURS_PER_WEEK = 7 * 24
+
+# Özet tablolarının dönemleri (period_start: dönemin ilk günü)
+PERIODS = ('day', 'week', 'month')
+
+def add_time_features(df):
+    """
+    'ds' kolonundan saatlik regressor kolonlarını üretir (yerinde)
+
+    Args:
+        df: 'ds' (timezone'suz datetime) kolonu olan DataFrame
+
+    Returns:
+        pd.DataFrame: hour, is_weekend, is_peak_hour, is_daytime, day_of_week eklenmiş df
+    """
+    df['hour'] = df['ds'].dt.hour
+    df['is_weekend'] = (df['ds'].dt.dayofweek >= 5).astype(int)
+    df['is_peak_hour'] = df['hour'].isin(PEAK_HOURS).astype(int)
+    df['is_daytime'] = df['hour'].isin(DAYTIME_HOURS).astype(int)
+    df['day_of_week'] = df['ds'].dt.dayofweek
+    return df
+
+def add_extreme_low_risk(df):
+    """
+    Pazar + öğle saati kombinasyonu için extreme_low_risk kolonu ekler (yerinde)
+
+    Args:
+        df: 'ds' kolonu olan DataFrame
+
+    Returns:
+        pd.DataFrame: extreme_low_risk (0/1) eklenmiş df
+    """
+    df['extreme_low_risk'] = (
+        (df['ds'].dt.dayofweek == 6) & df['ds'].dt.hour.isin(MIDDAY_HOURS)
+    ).astype(int)
+    return df
+
+def hour_of_week(ds):
+    """
+    Haftanın saati: Pazartesi 00:00 = 0 ... Pazar 23:00 = 167
+
+    Args:
+        ds: Timezone'suz datetime Series
+
+    Returns:
+        np.ndarray: int dilim indeksleri
+    """
+    return (ds.dt.dayofweek * 24 + ds.dt.hour).to_numpy()
+
+def period_starts(dates, period):
+    """
+    Her günün ait olduğu dönemin ilk günü (vektörel)
+
+    Args:
+        dates: datetime64[D] dizisi
+        period (str): 'day' | 'week' (Pazartesi) | 'month'
+
+    Returns:
+        np.ndarray: datetime64[D]
+    """
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    if period == 'day':
+        return dates
+    if period == 'week':
+        weekday = (dates_to_days(dates) + EPOCH_WEEKDAY) % 7
+        return dates - weekday.astype('timedelta64[D]')
+    if period == 'month':
+        return dates.astype('datetime64[M]').astype('datetime64[D]')
+    raise ValueError(f"Bilinmeyen dönem: {period} ({', '.join(PERIODS)})")
+
+def covering_days(first_day, last_day):
+    """
+    [first_day, last_day] günlerine dokunan tüm hafta ve ayları tam kapsayan gün aralığı
+
+    Args:
+        first_day, last_day (int): Epoch gün indeksleri
+
+    Returns:
+        tuple: (ilk gün, son gün) indeksleri (dahil)
+    """
+    first, last = days_to_dates([first_day, last_day])
+    start = min(period_starts([first], 'week')[0], period_starts([first], 'month')[0])
+    week_end = period_starts([last], 'week')[0] + np.timedelta64(6, 'D')
+    month_end = (last.astype('datetime64[M]') + 1).astype('datetime64[D]') - np.timedelta64(1, 'D')
+    return int(dates_to_days(start)), int(dates_to_days(max(week_end, month_end)))
+
+def covering_runs(days):
+    """
+    Değişen günlerin dönemlerini tam kapsayan, birbirinden ayrık gün pencereleri
+
+    Her gün için covering_days penceresi alınır; çakışan ya da bitişik
+    pencereler birleştirilir. Eski bir saatin düzeltilmesi ile bugünün
+    eklenmesi aradaki ayların taranmasına yol açmaz.
+
+    Args:
+        days: Sıralı, tekil epoch gün indeksleri
+
+    Returns:
+        list: (ilk gün, son gün) çiftleri (dahil)
+    """
+    runs = []
+    for day in days:
+        first_day, last_day = covering_days(day, day)
+        if runs and first_day <= runs[-1][1] + 1:
+            runs[-1][1] = max(runs[-1][1], last_day)
+        else:
+            runs.append([first_day, last_day])
+    return [tuple(run) for run in runs]
+
+def holiday_days(years):
+    """
+    Verilen yıllar için tatil günleri kümesini döndürür
+
+    Args:
+        years: Yıl listesi
+
+    Returns:
+        set: datetime.date kümesi (resmi tatiller + bayramlar)
+    """
+    days = {pd.Timestamp(day).date() for dates in BAYRAM_DAYS.values() for day in dates}
+    if holidays_lib is not None:
+        days.update(holidays_lib.Turkey(years=sorted(set(years))).keys())
+    return days
+
+def is_holiday(ds):
+    """
+    Her saat için tatil bayrağı (vektörel)
+
+    Args:
+        ds: Timezone'suz datetime Series
+
+    Returns:
+        pd.Series: 0/1 tatil bayrağı
+    """
+    if len(ds) == 0:
+        return pd.Series([], dtype=int, index=ds.index)
+    days = holiday_days(ds.dt.year.unique().tolist())
+    return ds.dt.date.isin(days).astype(int)
@@ -4,25 +4,15 @@
 Prophet modelinde overfitting kontrolü
 """
 
-import pandas as pd
 import numpy as np
 from prophet import Prophet
-from prophet.serialize import model_from_json
-import sqlite3
 from datetime import timedelta
 import os
 
-DB_PATH = os.path.join(os.path.dirname(__file__), '../../data/energy.db')
-MODEL_PATH = os.path.join(os.path.dirname(__file__), '../../models/prophet_model.json')
+from hourly_facts import refresh_pending_facts
+from evaluation import EvaluationEngine, metrics
 
-def load_data():
-    """Veri tabanından veri yükle"""
-    conn = sqlite3.connect(DB_PATH)
-    query = "SELECT date as ds, price as y FROM mcp_data ORDER BY date"
-    df = pd.read_sql_query(query, conn)
-    conn.close()
-    df['ds'] = pd.to_datetime(df['ds']).dt.tz_localize(None)
-    return df
+MODEL_PATH = os.path.join(os.path.dirname(__file__), '../../models/prophet_model.json')
 
 def create_train_test_splits(df):
     """Farklı zaman dilimlerinde train/test split'leri oluştur"""
@@ -55,7 +45,7 @@ def create_train_test_splits(df):
 
     return splits
 
-def evaluate_split(train, test, split_name):
+def evaluate_split(engine, train, test, split_name):
     """Bir split için model eğit ve değerlendir"""
     print(f"\n{'='*60}")
     print(f"Split: {split_name}")
@@ -73,20 +63,14 @@ def evaluate_split(train, test, split_name):
         seasonality_prior_scale=10.0,
     )
     model.add_country_holidays('TR')
-    model.fit(train)
-
-    # Tahmin
-    forecast = model.predict(test[['ds']])
-
-    # Metrikler
-    y_true = test['y'].values
-    y_pred = forecast['yhat'].values
+    model.fit(train[['ds', 'y']])
 
-    mae = np.mean(np.abs(y_true - y_pred))
-    rmse = np.sqrt(np.mean((y_true - y_pred)**2))
+    # Tahmin: test satırları ardışık bir pencere
+    frame = engine.predict(model, test['ds'].min(), test['ds'].max() + timedelta(hours=1), key=split_name)
 
-    mask = y_true != 0
-    mape = np.mean(np.abs((y_true[mask] - y_pred[mask]) / y_true[mask])) * 100 if mask.sum() > 0 else 0
+    # Metrikler (MAPE: 0 TRY hariç)
+    result = metrics(frame, mape_mask='nonzero')
+    mae, rmse, mape = result['mae'], result['rmse'], result['mape']
 
     print(f"\nMetrikler:")
     print(f"  MAE:  {mae:.2f} TRY")
@@ -100,8 +84,11 @@ def main():
     print("Overfitting Kontrolu - Farkli Zaman Dilimlerinde Test")
     print("="*60)
 
-    # Veri yükle
-    df = load_data()
+    # Bölünmeler hourly_facts'in güncel haliyle yapılır
+    refresh_pending_facts()
+    # Veri yükle (bir kez)
+    engine = EvaluationEngine()
+    df = engine.df
 
     # Farklı split'ler oluştur
     splits = create_train_test_splits(df)
@@ -109,7 +96,10 @@ def main():
     # Her split'i değerlendir
     results = []
     for split in splits:
-        mae, rmse, mape = evaluate_split(split['train'], split['test'], split['name'])
+        if len(split['test']) == 0:
+            print(f"\n[!] {split['name']}: test verisi yok (veri araligi kisa), atlandi")
+            continue
+        mae, rmse, mape = evaluate_split(engine, split['train'], split['test'], split['name'])
         results.append({
             'split': split['name'],
             'mae': mae,
@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+EPİAŞ MCP Fiyat Tahmini - İçerik Hash'li Adım Checkpoint'leri
+=============================================================
+
+weekly_workflow aynı Pazartesi tekrar çalıştırıldığında (ör. export hatası
+sonrası) yeni veri gelmediyse Prophet'i yeniden eğitmemeli, tahmini ve
+grafikleri yeniden üretmemeli. Her adım bir girdi anahtarı ile kaydedilir:
+
+    train   = hash(end_date öncesi mcp_data satırları, model ayarları, tatiller)
+    predict = hash(model dosyası, hafta)
+    compare = hash(haftanın tahmin + gerçek satırları)
+    export  = hash(forecast_history, weekly_performance, bu haftanın Pazartesi'si)
+
+Adım, anahtarı değişmediyse VE kaydedilen çıktıları (dosya hash'leri, DB
+satırları) hâlâ yerindeyse atlanır. Zincir doğal olarak yayılır: yeni veri
+-> yeni model dosyası -> yeni predict anahtarı -> yeni tahmin satırları ->
+yeni export anahtarı.
+
+Zorla yeniden çalıştırma: --force argümanı veya ML_FORCE=1.
+"""
+
+import os
+import sys
+import json
+import hashlib
+from datetime import datetime
+
+import pandas as pd
+
+from database import get_reader, get_writer, retry_on_lock
+from epoch_hours import table_exists, to_epoch_hour
+
+def hash_values(*parts):
+    """JSON'a çevrilebilir değerlerin sha256 özeti"""
+    payload = json.dumps(parts, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def hash_frame(df):
+    """DataFrame içeriğinin sha256 özeti (satır sırası dahil, index hariç)"""
+    digest = hashlib.sha256(','.join(df.columns).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+def hash_query(conn, query, params=()):
+    """Sorgu sonucunun içerik hash'i"""
+    return hash_frame(pd.read_sql_query(query, conn, params=params))
+
+def file_hash(path):
+    """Dosyanın sha256 özeti (yoksa None)"""
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def create_checkpoints_table(conn):
+    """pipeline_checkpoints tablosunu oluşturur (adım başına tek satır)"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS pipeline_checkpoints (
+            step TEXT PRIMARY KEY,
+            input_hash TEXT NOT NULL,
+            outputs TEXT NOT NULL,
+            metadata TEXT,
+            updated_at TEXT NOT NULL
+        )
+    """)
+
+def get_checkpoint(step):
+    """
+    Adımın son checkpoint'ini döndürür
+
+    Returns:
+        dict veya None: {'input_hash', 'outputs', 'metadata', 'updated_at'}
+    """
+    conn = get_reader()
+    try:
+        if not table_exists(conn, 'pipeline_checkpoints'):
+            return None
+        row = conn.execute(
+            "SELECT input_hash, outputs, metadata, updated_at FROM pipeline_checkpoints WHERE step = ?",
+            (step,)
+        ).fetchone()
+    finally:
+        conn.close()
+
+    if row is None:
+        return None
+    return {
+        'input_hash': row[0],
+        'outputs': json.loads(row[1]),
+        'metadata': json.loads(row[2]) if row[2] else {},
+        'updated_at': row[3],
+    }
+
+def force_requested():
+    """--force argümanı veya ML_FORCE ortam değişkeni verilmiş mi?"""
+    return '--force' in sys.argv or os.environ.get('ML_FORCE', '0') not in ('', '0', 'false')
+
+def is_fresh(step, input_hash, outputs):
+    """
+    Adım atlanabilir mi?
+
+    Args:
+        step (str): Adım adı
+        input_hash (str): Girdilerin şu anki hash'i
+        outputs (dict): Çıktıların şu anki hash'leri {etiket: hash veya None}
+
+    Returns:
+        tuple: (bool, checkpoint) - checkpoint metadata'sı atlanan adımın
+               özetini yazdırmak için kullanılır
+    """
+    if force_requested():
+        return False, None
+    checkpoint = get_checkpoint(step)
+    if checkpoint is None or checkpoint['input_hash'] != input_hash:
+        return False, checkpoint
+    # Çıktılardan biri silinmiş/değişmişse adım yeniden çalışır
+    for label, current in outputs.items():
+        if current is None or checkpoint['outputs'].get(label) != current:
+            return False, checkpoint
+    return True, checkpoint
+
+@retry_on_lock
+def record_checkpoint(step, input_hash, outputs, metadata=None):
+    """
+    Başarılı adımın checkpoint'ini kaydeder
+
+    Args:
+        step (str): Adım adı
+        input_hash (str): Adımın çalıştığı girdilerin hash'i
+        outputs (dict): Üretilen çıktıların hash'leri
+        metadata (dict, optional): Atlandığında gösterilecek özet (metrikler vb.)
+    """
+    with get_writer() as conn:
+        create_checkpoints_table(conn)
+        conn.execute("""
+            INSERT OR REPLACE INTO pipeline_checkpoints (step, input_hash, outputs, metadata, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, (
+            step, input_hash,
+            json.dumps(outputs, sort_keys=True),
+            json.dumps(metadata or {}, sort_keys=True, default=str),
+            datetime.now().isoformat(timespec='seconds'),
+        ))
+
+# =====================================================================
+# Haftalık adım anahtarları
+# =====================================================================
+
+def prophet_version():
+    """Kurulu prophet sürümü (farklı sürüm = farklı model)"""
+    try:
+        from importlib.metadata import version
+        return version('prophet')
+    except Exception:
+        return None
+
+def training_key(end_date):
+    """
+    Eğitim girdilerinin hash'i
+
+    Args:
+        end_date (str): Eğitim verisinin bitişi (dahil değil)
+    """
+    from train_prophet import MODEL_CONFIG, REGRESSORS, COUNTRY_HOLIDAYS, build_holidays_frame
+
+    conn = get_reader()
+    data_hash = hash_query(
+        conn, "SELECT ts, price FROM mcp_data WHERE ts < ? ORDER BY ts", (to_epoch_hour(end_date),)
+    )
+    conn.close()
+
+    return hash_values(
+        'train', end_date, data_hash,
+        MODEL_CONFIG, REGRESSORS, COUNTRY_HOLIDAYS,
+        hash_frame(build_holidays_frame()), prophet_version(),
+    )
+
+def forecast_rows_hash(week_start):
+    """forecast_history'deki haftanın tahmin satırlarının hash'i (yoksa None)"""
+    conn = get_reader()
+    df = pd.read_sql_query(
+        "SELECT forecast_datetime, predicted_price FROM forecast_history WHERE week_start = ? ORDER BY forecast_datetime",
+        conn, params=(week_start,)
+    )
+    conn.close()
+    return hash_frame(df) if len(df) > 0 else None
+
+def compare_key(week_start, week_end):
+    """Haftanın tahmin ve gerçek fiyat satırlarının hash'i"""
+    start_ts = to_epoch_hour(week_start)
+    end_ts = to_epoch_hour(week_end) + 24
+    conn = get_reader()
+    forecasts = hash_query(conn, """
+        SELECT ts, predicted_price FROM forecast_history
+        WHERE week_start = ? ORDER BY ts
+    """, (week_start,))
+    actuals = hash_query(conn, "SELECT ts, price FROM mcp_data WHERE ts >= ? AND ts < ? ORDER BY ts", (start_ts, end_ts))
+    conn.close()
+    return hash_values('compare', week_start, week_end, forecasts, actuals)
+
+def performance_row_hash(week_start):
+    """weekly_performance'taki haftanın metrik satırının hash'i (yoksa None)"""
+    conn = get_reader()
+    df = pd.read_sql_query(
+        "SELECT mape, mae, rmse, total_predictions FROM weekly_performance WHERE week_start = ?",
+        conn, params=(week_start,)
+    )
+    conn.close()
+    return hash_frame(df) if len(df) > 0 else None
+
+def export_key(current_monday):
+    """Export'un okuduğu tabloların ve tarih bağlamının hash'i"""
+    conn = get_reader()
+    forecasts = hash_query(conn, """
+        SELECT week_start, forecast_datetime, predicted_price, actual_price,
+               absolute_error, percentage_error
+        FROM forecast_history ORDER BY week_start, forecast_datetime
+    """)
+    performance = hash_query(conn, """
+        SELECT week_start, week_end, mape, mae, rmse, total_predictions
+        FROM weekly_performance ORDER BY week_start
+    """)
+    blocks = hash_query(conn, """
+        SELECT * FROM forecast_blocks ORDER BY period, period_start, block
+    """) if table_exists(conn, 'forecast_blocks') else None
+    # Alt/üst bantlar (attach_band) kantillerden: tahmin aynı kalıp kantiller değişebilir
+    quantiles = hash_query(conn, """
+        SELECT week_start, start_ts, hours, levels, hex(data) AS data FROM forecast_quantiles ORDER BY week_start
+    """) if table_exists(conn, 'forecast_quantiles') else None
+    conn.close()
+    return hash_values('export', current_monday, forecasts, performance, blocks, quantiles)
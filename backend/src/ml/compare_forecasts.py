@@ -14,13 +14,61 @@ Bu script:
 
 import pandas as pd
 import numpy as np
-import sqlite3
-import os
-from datetime import datetime, timedelta
 
-# Veri tabanı yolu
-DB_PATH = os.path.join(os.path.dirname(__file__), '../../data/energy.db')
+from epoch_hours import to_epoch_hour
+from database import get_writer, retry_on_lock
+from quantile_store import print_week_evaluation
 
+def error_metrics(y_true, y_pred):
+    """
+    Saatlik hatalar ve haftalık metrikler
+
+    Args:
+        y_true (np.ndarray): Gerçek fiyatlar
+        y_pred (np.ndarray): Tahminler
+
+    Returns:
+        tuple: (absolute_errors, percentage_errors, mae, rmse, mape)
+    """
+    # Mutlak hatalar
+    absolute_errors = np.abs(y_true - y_pred)
+    percentage_errors = (absolute_errors / y_true) * 100
+
+    # MAE (Mean Absolute Error)
+    mae = np.mean(absolute_errors)
+
+    # RMSE (Root Mean Squared Error)
+    rmse = np.sqrt(np.mean((y_true - y_pred)**2))
+
+    # MAPE (Mean Absolute Percentage Error) - sıfır olmayan değerler için
+    mask = y_true > 100  # 100 TRY'den büyük fiyatlar (0 TRY'yi filtrele)
+    mape = np.mean(percentage_errors[mask]) if mask.sum() > 0 else 0
+
+    return absolute_errors, percentage_errors, mae, rmse, mape
+
+def save_weekly_performance(conn, week_start, week_end, mape, mae, rmse, total_predictions):
+    """weekly_performance satırını ekler veya günceller (commit çağırana ait)"""
+    # Önce bu hafta için kayıt var mı kontrol et
+    check_query = "SELECT COUNT(*) as count FROM weekly_performance WHERE week_start = ?"
+    result = conn.execute(check_query, (week_start,)).fetchone()
+
+    if result[0] > 0:
+        # Güncelle
+        update_query = """
+            UPDATE weekly_performance
+            SET mape = ?, mae = ?, rmse = ?, total_predictions = ?
+            WHERE week_start = ?
+        """
+        conn.execute(update_query, (mape, mae, rmse, total_predictions, week_start))
+    else:
+        # Yeni kayıt ekle
+        insert_query = """
+            INSERT INTO weekly_performance (week_start, week_end, mape, mae, rmse, total_predictions)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """
+        conn.execute(insert_query, (week_start, week_end, mape, mae, rmse, total_predictions))
+
+@retry_on_lock
 def compare_week(week_start, week_end):
     """
     Belirli bir hafta için tahmin vs gerçek karşılaştırması yapar
@@ -36,57 +84,47 @@ def compare_week(week_start, week_end):
     print(f"HAFTALIK KARŞILAŞTIRMA: {week_start} - {week_end}")
     print("="*70)
 
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_writer()
 
     # 1. Tahminleri çek
     print(f"\n[*] {week_start} - {week_end} için tahminler yükleniyor...")
-    forecast_query = """
-        SELECT forecast_datetime, predicted_price
-        FROM forecast_history
-        WHERE week_start = ?
-        ORDER BY forecast_datetime
-    """
-    forecasts = pd.read_sql_query(forecast_query, conn, params=[week_start])
+    forecast_count = conn.execute(
+        "SELECT COUNT(*) FROM forecast_history WHERE week_start = ?", (week_start,)
+    ).fetchone()[0]
 
-    if len(forecasts) == 0:
+    if forecast_count == 0:
         print(f"[!] UYARI: {week_start} için tahmin bulunamadı!")
         conn.close()
         return None
 
-    print(f"[+] {len(forecasts)} tahmin kaydı bulundu")
+    print(f"[+] {forecast_count} tahmin kaydı bulundu")
 
     # 2. Gerçek değerleri çek
     print(f"[*] Gerçek değerler yükleniyor...")
 
-    # week_end'i dahil et (Pazar günü dahil)
-    actual_query = """
-        SELECT date, price
-        FROM mcp_data
-        WHERE date >= ? AND date <= ?
-        ORDER BY date
-    """
-    actuals = pd.read_sql_query(actual_query, conn, params=[week_start, week_end + ' 23:59:59'])
+    # week_end'i dahil et (Pazar günü dahil): [Pazartesi 00:00, sonraki Pazartesi 00:00)
+    start_ts = to_epoch_hour(week_start)
+    end_ts = to_epoch_hour(week_end) + 24
+    actual_count = conn.execute(
+        "SELECT COUNT(*) FROM mcp_data WHERE ts >= ? AND ts < ?", (start_ts, end_ts)
+    ).fetchone()[0]
 
-    if len(actuals) == 0:
+    if actual_count == 0:
         print(f"[!] UYARI: {week_start} - {week_end} için gerçek veri bulunamadı!")
         conn.close()
         return None
 
-    print(f"[+] {len(actuals)} gerçek kayıt bulundu")
+    print(f"[+] {actual_count} gerçek kayıt bulundu")
 
-    # 3. Tahmin ve gerçek verileri birleştir
-    # forecast_datetime ve date'i normalize et
-    forecasts['ds'] = pd.to_datetime(forecasts['forecast_datetime']).dt.tz_localize(None)
-    actuals['ds'] = pd.to_datetime(actuals['date']).dt.tz_localize(None)
-
-    # Merge
-    comparison = pd.merge(
-        forecasts,
-        actuals,
-        left_on='ds',
-        right_on='ds',
-        how='inner'
-    )
+    # 3. Tahmin ve gerçek verileri birleştir (tamsayı ts üzerinden join)
+    comparison_query = """
+        SELECT f.forecast_datetime, f.predicted_price, m.price
+        FROM forecast_history f
+        JOIN mcp_data m ON m.ts = f.ts
+        WHERE f.week_start = ? AND m.ts >= ? AND m.ts < ?
+        ORDER BY f.ts
+    """
+    comparison = pd.read_sql_query(comparison_query, conn, params=[week_start, start_ts, end_ts])
 
     if len(comparison) == 0:
         print("[!] HATA: Tahmin ve gerçek veriler eşleştirilemedi!")
@@ -99,44 +137,33 @@ def compare_week(week_start, week_end):
     y_true = comparison['price'].values
     y_pred = comparison['predicted_price'].values
 
-    # Mutlak hatalar
-    absolute_errors = np.abs(y_true - y_pred)
-    percentage_errors = (absolute_errors / y_true) * 100
-
-    # MAE (Mean Absolute Error)
-    mae = np.mean(absolute_errors)
-
-    # RMSE (Root Mean Squared Error)
-    rmse = np.sqrt(np.mean((y_true - y_pred)**2))
-
-    # MAPE (Mean Absolute Percentage Error) - sıfır olmayan değerler için
-    mask = y_true > 100  # 100 TRY'den büyük fiyatlar (0 TRY'yi filtrele)
-    mape = np.mean(percentage_errors[mask]) if mask.sum() > 0 else 0
+    absolute_errors, percentage_errors, mae, rmse, mape = error_metrics(y_true, y_pred)
 
     print(f"\n[*] PERFORMANS METRİKLERİ:")
     print(f"   MAE  (Ortalama Mutlak Hata)  : {mae:.2f} TRY")
     print(f"   RMSE (Kök Ortalama Kare Hata): {rmse:.2f} TRY")
     print(f"   MAPE (Ortalama Yüzde Hata)   : {mape:.2f}%")
     print(f"   Toplam Tahmin                : {len(comparison)}")
+    # Kantil tahminleri saklandıysa (forecast_quantiles) pinball loss + kapsama
+    print_week_evaluation(week_start)
 
     # 5. forecast_history'yi güncelle (actual_price, errors)
     print(f"\n[*] forecast_history tablosu güncelleniyor...")
 
-    for idx, row in comparison.iterrows():
-        update_query = """
-            UPDATE forecast_history
-            SET actual_price = ?,
-                absolute_error = ?,
-                percentage_error = ?
-            WHERE week_start = ? AND forecast_datetime = ?
-        """
-        conn.execute(update_query, (
-            row['price'],
-            absolute_errors[idx],
-            percentage_errors[idx],
-            week_start,
-            row['forecast_datetime']
-        ))
+    update_query = """
+        UPDATE forecast_history
+        SET actual_price = ?,
+            absolute_error = ?,
+            percentage_error = ?
+        WHERE week_start = ? AND forecast_datetime = ?
+    """
+    conn.executemany(update_query, zip(
+        y_true.tolist(),
+        absolute_errors.tolist(),
+        percentage_errors.tolist(),
+        [week_start] * len(comparison),
+        comparison['forecast_datetime'].tolist()
+    ))
 
     conn.commit()
     print(f"[+] {len(comparison)} kayıt güncellendi")
@@ -144,25 +171,7 @@ def compare_week(week_start, week_end):
     # 6. weekly_performance tablosuna kaydet
     print(f"[*] weekly_performance tablosuna kaydediliyor...")
 
-    # Önce bu hafta için kayıt var mı kontrol et
-    check_query = "SELECT COUNT(*) as count FROM weekly_performance WHERE week_start = ?"
-    result = conn.execute(check_query, (week_start,)).fetchone()
-
-    if result[0] > 0:
-        # Güncelle
-        update_query = """
-            UPDATE weekly_performance
-            SET mape = ?, mae = ?, rmse = ?, total_predictions = ?
-            WHERE week_start = ?
-        """
-        conn.execute(update_query, (mape, mae, rmse, len(comparison), week_start))
-    else:
-        # Yeni kayıt ekle
-        insert_query = """
-            INSERT INTO weekly_performance (week_start, week_end, mape, mae, rmse, total_predictions)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """
-        conn.execute(insert_query, (week_start, week_end, mape, mae, rmse, len(comparison)))
+    save_weekly_performance(conn, week_start, week_end, mape, mae, rmse, len(comparison))
 
     conn.commit()
     conn.close()
@@ -199,4 +208,6 @@ def main():
         print("\n[!] Karşılaştırma yapılamadı!")
 
 if __name__ == "__main__":
-    main()
+    from profiling import profiled
+    with profiled('compare_forecasts'):
+        main()
@@ -1,131 +1,99 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 """
-Model karsilastirmasi: v1 (original) vs v2 (improved)
+Model karsilastirmasi (A/B): registry'deki iki surum
+
+Kullanim:
+    python compare_models.py                 # aktif prophet vs aktif prophet_v2
+    python compare_models.py <surum_a> <surum_b>
 """
 
-import pandas as pd
-import numpy as np
-from prophet.serialize import model_from_json
-import sqlite3
-from datetime import timedelta
-import os
-
-DB_PATH = os.path.join(os.path.dirname(__file__), '../../data/energy.db')
-MODEL_V1 = os.path.join(os.path.dirname(__file__), '../../models/prophet_model.json')
-MODEL_V2 = os.path.join(os.path.dirname(__file__), '../../models/prophet_model_v2.json')
-
-def load_data():
-    conn = sqlite3.connect(DB_PATH)
-    query = "SELECT date as ds, price as y FROM mcp_data ORDER BY date"
-    df = pd.read_sql_query(query, conn)
-    conn.close()
-    df['ds'] = pd.to_datetime(df['ds']).dt.tz_localize(None)
-    return df
-
-def add_regressors(df):
-    """v2 model icin regressorlari ekle"""
-    df = df.copy()
-    df['is_sunday'] = df['ds'].dt.dayofweek == 6
-    df['is_midday'] = df['ds'].dt.hour.isin([10, 11, 12, 13, 14])
-    df['extreme_low_risk'] = (df['is_sunday'] & df['is_midday']).astype(int)
-    return df
-
-def evaluate_model(model, test_data, model_name, use_regressor=False):
-    """Model performansini olc"""
+import sys
+
+from hourly_facts import refresh_pending_facts
+from evaluation import EvaluationEngine, mask_variants
+from model_registry import active_version, get_version
+
+def evaluate_model(engine, version, start, model_name):
+    """Model performansini olc (tek tahmin, maske varyantlari onbellekten)"""
     print(f"\n{'='*70}")
     print(f"Model: {model_name}")
     print(f"{'='*70}")
 
-    if use_regressor:
-        test_data = add_regressors(test_data)
-        forecast = model.predict(test_data[['ds', 'extreme_low_risk']])
-    else:
-        forecast = model.predict(test_data[['ds']])
-
-    y_true = test_data['y'].values
-    y_pred = forecast['yhat'].values
-
-    # Tum veri
-    mae_all = np.mean(np.abs(y_true - y_pred))
-    rmse_all = np.sqrt(np.mean((y_true - y_pred)**2))
-
-    # Normal fiyatlar (>=100 TRY)
-    normal_mask = y_true >= 100
-    y_true_normal = y_true[normal_mask]
-    y_pred_normal = y_pred[normal_mask]
-
-    mae_normal = np.mean(np.abs(y_true_normal - y_pred_normal))
-    rmse_normal = np.sqrt(np.mean((y_true_normal - y_pred_normal)**2))
-    mape_normal = np.mean(np.abs((y_true_normal - y_pred_normal) / y_true_normal)) * 100
-
-    # Ekstrem dusuk fiyatlar (0-100 TRY)
-    extreme_mask = y_true < 100
-    if extreme_mask.sum() > 0:
-        y_true_extreme = y_true[extreme_mask]
-        y_pred_extreme = y_pred[extreme_mask]
-        mae_extreme = np.mean(np.abs(y_true_extreme - y_pred_extreme))
-    else:
-        mae_extreme = 0
+    frame = engine.predict_version(version, start=start)
+    variants = mask_variants(frame, names=('all', 'ge100', 'lt100'), mape_mask='ge100')
+    everything, normal, extreme = (variants.loc[name] for name in ('all', 'ge100', 'lt100'))
 
     print(f"\nTum Veri:")
-    print(f"  MAE:  {mae_all:.2f} TRY")
-    print(f"  RMSE: {rmse_all:.2f} TRY")
+    print(f"  MAE:  {everything['mae']:.2f} TRY")
+    print(f"  RMSE: {everything['rmse']:.2f} TRY")
 
-    print(f"\nNormal Fiyatlar (>= 100 TRY): {normal_mask.sum()} kayit")
-    print(f"  MAE:  {mae_normal:.2f} TRY")
-    print(f"  RMSE: {rmse_normal:.2f} TRY")
-    print(f"  MAPE: {mape_normal:.2f}%")
+    print(f"\nNormal Fiyatlar (>= 100 TRY): {int(normal['count'])} kayit")
+    print(f"  MAE:  {normal['mae']:.2f} TRY")
+    print(f"  RMSE: {normal['rmse']:.2f} TRY")
+    print(f"  MAPE: {normal['mape']:.2f}%")
 
-    print(f"\nEkstrem Dusuk (<100 TRY): {extreme_mask.sum()} kayit")
-    print(f"  MAE:  {mae_extreme:.2f} TRY")
+    print(f"\nEkstrem Dusuk (<100 TRY): {int(extreme['count'])} kayit")
+    print(f"  MAE:  {extreme['mae']:.2f} TRY")
 
     return {
         'model': model_name,
-        'mae_all': mae_all,
-        'rmse_all': rmse_all,
-        'mae_normal': mae_normal,
-        'rmse_normal': rmse_normal,
-        'mape_normal': mape_normal,
-        'mae_extreme': mae_extreme,
-        'extreme_count': extreme_mask.sum()
+        'mae_all': everything['mae'],
+        'rmse_all': everything['rmse'],
+        'mae_normal': normal['mae'],
+        'rmse_normal': normal['rmse'],
+        'mape_normal': normal['mape'],
+        'mae_extreme': extreme['mae'],
+        'extreme_count': int(extreme['count'])
     }
 
+def resolve_versions(argv):
+    """Komut satirindaki surumler; yoksa aktif prophet ve prophet_v2"""
+    if len(argv) >= 3:
+        entries = [get_version(argv[1]), get_version(argv[2])]
+        missing = [v for v, entry in zip(argv[1:3], entries) if entry is None]
+        if missing:
+            raise SystemExit(f"[!] Registry'de bulunamadi: {', '.join(missing)}")
+        return entries
+
+    entries = [active_version('prophet'), active_version('prophet_v2')]
+    if None in entries:
+        raise SystemExit("[!] Aktif prophet/prophet_v2 surumu yok. Surum verin veya mevcut dosyayi kaydedin:\n"
+                         "    python model_registry.py import ../../models/prophet_model_v2.json --name prophet_v2 --activate")
+    return entries
+
 def main():
+    entry_a, entry_b = resolve_versions(sys.argv)
+    label_a = f"{entry_a['name']} v{entry_a['version']}"
+    label_b = f"{entry_b['name']} v{entry_b['version']}"
+
     print("="*70)
-    print("MODEL KARSILASTIRMASI: v1 (Original) vs v2 (Improved)")
+    print(f"MODEL KARSILASTIRMASI: {label_a} vs {label_b}")
     print("="*70)
 
-    # Veri yukle
-    df = load_data()
-
-    # Son 60 gun test
-    test_start = df['ds'].max() - timedelta(days=60)
-    test_data = df[df['ds'] > test_start].copy()
+    # Test penceresi hourly_facts'ten (yeni kurulumda tablo burada oluşur)
+    refresh_pending_facts()
+    # Veri bir kez yuklenir; son 60 gun test
+    engine = EvaluationEngine()
+    test_start = engine.last_days(60)
+    test_data = engine.window(test_start)
 
     print(f"\n[*] Test verisi: {len(test_data)} kayit")
     print(f"[*] Tarih: {test_data['ds'].min()} -> {test_data['ds'].max()}")
 
-    # Model v1 yukle
-    print(f"\n[*] Model v1 yukleniyor...")
-    with open(MODEL_V1, 'r') as f:
-        model_v1 = model_from_json(f.read())
-
-    # Model v2 yukle
-    print(f"[*] Model v2 yukleniyor...")
-    with open(MODEL_V2, 'r') as f:
-        model_v2 = model_from_json(f.read())
+    # Modeller registry'den (yeniden egitim yok)
+    print(f"\n[*] Modeller yukleniyor: {label_a}, {label_b}")
 
     # Degerlendirme
-    results_v1 = evaluate_model(model_v1, test_data, "v1 (Original)", use_regressor=False)
-    results_v2 = evaluate_model(model_v2, test_data, "v2 (Improved)", use_regressor=True)
+    results_v1 = evaluate_model(engine, entry_a['version'], test_start, label_a)
+    results_v2 = evaluate_model(engine, entry_b['version'], test_start, label_b)
 
     # Karsilastirma
     print(f"\n{'='*70}")
     print("KARSILASTIRMA OZETI")
     print(f"{'='*70}")
 
-    print(f"\n{'Metrik':30s} {'v1 (Original)':15s} {'v2 (Improved)':15s} {'Iyilesme':15s}")
+    print(f"\n{'Metrik':30s} {label_a:15s} {label_b:15s} {'Iyilesme':15s}")
     print("-"*70)
 
     metrics = [
@@ -162,17 +130,17 @@ def main():
     overall_improvement = (results_v1['mae_normal'] - results_v2['mae_normal']) / results_v1['mae_normal'] * 100
 
     if overall_improvement > 5:
-        print(f"\n v2 MODEL DAHA IYI!")
+        print(f"\n {label_b} DAHA IYI!")
         print(f"    Normal fiyatlar icin {overall_improvement:.1f}% iyilesme")
-        print(f"    Kullanim onerisi: v2 modelini kullan")
+        print(f"    Kullanim onerisi: python model_registry.py activate {entry_b['version']}")
     elif overall_improvement > 0:
-        print(f"\n v2 HAFIF DAHA IYI")
+        print(f"\n {label_b} HAFIF DAHA IYI")
         print(f"    {overall_improvement:.1f}% iyilesme (minör)")
         print(f"    Her iki model de kullanilabilir")
     else:
         print(f"\n MODELLER BENZER")
         print(f"    Anlamli fark yok")
-        print(f"    v1 (daha basit) tercih edilebilir")
+        print(f"    {label_a} tercih edilebilir")
 
     print("="*70)
 
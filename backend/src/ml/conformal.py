@@ -0,0 +1,274 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+EPİAŞ MCP Fiyat Tahmini - Conformal Güven Aralıkları
+====================================================
+
+Prophet'in %95 aralıkları trend'in Monte Carlo simülasyonundan gelir: hem
+pahalıdır hem de (sabit tatil listesi, 0 TRY'ye düşen Pazar öğle saatleri
+yüzünden) gerçekleşen kapsama nominal değerden belirgin şekilde sapar.
+
+Bu modül aralıkları forecast_history'deki gerçek tahmin hatalarından üretir:
+
+1. Son WINDOW_WEEKS haftanın artıkları (gerçek - tahmin) haftanın saatine
+   (0-167) göre bir tampon matrisinde tutulur; her dilim komşu
+   ±NEIGHBOR_HOURS saatlerle havuzlanır ve bir kez sıralanır
+2. İstenen kapsama için alt/üst sınır, her dilimde split-conformal sırası
+   (⌊(n+1)α/2⌋ ve ⌈(n+1)(1-α/2)⌉) ile tek vektörel indeksleme ile okunur
+3. yhat_lower = yhat + alt artık, yhat_upper = yhat + üst artık (asimetrik)
+
+Sınırın kırpılmadan hesaplanması için dilim başına en az ⌈2/α⌉-1 örnek
+gerekir (%95 için 39). Tampon daha küçükse sıra en küçük/en büyük örneğe
+kırpılır ve kapsama nominalin altında kalır: is_calibrated bunu kontrol eder
+(predict.py o durumda Prophet aralıklarına döner), realized_coverage her hafta
+için gerçekleşen kapsamayı raporlar.
+
+Kullanım:
+    python conformal.py                          # %80 ve %95 için haftalık kapsama
+    python conformal.py --coverage 0.9 --window 12 --from 2025-06-02
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from database import get_reader
+from epoch_hours import table_exists, epoch_hours_to_local
+from calendar_features import hour_of_week, HOURS_PER_WEEK
+
+# Artık tamponundaki hafta sayısı
+WINDOW_WEEKS = 26
+
+# Her dilim ±bu kadar komşu saatle havuzlanır (26 hafta x 5 saat = 130 örnek)
+NEIGHBOR_HOURS = 2
+
+# Kapsama raporunda tampon için gereken en az hafta
+MIN_WEEKS = 4
+
+def load_residuals(start=None, end=None):
+    """
+    [start, end) aralığında başlayan haftaların artık matrisi
+
+    Args:
+        start (str, optional): İlk hafta (YYYY-MM-DD, dahil)
+        end (str, optional): Bitiş (YYYY-MM-DD, dahil değil)
+
+    Returns:
+        tuple: (week_starts listesi, np.ndarray (hafta, 168) - gerçeği olmayan saatler NaN)
+    """
+    conn = get_reader()
+    try:
+        if not table_exists(conn, 'forecast_history'):
+            return [], np.empty((0, HOURS_PER_WEEK))
+        df = pd.read_sql_query("""
+            SELECT f.week_start, f.ts, m.price - f.predicted_price AS residual
+            FROM forecast_history f
+            JOIN mcp_data m ON m.ts = f.ts
+            WHERE f.week_start >= ? AND f.week_start < ?
+        """, conn, params=(start or '0000-00-00', end or '9999-99-99'))
+    finally:
+        conn.close()
+
+    weeks = sorted(df['week_start'].unique())
+    matrix = np.full((len(weeks), HOURS_PER_WEEK), np.nan)
+    rows = pd.Index(weeks).get_indexer(df['week_start'])
+    slots = hour_of_week(epoch_hours_to_local(df['ts']))
+    matrix[rows, slots] = df['residual'].to_numpy(dtype=float)
+    return weeks, matrix
+
+class ConformalIntervals:
+    """
+    Haftanın saati bazında artık tamponu
+
+    Args:
+        residuals: (hafta, 168) artık matrisi (NaN = gerçek yok)
+        neighbor_hours (int): Havuzlanacak komşu saat sayısı
+    """
+
+    def __init__(self, residuals, neighbor_hours=NEIGHBOR_HOURS):
+        residuals = np.asarray(residuals, dtype=float).reshape(-1, HOURS_PER_WEEK)
+        self.weeks = len(residuals)
+
+        pooled = np.concatenate([
+            np.roll(residuals, shift, axis=1) for shift in range(-neighbor_hours, neighbor_hours + 1)
+        ])
+        # NaN'lar sona sıralanır; ilk counts[slot] değer geçerli
+        self._sorted = np.sort(pooled, axis=0)
+        self._counts = np.sum(~np.isnan(pooled), axis=0)
+        # Hiç örneği olmayan dilimler için tüm saatlerin havuzu
+        self._all = np.sort(pooled[~np.isnan(pooled)])
+
+    def is_calibrated(self, coverage=0.95):
+        """Her dilimde kapsama için sınırlar kırpılmadan hesaplanabiliyor mu?"""
+        required = int(np.ceil(2 / (1 - coverage))) - 1
+        return bool(self._counts.min() >= required)
+
+    @staticmethod
+    def _ranks(counts, levels):
+        """
+        Seviyelerin conformal sıraları (1 tabanlı, [1, n] aralığına kırpılmış):
+        q < 0.5 için ⌊(n+1)q⌋, diğerleri için ⌈(n+1)q⌉
+
+        Returns:
+            np.ndarray: (seviye, dilim)
+        """
+        levels = np.asarray(levels, dtype=float)[:, None]
+        scaled = (counts[None, :] + 1) * levels
+        ranks = np.where(levels < 0.5, np.floor(scaled), np.ceil(scaled))
+        return np.clip(ranks, 1, np.maximum(counts, 1)[None, :]).astype(int)
+
+    def residual_quantiles(self, levels):
+        """
+        Her dilim için artık kantilleri (tek vektörel indeksleme)
+
+        Args:
+            levels: Kantil seviyeleri (0-1, dahil değil)
+
+        Returns:
+            np.ndarray: (seviye, 168) - yhat'e eklenir
+        """
+        levels = np.asarray(levels, dtype=float)
+        if ((levels <= 0) | (levels >= 1)).any():
+            raise ValueError(f"Kantil seviyeleri 0 ile 1 arasında olmalı: {levels.tolist()}")
+
+        quantiles = np.take_along_axis(self._sorted, self._ranks(self._counts, levels) - 1, axis=0)
+
+        empty = self._counts == 0
+        if empty.any() and len(self._all) > 0:
+            pooled_ranks = self._ranks(np.array([len(self._all)]), levels)[:, 0]
+            quantiles[:, empty] = self._all[pooled_ranks - 1][:, None]
+        return quantiles
+
+    def offsets(self, coverage=0.95):
+        """
+        Her dilim için artık sınırları
+
+        Args:
+            coverage (float): Nominal kapsama (0-1)
+
+        Returns:
+            tuple: (lower, upper) - 168 elemanlı diziler (yhat'e eklenir)
+        """
+        if not 0 < coverage < 1:
+            raise ValueError(f"Kapsama 0 ile 1 arasında olmalı: {coverage}")
+
+        alpha = 1 - coverage
+        lower, upper = self.residual_quantiles([alpha / 2, 1 - alpha / 2])
+        return lower, upper
+
+    def apply(self, forecast, coverage=0.95):
+        """
+        Tahmine yhat_lower/yhat_upper kolonlarını yazar (yerinde)
+
+        Args:
+            forecast: ds ve yhat kolonlu DataFrame
+            coverage (float): Nominal kapsama
+
+        Returns:
+            pd.DataFrame: forecast
+        """
+        lower, upper = self.offsets(coverage)
+        slots = hour_of_week(forecast['ds'])
+        yhat = forecast['yhat'].to_numpy(dtype=float)
+        forecast['yhat_lower'] = yhat + lower[slots]
+        forecast['yhat_upper'] = yhat + upper[slots]
+        return forecast
+
+    @classmethod
+    def from_history(cls, before, weeks=WINDOW_WEEKS, neighbor_hours=NEIGHBOR_HOURS):
+        """
+        Haftadan önceki `weeks` haftanın artıklarıyla tampon (data leakage yok)
+
+        Args:
+            before (str): Tahmin edilecek haftanın Pazartesi'si (YYYY-MM-DD, dahil değil)
+        """
+        start = (pd.Timestamp(before) - pd.Timedelta(weeks=weeks)).strftime('%Y-%m-%d')
+        _, matrix = load_residuals(start, before)
+        return cls(matrix, neighbor_hours=neighbor_hours)
+
+def realized_coverage(coverages=(0.8, 0.95), start=None, end=None, window=WINDOW_WEEKS):
+    """
+    Her hafta için, sadece önceki `window` haftanın artıklarıyla kurulan
+    aralıkların gerçekleşen kapsaması
+
+    Args:
+        coverages: Nominal kapsamalar
+        start (str, optional): İlk hafta (YYYY-MM-DD, dahil)
+        end (str, optional): Bitiş (YYYY-MM-DD, dahil değil)
+        window (int): Tampon hafta sayısı
+
+    Returns:
+        pd.DataFrame: week_start, nominal, hours, realized, width (ortalama aralık genişliği, TRY)
+    """
+    load_start = (pd.Timestamp(start) - pd.Timedelta(weeks=window)).strftime('%Y-%m-%d') if start else None
+    weeks, matrix = load_residuals(load_start, end)
+    week_dates = pd.to_datetime(pd.Series(weeks, dtype=object))
+
+    rows = []
+    for i, week_start in enumerate(weeks):
+        if start and week_start < start:
+            continue
+        in_window = ((week_dates >= week_dates[i] - pd.Timedelta(weeks=window)) & (week_dates < week_dates[i])).to_numpy()
+        if in_window.sum() < MIN_WEEKS:
+            continue
+        intervals = ConformalIntervals(matrix[in_window])
+
+        actual = matrix[i]
+        valid = ~np.isnan(actual)
+        if not valid.any():
+            continue
+        for coverage in coverages:
+            lower, upper = intervals.offsets(coverage)
+            inside = (actual[valid] >= lower[valid]) & (actual[valid] <= upper[valid])
+            rows.append({
+                'week_start': week_start,
+                'nominal': coverage,
+                'hours': int(valid.sum()),
+                'realized': float(inside.mean()),
+                'width': float(np.mean(upper - lower)),
+            })
+
+    return pd.DataFrame(rows, columns=['week_start', 'nominal', 'hours', 'realized', 'width'])
+
+def main():
+    """Komut satırı girişi"""
+    parser = argparse.ArgumentParser(description='Conformal aralıkların haftalık kapsaması')
+    parser.add_argument('--coverage', type=float, nargs='+', default=[0.8, 0.95], help='Nominal kapsama(lar)')
+    parser.add_argument('--window', type=int, default=WINDOW_WEEKS, help='Tampon hafta sayısı')
+    parser.add_argument('--from', dest='start', default=None, help='İlk hafta (YYYY-MM-DD, dahil)')
+    parser.add_argument('--to', dest='end', default=None, help='Bitiş (YYYY-MM-DD, dahil değil)')
+    args = parser.parse_args()
+
+    print("="*70)
+    print(f"CONFORMAL ARALIK KAPSAMASI (tampon: {args.window} hafta)")
+    print("="*70)
+
+    report = realized_coverage(args.coverage, args.start, args.end, args.window)
+    if len(report) == 0:
+        print(f"[!] Yeterli geçmiş yok (en az {MIN_WEEKS} hafta karşılaştırılmış tahmin gerekli)")
+        return
+
+    table = report.pivot(index='week_start', columns='nominal', values=['realized', 'width'])
+    hours = report.groupby('week_start')['hours'].first()
+    header = ''.join(f"{f'%{c * 100:g} kapsama':>14}{'genişlik':>10}" for c in args.coverage)
+    print(f"\n{'Hafta':12}{'Saat':>6}{header}")
+    print("-"*70)
+    for week_start in table.index:
+        cells = ''.join(
+            f"{table.loc[week_start, ('realized', c)] * 100:>13.1f}%{table.loc[week_start, ('width', c)]:>10.0f}"
+            for c in args.coverage
+        )
+        print(f"{week_start:12}{hours[week_start]:>6}{cells}")
+
+    print("-"*70)
+    # Saat ağırlıklı ortalama kapsama
+    for coverage in args.coverage:
+        subset = report[report['nominal'] == coverage]
+        realized = np.average(subset['realized'], weights=subset['hours'])
+        print(f"[*] Nominal %{coverage * 100:g}: gerçekleşen %{realized * 100:.1f}, "
+              f"ortalama genişlik {subset['width'].mean():.0f} TRY ({len(subset)} hafta)")
+    print("="*70)
+
+if __name__ == "__main__":
+    main()
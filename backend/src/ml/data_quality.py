@@ -0,0 +1,379 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+EPİAŞ MCP Fiyat Tahmini - Akış Tipi Veri Kalitesi Kontrolü
+==========================================================
+
+validate_extreme_prices.py elle çalıştırılan tam tablo raporu,
+verify_epias_api.py ise sadece en ucuz saatleri API ile karşılaştırır. Bu modül
+her sync sonrası SADECE yeni eklenen satırları kontrol eder ve bulguları
+data_quality_issues tablosuna yazar.
+
+Yeni satırlar AUTOINCREMENT id ile bulunur (Node sync'in INSERT OR REPLACE'i
+de yeni id üretir); tablo başına son işlenen id ve en büyük ts
+data_quality_state'te tutulur. Maliyet O(yeni satır): her kontrol yeni
+satırlar ve sabit boyutlu bir komşuluk (ör. sıfır fiyat serisinin başı)
+üzerinde çalışır.
+
+Kontroller:
+    missing_hours     Önceki son saat ile yeni saatler arasındaki boşluklar (tüm tablolar)
+    duplicate_hour    Aynı ts'ye sahip birden fazla satır (tüm tablolar)
+    non_monotonic     id sırasında geriye giden ts (tüm tablolar)
+    negative_price    Negatif fiyat serileri (mcp_data)
+    zero_price_run    MAX_ZERO_RUN_HOURS saatten uzun 0 TRY serileri (mcp_data)
+    generation_total  total ile bileşenlerin toplamı arasındaki fark (generation_data)
+    price_outlier     (haftanın günü, saat) dilimi medyanından MAD ölçeğinde sapma (mcp_data)
+
+Aykırı değer kontrolü haftanın saati profilinin (price_profile.py; tatil
+günleri ayrı) medyan ve MAD'ini kullanır. post_sync.py profili bu kontrolden
+sonra günceller; yeni fiyatlar önceki profile göre değerlendirilir.
+
+Kullanım:
+    python data_quality.py               # yeni satırları kontrol et + son bulgular
+    python data_quality.py --days 30     # son 30 günün bulguları
+    python data_quality.py --rebuild     # tüm geçmişi baştan kontrol et
+"""
+
+import argparse
+import json
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from database import get_reader, get_writer, retry_on_lock
+from epoch_hours import table_exists, has_ts_column, epoch_hours_to_local
+from hourly_facts import GENERATION_COLUMNS
+from price_profile import load_profile, lookup, holiday_flags
+
+# Kontrol edilen kaynak tablolar ve okunacak değer kolonları
+SOURCE_TABLES = {
+    'mcp_data': ['price'],
+    'generation_data': GENERATION_COLUMNS,
+    'consumption_data': ['consumption'],
+}
+
+# Bahar Pazarlarında gün ortası 0 TRY serileri olağan (~8 saat); daha uzunu şüpheli
+MAX_ZERO_RUN_HOURS = 10
+
+# generation_data: |total - bileşen toplamı| <= max(MWh, oran * total)
+GENERATION_TOLERANCE_MWH = 1.0
+GENERATION_TOLERANCE_RATIO = 0.005
+
+# Aykırı değer kontrolü için dilimde gereken en az profil gözlemi
+MIN_PROFILE_SAMPLES = 4
+# Normal dağılımda MAD -> standart sapma çarpanı
+MAD_SCALE = 1.4826
+# Sıfır fiyatların baskın olduğu dilimlerde MAD 0 olabilir; alt sınır (TRY)
+MIN_MAD = 25.0
+OUTLIER_Z = 6.0
+
+ISSUE_COLUMNS = ['table_name', 'check_name', 'ts_start', 'ts_end', 'severity',
+                 'value', 'expected', 'detail', 'detected_at']
+
+def create_quality_tables(conn):
+    """data_quality_issues ve data_quality_state tablolarını oluşturur"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS data_quality_issues (
+            table_name TEXT NOT NULL,
+            check_name TEXT NOT NULL,
+            ts_start INTEGER NOT NULL,
+            ts_end INTEGER NOT NULL,
+            severity TEXT NOT NULL,
+            value REAL,
+            expected REAL,
+            detail TEXT,
+            detected_at TEXT NOT NULL,
+            PRIMARY KEY (table_name, check_name, ts_start)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS data_quality_state (
+            table_name TEXT PRIMARY KEY,
+            last_id INTEGER NOT NULL,
+            last_ts INTEGER
+        )
+    """)
+
+def _runs(ts, mask):
+    """
+    Ardışık saatlerde mask'in True olduğu seriler
+
+    Args:
+        ts: Sıralı, tekil epoch saatler
+        mask: Aynı uzunlukta bool dizi
+
+    Returns:
+        list: (başlangıç indeksi, bitiş indeksi) çiftleri (dahil)
+    """
+    ts = np.asarray(ts, dtype='int64')
+    mask = np.asarray(mask, dtype=bool)
+    # Seri kırılması: mask değişimi veya saat boşluğu
+    breaks = np.flatnonzero((np.diff(mask.astype(int)) != 0) | (np.diff(ts) != 1)) + 1
+    starts = np.concatenate([[0], breaks])
+    ends = np.concatenate([breaks - 1, [len(ts) - 1]])
+    return [(s, e) for s, e in zip(starts, ends) if len(ts) and mask[s]]
+
+def _issue(table, check, ts_start, ts_end, severity, value=None, expected=None, detail=''):
+    """Tek bulgu satırı"""
+    return {
+        'table_name': table, 'check_name': check,
+        'ts_start': int(ts_start), 'ts_end': int(ts_end), 'severity': severity,
+        'value': None if value is None else float(value),
+        'expected': None if expected is None else float(expected),
+        'detail': detail,
+    }
+
+def check_timeline(conn, table, rows, last_ts):
+    """
+    Eksik saat, tekrar eden saat ve geriye giden ts kontrolleri
+
+    Args:
+        conn: SQLite bağlantısı
+        table (str): Kaynak tablo
+        rows: Yeni satırlar (id sırasında; id, ts kolonları)
+        last_ts: Önceki çalıştırmada görülen en büyük ts (None = ilk çalıştırma)
+
+    Returns:
+        list: Bulgu dict'leri
+    """
+    issues = []
+    ts = rows['ts'].to_numpy(dtype='int64')
+
+    # id sırasında ts geriye gidiyorsa (aynı sync içinde sırasız yazım)
+    for i in np.flatnonzero(np.diff(ts) <= 0) + 1:
+        issues.append(_issue(table, 'non_monotonic', ts[i], ts[i], 'warning', ts[i], ts[i - 1] + 1,
+                             f"id {rows['id'].iat[i]}: ts önceki satırdan ({ts[i - 1]}) küçük/eşit"))
+
+    # Tekrar eden saatler: sadece yeni ts'ler için index araması
+    new_ts = np.unique(ts)
+    duplicates = conn.execute(f"""
+        SELECT ts, COUNT(*) FROM {table}
+        WHERE ts IN (SELECT value FROM json_each(?))
+        GROUP BY ts HAVING COUNT(*) > 1
+    """, (json.dumps(new_ts.tolist()),)).fetchall()
+    for value, count in duplicates:
+        issues.append(_issue(table, 'duplicate_hour', value, value, 'error', count, 1,
+                             f"{count} satır aynı saate sahip"))
+
+    # Eksik saatler: önceki son saatten yeni en büyük saate kadar gelmeyenler
+    start = (last_ts + 1) if last_ts is not None else new_ts[0]
+    expected = np.arange(start, new_ts[-1] + 1)
+    missing = np.setdiff1d(expected, new_ts, assume_unique=True)
+    if len(missing):
+        for s, e in _runs(missing, np.ones(len(missing), dtype=bool)):
+            issues.append(_issue(table, 'missing_hours', missing[s], missing[e], 'warning', e - s + 1, 0,
+                                 f"{e - s + 1} saat eksik"))
+    return issues
+
+def check_prices(conn, rows):
+    """
+    Negatif fiyat ve uzun 0 TRY serileri
+
+    Yeni saatlerden önceki MAX_ZERO_RUN_HOURS saat de okunur; sync sınırını
+    aşan seriler bölünmeden değerlendirilir (aynı başlangıçlı bulgu güncellenir).
+
+    Args:
+        conn: SQLite bağlantısı
+        rows: Yeni mcp_data satırları (ts, price)
+
+    Returns:
+        list: Bulgu dict'leri
+    """
+    first = int(rows['ts'].min())
+    context = pd.read_sql_query(
+        "SELECT ts, price FROM mcp_data WHERE ts >= ? AND ts < ?",
+        conn, params=[first - MAX_ZERO_RUN_HOURS, first]
+    )
+    prices = rows[['ts', 'price']] if len(context) == 0 else pd.concat([context, rows[['ts', 'price']]])
+    prices = prices.dropna().drop_duplicates('ts', keep='last').sort_values('ts')
+    ts = prices['ts'].to_numpy(dtype='int64')
+    price = prices['price'].to_numpy(dtype=float)
+    new = np.isin(ts, rows['ts'].to_numpy(dtype='int64'))
+
+    issues = []
+    for s, e in _runs(ts, price < 0):
+        if new[s:e + 1].any():
+            issues.append(_issue('mcp_data', 'negative_price', ts[s], ts[e], 'error', price[s:e + 1].min(), 0,
+                                 f"{e - s + 1} saat negatif fiyat"))
+    for s, e in _runs(ts, price == 0):
+        length = e - s + 1
+        if length > MAX_ZERO_RUN_HOURS and new[s:e + 1].any():
+            issues.append(_issue('mcp_data', 'zero_price_run', ts[s], ts[e], 'warning', length, MAX_ZERO_RUN_HOURS,
+                                 f"{length} saat kesintisiz 0 TRY"))
+    return issues
+
+def check_generation(rows):
+    """
+    total kolonunun bileşenlerin toplamıyla tutarlılığı
+
+    Args:
+        rows: Yeni generation_data satırları (ts + GENERATION_COLUMNS)
+
+    Returns:
+        list: Bulgu dict'leri
+    """
+    components = [col for col in GENERATION_COLUMNS if col != 'total']
+    rows = rows[rows['total'].notna()]
+    component_sum = rows[components].fillna(0).sum(axis=1)
+    tolerance = np.maximum(GENERATION_TOLERANCE_MWH, GENERATION_TOLERANCE_RATIO * rows['total'].abs())
+    bad = (rows['total'] - component_sum).abs() > tolerance
+    return [
+        _issue('generation_data', 'generation_total', ts, ts, 'error', total, expected,
+               f"total - bileşenler = {total - expected:+.2f} MWh")
+        for ts, total, expected in zip(rows.loc[bad, 'ts'], rows.loc[bad, 'total'], component_sum[bad])
+    ]
+
+def check_outliers(conn, rows):
+    """
+    Fiyatların haftanın saati profiline göre robust z skoru
+
+    Args:
+        conn: SQLite bağlantısı (profil aynı transaction içinden okunur)
+        rows: Yeni mcp_data satırları (ts, price)
+
+    Returns:
+        list: Bulgu dict'leri
+    """
+    profile = load_profile(conn)
+    rows = rows[rows['price'].notna()]
+    ts = rows['ts'].to_numpy(dtype='int64')
+    price = rows['price'].to_numpy(dtype=float)
+    holiday = holiday_flags(ts)
+    median, mad, samples = (lookup(ts, stat, holiday, profile) for stat in ('median', 'mad', 'samples'))
+
+    z = (price - median) / (MAD_SCALE * np.maximum(mad, MIN_MAD))
+    bad = (samples >= MIN_PROFILE_SAMPLES) & (np.abs(z) > OUTLIER_Z)
+    return [
+        _issue('mcp_data', 'price_outlier', t, t, 'warning', value, expected, f"robust z = {score:+.1f}")
+        for t, value, expected, score in zip(ts[bad], price[bad], median[bad], z[bad])
+    ]
+
+def validate_new_rows(conn, rebuild=False):
+    """
+    Son işlenen id'den sonra eklenen satırları kontrol eder ve bulguları
+    yazar (çağıranın transaction'ında; commit çağırana ait)
+
+    Args:
+        conn: Yazıcı SQLite bağlantısı
+        rebuild (bool): True ise bulgular, durum ve profil silinip tüm
+            geçmiş yeniden kontrol edilir
+
+    Returns:
+        dict: tablo -> {'rows': kontrol edilen satır, 'issues': bulgu sayısı}
+    """
+    create_quality_tables(conn)
+    if rebuild:
+        for table in ('data_quality_issues', 'data_quality_state'):
+            conn.execute(f"DELETE FROM {table}")
+
+    detected_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    summary = {}
+    for table, columns in SOURCE_TABLES.items():
+        if not table_exists(conn, table) or not has_ts_column(conn, table):
+            continue
+        state = conn.execute(
+            "SELECT last_id, last_ts FROM data_quality_state WHERE table_name = ?", (table,)
+        ).fetchone()
+        last_id, last_ts = state if state else (0, None)
+
+        rows = pd.read_sql_query(
+            f"SELECT id, ts, {', '.join(columns)} FROM {table} WHERE id > ? AND ts IS NOT NULL ORDER BY id",
+            conn, params=[last_id]
+        )
+        if len(rows) == 0:
+            continue
+
+        issues = check_timeline(conn, table, rows, last_ts)
+        if table == 'mcp_data':
+            issues += check_prices(conn, rows)
+            issues += check_outliers(conn, rows)
+        elif table == 'generation_data':
+            issues += check_generation(rows)
+
+        if issues:
+            frame = pd.DataFrame(issues).assign(detected_at=detected_at)[ISSUE_COLUMNS]
+            conn.executemany(
+                f"INSERT OR REPLACE INTO data_quality_issues ({', '.join(ISSUE_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(ISSUE_COLUMNS))})",
+                frame.astype(object).where(frame.notna(), None).itertuples(index=False, name=None)
+            )
+
+        max_ts = int(rows['ts'].max())
+        conn.execute(
+            "INSERT OR REPLACE INTO data_quality_state (table_name, last_id, last_ts) VALUES (?, ?, ?)",
+            (table, int(rows['id'].max()), max(max_ts, last_ts) if last_ts is not None else max_ts)
+        )
+        summary[table] = {'rows': len(rows), 'issues': len(issues)}
+    return summary
+
+@retry_on_lock
+def run_validation(rebuild=False):
+    """Kendi yazıcı bağlantısıyla kontrol"""
+    with get_writer() as conn:
+        return validate_new_rows(conn, rebuild=rebuild)
+
+def load_issues(since_ts=None, severity=None, conn=None):
+    """
+    Kayıtlı bulgular (en yeni saat önce)
+
+    Args:
+        since_ts (int, optional): Bu saatten sonra biten bulgular
+        severity (str, optional): 'error' | 'warning'
+        conn: Açık bağlantı (yoksa okuyucu açılır)
+
+    Returns:
+        pd.DataFrame: ISSUE_COLUMNS
+    """
+    own = conn is None
+    conn = conn or get_reader()
+    try:
+        if not table_exists(conn, 'data_quality_issues'):
+            return pd.DataFrame(columns=ISSUE_COLUMNS)
+        return pd.read_sql_query(f"""
+            SELECT {', '.join(ISSUE_COLUMNS)} FROM data_quality_issues
+            WHERE ts_end >= ? AND (? IS NULL OR severity = ?)
+            ORDER BY ts_start DESC, table_name, check_name
+        """, conn, params=(since_ts if since_ts is not None else -1, severity, severity))
+    finally:
+        if own:
+            conn.close()
+
+def main():
+    """Komut satırı girişi"""
+    parser = argparse.ArgumentParser(description='Yeni satırlar için veri kalitesi kontrolü')
+    parser.add_argument('--days', type=int, default=7, help='Listelenecek bulguların gün sayısı')
+    parser.add_argument('--severity', default=None, choices=('error', 'warning'), help='Önem filtresi')
+    parser.add_argument('--rebuild', action='store_true', help='Tüm geçmişi baştan kontrol et')
+    args = parser.parse_args()
+
+    print("="*70)
+    print("VERİ KALİTESİ KONTROLÜ" + (" (YENİDEN)" if args.rebuild else ""))
+    print("="*70)
+
+    summary = run_validation(rebuild=args.rebuild)
+    if not summary:
+        print("[*] Yeni satır yok")
+    for table, counts in summary.items():
+        print(f"[+] {table}: {counts['rows']} yeni satır, {counts['issues']} bulgu")
+
+    conn = get_reader()
+    try:
+        latest = conn.execute("SELECT MAX(last_ts) FROM data_quality_state").fetchone()[0] or 0
+        issues = load_issues(latest - args.days * 24, args.severity, conn)
+    finally:
+        conn.close()
+    if len(issues) == 0:
+        print(f"\n✅ Son {args.days} günde bulgu yok")
+        print("="*70)
+        return
+
+    issues['start'] = epoch_hours_to_local(issues['ts_start']).dt.strftime('%Y-%m-%d %H:%M')
+    print(f"\n{'Başlangıç':18}{'Tablo':18}{'Kontrol':18}{'Önem':9}Detay")
+    print("-"*70)
+    for row in issues.itertuples():
+        print(f"{row.start:18}{row.table_name:18}{row.check_name:18}{row.severity:9}{row.detail}")
+    print("="*70)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+EPİAŞ MCP Fiyat Tahmini - Ortak SQLite Bağlantı Katmanı
+=======================================================
+
+Node sync (services/database.ts) ve Python ML scriptleri aynı
+data/energy.db dosyasını kullanıyor. Bu modül Python tarafı için:
+
+1. WAL modu ve performans pragma'ları (synchronous, cache_size, mmap_size, temp_store)
+2. Havuzlanmış (pooled) salt-okunur ve yazıcı bağlantılar
+   - Okuyucular mode=ro ile açılır; WAL sayesinde uzun analiz sorguları
+     günlük veri yazımını bloklamaz
+   - Yazıcılar kilitte hemen hata vermez: busy_timeout + retry_on_lock
+3. İsteğe bağlı sorgu süresi ölçümü (ML_SQL_TIMING=1)
+
+Kullanım:
+    from database import get_reader, get_writer
+
+    conn = get_reader()
+    df = pd.read_sql_query(query, conn)
+    conn.close()   # bağlantıyı havuza geri verir
+
+    with get_writer() as conn:   # çıkışta commit (hata varsa rollback)
+        conn.execute(...)
+
+Veri tabanı yolu ENERGY_DB_PATH ortam değişkeni ile değiştirilebilir.
+"""
+
+import sqlite3
+import os
+import time
+import random
+import threading
+import functools
+from collections import defaultdict
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../data/energy.db')
+DB_PATH = os.environ.get('ENERGY_DB_PATH', DEFAULT_DB_PATH)
+
+# Node tarafı da WAL kullanıyor (services/database.ts)
+PRAGMAS = {
+    'synchronous': 'NORMAL',      # WAL ile güvenli, FULL'a göre çok daha hızlı commit
+    'cache_size': -64000,         # ~64 MB sayfa cache'i (negatif = KiB)
+    'mmap_size': 268435456,       # 256 MB memory-mapped I/O
+    'temp_store': 'MEMORY',       # ORDER BY / GROUP BY geçici tabloları RAM'de
+}
+
+# Kilitli veri tabanında SQLite'ın kendi içinde bekleme süresi (ms)
+BUSY_TIMEOUT_MS = 30000
+
+# busy_timeout da yetmezse tüm işin tekrar deneme sayısı
+LOCK_RETRIES = 5
+
+# Havuzda bekletilecek en fazla boş bağlantı (tür başına)
+MAX_IDLE_CONNECTIONS = 4
+
+_pool_lock = threading.Lock()
+_pools = {'read': [], 'write': []}
+_schema_ready = set()
+
+_timing_enabled = os.environ.get('ML_SQL_TIMING', '0') not in ('', '0', 'false')
+_timings_lock = threading.Lock()
+_timings = defaultdict(lambda: {'calls': 0, 'seconds': 0.0, 'rows': 0})
+
+def _record_timing(sql, seconds, rows=0, new_call=True):
+    """Sorgu süresini SQL metnine göre biriktirir"""
+    key = ' '.join(str(sql).split())[:160]
+    with _timings_lock:
+        entry = _timings[key]
+        entry['calls'] += int(new_call)
+        entry['seconds'] += seconds
+        entry['rows'] += rows
+
+class TimedCursor(sqlite3.Cursor):
+    """execute/fetch sürelerini ölçen cursor (sadece zamanlama açıkken kullanılır)"""
+
+    _last_sql = None
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._last_sql = sql
+            _record_timing(sql, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._last_sql = sql
+            _record_timing(sql, time.perf_counter() - start, max(self.rowcount, 0))
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        if self._last_sql is not None:
+            # fetch süresi aynı sorgunun devamı sayılır (yeni çağrı değil)
+            _record_timing(self._last_sql, time.perf_counter() - start, len(rows), new_call=False)
+        return rows
+
+class PooledConnection(sqlite3.Connection):
+    """
+    close() çağrıldığında kapanmak yerine havuza dönen bağlantı
+
+    Mevcut 'conn = ...; conn.close()' kalıbı değişmeden havuzla çalışır.
+    """
+
+    _mode = 'read'
+    _db_path = None
+    # Havuzda bekliyor mu? (ikinci close() aynı bağlantıyı iki kez eklemesin)
+    _in_pool = False
+
+    def cursor(self, factory=None):
+        if factory is None and _timing_enabled:
+            factory = TimedCursor
+        return super().cursor(factory) if factory is not None else super().cursor()
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def close(self):
+        if self._in_pool:
+            return
+        # Yarım kalmış transaction havuza taşınmasın
+        if self.in_transaction:
+            self.rollback()
+        with _pool_lock:
+            pool = _pools[self._mode]
+            if len(pool) < MAX_IDLE_CONNECTIONS:
+                self._in_pool = True
+                pool.append(self)
+                return
+        super().close()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # sqlite3 davranışı: hata yoksa commit, varsa rollback; ek olarak havuza dön
+        result = super().__exit__(exc_type, exc_value, traceback)
+        self.close()
+        return result
+
+def _apply_pragmas(conn, mode):
+    """Bağlantı başına pragma'ları uygular"""
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    for name, value in PRAGMAS.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    if mode == 'write':
+        # journal_mode kalıcıdır, ama yeni oluşturulan DB için bir kez ayarlanmalı
+        conn.execute("PRAGMA journal_mode = WAL")
+    else:
+        conn.execute("PRAGMA query_only = ON")
+
+def _open(mode, db_path):
+    """Havuzda boş bağlantı yoksa yenisini açar"""
+    if mode == 'read':
+        uri = 'file:' + os.path.abspath(db_path) + '?mode=ro'
+        conn = sqlite3.connect(uri, uri=True, timeout=BUSY_TIMEOUT_MS / 1000,
+                               check_same_thread=False, factory=PooledConnection)
+    else:
+        conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_MS / 1000,
+                               check_same_thread=False, factory=PooledConnection)
+    conn._mode = mode
+    conn._db_path = db_path
+    _apply_pragmas(conn, mode)
+    return conn
+
+def _acquire(mode):
+    """Havuzdan bağlantı alır (yoksa açar)"""
+    db_path = DB_PATH
+    with _pool_lock:
+        pool = _pools[mode]
+        while pool:
+            conn = pool.pop()
+            conn._in_pool = False
+            if conn._db_path == db_path:
+                return conn
+            sqlite3.Connection.close(conn)
+
+    return _open(mode, db_path)
+
+def ensure_schema():
+    """
+    Türetilmiş kolon/index migration'larını süreç başına bir kez çalıştırır
+
+    Salt-okunur bağlantılar şemayı değiştiremediği için ilk okuyucudan
+    önce bir yazıcı bağlantı ile yapılır.
+    """
+    if DB_PATH in _schema_ready:
+        return
+    from epoch_hours import ensure_epoch_hours
+    conn = _acquire('write')
+    try:
+        ensure_epoch_hours(conn)
+        conn.commit()
+    finally:
+        conn.close()
+    _schema_ready.add(DB_PATH)
+
+def get_reader():
+    """
+    Salt-okunur bağlantı döndürür (WAL: yazıcıları bloklamaz)
+
+    Returns:
+        PooledConnection: close() ile havuza geri verilir
+    """
+    ensure_schema()
+    return _acquire('read')
+
+def get_writer():
+    """
+    Yazıcı bağlantı döndürür (busy_timeout ile kilitte bekler)
+
+    Returns:
+        PooledConnection: close() ile havuza geri verilir; 'with' bloğunda
+                          çıkışta commit/rollback yapılır
+    """
+    ensure_schema()
+    return _acquire('write')
+
+def is_lock_error(error):
+    """SQLite kilit/busy hatası mı?"""
+    message = str(error).lower()
+    return isinstance(error, sqlite3.OperationalError) and ('locked' in message or 'busy' in message)
+
+def retry_on_lock(func=None, retries=LOCK_RETRIES, base_delay=0.5):
+    """
+    Kilit hatasında yazma işini üstel bekleme ile tekrar dener
+
+    busy_timeout süresi de dolduysa (ör. Node sync uzun bir transaction
+    içindeyse) tüm fonksiyon baştan çalıştırılır. Fonksiyon kendi
+    bağlantısını almalı ki yarım kalan transaction geri alınsın.
+    """
+    if func is None:
+        return functools.partial(retry_on_lock, retries=retries, base_delay=base_delay)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        for attempt in range(retries + 1):
+            try:
+                return func(*args, **kwargs)
+            except sqlite3.OperationalError as e:
+                if not is_lock_error(e) or attempt == retries:
+                    raise
+                delay = base_delay * (2 ** attempt) * (1 + random.random() * 0.25)
+                print(f"[!] Veri tabanı kilitli, {delay:.1f}s sonra tekrar denenecek "
+                      f"({attempt + 1}/{retries})")
+                time.sleep(delay)
+    return wrapper
+
+def enable_query_timing(enabled=True):
+    """Sorgu süresi ölçümünü açar/kapatır (yeni cursor'lar için geçerli)"""
+    global _timing_enabled
+    _timing_enabled = enabled
+
+def query_timings(reset=False):
+    """
+    Biriken sorgu sürelerini döndürür (en yavaştan hızlıya)
+
+    Returns:
+        list: [{'sql', 'calls', 'seconds', 'rows'}, ...]
+    """
+    with _timings_lock:
+        result = sorted(
+            ({'sql': sql, **stats} for sql, stats in _timings.items()),
+            key=lambda item: item['seconds'],
+            reverse=True
+        )
+        if reset:
+            _timings.clear()
+    return result
+
+def print_query_timings(top=15):
+    """En yavaş sorguları tablo halinde yazdırır"""
+    timings = query_timings()
+    if not timings:
+        return
+    print(f"\n[*] SQL süreleri (en yavaş {min(top, len(timings))}):")
+    print(f"   {'Süre (s)':>9s} {'Çağrı':>6s} {'Satır':>8s}  Sorgu")
+    for item in timings[:top]:
+        print(f"   {item['seconds']:9.3f} {item['calls']:6d} {item['rows']:8d}  {item['sql'][:90]}")
+
+def close_all():
+    """Havuzdaki tüm bağlantıları kapatır (WAL checkpoint için)"""
+    with _pool_lock:
+        for pool in _pools.values():
+            while pool:
+                sqlite3.Connection.close(pool.pop())
@@ -0,0 +1,325 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+EPİAŞ MCP Fiyat Tahmini - Drift İzleme ve Yeniden Eğitim Kararı
+===============================================================
+
+Model her hafta koşulsuz yeniden eğitilmez. Günlük sync sonrası
+(post_sync.py) aktif modelin canlı tahmin hataları kontrol edilir:
+
+1. Kayan hata istatistikleri: aktif modelin tahmin ettiği haftaların
+   (week_start >= eğitim kesimi) son WINDOW_HOURS gerçekleşmiş saatinin
+   MAE'si, pencereden önceki REFERENCE_HOURS saatin MAE'sine oranla
+   (MAE_RATIO_THRESHOLD)
+2. Artık dağılımı kayması: referans ortalama/standart sapma ile
+   standartlaştırılmış artıklar üzerinde iki yönlü Page-Hinkley testi
+   (PH_DELTA, PH_THRESHOLD)
+3. Model yaşı: eğitim kesimi MAX_MODEL_AGE_DAYS günden eskiyse
+
+Her kontrol drift_checks tablosuna yazılır. Haftalık akış (weekly_workflow)
+retrain_decision ile aktif sürüm için eşik aşıldı mı diye bakar; aşılmadıysa
+eğitim atlanır ve yeni hafta mevcut modelle tahmin edilir.
+
+Zorla yeniden eğitim: ML_RETRAIN=1 (veya --force / ML_FORCE=1).
+
+Kullanım:
+    python drift_monitor.py              # kontrol et ve kaydet
+    python drift_monitor.py --history    # son kontroller
+"""
+
+import os
+import json
+import argparse
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from database import get_reader, get_writer, retry_on_lock
+from epoch_hours import table_exists
+from checkpoints import force_requested
+
+# Kayan pencere: son 7 günün gerçekleşmiş saatleri
+WINDOW_HOURS = 7 * 24
+MIN_WINDOW_HOURS = 24
+
+# Referans: pencereden önceki 8 hafta
+REFERENCE_HOURS = 8 * 7 * 24
+MIN_REFERENCE_HOURS = 14 * 24
+
+# Pencere MAE'si referansın bu katını aşarsa drift
+MAE_RATIO_THRESHOLD = 1.3
+
+# Page-Hinkley: standart sapma biriminde tolerans ve alarm eşiği. Saatlik
+# artıklar otokorelasyonlu olduğundan eşik yüksek tutulur (~1σ'lık kalıcı
+# sapma yaklaşık 100 saatte alarm verir)
+PH_DELTA = 0.5
+PH_THRESHOLD = 50.0
+
+# Bu yaştan eski model drift olmasa da yeniden eğitilir
+MAX_MODEL_AGE_DAYS = 28
+
+def create_drift_table(conn):
+    """drift_checks tablosunu oluşturur"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS drift_checks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            checked_at TEXT NOT NULL,
+            version INTEGER,
+            window_end_ts INTEGER,
+            window_hours INTEGER NOT NULL,
+            reference_hours INTEGER NOT NULL,
+            mae_window REAL,
+            mae_reference REAL,
+            mae_ratio REAL,
+            ph_stat REAL,
+            model_age_days REAL,
+            retrain INTEGER NOT NULL,
+            reasons TEXT
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_drift_checks_version ON drift_checks(version, retrain)")
+
+def retrain_forced():
+    """ML_RETRAIN, --force veya ML_FORCE verilmiş mi?"""
+    return force_requested() or os.environ.get('ML_RETRAIN', '0') not in ('', '0', 'false')
+
+def load_live_residuals(hours=WINDOW_HOURS + REFERENCE_HOURS):
+    """
+    forecast_history'deki canlı tahminlerin son `hours` gerçekleşmiş saatinin artıkları
+
+    Returns:
+        pd.DataFrame: week_start, ts, residual (gerçek - tahmin), ts sıralı
+    """
+    empty = pd.DataFrame(columns=['week_start', 'ts', 'residual'])
+    conn = get_reader()
+    try:
+        if not table_exists(conn, 'forecast_history'):
+            return empty
+        last_ts = conn.execute("""
+            SELECT MAX(f.ts) FROM forecast_history f JOIN mcp_data m ON m.ts = f.ts
+        """).fetchone()[0]
+        if last_ts is None:
+            return empty
+        return pd.read_sql_query("""
+            SELECT f.week_start, f.ts, m.price - f.predicted_price AS residual
+            FROM forecast_history f
+            JOIN mcp_data m ON m.ts = f.ts
+            WHERE f.ts > ?
+            ORDER BY f.ts
+        """, conn, params=(last_ts - hours,))
+    finally:
+        conn.close()
+
+def page_hinkley(z, delta=PH_DELTA):
+    """
+    İki yönlü Page-Hinkley istatistiği
+
+    m_t = Σ (z_i - δ), PH = max_t (m_t - min_{s<=t} m_s); aşağı yön -z ile.
+
+    Args:
+        z: Standartlaştırılmış artıklar (zaman sıralı)
+        delta (float): Tolerans (σ birimi)
+
+    Returns:
+        float: İki yönün en büyük istatistiği
+    """
+    z = np.asarray(z, dtype=float)
+    if len(z) == 0:
+        return 0.0
+
+    def one_sided(x):
+        cumulative = np.concatenate([[0.0], np.cumsum(x - delta)])
+        return float(np.max(cumulative - np.minimum.accumulate(cumulative)))
+
+    return max(one_sided(z), one_sided(-z))
+
+def model_age_days(entry, as_of=None):
+    """Aktif modelin eğitim kesiminden (yoksa kayıt tarihinden) bu yana geçen gün"""
+    as_of = pd.Timestamp(as_of or datetime.now())
+    reference = entry['training_cutoff'] or entry['created_at']
+    return (as_of - pd.Timestamp(reference)).total_seconds() / 86400
+
+def check_drift(as_of=None, name='prophet'):
+    """
+    Aktif model için drift kontrolü (kaydetmez)
+
+    Args:
+        as_of (str, optional): Model yaşının hesaplandığı an (varsayılan: şimdi)
+        name (str): Model ailesi
+
+    Returns:
+        dict: version, window_end_ts, window_hours, reference_hours, mae_window,
+              mae_reference, mae_ratio, ph_stat, model_age_days, retrain, reasons
+    """
+    from model_registry import active_version
+
+    entry = active_version(name)
+    residuals = load_live_residuals()
+    # Pencere sadece aktif modelin ürettiği tahminler; referans pencereden öncesi
+    live = residuals
+    if entry is not None and entry['training_cutoff']:
+        live = residuals[residuals['week_start'] >= entry['training_cutoff']]
+    window = live.tail(WINDOW_HOURS)
+    window_start = window['ts'].iloc[0] if len(window) else np.inf
+    reference = residuals[residuals['ts'] < window_start].tail(REFERENCE_HOURS)
+
+    result = {
+        'version': entry['version'] if entry else None,
+        'window_end_ts': int(window['ts'].iloc[-1]) if len(window) else None,
+        'window_hours': len(window),
+        'reference_hours': len(reference),
+        'mae_window': None,
+        'mae_reference': None,
+        'mae_ratio': None,
+        'ph_stat': None,
+        'model_age_days': model_age_days(entry, as_of) if entry else None,
+        'reasons': [],
+    }
+
+    if entry is None:
+        result['reasons'].append(f"{name} için aktif model yok")
+    elif result['model_age_days'] >= MAX_MODEL_AGE_DAYS:
+        result['reasons'].append(f"model yaşı {result['model_age_days']:.0f} gün (sınır {MAX_MODEL_AGE_DAYS})")
+
+    if len(window) >= MIN_WINDOW_HOURS and len(reference) >= MIN_REFERENCE_HOURS:
+        window_residuals = window['residual'].to_numpy(dtype=float)
+        reference_residuals = reference['residual'].to_numpy(dtype=float)
+        mae_window = float(np.mean(np.abs(window_residuals)))
+        mae_reference = float(np.mean(np.abs(reference_residuals)))
+        scale = float(np.std(reference_residuals)) or 1.0
+        z = (window_residuals - np.mean(reference_residuals)) / scale
+
+        result.update({
+            'mae_window': mae_window,
+            'mae_reference': mae_reference,
+            'mae_ratio': mae_window / mae_reference if mae_reference > 0 else None,
+            'ph_stat': page_hinkley(z),
+        })
+        if result['mae_ratio'] is not None and result['mae_ratio'] > MAE_RATIO_THRESHOLD:
+            result['reasons'].append(f"MAE oranı {result['mae_ratio']:.2f} > {MAE_RATIO_THRESHOLD}")
+        if result['ph_stat'] > PH_THRESHOLD:
+            result['reasons'].append(f"Page-Hinkley {result['ph_stat']:.1f} > {PH_THRESHOLD:g}")
+
+    result['retrain'] = bool(result['reasons'])
+    return result
+
+@retry_on_lock
+def record_check(result):
+    """Kontrol sonucunu drift_checks tablosuna yazar"""
+    with get_writer() as conn:
+        create_drift_table(conn)
+        conn.execute("""
+            INSERT INTO drift_checks (
+                checked_at, version, window_end_ts, window_hours, reference_hours,
+                mae_window, mae_reference, mae_ratio, ph_stat, model_age_days, retrain, reasons
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            datetime.now().isoformat(timespec='seconds'), result['version'], result['window_end_ts'],
+            result['window_hours'], result['reference_hours'], result['mae_window'],
+            result['mae_reference'], result['mae_ratio'], result['ph_stat'],
+            result['model_age_days'], int(result['retrain']),
+            json.dumps(result['reasons'], ensure_ascii=False),
+        ))
+
+def run_drift_check(as_of=None, name='prophet'):
+    """Kontrol eder, kaydeder ve özetini yazdırır"""
+    result = check_drift(as_of, name)
+    record_check(result)
+    print_check(result)
+    return result
+
+def print_check(result):
+    """Kontrol özetini yazdırır"""
+    version = f"v{result['version']}" if result['version'] is not None else '-'
+    age = f"{result['model_age_days']:.1f} gün" if result['model_age_days'] is not None else '-'
+    print(f"   Aktif model    : {version} ({age})")
+    if result['mae_window'] is not None:
+        print(f"   MAE (pencere)  : {result['mae_window']:.2f} TRY ({result['window_hours']} saat)")
+        print(f"   MAE (referans) : {result['mae_reference']:.2f} TRY ({result['reference_hours']} saat)")
+        if result['mae_ratio'] is not None:
+            print(f"   MAE oranı      : {result['mae_ratio']:.2f} (eşik {MAE_RATIO_THRESHOLD})")
+        print(f"   Page-Hinkley   : {result['ph_stat']:.1f} (eşik {PH_THRESHOLD:g})")
+    else:
+        print(f"   Yeterli canlı tahmin yok ({result['window_hours']} + {result['reference_hours']} saat)")
+    if result['retrain']:
+        print(f"   ⚠️  Yeniden eğitim gerekli: {'; '.join(result['reasons'])}")
+    else:
+        print(f"   ✅ Drift yok")
+
+def retrain_decision(as_of=None, name='prophet'):
+    """
+    Haftalık akış için: aktif model yeniden eğitilmeli mi?
+
+    Güncel kontrol yapılıp kaydedilir; aktif sürüm için daha önceki günlük
+    kontrollerden biri eşiği aştıysa da yeniden eğitilir.
+
+    Args:
+        as_of (str, optional): Model yaşının hesaplandığı an (ör. haftanın Pazartesi'si)
+
+    Returns:
+        dict: check_drift sonucu; retrain ve reasons önceki alarmları da içerir
+    """
+    result = run_drift_check(as_of, name)
+    if retrain_forced():
+        result['reasons'].append('zorla yeniden eğitim (ML_RETRAIN / --force)')
+    elif result['version'] is not None:
+        conn = get_reader()
+        try:
+            earlier = conn.execute("""
+                SELECT checked_at, reasons FROM drift_checks
+                WHERE version = ? AND retrain = 1
+                ORDER BY id LIMIT 1
+            """, (result['version'],)).fetchone()
+        finally:
+            conn.close()
+        if earlier and not result['retrain']:
+            result['reasons'].append(f"{earlier[0]} kontrolü: {'; '.join(json.loads(earlier[1]))}")
+
+    result['retrain'] = bool(result['reasons'])
+    return result
+
+def recent_checks(limit=14):
+    """Son kontroller (yeniden eskiye)"""
+    conn = get_reader()
+    try:
+        if not table_exists(conn, 'drift_checks'):
+            return pd.DataFrame()
+        return pd.read_sql_query(
+            "SELECT * FROM drift_checks ORDER BY id DESC LIMIT ?", conn, params=(limit,)
+        )
+    finally:
+        conn.close()
+
+def main():
+    """Komut satırı girişi"""
+    parser = argparse.ArgumentParser(description='Aktif model için drift kontrolü')
+    parser.add_argument('--history', action='store_true', help='Son kontrolleri listele')
+    parser.add_argument('--name', default='prophet', help='Model ailesi')
+    args = parser.parse_args()
+
+    print("="*70)
+    print("DRIFT KONTROLÜ")
+    print("="*70)
+
+    if args.history:
+        checks = recent_checks()
+        if len(checks) == 0:
+            print("[!] Kayıtlı kontrol yok")
+            return
+        print(f"{'Tarih':20} {'Sürüm':>6} {'MAE oranı':>10} {'PH':>7} {'Yaş':>6}  Karar")
+        print("-"*70)
+        for _, row in checks.iterrows():
+            ratio = f"{row['mae_ratio']:.2f}" if pd.notna(row['mae_ratio']) else '-'
+            ph = f"{row['ph_stat']:.1f}" if pd.notna(row['ph_stat']) else '-'
+            age = f"{row['model_age_days']:.0f}g" if pd.notna(row['model_age_days']) else '-'
+            version = f"v{int(row['version'])}" if pd.notna(row['version']) else '-'
+            decision = 'yeniden eğit' if row['retrain'] else '-'
+            print(f"{row['checked_at']:20} {version:>6} {ratio:>10} {ph:>7} {age:>6}  {decision}")
+        return
+
+    run_drift_check(name=args.name)
+    print("="*70)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+EPİAŞ MCP Fiyat Tahmini - Tamsayı Saat Anahtarları (epoch-hour)
+===============================================================
+
+Tablolardaki tarih kolonları ISO metin olarak saklanıyor
+("2023-10-15T00:00:00+03:00" veya "2025-10-27 00:00:00"). Aralık sorguları
+ve tablolar arası join'ler bu yüzden string karşılaştırması yapıyor.
+
+Bu modül:
+1. mcp_data, generation_data, consumption_data ve forecast_history
+   tablolarına 'ts' (UTC epoch saat, INTEGER) kolonu ekler
+2. Mevcut satırları tek UPDATE ile toplu doldurur
+3. Yeni eklenen satırlar için ts'yi dolduran trigger'ları kurar
+   (Node sync kodu değişmeden çalışmaya devam eder)
+4. (ts, price) gibi covering index'leri oluşturur
+5. Python tarafı için tarih <-> ts dönüşüm yardımcılarını sağlar
+
+Kullanım:
+    python src/ml/epoch_hours.py   # migration'ı elle çalıştırır
+"""
+
+import numpy as np
+import pandas as pd
+
+# Türkiye 2016'dan beri sabit UTC+3 (yaz saati uygulaması yok)
+TR_UTC_OFFSET_SECONDS = 3 * 3600
+TR_UTC_OFFSET_HOURS = 3
+
+# Epoch gün indeksi 0 = 1970-01-01 (Perşembe; Pazartesi = 0 düzeninde 3)
+EPOCH_DATE = np.datetime64('1970-01-01', 'D')
+EPOCH_WEEKDAY = 3
+
+# Kaynak kolonu timezone offset'li ISO metin olan tablolar
+OFFSET_TABLES = {
+    'mcp_data': 'date',
+    'generation_data': 'date',
+    'consumption_data': 'date',
+}
+
+# Kaynak kolonu Türkiye saatiyle timezone'suz metin olan tablolar
+LOCAL_TABLES = {
+    'forecast_history': 'forecast_datetime',
+}
+
+COVERING_INDEXES = {
+    'idx_mcp_ts_price': 'mcp_data(ts, price)',
+    'idx_generation_ts': 'generation_data(ts, total, solar, wind, hydro)',
+    'idx_consumption_ts': 'consumption_data(ts, consumption)',
+    'idx_forecast_ts': 'forecast_history(ts, predicted_price, actual_price)',
+}
+
+def ts_sql_expression(table, column):
+    """
+    Tablonun tarih kolonundan epoch saat üreten SQL ifadesini döndürür
+
+    SQLite strftime('%s', ...) '+03:00' gibi offset'leri UTC'ye çevirir;
+    offset'siz (Türkiye saati) kolonlar için 3 saat elle düşülür.
+
+    Args:
+        table (str): Tablo adı (offset'li mi offset'siz mi olduğunu belirler)
+        column (str): SQL'de kullanılacak kolon referansı ('date', 'NEW.date' vb.)
+    """
+    if table in LOCAL_TABLES:
+        return f"(CAST(strftime('%s', {column}) AS INTEGER) - {TR_UTC_OFFSET_SECONDS}) / 3600"
+    return f"CAST(strftime('%s', {column}) AS INTEGER) / 3600"
+
+def has_ts_column(conn, table):
+    """Tabloda ts kolonu var mı?"""
+    columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+    return 'ts' in columns
+
+def table_exists(conn, table):
+    """Tablo veri tabanında var mı?"""
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    ).fetchone()
+    return row is not None
+
+def migrate_epoch_hours(conn):
+    """
+    ts kolonlarını, trigger'ları ve index'leri oluşturur (idempotent)
+
+    Args:
+        conn: SQLite bağlantısı
+
+    Returns:
+        int: ts kolonu yeni eklenen tablo sayısı
+    """
+    migrated = 0
+    for table, column in {**OFFSET_TABLES, **LOCAL_TABLES}.items():
+        if not table_exists(conn, table):
+            continue
+
+        if not has_ts_column(conn, table):
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN ts INTEGER")
+            # Toplu backfill: satır satır değil, tek UPDATE
+            conn.execute(f"UPDATE {table} SET ts = {ts_sql_expression(table, column)}")
+            migrated += 1
+
+        # INSERT OR REPLACE de INSERT trigger'ını tetikler
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_ts_insert
+            AFTER INSERT ON {table}
+            BEGIN
+                UPDATE {table} SET ts = {ts_sql_expression(table, 'NEW.' + column)}
+                WHERE rowid = NEW.rowid;
+            END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_ts_update
+            AFTER UPDATE OF {column} ON {table}
+            BEGIN
+                UPDATE {table} SET ts = {ts_sql_expression(table, 'NEW.' + column)}
+                WHERE rowid = NEW.rowid;
+            END
+        """)
+
+    for name, target in COVERING_INDEXES.items():
+        table = target.split('(')[0]
+        if table_exists(conn, table):
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+
+    conn.commit()
+    return migrated
+
+def ensure_epoch_hours(conn):
+    """
+    ts kolonu eksikse migration'ı çalıştırır
+
+    Loader'lar her çağrıda bunu çağırabilir; şema hazırsa sadece
+    tek bir PRAGMA sorgusu maliyeti vardır.
+    """
+    if table_exists(conn, 'mcp_data') and not has_ts_column(conn, 'mcp_data'):
+        print("[*] ts (epoch saat) kolonları ekleniyor...")
+        migrated = migrate_epoch_hours(conn)
+        print(f"[+] {migrated} tabloya ts kolonu eklendi")
+    elif table_exists(conn, 'forecast_history') and not has_ts_column(conn, 'forecast_history'):
+        migrate_epoch_hours(conn)
+
+def to_epoch_hour(value):
+    """
+    Türkiye saatiyle verilen tarihi UTC epoch saatine çevirir
+
+    Args:
+        value: 'YYYY-MM-DD', 'YYYY-MM-DD HH:MM:SS', offset'li ISO metin veya Timestamp.
+               Offset'siz değerler Türkiye saati kabul edilir.
+
+    Returns:
+        int: UTC epoch saat (saniye / 3600)
+    """
+    stamp = pd.Timestamp(value)
+    if stamp.tzinfo is None:
+        seconds = stamp.value // 10**9 - TR_UTC_OFFSET_SECONDS
+    else:
+        seconds = stamp.value // 10**9
+    return int(seconds // 3600)
+
+def epoch_hours_to_local(ts):
+    """
+    Epoch saat dizisini timezone'suz Türkiye saatine çevirir (vektörel)
+
+    Metin parse etmekten çok daha hızlıdır; Prophet'in beklediği
+    timezone'suz 'ds' kolonunu doğrudan üretir.
+
+    Args:
+        ts: Epoch saat değerleri (Series veya array)
+
+    Returns:
+        pd.Series / DatetimeIndex: Türkiye saati (timezone'suz)
+    """
+    seconds = np.asarray(ts, dtype='int64') * 3600 + TR_UTC_OFFSET_SECONDS
+    local = pd.to_datetime(seconds, unit='s')
+    if isinstance(ts, pd.Series):
+        return pd.Series(local, index=ts.index)
+    return local
+
+def local_to_epoch_hours(ds):
+    """
+    Timezone'suz Türkiye saatlerini epoch saate çevirir (epoch_hours_to_local'ın tersi)
+
+    Args:
+        ds: Tarih-saat değerleri (Series veya array)
+
+    Returns:
+        np.ndarray: int64 epoch saatler
+    """
+    hours = (pd.to_datetime(np.asarray(ds)) - pd.Timestamp('1970-01-01')) // pd.Timedelta(hours=1)
+    return np.asarray(hours, dtype='int64') - TR_UTC_OFFSET_HOURS
+
+def local_days(ts):
+    """Epoch saatlerin Türkiye takvim günü indeksi (1970-01-01 = 0, vektörel)"""
+    return (np.asarray(ts, dtype='int64') + TR_UTC_OFFSET_HOURS) // 24
+
+def local_hour_of_week(ts):
+    """Epoch saatlerin Türkiye saatiyle haftanın saati (Pazartesi 00:00 = 0 ... 167, vektörel)"""
+    ts = np.asarray(ts, dtype='int64')
+    weekday = (local_days(ts) + EPOCH_WEEKDAY) % 7
+    return weekday * 24 + (ts + TR_UTC_OFFSET_HOURS) % 24
+
+def local_day_start(day):
+    """Gün indeksinin Türkiye gece yarısı epoch saati"""
+    return int(day) * 24 - TR_UTC_OFFSET_HOURS
+
+def days_to_dates(days):
+    """Gün indeksleri -> datetime64[D]"""
+    return EPOCH_DATE + np.asarray(days, dtype='int64').astype('timedelta64[D]')
+
+def dates_to_days(dates):
+    """datetime64[D] -> gün indeksleri"""
+    return (np.asarray(dates, dtype='datetime64[D]') - EPOCH_DATE).astype('int64')
+
+def main():
+    """Migration'ı elle çalıştırır"""
+    print("="*70)
+    print("EPOCH SAAT MIGRATION")
+    print("="*70)
+    # database.py bu modülü kullanıyor; döngüsel import olmasın diye burada
+    from database import DB_PATH, _acquire
+    print(f"Database: {DB_PATH}")
+
+    conn = _acquire('write')
+    migrated = migrate_epoch_hours(conn)
+    conn.close()
+
+    print(f"[+] {migrated} tabloya ts kolonu eklendi, trigger ve index'ler hazır")
+    print("="*70)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+EPİAŞ MCP Fiyat Tahmini - Ortak Değerlendirme Motoru
+====================================================
+
+compare_models, test_v2_model, check_overfitting, simple_overfitting_check,
+analyze_last_60_days ve train_prophet.evaluate_model aynı motoru kullanır:
+
+1. Veri anlık görüntüsü (fiyat + tüm regressor kolonları) BİR kez yüklenir
+2. Her model her pencere için BİR kez tahmin edilir ve önbelleğe alınır
+   (değerlendirmede güven aralığı gerekmiyorsa uncertainty sampling atlanır).
+   Registry sürümlerinin tahminleri model_predictions tablosunda kalıcıdır
+   (prediction_store.py); aynı sürüm bir daha tahmin edilmez.
+3. Tüm metrik varyantları (MAPE maskeleri) ve kırılımlar (saat, gün, fiyat
+   bandı, ay) önbellekteki artıklar üzerinde vektörel groupby ile hesaplanır
+
+Maskeler (script'lerin tarihsel MAPE tanımları):
+    all      tüm satırlar
+    nonzero  y != 0        (overfitting kontrolleri)
+    ge100    y >= 100      (compare_models, test_v2_model)
+    gt100    y > 100       (compare_forecasts haftalık)
+    ge500    y >= 500      (train_prophet test seti)
+    lt100    y < 100       (ekstrem düşük fiyatlar)
+
+Kullanım:
+    python evaluation.py                    # aktif prophet (+ varsa prophet_v2), son 60 gün
+    python evaluation.py 12 14 --days 90    # registry sürümleri
+"""
+
+import sys
+import argparse
+import time
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from hourly_facts import load_facts, refresh_pending_facts
+from calendar_features import add_time_features, add_extreme_low_risk
+
+MASKS = {
+    'all': lambda y: np.ones(len(y), dtype=bool),
+    'nonzero': lambda y: y != 0,
+    'ge100': lambda y: y >= 100,
+    'gt100': lambda y: y > 100,
+    'ge500': lambda y: y >= 500,
+    'lt100': lambda y: y < 100,
+}
+
+# Fiyat bantları (TRY/MWh): 0, ekstrem düşük, düşük, normal, yüksek, tavan civarı
+PRICE_BANDS = [-np.inf, 0, 100, 500, 1500, 2500, np.inf]
+PRICE_BAND_LABELS = ['<=0', '0-100', '100-500', '500-1500', '1500-2500', '2500+']
+
+WEEKDAY_NAMES = ['Pzt', 'Sal', 'Car', 'Per', 'Cum', 'Cmt', 'Paz']
+
+def load_snapshot(start_ts=None, end_ts=None):
+    """
+    Değerlendirme verisi: ds, y ve tüm model sürümlerinin regressor kolonları
+
+    Args:
+        start_ts (int, optional): Başlangıç epoch saati (dahil)
+        end_ts (int, optional): Bitiş epoch saati (dahil değil)
+
+    Returns:
+        pd.DataFrame
+    """
+    df = load_facts(start_ts=start_ts, end_ts=end_ts, columns=('price AS y',))
+    add_time_features(df)
+    add_extreme_low_risk(df)
+    return df
+
+def metrics(frame, mape_mask='gt100'):
+    """
+    Tek bir satır kümesinin metrikleri
+
+    Args:
+        frame: y ve yhat kolonlu DataFrame (EvaluationEngine.predict çıktısı)
+        mape_mask (str): MAPE'ye girecek satırlar (MASKS anahtarı; y == 0 her zaman hariç)
+
+    Returns:
+        dict: count, mae, rmse, mape, bias (ortalama y - yhat), residual_std.
+              Boş kümede metrikler 0.
+    """
+    y = frame['y'].to_numpy(dtype=float)
+    residual = y - frame['yhat'].to_numpy(dtype=float)
+    if len(y) == 0:
+        return {'count': 0, 'mae': 0.0, 'rmse': 0.0, 'mape': 0.0, 'bias': 0.0, 'residual_std': 0.0}
+
+    mask = MASKS[mape_mask](y) & (y != 0)
+    return {
+        'count': len(y),
+        'mae': float(np.mean(np.abs(residual))),
+        'rmse': float(np.sqrt(np.mean(residual ** 2))),
+        'mape': float(np.mean(np.abs(residual[mask] / y[mask])) * 100) if mask.any() else 0.0,
+        'bias': float(np.mean(residual)),
+        'residual_std': float(np.std(residual)),
+    }
+
+def mask_variants(frame, names=tuple(MASKS), mape_mask='gt100'):
+    """
+    Aynı tahminlerin maske bazlı metrikleri (ör. 'tüm veri' vs 'normal fiyatlar')
+
+    Returns:
+        pd.DataFrame: index = maske adı, kolonlar = metrics() anahtarları
+    """
+    y = frame['y'].to_numpy()
+    return pd.DataFrame({name: metrics(frame[MASKS[name](y)], mape_mask) for name in names}).T
+
+def _slice_keys(frame, by):
+    if by == 'hour':
+        return frame['ds'].dt.hour
+    if by == 'weekday':
+        return frame['ds'].dt.dayofweek.map(dict(enumerate(WEEKDAY_NAMES)))
+    if by == 'price_band':
+        return pd.cut(frame['y'], PRICE_BANDS, labels=PRICE_BAND_LABELS)
+    if by == 'month':
+        return frame['ds'].dt.to_period('M').astype(str)
+    # Dışarıdan verilen etiketler (ör. dönem adları)
+    return pd.Series(by, index=frame.index)
+
+def slice_metrics(frame, by, mape_mask='gt100'):
+    """
+    Kırılım bazında metrikler (tek vektörel groupby)
+
+    Args:
+        frame: EvaluationEngine.predict çıktısı
+        by: 'hour' | 'weekday' | 'price_band' | 'month' veya satır başına etiket dizisi
+        mape_mask (str): MAPE maskesi
+
+    Returns:
+        pd.DataFrame: index = kırılım, kolonlar = count, mae, rmse, mape, bias
+    """
+    y = frame['y'].to_numpy(dtype=float)
+    residual = y - frame['yhat'].to_numpy(dtype=float)
+    mask = MASKS[mape_mask](y) & (y != 0)
+    ape = np.full(len(y), np.nan)
+    ape[mask] = np.abs(residual[mask] / y[mask]) * 100
+
+    work = pd.DataFrame({
+        # Kategorik fiyat bantları sırasını korur
+        'key': _slice_keys(frame, by).reset_index(drop=True),
+        'abs_error': np.abs(residual),
+        'sq_error': residual ** 2,
+        'residual': residual,
+        'ape': ape,
+    })
+    grouped = work.groupby('key', sort=by != 'weekday', observed=True)
+    result = pd.DataFrame({
+        'count': grouped.size(),
+        'mae': grouped['abs_error'].mean(),
+        'rmse': np.sqrt(grouped['sq_error'].mean()),
+        'mape': grouped['ape'].mean().fillna(0.0),
+        'bias': grouped['residual'].mean(),
+    })
+    if by == 'weekday':
+        result = result.reindex([name for name in WEEKDAY_NAMES if name in result.index])
+    return result
+
+class EvaluationEngine:
+    """
+    Tek veri yüklemesi + model/pencere başına tek tahmin
+
+    Args:
+        df (pd.DataFrame, optional): Hazır veri (ds, y ve regressor kolonları);
+                                     yoksa load_snapshot(start_ts) ile yüklenir
+        start_ts (int, optional): Sadece bu epoch saatinden sonrasını yükle
+    """
+
+    def __init__(self, df=None, start_ts=None):
+        self.df = df if df is not None else load_snapshot(start_ts=start_ts)
+        self._predictions = {}
+        self._models = {}
+
+    def last_days(self, days):
+        """Son N günün başlangıcı (ds > max - N gün ile aynı satırlar)"""
+        return self.df['ds'].max() - timedelta(days=days) + timedelta(hours=1)
+
+    def window(self, start=None, end=None):
+        """[start, end) penceresindeki satırlar"""
+        mask = np.ones(len(self.df), dtype=bool)
+        if start is not None:
+            mask &= (self.df['ds'] >= pd.Timestamp(start)).to_numpy()
+        if end is not None:
+            mask &= (self.df['ds'] < pd.Timestamp(end)).to_numpy()
+        return self.df[mask]
+
+    def predict(self, model, start=None, end=None, key=None, intervals=False):
+        """
+        Modelin [start, end) penceresi için tahminleri (önbellekli)
+
+        Args:
+            model: Prophet modeli
+            start, end: Pencere sınırları (None = veri başı/sonu)
+            key: Önbellek anahtarı (registry sürümü, etiket); yoksa id(model)
+            intervals (bool): yhat_lower/yhat_upper de gerekli mi (uncertainty sampling)
+
+        Returns:
+            pd.DataFrame: ds, y, yhat, residual (+ yhat_lower, yhat_upper)
+        """
+        cache_key = (key if key is not None else id(model),
+                     None if start is None else pd.Timestamp(start),
+                     None if end is None else pd.Timestamp(end), intervals)
+        if cache_key in self._predictions:
+            return self._predictions[cache_key]
+
+        frame = self.window(start, end)
+        if len(frame) == 0:
+            # Prophet boş DataFrame'i reddeder; boş pencerede metrikler 0 olur
+            return pd.DataFrame(columns=['ds', 'y', 'yhat', 'residual'])
+        features = frame[['ds'] + list(model.extra_regressors)]
+
+        # Sadece yhat gerekiyorsa örnekleme (tahmin süresinin çoğu) atlanır
+        saved_samples = model.uncertainty_samples
+        if not intervals:
+            model.uncertainty_samples = 0
+        try:
+            forecast = model.predict(features)
+        finally:
+            model.uncertainty_samples = saved_samples
+
+        result = frame[['ds', 'y']].reset_index(drop=True)
+        result['yhat'] = forecast['yhat'].to_numpy()
+        if intervals:
+            result['yhat_lower'] = forecast['yhat_lower'].to_numpy()
+            result['yhat_upper'] = forecast['yhat_upper'].to_numpy()
+        result['residual'] = result['y'] - result['yhat']
+
+        self._predictions[cache_key] = result
+        return result
+
+    def predict_version(self, version, start=None, end=None, intervals=False):
+        """
+        Registry sürümünün tahminleri
+
+        Aralık gerekmiyorsa model_predictions tablosundan okunur; tabloda
+        olmayan saatler bir kez tahmin edilip eklenir (model sadece o zaman yüklenir).
+        """
+        from model_registry import load_version
+        if intervals:
+            return self.predict(load_version(version), start, end, key=('version', int(version)),
+                                intervals=True)
+
+        cache_key = (('version', int(version)),
+                     None if start is None else pd.Timestamp(start),
+                     None if end is None else pd.Timestamp(end), False)
+        if cache_key not in self._predictions:
+            from prediction_store import cached_predictions
+            self._predictions[cache_key] = cached_predictions(
+                version, self.window(start, end), lambda: load_version(version)
+            )
+        return self._predictions[cache_key]
+
+    def predict_active(self, start=None, end=None, name='prophet'):
+        """
+        Aktif modelin tahminleri: registry'de aktif sürüm varsa onun (kayıtlı
+        tahminlerle), yoksa sabit model dosyasının
+        """
+        from model_registry import ACTIVE_PATHS, active_version
+        entry = active_version(name)
+        if entry is not None:
+            return self.predict_version(entry['version'], start, end)
+
+        from prophet.serialize import model_from_json
+        path = ACTIVE_PATHS[name]
+        if path not in self._models:
+            with open(path, 'r') as f:
+                self._models[path] = model_from_json(f.read())
+        return self.predict(self._models[path], start, end, key=path)
+
+def print_metric_table(table, title, index_label=''):
+    """Metrik tablosunu yazdırır"""
+    print(f"\n{title}")
+    print(f"  {index_label:12s} {'Kayit':>7} {'MAE':>9} {'RMSE':>9} {'MAPE':>8} {'Bias':>9}")
+    for name, row in table.iterrows():
+        print(f"  {str(name):12s} {int(row['count']):7d} {row['mae']:9.2f} {row['rmse']:9.2f} "
+              f"{row['mape']:7.2f}% {row['bias']:9.2f}")
+
+def model_report(engine, version, start):
+    """Bir registry sürümü için tam rapor (tek tahmin, tüm kırılımlar)"""
+    from model_registry import get_version
+    entry = get_version(version)
+    frame = engine.predict_version(version, start=start)
+
+    print(f"\n{'='*70}")
+    print(f"Model: {entry['name']} v{entry['version']} (kesim: {entry['training_cutoff'] or '-'})")
+    print(f"{'='*70}")
+    print_metric_table(mask_variants(frame), "Maske varyantlari (MAPE: > 100 TRY)", 'Maske')
+    print_metric_table(slice_metrics(frame, 'price_band'), "Fiyat bandi", 'Band')
+    print_metric_table(slice_metrics(frame, 'weekday'), "Haftanin gunu", 'Gun')
+    print_metric_table(slice_metrics(frame, 'hour'), "Saat", 'Saat')
+    print_metric_table(slice_metrics(frame, 'month'), "Ay", 'Ay')
+
+def main():
+    """Komut satırı: registry sürümleri için değerlendirme raporu"""
+    from model_registry import active_version
+
+    parser = argparse.ArgumentParser(description='Model degerlendirme raporu')
+    parser.add_argument('versions', nargs='*', type=int, help='Registry surumleri')
+    parser.add_argument('--days', type=int, default=60, help='Test penceresi (son N gun)')
+    args = parser.parse_args()
+
+    versions = args.versions
+    if not versions:
+        versions = [entry['version'] for entry in (active_version('prophet'), active_version('prophet_v2')) if entry]
+    if not versions:
+        print("[!] Registry'de aktif model yok")
+        sys.exit(1)
+
+    start_time = time.perf_counter()
+    # Değerlendirme hourly_facts'ten okur; önce yeni/düzeltilen saatler işlenir
+    refresh_pending_facts()
+    engine = EvaluationEngine()
+    start = engine.last_days(args.days)
+
+    print("="*70)
+    print(f"DEGERLENDIRME RAPORU: son {args.days} gun ({start} ->)")
+    print("="*70)
+
+    for version in versions:
+        model_report(engine, version, start)
+
+    print(f"\n[*] Rapor suresi: {time.perf_counter() - start_time:.1f} s")
+
+if __name__ == "__main__":
+    main()
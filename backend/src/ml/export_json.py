@@ -7,18 +7,49 @@ EPİAŞ MCP Fiyat Tahmini - JSON Export
 Bu script:
 1. forecast_history'den bu hafta ve geçen hafta tahminlerini çeker
 2. weekly_performance'tan performans trendini çeker
-3. Frontend için JSON dosyası oluşturur
+3. Frontend için JSON dosyası oluşturur (kompakt + .gz/.br kopyaları)
+4. İçerik değişmediyse dosyalara hiç dokunmaz (hash + ETag kontrolü)
+5. Her hafta için ayrı arşiv dosyası (public/weeks/YYYY-MM-DD.json) ve
+   index.json manifest'i yazar; sadece verisi değişen haftalar yeniden üretilir
+6. Grafikler için tüm tahmin geçmişini kompakt binary formatta yazar
+   (public/forecasts.bin, little-endian float32 kolonlar)
+7. Güven bandı (lower/upper) forecast_quantiles'taki %95 kantil bandından gelir
+8. Baz/puant/puant dışı blok ortalamaları forecast_blocks tablosundan okunur
+   (bu haftanın günleri, bu ve geçen hafta, bu ay)
 """
 
 import pandas as pd
-import sqlite3
+import numpy as np
 import json
+import gzip
+import hashlib
 import os
+import struct
 from datetime import datetime, timedelta
 
-# Veri tabanı ve output yolu
-DB_PATH = os.path.join(os.path.dirname(__file__), '../../data/energy.db')
+from database import get_reader
+from quantile_store import load_quantiles, quantile_column, BAND_LEVELS
+from forecast_blocks import load_blocks
+
+try:
+    import brotli
+except ImportError:  # brotli opsiyonel, yoksa sadece .gz yazılır
+    brotli = None
+
+# Output yolları
 OUTPUT_PATH = os.path.join(os.path.dirname(__file__), '../../public/forecasts.json')
+WEEKS_DIR = os.path.join(os.path.dirname(__file__), '../../public/weeks')
+BINARY_PATH = os.path.join(os.path.dirname(__file__), '../../public/forecasts.bin')
+
+# Binary format: 32 byte header + n_cols adet float32[n_hours] kolon (little-endian)
+#   magic 'EPF1' | uint32 version | uint32 n_hours | uint32 n_cols |
+#   int64 start_epoch (UTC saniye) | uint32 step_seconds | uint32 reserved
+# Header 32 byte olduğu için kolonlar 4 byte hizalı; tarayıcıda
+# new Float32Array(buffer, 32 + i * n_hours * 4, n_hours) ile doğrudan okunur.
+BINARY_MAGIC = b'EPF1'
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct('<4sIIIqII')
+BINARY_COLUMNS = ('predicted', 'actual', 'lower', 'upper')
 
 def get_current_week_monday():
     """Bugünün ait olduğu haftanın Pazartesi tarihini döndürür"""
@@ -28,6 +59,341 @@ def get_current_week_monday():
     monday = today - timedelta(days=days_since_monday)
     return monday.strftime('%Y-%m-%d')
 
+def frame_to_records(df, columns):
+    """
+    DataFrame'i satır satır dolaşmadan JSON kayıtlarına çevirir
+
+    Args:
+        df: Kaynak DataFrame
+        columns (dict): {kaynak_kolon: json_anahtarı}. Sayısal kolonlar 2 haneye yuvarlanır.
+
+    Returns:
+        list: JSON'a hazır dict listesi (NaN -> None)
+    """
+    if len(df) == 0:
+        return []
+
+    out = df[list(columns)].rename(columns=columns)
+    numeric = out.select_dtypes('number').columns
+    out[numeric] = out[numeric].round(2)
+
+    # NaN'ları None yap (JSON'da null olarak yazılsın)
+    out = out.astype(object).where(out.notna(), None)
+    return out.to_dict('records')
+
+def serialize_payload(data):
+    """Boşluksuz, deterministik JSON üretir (UTF-8 bytes)"""
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def content_hash(data):
+    """
+    Payload'ın içerik hash'i (generated_at hariç)
+
+    generated_at her çalıştırmada değiştiği için hash'e dahil edilmez,
+    böylece veri aynıysa hash de aynı kalır.
+    """
+    stable = {k: v for k, v in data.items() if k != 'generated_at'}
+    return hashlib.sha256(serialize_payload(stable)).hexdigest()
+
+def read_previous_hash(hash_path):
+    """Önceki export'un içerik hash'ini okur (yoksa None)"""
+    if not os.path.exists(hash_path):
+        return None
+    with open(hash_path, 'r', encoding='utf-8') as f:
+        return f.read().strip() or None
+
+def write_atomic(path, payload):
+    """Dosyayı önce geçici dosyaya yazıp sonra yerine taşır"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(payload)
+    os.replace(tmp_path, path)
+
+def write_json_bundle(data, output_path=OUTPUT_PATH):
+    """
+    JSON'u ve önceden sıkıştırılmış kopyalarını yazar
+
+    İçerik hash'i bir önceki export ile aynıysa hiçbir dosya yazılmaz.
+
+    Args:
+        data (dict): Export edilecek veri
+        output_path (str): JSON dosya yolu
+
+    Returns:
+        bool: Dosyalar yazıldıysa True, içerik aynı olduğu için atlandıysa False
+    """
+    hash_path = output_path + '.sha256'
+    etag_path = output_path + '.etag'
+
+    digest = content_hash(data)
+    if digest == read_previous_hash(hash_path) and os.path.exists(output_path):
+        print(f"[*] İçerik değişmedi (sha256 {digest[:12]}), yazma atlandı")
+        return False
+
+    payload = serialize_payload(data)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+    write_atomic(output_path, payload)
+    # mtime=0: aynı içerik her zaman aynı .gz bytes'ını üretir (git diff temiz kalır)
+    write_atomic(output_path + '.gz', gzip.compress(payload, compresslevel=9, mtime=0))
+    if brotli is not None:
+        write_atomic(output_path + '.br', brotli.compress(payload, quality=11))
+    else:
+        print("[!] brotli kurulu değil, .br dosyası yazılmadı")
+
+    # ETag servis edilen bytes'ın hash'i, .sha256 ise değişiklik tespiti için
+    etag = '"' + hashlib.sha256(payload).hexdigest()[:32] + '"'
+    write_atomic(etag_path, etag.encode('utf-8'))
+    write_atomic(hash_path, digest.encode('utf-8'))
+
+    return True
+
+def attach_band(df, quantiles):
+    """
+    ts kolonlu tahminlere BAND_LEVELS kantillerini lower_bound/upper_bound olarak ekler
+
+    Args:
+        df: ts kolonu olan DataFrame
+        quantiles: load_quantiles çıktısı
+
+    Returns:
+        pd.DataFrame: Bant kantilleri saklı değilse df değişmeden döner
+    """
+    lower, upper = (quantile_column(level) for level in BAND_LEVELS)
+    if lower not in quantiles or upper not in quantiles:
+        return df
+    band = quantiles[['ts', lower, upper]].rename(columns={lower: 'lower_bound', upper: 'upper_bound'})
+    return df.merge(band, on='ts', how='left')
+
+def load_week_fingerprints(conn):
+    """
+    forecast_history'deki her hafta için ucuz bir içerik parmak izi hesaplar
+
+    Satırlar tek tek okunmaz; SQLite GROUP BY ile hafta başına tek satır döner.
+    Tahmin, gerçek değer veya haftalık performans değişirse parmak izi de değişir.
+
+    Returns:
+        dict: {week_start: {'week_end': str, 'hours': int, 'has_actuals': bool, 'fingerprint': str}}
+    """
+    query = """
+        SELECT
+            f.week_start,
+            f.week_end,
+            COUNT(*) AS hours,
+            COUNT(f.actual_price) AS actual_count,
+            TOTAL(f.predicted_price) AS predicted_sum,
+            TOTAL(f.actual_price) AS actual_sum,
+            TOTAL(f.absolute_error) AS error_sum,
+            MAX(f.created_at) AS last_created,
+            p.mape, p.mae, p.rmse
+        FROM forecast_history f
+        LEFT JOIN weekly_performance p ON p.week_start = f.week_start
+        GROUP BY f.week_start
+        ORDER BY f.week_start
+    """
+    fingerprints = {}
+    for row in conn.execute(query):
+        week_start, week_end, hours, actual_count = row[:4]
+        fingerprints[week_start] = {
+            'week_end': week_end,
+            'hours': hours,
+            'has_actuals': actual_count > 0,
+            'fingerprint': hashlib.sha256(repr(row).encode('utf-8')).hexdigest()[:16]
+        }
+    return fingerprints
+
+def read_week_manifest(weeks_dir=WEEKS_DIR):
+    """Mevcut haftalık arşiv manifest'ini okur (yoksa boş)"""
+    index_path = os.path.join(weeks_dir, 'index.json')
+    if not os.path.exists(index_path):
+        return {}
+    with open(index_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    return {week['start']: week for week in manifest.get('weeks', [])}
+
+def build_week_shards(conn, weeks):
+    """
+    Verilen haftaların arşiv içeriğini tek sorguda üretir
+
+    Args:
+        conn: SQLite bağlantısı
+        weeks (list): Hafta başlangıçları (Pazartesi, 'YYYY-MM-DD')
+
+    Returns:
+        dict: {week_start: shard_dict}
+    """
+    if not weeks:
+        return {}
+
+    placeholders = ','.join('?' * len(weeks))
+    rows = pd.read_sql_query(f"""
+        SELECT week_start, week_end, forecast_datetime, predicted_price,
+               actual_price, absolute_error, percentage_error
+        FROM forecast_history
+        WHERE week_start IN ({placeholders})
+        ORDER BY week_start, forecast_datetime
+    """, conn, params=weeks)
+    perf = pd.read_sql_query(f"""
+        SELECT week_start, mape, mae, rmse, total_predictions
+        FROM weekly_performance
+        WHERE week_start IN ({placeholders})
+    """, conn, params=weeks).set_index('week_start')
+
+    shards = {}
+    for week_start, group in rows.groupby('week_start', sort=False):
+        performance = None
+        if week_start in perf.index:
+            p = perf.loc[week_start]
+            performance = {
+                'mape': round(float(p['mape']), 2),
+                'mae': round(float(p['mae']), 2),
+                'rmse': round(float(p['rmse']), 2),
+                'total_predictions': int(p['total_predictions'])
+            }
+        shards[week_start] = {
+            'start': week_start,
+            'end': group['week_end'].iloc[0],
+            'performance': performance,
+            'forecasts': frame_to_records(group, {
+                'forecast_datetime': 'datetime',
+                'predicted_price': 'predicted',
+                'actual_price': 'actual',
+                'absolute_error': 'error',
+                'percentage_error': 'error_percent'
+            })
+        }
+    return shards
+
+def export_week_shards(conn, weeks_dir=WEEKS_DIR):
+    """
+    Haftalık arşiv dosyalarını ve index.json manifest'ini yazar
+
+    Her hafta public/weeks/YYYY-MM-DD.json dosyasına yazılır. Manifest'teki
+    'hash' alanı dosya içeriğinin hash'idir; istemci dosyayı ?v=<hash> ile
+    isteyerek süresiz cache'leyebilir. Sadece parmak izi değişen haftalar
+    yeniden üretilir, silinen haftaların dosyaları kaldırılır.
+
+    Returns:
+        int: Yeniden yazılan hafta sayısı
+    """
+    fingerprints = load_week_fingerprints(conn)
+    previous = read_week_manifest(weeks_dir)
+
+    changed = [
+        week for week, info in fingerprints.items()
+        if previous.get(week, {}).get('fingerprint') != info['fingerprint']
+        or not os.path.exists(os.path.join(weeks_dir, f"{week}.json"))
+    ]
+
+    os.makedirs(weeks_dir, exist_ok=True)
+    shards = build_week_shards(conn, changed)
+
+    manifest_weeks = []
+    for week, info in fingerprints.items():
+        if week in shards:
+            payload = serialize_payload(shards[week])
+            write_atomic(os.path.join(weeks_dir, f"{week}.json"), payload)
+            file_hash = hashlib.sha256(payload).hexdigest()[:16]
+        else:
+            file_hash = previous[week]['hash']
+
+        manifest_weeks.append({
+            'start': week,
+            'end': info['week_end'],
+            'file': f"{week}.json",
+            'hash': file_hash,
+            'fingerprint': info['fingerprint'],
+            'hours': info['hours'],
+            'has_actuals': info['has_actuals']
+        })
+
+    # Artık DB'de olmayan haftaların dosyalarını temizle
+    for week in set(previous) - set(fingerprints):
+        stale_path = os.path.join(weeks_dir, f"{week}.json")
+        if os.path.exists(stale_path):
+            os.remove(stale_path)
+
+    # Manifest küçük olduğu için sıkıştırılmış kopyaya gerek yok
+    manifest = {'weeks': manifest_weeks}
+    index_path = os.path.join(weeks_dir, 'index.json')
+    if changed or set(previous) != set(fingerprints) or not os.path.exists(index_path):
+        write_atomic(index_path, serialize_payload(manifest))
+
+    return len(changed)
+
+def build_binary_series(df, step_seconds=3600):
+    """
+    Saatlik tahmin geçmişini sabit adımlı float32 kolonlara çevirir
+
+    Args:
+        df: ts (epoch saat), predicted_price, actual_price kolonları
+            (opsiyonel: lower_bound, upper_bound)
+        step_seconds (int): Zaman adımı (saniye)
+
+    Returns:
+        tuple: (start_epoch, columns) - columns: BINARY_COLUMNS sırasında float32 dizileri,
+               eksik saatler NaN
+    """
+    if len(df) == 0:
+        return 0, [np.empty(0, dtype='<f4') for _ in BINARY_COLUMNS]
+
+    epochs = df['ts'].to_numpy(dtype='int64') * 3600
+    start_epoch = int(epochs.min())
+    slots = (epochs - start_epoch) // step_seconds
+    n_hours = int(slots.max()) + 1
+
+    sources = {
+        'predicted': 'predicted_price',
+        'actual': 'actual_price',
+        'lower': 'lower_bound',
+        'upper': 'upper_bound',
+    }
+    columns = []
+    for name in BINARY_COLUMNS:
+        column = np.full(n_hours, np.nan, dtype='<f4')
+        if sources[name] in df:
+            column[slots] = df[sources[name]].to_numpy(dtype='float64', na_value=np.nan)
+        columns.append(column)
+
+    return start_epoch, columns
+
+def pack_binary_series(start_epoch, columns, step_seconds=3600):
+    """Header + kolonları tek bir bytes bloğunda birleştirir"""
+    n_hours = len(columns[0]) if columns else 0
+    header = BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, n_hours, len(columns),
+                                start_epoch, step_seconds, 0)
+    return header + b''.join(np.ascontiguousarray(c, dtype='<f4').tobytes() for c in columns)
+
+def export_binary_series(conn, output_path=BINARY_PATH):
+    """
+    Tüm forecast_history'yi kompakt binary dosyaya yazar
+
+    lower/upper kolonları forecast_quantiles'taki %95 bandıdır; kantili
+    saklanmamış haftalarda NaN yazılır.
+
+    Returns:
+        int: Yazılan saat sayısı (içerik aynıysa 0)
+    """
+    history = pd.read_sql_query("""
+        SELECT ts, predicted_price, actual_price
+        FROM forecast_history
+        ORDER BY ts
+    """, conn)
+    history = attach_band(history, load_quantiles(conn=conn))
+
+    start_epoch, columns = build_binary_series(history)
+    payload = pack_binary_series(start_epoch, columns)
+
+    if os.path.exists(output_path):
+        with open(output_path, 'rb') as f:
+            if hashlib.sha256(f.read()).digest() == hashlib.sha256(payload).digest():
+                return 0
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    write_atomic(output_path, payload)
+    write_atomic(output_path + '.gz', gzip.compress(payload, compresslevel=9, mtime=0))
+    return len(columns[0])
+
 def export_forecasts():
     """
     Database'den tahminleri ve performansı çekip JSON'a export eder
@@ -36,7 +402,7 @@ def export_forecasts():
     print("JSON EXPORT - Frontend için veri hazırlama")
     print("="*70)
 
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_reader()
 
     # Bu haftanın Pazartesi'si
     this_week_monday = get_current_week_monday()
@@ -52,21 +418,24 @@ def export_forecasts():
     # 1. Bu hafta tahminleri
     print(f"\n[*] Bu hafta tahminleri yükleniyor...")
     current_week_query = """
-        SELECT forecast_datetime, predicted_price, actual_price, absolute_error
+        SELECT ts, forecast_datetime, predicted_price, actual_price, absolute_error
         FROM forecast_history
         WHERE week_start = ?
         ORDER BY forecast_datetime
     """
     current_week = pd.read_sql_query(current_week_query, conn, params=[this_week_monday])
+    next_day = (datetime.strptime(this_week_monday, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+    current_week = attach_band(current_week, load_quantiles(this_week_monday, next_day, conn=conn))
 
-    current_forecasts = []
-    if len(current_week) > 0:
-        for _, row in current_week.iterrows():
-            current_forecasts.append({
-                'datetime': row['forecast_datetime'],
-                'predicted': round(row['predicted_price'], 2),
-                'actual': round(row['actual_price'], 2) if pd.notna(row['actual_price']) else None
-            })
+    current_columns = {
+        'forecast_datetime': 'datetime',
+        'predicted_price': 'predicted',
+        'actual_price': 'actual'
+    }
+    if 'lower_bound' in current_week:
+        current_columns.update({'lower_bound': 'lower', 'upper_bound': 'upper'})
+    current_forecasts = frame_to_records(current_week, current_columns)
+    if len(current_forecasts) > 0:
         print(f"[+] {len(current_forecasts)} tahmin bulundu")
     else:
         print(f"[!] Bu hafta için tahmin bulunamadı!")
@@ -104,16 +473,14 @@ def export_forecasts():
     """
     last_week_comp = pd.read_sql_query(last_week_comparison_query, conn, params=[last_week_monday])
 
-    last_week_comparison = []
-    if len(last_week_comp) > 0:
-        for _, row in last_week_comp.iterrows():
-            last_week_comparison.append({
-                'datetime': row['forecast_datetime'],
-                'predicted': round(row['predicted_price'], 2),
-                'actual': round(row['actual_price'], 2),
-                'error': round(row['absolute_error'], 2),
-                'error_percent': round(row['percentage_error'], 2)
-            })
+    last_week_comparison = frame_to_records(last_week_comp, {
+        'forecast_datetime': 'datetime',
+        'predicted_price': 'predicted',
+        'actual_price': 'actual',
+        'absolute_error': 'error',
+        'percentage_error': 'error_percent'
+    })
+    if len(last_week_comparison) > 0:
         print(f"[+] {len(last_week_comparison)} karşılaştırma kaydı bulundu")
     else:
         print(f"[!] Geçen hafta karşılaştırması bulunamadı")
@@ -121,29 +488,60 @@ def export_forecasts():
     # 4. Haftalık performans trendi (son 8 hafta)
     print(f"\n[*] Haftalık performans trendi yükleniyor...")
     trend_query = """
-        SELECT week_start, week_end, mape, mae, rmse
+        SELECT week_start || ' - ' || week_end AS week, mape, mae, rmse
         FROM weekly_performance
         ORDER BY week_start DESC
         LIMIT 8
     """
     trend = pd.read_sql_query(trend_query, conn)
 
-    historical_trend = []
-    if len(trend) > 0:
-        for _, row in trend.iterrows():
-            historical_trend.append({
-                'week': f"{row['week_start']} - {row['week_end']}",
-                'mape': round(row['mape'], 2),
-                'mae': round(row['mae'], 2),
-                'rmse': round(row['rmse'], 2)
-            })
+    historical_trend = frame_to_records(trend, {
+        'week': 'week',
+        'mape': 'mape',
+        'mae': 'mae',
+        'rmse': 'rmse'
+    })
+    if len(historical_trend) > 0:
         print(f"[+] {len(historical_trend)} haftalık performans kaydı bulundu")
     else:
         print(f"[!] Performans trendi bulunamadı")
 
+    # 5. Blok ürünleri (baz / puant / puant dışı)
+    print(f"\n[*] Blok ürünleri yükleniyor...")
+    block_columns = {
+        'period_start': 'start',
+        'block': 'block',
+        'forecast': 'forecast',
+        'actual': 'actual',
+        'forecast_hours': 'forecast_hours',
+        'actual_hours': 'actual_hours',
+    }
+    month_start = this_week_monday[:8] + '01'
+    next_monday = (datetime.strptime(this_week_monday, '%Y-%m-%d') + timedelta(days=7)).strftime('%Y-%m-%d')
+    blocks = {
+        'daily': frame_to_records(load_blocks('day', this_week_monday, next_monday, conn=conn), block_columns),
+        'weekly': frame_to_records(load_blocks('week', last_week_monday, next_monday, conn=conn), block_columns),
+        'monthly': frame_to_records(load_blocks('month', month_start, next_monday, conn=conn), block_columns),
+    }
+    print(f"[+] {sum(len(records) for records in blocks.values())} blok kaydı bulundu")
+
+    # 6. Haftalık arşiv (sadece değişen haftalar)
+    print(f"\n[*] Haftalık arşiv güncelleniyor...")
+    rewritten = export_week_shards(conn, WEEKS_DIR)
+    print(f"[+] {rewritten} hafta dosyası yeniden yazıldı: {WEEKS_DIR}")
+
+    # 7. Binary grafik verisi (float32 kolonlar)
+    print(f"\n[*] Binary grafik verisi güncelleniyor...")
+    binary_hours = export_binary_series(conn, BINARY_PATH)
+    if binary_hours > 0:
+        print(f"[+] {binary_hours} saatlik seri yazıldı: {BINARY_PATH} "
+              f"({os.path.getsize(BINARY_PATH) / 1024:.2f} KB)")
+    else:
+        print(f"[*] Binary seri değişmedi, yazma atlandı")
+
     conn.close()
 
-    # 5. JSON oluştur
+    # 8. JSON oluştur
     print(f"\n[*] JSON dosyası oluşturuluyor...")
     output_data = {
         'generated_at': datetime.now().isoformat(),
@@ -154,18 +552,15 @@ def export_forecasts():
         },
         'last_week_performance': last_week_performance,
         'last_week_comparison': last_week_comparison,
-        'historical_trend': historical_trend
+        'historical_trend': historical_trend,
+        'blocks': blocks
     }
 
-    # public klasörünü oluştur
-    os.makedirs(os.path.dirname(OUTPUT_PATH), exist_ok=True)
-
-    # JSON'u kaydet
-    with open(OUTPUT_PATH, 'w', encoding='utf-8') as f:
-        json.dump(output_data, f, ensure_ascii=False, indent=2)
-
-    print(f"[+] JSON dosyası kaydedildi: {OUTPUT_PATH}")
-    print(f"   Dosya boyutu: {os.path.getsize(OUTPUT_PATH) / 1024:.2f} KB")
+    # JSON'u kaydet (içerik aynıysa atlanır)
+    if write_json_bundle(output_data, OUTPUT_PATH):
+        print(f"[+] JSON dosyası kaydedildi: {OUTPUT_PATH}")
+        print(f"   Dosya boyutu: {os.path.getsize(OUTPUT_PATH) / 1024:.2f} KB "
+              f"(gzip: {os.path.getsize(OUTPUT_PATH + '.gz') / 1024:.2f} KB)")
     print("="*70)
 
     return output_data
@@ -183,4 +578,6 @@ def main():
         return None
 
 if __name__ == "__main__":
-    main()
+    from profiling import profiled
+    with profiled('export_json'):
+        main()
@@ -4,14 +4,13 @@
 Eksik Veri Toplama - 17-22 Ekim 2025 arası
 """
 
-import sqlite3
-import os
 import sys
 import requests
-from datetime import datetime, timedelta
+
+from database import get_reader, get_writer
+from datetime import datetime
 
 # Paths
-DB_PATH = os.path.join(os.path.dirname(__file__), '../../data/energy.db')
 API_BASE = "https://seffaflik.epias.com.tr/electricity-service/v1"
 
 def get_tgt():
@@ -76,7 +75,7 @@ def insert_mcp_data(records):
         print("[!] Eklenecek veri yok")
         return 0
 
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_writer()
     cursor = conn.cursor()
 
     inserted = 0
@@ -155,7 +154,7 @@ def main():
     print(f"Mevcut     : {len(records) - inserted}")
 
     # Veritabani durumu
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_reader()
     cursor = conn.cursor()
     cursor.execute("SELECT COUNT(*) FROM mcp_data")
     total = cursor.fetchone()[0]
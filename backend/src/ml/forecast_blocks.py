@@ -0,0 +1,394 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+EPİAŞ MCP Fiyat Tahmini - Blok Ürünleri (Baz / Puant / Puant Dışı)
+==================================================================
+
+Saatlik tahmin ve gerçek fiyatları günlük, haftalık ve aylık blok
+ortalamalarına çevirir:
+
+    base      tüm saatler
+    peak      hafta içi 08:00-19:59 (Pazartesi-Cuma)
+    offpeak   peak dışındaki saatler
+
+Bloklar haftanın saati (0-167) üzerinde maskelerdir; hour_mask ile yeni
+bloklar tanımlanabilir. Hesap tek bir reshape-and-reduce'tur:
+
+1. Saatlik seriler Türkiye gece yarısına hizalı (gün, 24) matrislerine çevrilir
+2. (blok, gün, 24) maske tensörü ile tek einsum: gün bazında toplam ve saat sayısı
+3. Hafta ve ay toplamları gün toplamlarından np.add.reduceat ile
+
+Sonuçlar forecast_blocks tablosunda tutulur (exporter buradan okur; uzun
+geçmişlerde blok görünümü tablo okumasıdır). Tahmin yazıcıları (predict,
+backfill) yazdıkları haftayı yeniden hesaplar. Günlük sync sonrası
+(post_sync.py) mcp_data'da son işlenen id'den sonra yazılmış (yeni, geç gelen
+veya düzeltilen) fiyatların günlerine dokunan dönemler yeniden hesaplanır.
+
+Kullanım:
+    python forecast_blocks.py                              # güncelle + aylık tablo
+    python forecast_blocks.py --period day --from 2025-10-01
+    python forecast_blocks.py --hours 17-21 --from 2025-09-01   # özel blok (kaydedilmez)
+    python forecast_blocks.py --rebuild
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from database import get_reader, get_writer, retry_on_lock
+from epoch_hours import (
+    table_exists, to_epoch_hour, TR_UTC_OFFSET_HOURS, EPOCH_WEEKDAY,
+    local_days, local_day_start, days_to_dates,
+)
+from calendar_features import HOURS_PER_WEEK, PERIODS, period_starts, covering_runs
+
+# Tabloda tutulan seriler: <ad> ortalama fiyat, <ad>_hours veri olan saat sayısı
+SERIES = ('forecast', 'actual')
+
+def hour_mask(hours, weekdays=range(7)):
+    """
+    Haftanın saati (0-167) blok maskesi
+
+    Args:
+        hours: Günün saatleri (0-23)
+        weekdays: Haftanın günleri (Pazartesi = 0)
+
+    Returns:
+        np.ndarray: 168 elemanlı bool dizi
+    """
+    mask = np.zeros((7, 24), dtype=bool)
+    mask[np.ix_(list(weekdays), list(hours))] = True
+    return mask.reshape(HOURS_PER_WEEK)
+
+_PEAK = hour_mask(range(8, 20), weekdays=range(5))
+
+BLOCKS = {
+    'base': hour_mask(range(24)),
+    'peak': _PEAK,
+    'offpeak': ~_PEAK,
+}
+
+def create_blocks_table(conn):
+    """forecast_blocks ve forecast_blocks_state tablolarını oluşturur"""
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS forecast_blocks (
+            period TEXT NOT NULL,
+            period_start TEXT NOT NULL,
+            block TEXT NOT NULL,
+            {', '.join(f'{name} REAL, {name}_hours INTEGER NOT NULL' for name in SERIES)},
+            PRIMARY KEY (period, period_start, block)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS forecast_blocks_state (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+    """)
+
+def block_aggregates(start_ts, series, blocks=BLOCKS, periods=PERIODS):
+    """
+    Saatlik serilerin dönem x blok ortalamaları (tek reshape-and-reduce)
+
+    Args:
+        start_ts (int): İlk saatin epoch saati (Türkiye gece yarısı)
+        series (dict): {ad: saatlik dizi}; aynı uzunlukta, 24'ün katı, NaN = veri yok
+        blocks (dict): {blok adı: 168 elemanlı bool maske}
+        periods: PERIODS alt kümesi
+
+    Returns:
+        pd.DataFrame: period, period_start, block, her seri için <ad> ve <ad>_hours.
+                      Hiçbir seride verisi olmayan (dönem, blok) satırları yok.
+    """
+    if (start_ts + TR_UTC_OFFSET_HOURS) % 24 != 0:
+        raise ValueError(f"Seriler Türkiye gece yarısından başlamalı (ts={start_ts})")
+
+    names = list(series)
+    values = np.stack([np.asarray(series[name], dtype=float) for name in names])
+    if values.shape[1] % 24 != 0:
+        raise ValueError(f"Seri uzunluğu 24'ün katı olmalı: {values.shape[1]}")
+    values = values.reshape(len(names), -1, 24)
+
+    days = local_days(start_ts) + np.arange(values.shape[1])
+    dates = days_to_dates(days)
+    slots = ((days + EPOCH_WEEKDAY) % 7)[:, None] * 24 + np.arange(24)
+
+    # (blok, gün, 24) maskeler; gün bazında toplam ve saat sayısı tek einsum ile
+    block_names = list(blocks)
+    masks = np.stack([np.asarray(blocks[name], dtype=bool) for name in block_names])[:, slots].astype(float)
+    valid = ~np.isnan(values)
+    sums = np.einsum('bdh,sdh->sbd', masks, np.where(valid, values, 0.0))
+    counts = np.einsum('bdh,sdh->sbd', masks, valid.astype(float))
+
+    frames = []
+    for period in periods:
+        keys = period_starts(dates, period)
+        boundaries = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        period_sums = np.add.reduceat(sums, boundaries, axis=2)
+        period_counts = np.add.reduceat(counts, boundaries, axis=2)
+
+        # (blok, dönem) satırları, blok içinde dönem sırası
+        frame = pd.DataFrame({
+            'period': period,
+            'period_start': np.tile(keys[boundaries].astype(str), len(block_names)),
+            'block': np.repeat(block_names, len(boundaries)),
+        })
+        for i, name in enumerate(names):
+            with np.errstate(invalid='ignore', divide='ignore'):
+                frame[name] = (period_sums[i] / period_counts[i]).ravel()
+            frame[f'{name}_hours'] = period_counts[i].ravel().astype(int)
+        frames.append(frame)
+
+    result = pd.concat(frames, ignore_index=True)
+    has_data = result[[f'{name}_hours' for name in names]].sum(axis=1) > 0
+    return result[has_data].reset_index(drop=True)
+
+def load_series(conn, start_ts, end_ts):
+    """
+    [start_ts, end_ts) için saatlik tahmin ve gerçek fiyat dizileri
+
+    Aynı saat birden fazla haftanın tahmininde varsa en yeni hafta kullanılır.
+
+    Returns:
+        dict: {'forecast': np.ndarray, 'actual': np.ndarray} (NaN = veri yok)
+    """
+    hours = end_ts - start_ts
+    series = {name: np.full(hours, np.nan) for name in SERIES}
+    queries = {
+        'forecast': ('forecast_history', "SELECT ts, predicted_price FROM forecast_history "
+                                         "WHERE ts >= ? AND ts < ? ORDER BY week_start"),
+        'actual': ('mcp_data', "SELECT ts, price FROM mcp_data WHERE ts >= ? AND ts < ?"),
+    }
+    for name, (table, query) in queries.items():
+        if not table_exists(conn, table):
+            continue
+        rows = np.array(conn.execute(query, (start_ts, end_ts)).fetchall(), dtype=float).reshape(-1, 2)
+        # Tekrarlanan ts'lerde son atama (en yeni hafta) kalır
+        series[name][rows[:, 0].astype('int64') - start_ts] = rows[:, 1]
+    return series
+
+def _data_range(conn):
+    """Tahmin ve gerçek fiyatların ilk ve son ts'i (veri yoksa None)"""
+    bounds = []
+    for table in ('forecast_history', 'mcp_data'):
+        if table_exists(conn, table):
+            bounds.append(conn.execute(f"SELECT MIN(ts), MAX(ts) FROM {table}").fetchone())
+    bounds = [row for row in bounds if row[0] is not None]
+    if not bounds:
+        return None
+    return min(row[0] for row in bounds), max(row[1] for row in bounds)
+
+def _changed_actual_days(conn):
+    """
+    mcp_data'da son işlenen id'den sonra yazılmış saatlerin günleri
+
+    Returns:
+        tuple: (gün indeksleri ya da None = durum yok, yeni son id)
+    """
+    row = conn.execute("SELECT value FROM forecast_blocks_state WHERE name = 'last_mcp_id'").fetchone()
+    has_actuals = table_exists(conn, 'mcp_data')
+    max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM mcp_data").fetchone()[0] if has_actuals else 0
+    if row is None:
+        return None, max_id
+    if not has_actuals:
+        return np.array([], dtype='int64'), max_id
+    ts = np.array(conn.execute("SELECT ts FROM mcp_data WHERE id > ? AND ts IS NOT NULL", (row[0],)).fetchall(),
+                  dtype='int64').ravel()
+    return np.unique(local_days(ts)), max_id
+
+def _write_blocks(conn, changed_days):
+    """
+    Değişen günlerin dönemlerini yeniden yazar; her ayrık pencere ayrı okunur
+
+    Args:
+        conn: Yazıcı SQLite bağlantısı
+        changed_days: Sıralı, tekil epoch gün indeksleri
+
+    Returns:
+        int: Yazılan satır sayısı
+    """
+    changed_dates = days_to_dates(changed_days)
+    affected = pd.DataFrame([
+        (period, key) for period in PERIODS
+        for key in np.unique(period_starts(changed_dates, period)).astype(str)
+    ], columns=['period', 'period_start'])
+
+    # Her pencere, değişen günlere dokunan dönemleri tam kapsar; kenarlardaki
+    # kısmi dönemler (ör. ayın başından önceki hafta günleri) yazılmaz
+    frames = []
+    for first_day, last_day in covering_runs(changed_days):
+        window_start, window_end = local_day_start(first_day), local_day_start(last_day + 1)
+        blocks = block_aggregates(window_start, load_series(conn, window_start, window_end))
+        frames.append(blocks.merge(affected, on=['period', 'period_start']))
+    blocks = pd.concat(frames, ignore_index=True)
+
+    conn.executemany("DELETE FROM forecast_blocks WHERE period = ? AND period_start = ?",
+                     affected.itertuples(index=False, name=None))
+    columns = ['period', 'period_start', 'block', *(f'{name}{suffix}' for name in SERIES for suffix in ('', '_hours'))]
+    values = blocks[columns].astype(object).where(blocks[columns].notna(), None)
+    conn.executemany(
+        f"INSERT INTO forecast_blocks ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+        values.itertuples(index=False, name=None)
+    )
+    return len(blocks)
+
+def refresh_blocks(conn, start_ts=None, end_ts=None, rebuild=False):
+    """
+    Değişen günlere dokunan tüm gün, hafta ve ay bloklarını yeniden hesaplar
+    (çağıranın transaction'ında; commit çağırana ait)
+
+    Aralık verilirse [start_ts, end_ts) saatlerinin günleri (tahmin
+    yazıcıları), verilmezse mcp_data'da son işlenen id'den sonra yazılmış
+    saatlerin günleri (ilk çalıştırmada tüm geçmiş) yeniden hesaplanır.
+
+    Args:
+        conn: Yazıcı SQLite bağlantısı
+        start_ts (int, optional): Aralık başı
+        end_ts (int, optional): Aralık sonu (verilmezse verinin sonu)
+        rebuild (bool): True ise tablo baştan hesaplanır
+
+    Returns:
+        int: Yazılan satır sayısı
+    """
+    create_blocks_table(conn)
+    if rebuild:
+        conn.execute("DELETE FROM forecast_blocks")
+        conn.execute("DELETE FROM forecast_blocks_state")
+
+    data_range = _data_range(conn)
+    if data_range is None:
+        return 0
+
+    max_id = None
+    if start_ts is None:
+        changed_days, max_id = _changed_actual_days(conn)
+        if changed_days is None:
+            changed_days = np.arange(local_days(data_range[0]), local_days(data_range[1]) + 1)
+    else:
+        if end_ts is None:
+            end_ts = data_range[1] + 1
+        changed_days = np.arange(local_days(start_ts), local_days(end_ts - 1) + 1) if end_ts > start_ts else []
+
+    written = _write_blocks(conn, changed_days) if len(changed_days) else 0
+    if max_id is not None:
+        conn.execute("INSERT OR REPLACE INTO forecast_blocks_state (name, value) VALUES ('last_mcp_id', ?)",
+                     (max_id,))
+    return written
+
+@retry_on_lock
+def refresh_pending_blocks(rebuild=False):
+    """Kendi yazıcı bağlantısıyla güncelleme"""
+    with get_writer() as conn:
+        return refresh_blocks(conn, rebuild=rebuild)
+
+def load_blocks(period='month', start=None, end=None, blocks=None, conn=None):
+    """
+    Kayıtlı blok ortalamaları
+
+    Args:
+        period (str): 'day' | 'week' | 'month'
+        start (str, optional): İlk dönem başı (YYYY-MM-DD, dahil)
+        end (str, optional): Bitiş (YYYY-MM-DD, dahil değil)
+        blocks (list, optional): Sadece bu bloklar
+        conn: Açık bağlantı (yoksa okuyucu açılır)
+
+    Returns:
+        pd.DataFrame: period_start, block, forecast, forecast_hours, actual, actual_hours
+    """
+    conditions = ["period = ?", "period_start >= ?", "period_start < ?"]
+    params = [period, start or '0000-00-00', end or '9999-99-99']
+    if blocks:
+        conditions.append(f"block IN ({', '.join('?' * len(blocks))})")
+        params.extend(blocks)
+
+    own = conn is None
+    conn = conn or get_reader()
+    try:
+        columns = ['period_start', 'block', *(f'{name}{suffix}' for name in SERIES for suffix in ('', '_hours'))]
+        if not table_exists(conn, 'forecast_blocks'):
+            return pd.DataFrame(columns=columns)
+        return pd.read_sql_query(f"""
+            SELECT {', '.join(columns)} FROM forecast_blocks
+            WHERE {' AND '.join(conditions)}
+            ORDER BY period_start, block
+        """, conn, params=params)
+    finally:
+        if own:
+            conn.close()
+
+def custom_blocks(mask, period='month', start=None, end=None):
+    """
+    Kayıtlı olmayan bir blok için dönem ortalamaları (saatlik veriden)
+
+    Args:
+        mask: hour_mask çıktısı (168 bool)
+        period (str): Dönem
+        start (str, optional): İlk gün (YYYY-MM-DD, dahil)
+        end (str, optional): Bitiş (YYYY-MM-DD, dahil değil)
+
+    Returns:
+        pd.DataFrame: block_aggregates çıktısı ('custom' bloğu)
+    """
+    conn = get_reader()
+    try:
+        data_range = _data_range(conn)
+        if data_range is None:
+            return pd.DataFrame()
+        start_ts = to_epoch_hour(start) if start else data_range[0]
+        end_ts = to_epoch_hour(end) if end else data_range[1] + 1
+        window_start = local_day_start(local_days(start_ts))
+        window_end = local_day_start(local_days(end_ts - 1) + 1)
+        series = load_series(conn, window_start, window_end)
+    finally:
+        conn.close()
+    return block_aggregates(window_start, series, {'custom': mask}, periods=(period,))
+
+def _parse_hours(text):
+    """'17-21' ya da '8,9,10' -> saat listesi (aralık sonu dahil)"""
+    hours = []
+    for part in text.split(','):
+        first, _, last = part.strip().partition('-')
+        hours.extend(range(int(first), int(last or first) + 1))
+    return hours
+
+def main():
+    """Komut satırı girişi"""
+    parser = argparse.ArgumentParser(description='Baz/puant blok ortalamaları')
+    parser.add_argument('--period', default='month', choices=PERIODS, help='Dönem')
+    parser.add_argument('--from', dest='start', default=None, help='İlk dönem başı (YYYY-MM-DD, dahil)')
+    parser.add_argument('--to', dest='end', default=None, help='Bitiş (YYYY-MM-DD, dahil değil)')
+    parser.add_argument('--hours', default=None, help="Özel blok saatleri (ör. '17-21' ya da '8,9,10')")
+    parser.add_argument('--weekdays', default='0-6', help="Özel blok günleri (Pazartesi = 0, ör. '0-4')")
+    parser.add_argument('--rebuild', action='store_true', help='Tabloyu baştan hesapla')
+    args = parser.parse_args()
+
+    print("="*70)
+    print("BLOK ÜRÜNLERİ" + (" (YENİDEN)" if args.rebuild else ""))
+    print("="*70)
+
+    if args.hours:
+        mask = hour_mask(_parse_hours(args.hours), _parse_hours(args.weekdays))
+        table = custom_blocks(mask, args.period, args.start, args.end)
+        print(f"[*] Özel blok: saat {args.hours}, gün {args.weekdays} ({int(mask.sum())} saat/hafta)")
+    else:
+        written = refresh_pending_blocks(rebuild=args.rebuild)
+        print(f"[+] {written} blok satırı güncellendi")
+        table = load_blocks(args.period, args.start, args.end)
+
+    if len(table) == 0:
+        print("[!] Blok verisi yok")
+        return
+
+    def cell(value, width):
+        return f"{value:>{width}.2f}" if pd.notna(value) else f"{'-':>{width}}"
+
+    print(f"\n{'Dönem':12}{'Blok':>9}{'Tahmin':>11}{'Saat':>6}{'Gerçek':>11}{'Saat':>6}{'Fark':>10}")
+    print("-"*70)
+    for row in table.itertuples(index=False):
+        print(f"{row.period_start:12}{row.block:>9}{cell(row.forecast, 11)}{row.forecast_hours:>6}"
+              f"{cell(row.actual, 11)}{row.actual_hours:>6}{cell(row.actual - row.forecast, 10)}")
+    print("="*70)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+EPİAŞ MCP Fiyat Tahmini - Saatlik Geniş Fact Tablosu
+====================================================
+
+mcp_data, generation_data ve consumption_data tablolarını saat bazında
+birleştiren hourly_facts tablosunu artımlı (incremental) olarak günceller:
+
+- Her saat için tek satır (ts = UTC epoch saat, PRIMARY KEY)
+- Fiyat, tüm üretim kolonları, tüketim ve takvim bayrakları
+- Her sync sonrası sadece kaynak tablolarda eklenen/değişen saatler yeniden
+  hesaplanır: üç tablonun AUTOINCREMENT id'si her eklemede (Node sync'in
+  INSERT OR REPLACE'i dahil) artar; son işlenen id'lerden sonraki satırların
+  saatleri güncellenir (geç gelen veya düzeltilen eski saatler dahil)
+- ML loader'ları tek bir ardışık ts aralığı okuyarak join yapmadan veri alır
+  (load_facts salt-okunur; güncelleme post_sync.py, eğitim/backfill giriş
+  noktaları ve bu script'in işi)
+
+Kullanım:
+    python src/ml/hourly_facts.py          # artımlı güncelleme
+    python src/ml/hourly_facts.py --full   # tabloyu baştan oluştur
+"""
+
+import sys
+import pandas as pd
+
+from epoch_hours import epoch_hours_to_local
+from database import get_reader, get_writer, retry_on_lock
+from calendar_features import add_time_features, is_holiday
+
+GENERATION_COLUMNS = [
+    'total', 'biomass', 'fueloil', 'geothermal', 'hydro', 'import_export',
+    'lignite', 'lng', 'natural_gas', 'naphtha', 'river', 'solar', 'wind',
+    'wasteheat', 'asphaltite_coal', 'black_coal', 'import_coal',
+]
+
+CALENDAR_COLUMNS = ['hour', 'day_of_week', 'is_weekend', 'is_peak_hour', 'is_daytime', 'is_holiday']
+
+FACT_COLUMNS = ['ts', 'price', 'price_usd', 'price_eur', *GENERATION_COLUMNS, 'consumption', *CALENDAR_COLUMNS]
+
+# Değişiklikleri id ile izlenen kaynak tablolar
+SOURCE_TABLES = ('mcp_data', 'generation_data', 'consumption_data')
+
+def create_hourly_facts_table(conn):
+    """hourly_facts ve hourly_facts_state tablolarını oluşturur (ts = rowid, aralık taraması ardışık okunur)"""
+    generation_sql = ',\n            '.join(f"{col} REAL" for col in GENERATION_COLUMNS)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS hourly_facts (
+            ts INTEGER PRIMARY KEY,
+            price REAL NOT NULL,
+            price_usd REAL,
+            price_eur REAL,
+            {generation_sql},
+            consumption REAL,
+            hour INTEGER NOT NULL,
+            day_of_week INTEGER NOT NULL,
+            is_weekend INTEGER NOT NULL,
+            is_peak_hour INTEGER NOT NULL,
+            is_daytime INTEGER NOT NULL,
+            is_holiday INTEGER NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS hourly_facts_state (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+    """)
+
+def refresh_hourly_facts(conn, full=False):
+    """
+    hourly_facts tablosunu eklenen/değişen saatler için günceller
+
+    Yeniden hesaplanan saatler: mcp_data, generation_data veya
+    consumption_data'da son işlenen id'den sonra yazılmış satırların saatleri
+    (id PRIMARY KEY aralık taraması; tablolar baştan taranmaz). Geç gelen
+    üretim/tüketim ve düzeltilen eski fiyatlar da böylece yansır.
+
+    Args:
+        conn: Yazıcı SQLite bağlantısı
+        full (bool): True ise tüm tablo baştan hesaplanır
+
+    Returns:
+        int: Yazılan satır sayısı
+    """
+    create_hourly_facts_table(conn)
+
+    if full:
+        conn.execute("DELETE FROM hourly_facts")
+        conn.execute("DELETE FROM hourly_facts_state")
+
+    state = dict(conn.execute("SELECT name, value FROM hourly_facts_state").fetchall())
+    last_ids = [state.get(table, 0) for table in SOURCE_TABLES]
+    # Okumadan önce alınır: arada eklenen satırlar bir sonraki çalıştırmada işlenir
+    max_ids = [conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0] for table in SOURCE_TABLES]
+
+    generation_select = ', '.join(f"g.{col}" for col in GENERATION_COLUMNS)
+    changed_sql = ' UNION '.join(f"SELECT ts FROM {table} WHERE id > ?" for table in SOURCE_TABLES)
+    rows = pd.read_sql_query(f"""
+        SELECT m.ts, m.price, m.price_usd, m.price_eur, {generation_select}, c.consumption
+        FROM mcp_data m
+        LEFT JOIN generation_data g ON g.ts = m.ts
+        LEFT JOIN consumption_data c ON c.ts = m.ts
+        WHERE m.ts IN ({changed_sql})
+        ORDER BY m.ts
+    """, conn, params=last_ids)
+
+    conn.executemany(
+        "INSERT OR REPLACE INTO hourly_facts_state (name, value) VALUES (?, ?)",
+        zip(SOURCE_TABLES, max_ids)
+    )
+
+    if len(rows) == 0:
+        conn.commit()
+        return 0
+
+    # Takvim bayrakları (Türkiye saatine göre)
+    rows['ds'] = epoch_hours_to_local(rows['ts'])
+    add_time_features(rows)
+    rows['is_holiday'] = is_holiday(rows['ds'])
+
+    placeholders = ','.join('?' * len(FACT_COLUMNS))
+    values = rows[FACT_COLUMNS].astype(object).where(rows[FACT_COLUMNS].notna(), None)
+    conn.executemany(
+        f"INSERT OR REPLACE INTO hourly_facts ({','.join(FACT_COLUMNS)}) VALUES ({placeholders})",
+        values.itertuples(index=False, name=None)
+    )
+    conn.commit()
+
+    return len(rows)
+
+@retry_on_lock
+def refresh_pending_facts():
+    """Kendi yazıcı bağlantısıyla artımlı güncelleme (loader'lar için)"""
+    conn = get_writer()
+    try:
+        return refresh_hourly_facts(conn)
+    finally:
+        conn.close()
+
+def load_facts(start_ts=None, end_ts=None, columns=('price',)):
+    """
+    hourly_facts'ten [start_ts, end_ts) aralığını tek ardışık tarama ile okur
+
+    Sadece okur (salt-okunur bağlantı; devam eden yazımları bloklamaz).
+    Tablo sync sonrası post_sync.py ile veya refresh_pending_facts() /
+    'python src/ml/hourly_facts.py' ile güncellenir.
+
+    Args:
+        start_ts (int, optional): Başlangıç epoch saati (dahil)
+        end_ts (int, optional): Bitiş epoch saati (dahil değil)
+        columns: ts dışında okunacak kolonlar
+
+    Returns:
+        pd.DataFrame: 'ds' (Türkiye saati, timezone'suz) + istenen kolonlar
+    """
+    query = f"SELECT ts, {', '.join(columns)} FROM hourly_facts WHERE ts >= ? AND ts < ? ORDER BY ts"
+    params = [
+        start_ts if start_ts is not None else -2**62,
+        end_ts if end_ts is not None else 2**62,
+    ]
+    conn = get_reader()
+    df = pd.read_sql_query(query, conn, params=params)
+    conn.close()
+    df.insert(0, 'ds', epoch_hours_to_local(df.pop('ts')))
+    return df
+
+def main():
+    """Komut satırından artımlı/tam güncelleme"""
+    full = '--full' in sys.argv
+
+    print("="*70)
+    print("HOURLY FACTS GÜNCELLEME" + (" (TAM)" if full else ""))
+    print("="*70)
+
+    conn = get_writer()
+    written = refresh_hourly_facts(conn, full=full)
+    total = conn.execute("SELECT COUNT(*) FROM hourly_facts").fetchone()[0]
+    conn.close()
+
+    print(f"[+] {written} saat güncellendi (toplam {total} saat)")
+    print("="*70)
+
+if __name__ == "__main__":
+    main()
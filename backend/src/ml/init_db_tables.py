@@ -3,29 +3,15 @@
 """
 Database Table Initialization
 ==============================
-Creates forecast_history and weekly_performance tables if they don't exist.
+Creates forecast_history and weekly_performance tables if they don't exist
+and adds the integer epoch-hour (ts) key columns.
 """
 
-import sqlite3
-import os
+from epoch_hours import migrate_epoch_hours
+from database import DB_PATH, get_writer
 
-# Database path
-script_dir = os.path.dirname(os.path.abspath(__file__))
-DB_PATH = os.path.join(script_dir, '../../data/energy.db')
-
-def init_forecast_tables():
-    """Create forecast_history and weekly_performance tables"""
-
-    print("="*70)
-    print("DATABASE TABLE INITIALIZATION")
-    print("="*70)
-    print(f"Database: {DB_PATH}")
-    print()
-
-    conn = sqlite3.connect(DB_PATH)
-
-    # Create forecast_history table
-    print("[1/2] Creating forecast_history table...")
+def create_forecast_tables(conn):
+    """Create forecast_history and weekly_performance tables on an open connection"""
     conn.execute('''
         CREATE TABLE IF NOT EXISTS forecast_history (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -40,10 +26,6 @@ def init_forecast_tables():
             UNIQUE(week_start, forecast_datetime)
         )
     ''')
-    print("[OK] forecast_history table created")
-
-    # Create weekly_performance table
-    print("[2/2] Creating weekly_performance table...")
     conn.execute('''
         CREATE TABLE IF NOT EXISTS weekly_performance (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -57,7 +39,25 @@ def init_forecast_tables():
             UNIQUE(week_start)
         )
     ''')
-    print("[OK] weekly_performance table created")
+
+def init_forecast_tables():
+    """Create forecast_history and weekly_performance tables"""
+
+    print("="*70)
+    print("DATABASE TABLE INITIALIZATION")
+    print("="*70)
+    print(f"Database: {DB_PATH}")
+    print()
+
+    conn = get_writer()
+
+    print("[1/2] Creating forecast_history and weekly_performance tables...")
+    create_forecast_tables(conn)
+    print("[OK] forecast_history and weekly_performance tables created")
+
+    print("[2/2] Adding epoch-hour (ts) columns and covering indexes...")
+    migrated = migrate_epoch_hours(conn)
+    print(f"[OK] ts columns ready ({migrated} tables migrated)")
 
     conn.commit()
     conn.close()
@@ -0,0 +1,351 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+EPİAŞ MCP Fiyat Tahmini - Pipeline Ölçümleri
+============================================
+
+Haftalık iş akışının adımlarını (karşılaştırma, eğitim, tahmin, DB yazma,
+export) ve alt adımlarını (SQL okuma, feature, Stan fit, predict, grafik)
+ölçer. Her span için:
+
+- Duvar saati süresi (wall)
+- Adımın kendi thread'inin CPU süresi (paralel adımlar birbirine karışmaz;
+  kök span tüm sürecin CPU'sunu ölçer)
+- Çocuk süreç CPU'su: children=True ile açılan adımlarda biten alt süreçler
+  (CmdStan; RUSAGE_CHILDREN süreç geneli olduğu için sadece alt süreç
+  başlatan adımlarda ölçülür) ve task_graph'ın süreç havuzunda çalışan
+  adımlar (grafik)
+- Süreç geneli RSS: adım sonundaki anlık değer ve adım sırasındaki değişim
+  (paralel adımların ayırmaları da dahildir), ayrıca süreç ömrü boyunca
+  tepe değer (peak RSS)
+- İşlenen satır sayısı
+
+Kayıtlar pipeline_runs tablosuna (adım başına bir satır) ve
+logs/pipeline_runs.jsonl dosyasına (çalıştırma başına bir satır) yazılır;
+eğitim süresinin haftalar içindeki değişimi buradan izlenebilir. JSON log
+sadece repo'nun veri tabanı için yazılır: ENERGY_DB_PATH verilmişse ya da
+DB_PATH değiştirilmişse (benchmark, geçici DB) atlanır; ENERGY_PIPELINE_LOG
+ile log yolu açıkça verilebilir.
+
+Kullanım:
+    from instrumentation import pipeline_run, span
+
+    with pipeline_run('weekly'):
+        with span('train') as s:
+            with span('stan_fit', children=True):
+                model.fit(df)
+            s.rows = len(df)
+
+Aktif bir pipeline_run yokken span'ler sadece ölçer, hiçbir yere yazmaz.
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import itertools
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows: RSS ölçümü yapılmaz
+    resource = None
+
+LOG_PATH = os.path.join(os.path.dirname(__file__), '../../logs/pipeline_runs.jsonl')
+
+# Verilirse JSON log bu dosyaya yazılır (veri tabanından bağımsız)
+LOG_PATH_ENV = 'ENERGY_PIPELINE_LOG'
+
+_local = threading.local()
+_sequence = itertools.count()
+_active_run = None
+
+def current_rss_mb():
+    """Sürecin anlık RSS değeri (MB; süreç geneli), ölçülemiyorsa None"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):  # /proc olmayan sistemler
+        return None
+    return round(pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024), 1)
+
+def children_cpu_seconds():
+    """Bitmiş ve beklenmiş çocuk süreçlerin toplam CPU süresi (yoksa 0)"""
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+def peak_rss_mb():
+    """Sürecin ömür boyu tepe RSS değeri (MB; adım başına değil), ölçülemiyorsa None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux KiB, macOS byte döndürür
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(peak / divisor, 1)
+
+class Span:
+    """Tek bir ölçüm aralığı (rows alanı blok içinde doldurulabilir)"""
+
+    def __init__(self, name, parent=None, rows=None):
+        self.name = name
+        self.sequence = next(_sequence)
+        self.path = f"{parent.path}/{name}" if parent is not None else name
+        self.depth = parent.depth + 1 if parent is not None else 0
+        self.rows = rows
+        self.status = 'ok'
+        self.error = None
+        self.started_at = None
+        self.wall_seconds = None
+        self.cpu_seconds = None
+        # Süreç havuzunda çalışan adımların CPU'su (task_graph ekler)
+        self.external_cpu_seconds = 0.0
+        self.child_cpu_seconds = None
+        self.rss_mb = None
+        self.peak_rss_mb = None
+        self.rss_growth_mb = None
+
+    def to_dict(self):
+        return {
+            'step': self.path,
+            'depth': self.depth,
+            'started_at': self.started_at,
+            'wall_seconds': self.wall_seconds,
+            'cpu_seconds': self.cpu_seconds,
+            'child_cpu_seconds': self.child_cpu_seconds,
+            'rss_mb': self.rss_mb,
+            'peak_rss_mb': self.peak_rss_mb,
+            'rss_growth_mb': self.rss_growth_mb,
+            'rows': self.rows,
+            'status': self.status,
+            'error': self.error,
+        }
+
+def _stack():
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+@contextmanager
+def span(name, rows=None, process_cpu=False, children=False):
+    """
+    Bir adımı ölçer (iç içe kullanılabilir: 'train/stan_fit')
+
+    Args:
+        name (str): Adım adı
+        rows (int, optional): İşlenen satır sayısı (sonradan s.rows ile de verilebilir)
+        process_cpu (bool): CPU'yu thread yerine tüm süreç için ölç (kök span;
+            çocuk süreçler de dahil)
+        children (bool): Adım alt süreç başlatıyor (ör. CmdStan); biten alt
+            süreçlerin CPU'sunu (RUSAGE_CHILDREN farkı) çocuk CPU'ya ekle
+
+    Yields:
+        Span: Ölçüm nesnesi
+    """
+    stack = _stack()
+    current = Span(name, parent=stack[-1] if stack else None, rows=rows)
+    current.started_at = datetime.now().isoformat(timespec='seconds')
+    cpu_clock = time.process_time if process_cpu else time.thread_time
+    rss_before = current_rss_mb()
+    children_start = children_cpu_seconds()
+    wall_start = time.perf_counter()
+    cpu_start = cpu_clock()
+    stack.append(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.status = 'error'
+        current.error = f"{type(e).__name__}: {e}"[:500]
+        raise
+    finally:
+        stack.pop()
+        current.wall_seconds = round(time.perf_counter() - wall_start, 3)
+        current.cpu_seconds = round(cpu_clock() - cpu_start, 3)
+        children_delta = children_cpu_seconds() - children_start if (children or process_cpu) else 0.0
+        current.child_cpu_seconds = round(children_delta + current.external_cpu_seconds, 3)
+        current.rss_mb = current_rss_mb()
+        current.peak_rss_mb = peak_rss_mb()
+        if rss_before is not None and current.rss_mb is not None:
+            current.rss_growth_mb = round(current.rss_mb - rss_before, 1)
+        if _active_run is not None:
+            _active_run.add(current)
+
+def current_span():
+    """Bu thread'de açık olan en içteki span (yoksa None)"""
+    stack = _stack()
+    return stack[-1] if stack else None
+
+@contextmanager
+def attach(parent):
+    """
+    Worker thread'lerde açılan span'leri verilen parent span'in altına bağlar
+
+    Span yığını thread'e özel; paralel adımlar 'weekly/train' gibi yollarla
+    kaydedilsin diye task_graph her worker'da bunu kullanır.
+    """
+    if parent is None:
+        yield
+        return
+    stack = _stack()
+    stack.append(parent)
+    try:
+        yield
+    finally:
+        stack.pop()
+
+class PipelineRun:
+    """Bir pipeline çalıştırmasının span'lerini toplar"""
+
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+        self.run_id = datetime.now().strftime('%Y%m%d-%H%M%S-') + uuid.uuid4().hex[:6]
+        self.started_at = datetime.now().isoformat(timespec='seconds')
+        self.spans = []
+        self.status = 'ok'
+        self._lock = threading.Lock()
+
+    def add(self, finished_span):
+        with self._lock:
+            self.spans.append(finished_span)
+
+    def to_dict(self):
+        # Span'ler bitiş sırasıyla eklenir; başlangıç sırasına göre yaz
+        ordered = sorted(self.spans, key=lambda s: s.sequence)
+        return {
+            'run_id': self.run_id,
+            'pipeline': self.pipeline,
+            'started_at': self.started_at,
+            'status': self.status,
+            'spans': [s.to_dict() for s in ordered],
+        }
+
+def create_pipeline_runs_table(conn):
+    """pipeline_runs tablosunu oluşturur (adım başına bir satır)"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS pipeline_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            run_id TEXT NOT NULL,
+            pipeline TEXT NOT NULL,
+            step TEXT NOT NULL,
+            depth INTEGER NOT NULL,
+            started_at TEXT NOT NULL,
+            wall_seconds REAL,
+            cpu_seconds REAL,
+            child_cpu_seconds REAL,
+            rss_mb REAL,
+            peak_rss_mb REAL,
+            rss_growth_mb REAL,
+            rows INTEGER,
+            status TEXT NOT NULL,
+            error TEXT
+        )
+    """)
+    # Eski tablolara sonradan eklenen kolonlar
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(pipeline_runs)")}
+    for column in ('child_cpu_seconds', 'rss_mb'):
+        if column not in columns:
+            conn.execute(f"ALTER TABLE pipeline_runs ADD COLUMN {column} REAL")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_pipeline_runs_step ON pipeline_runs(pipeline, step, started_at)")
+
+def default_log_path():
+    """
+    JSON log yolu: ENERGY_PIPELINE_LOG, yoksa repo veri tabanı için LOG_PATH
+
+    Returns:
+        str veya None: Geçici/başka bir veri tabanıyla çalışılıyorsa None
+                       (workflow'un commit ettiği log'a yazılmaz)
+    """
+    if os.environ.get(LOG_PATH_ENV):
+        return os.environ[LOG_PATH_ENV]
+    import database
+    if 'ENERGY_DB_PATH' in os.environ or \
+            os.path.abspath(database.DB_PATH) != os.path.abspath(database.DEFAULT_DB_PATH):
+        return None
+    return LOG_PATH
+
+def save_run(run, log_path=None):
+    """
+    Çalıştırmayı pipeline_runs tablosuna ve JSON log'a yazar
+
+    Ölçüm kaydı pipeline'ı asla düşürmemeli; hatalar sadece yazdırılır.
+    """
+    log_path = log_path or default_log_path()
+    payload = run.to_dict()
+
+    if log_path:
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok=True)
+            with open(log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(payload, ensure_ascii=False) + '\n')
+        except OSError as e:
+            print(f"[!] Ölçüm log'u yazılamadı: {e}")
+
+    try:
+        from database import get_writer, retry_on_lock
+
+        @retry_on_lock
+        def write():
+            with get_writer() as conn:
+                create_pipeline_runs_table(conn)
+                conn.executemany("""
+                    INSERT INTO pipeline_runs (run_id, pipeline, step, depth, started_at,
+                                               wall_seconds, cpu_seconds, child_cpu_seconds,
+                                               rss_mb, peak_rss_mb, rss_growth_mb, rows, status, error)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, [
+                    (run.run_id, run.pipeline, s['step'], s['depth'], s['started_at'],
+                     s['wall_seconds'], s['cpu_seconds'], s['child_cpu_seconds'],
+                     s['rss_mb'], s['peak_rss_mb'], s['rss_growth_mb'], s['rows'], s['status'], s['error'])
+                    for s in payload['spans']
+                ])
+        write()
+    except Exception as e:
+        print(f"[!] pipeline_runs tablosuna yazılamadı: {e}")
+
+def print_run_summary(run):
+    """Adım sürelerini tablo halinde yazdırır"""
+    payload = run.to_dict()
+    if not payload['spans']:
+        return
+    print(f"\n[*] Adım ölçümleri ({run.run_id}):")
+    print("    CPU: adımın thread'i (kök: tüm süreç); Çocuk: alt süreçler; RSS/ΔRSS: süreç geneli")
+    print(f"   {'Adım':<30s} {'Süre (s)':>9s} {'CPU (s)':>8s} {'Çocuk':>7s} {'RSS':>7s} {'ΔRSS':>7s} {'Satır':>8s}")
+    for s in payload['spans']:
+        name = '  ' * s['depth'] + s['step'].split('/')[-1]
+        rss = f"{s['rss_mb']:.0f}" if s['rss_mb'] is not None else '-'
+        growth = f"{s['rss_growth_mb']:+.0f}" if s['rss_growth_mb'] is not None else '-'
+        rows = str(s['rows']) if s['rows'] is not None else '-'
+        flag = '' if s['status'] == 'ok' else '  ❌'
+        print(f"   {name:<30s} {s['wall_seconds']:9.2f} {s['cpu_seconds']:8.2f} {s['child_cpu_seconds']:7.2f} "
+              f"{rss:>7s} {growth:>7s} {rows:>8s}{flag}")
+
+@contextmanager
+def pipeline_run(pipeline, log_path=None):
+    """
+    Bir pipeline çalıştırmasını başlatır; bitişte özet yazdırır ve kaydeder
+
+    Args:
+        pipeline (str): Pipeline adı ('weekly' vb.)
+        log_path (str, optional): JSON log dosyası (varsayılan logs/pipeline_runs.jsonl)
+
+    Yields:
+        PipelineRun: Çalıştırma nesnesi (status alanı değiştirilebilir)
+    """
+    global _active_run
+    previous = _active_run
+    run = PipelineRun(pipeline)
+    _active_run = run
+    try:
+        with span(pipeline, process_cpu=True):
+            yield run
+    except BaseException:
+        run.status = 'error'
+        raise
+    finally:
+        _active_run = previous
+        print_run_summary(run)
+        save_run(run, log_path)
@@ -0,0 +1,341 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+EPİAŞ MCP Fiyat Tahmini - Birleştirilebilir Metrik Akümülatörleri
+=================================================================
+
+forecast_history'deki tahminlerin hata toplamları
+(model sürümü, hafta, saat, fiyat bandı) anahtarıyla metric_accumulators
+tablosunda tutulur:
+
+    count, sum_error (y - yhat), sum_abs_error, sum_sq_error,
+    ape_sum_<maske>, ape_count_<maske>   (MAPE payı ve paydası)
+
+Toplamlar birleştirilebilir: herhangi bir hafta, ay, saat, fiyat bandı ya da
+sürüm için MAE/RMSE/MAPE/bias, ilgili satırların toplamından anında
+hesaplanır; forecast_history yeniden taranmaz.
+
+Günlük sync sonrası (post_sync.py) sadece gerçek fiyatı değişen haftalar
+yeniden hesaplanır: mcp_data'nın AUTOINCREMENT id'si her eklemede (Node
+sync'in INSERT OR REPLACE'i dahil) artar; son işlenen id'den sonraki
+satırların saatlerini içeren haftalar baştan toplanır. Geç gelen ya da
+düzeltilen fiyatlar böylece kaçmaz ve weekly_performance ile tutarlı kalır.
+Bir haftanın tahmini yeniden yazılırsa (predict, backfill) o haftanın
+akümülatörleri sıfırlanır ve bir sonraki güncellemede baştan hesaplanır.
+
+Sürüm, haftanın tahminini üreten registry sürümüdür (version_for_week);
+registry'de karşılığı olmayan eski haftalar için 0.
+
+Kullanım:
+    python metric_accumulators.py                        # güncelle + haftalık tablo
+    python metric_accumulators.py --by month --mask ge500
+    python metric_accumulators.py --by hour --from 2025-09-01 --to 2025-10-01
+    python metric_accumulators.py --rebuild              # tabloyu baştan hesapla
+"""
+
+import argparse
+import json
+
+import numpy as np
+import pandas as pd
+
+from database import get_reader, get_writer, retry_on_lock
+from epoch_hours import table_exists, to_epoch_hour, epoch_hours_to_local
+from evaluation import MASKS, PRICE_BANDS, PRICE_BAND_LABELS
+
+# MAPE payı/paydası tutulan maskeler (evaluation.MASKS; y == 0 her zaman hariç)
+MAPE_MASKS = ('nonzero', 'ge100', 'gt100', 'ge500')
+
+KEY_COLUMNS = ['version', 'week_start', 'hour', 'price_band']
+SUM_COLUMNS = [
+    'count', 'sum_error', 'sum_abs_error', 'sum_sq_error',
+    *(f'ape_sum_{name}' for name in MAPE_MASKS),
+    *(f'ape_count_{name}' for name in MAPE_MASKS),
+]
+
+# query_metrics 'by' seçenekleri
+GROUPINGS = ('week', 'month', 'hour', 'price_band', 'version')
+
+WEEK_HOURS = 7 * 24
+
+def create_accumulator_tables(conn):
+    """metric_accumulators, metric_accumulator_weeks ve metric_accumulator_state tablolarını oluşturur"""
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS metric_accumulators (
+            version INTEGER NOT NULL,
+            week_start TEXT NOT NULL,
+            hour INTEGER NOT NULL,
+            price_band INTEGER NOT NULL,
+            {', '.join(f'{name} REAL NOT NULL' for name in SUM_COLUMNS)},
+            PRIMARY KEY (version, week_start, hour, price_band)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_metric_accumulators_week ON metric_accumulators(week_start)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS metric_accumulator_weeks (
+            week_start TEXT PRIMARY KEY,
+            version INTEGER NOT NULL,
+            last_ts INTEGER NOT NULL,
+            end_ts INTEGER NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS metric_accumulator_state (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+    """)
+
+def reset_weeks(conn, week_starts):
+    """
+    Tahmini yeniden yazılan haftaların akümülatörlerini siler
+    (çağıranın transaction'ında; commit çağırana ait)
+
+    Args:
+        conn: Yazıcı SQLite bağlantısı
+        week_starts: Pazartesi listesi (YYYY-MM-DD)
+    """
+    create_accumulator_tables(conn)
+    params = [(week_start,) for week_start in week_starts]
+    conn.executemany("DELETE FROM metric_accumulators WHERE week_start = ?", params)
+    conn.executemany("DELETE FROM metric_accumulator_weeks WHERE week_start = ?", params)
+
+def _register_new_weeks(conn):
+    """forecast_history'de olup takip edilmeyen haftaları ekler (sürüm registry'den), listesini döndürür"""
+    from model_registry import version_for_week
+
+    new_weeks = [row[0] for row in conn.execute("""
+        SELECT DISTINCT week_start FROM forecast_history
+        WHERE week_start NOT IN (SELECT week_start FROM metric_accumulator_weeks)
+    """)]
+    rows = []
+    for week_start in new_weeks:
+        entry = version_for_week(week_start)
+        start_ts = to_epoch_hour(week_start)
+        rows.append((week_start, entry['version'] if entry else 0, start_ts - 1, start_ts + WEEK_HOURS - 1))
+    conn.executemany("""
+        INSERT INTO metric_accumulator_weeks (week_start, version, last_ts, end_ts) VALUES (?, ?, ?, ?)
+    """, rows)
+    return new_weeks
+
+def accumulate(frame):
+    """
+    Saatlik tahmin/gerçek satırlarını anahtar bazında toplamlara indirger
+
+    Args:
+        frame: version, week_start, ts, yhat, y kolonları
+
+    Returns:
+        pd.DataFrame: KEY_COLUMNS + SUM_COLUMNS
+    """
+    y = frame['y'].to_numpy(dtype=float)
+    error = y - frame['yhat'].to_numpy(dtype=float)
+
+    work = pd.DataFrame({
+        'version': frame['version'].to_numpy(),
+        'week_start': frame['week_start'].to_numpy(),
+        'hour': epoch_hours_to_local(frame['ts']).dt.hour.to_numpy(),
+        'price_band': pd.cut(y, PRICE_BANDS, labels=False),
+        'count': 1.0,
+        'sum_error': error,
+        'sum_abs_error': np.abs(error),
+        'sum_sq_error': error ** 2,
+    })
+    nonzero = y != 0
+    ape = np.zeros(len(y))
+    ape[nonzero] = np.abs(error[nonzero] / y[nonzero]) * 100
+    for name in MAPE_MASKS:
+        mask = MASKS[name](y) & nonzero
+        work[f'ape_sum_{name}'] = np.where(mask, ape, 0.0)
+        work[f'ape_count_{name}'] = mask.astype(float)
+
+    return work.groupby(KEY_COLUMNS, as_index=False)[SUM_COLUMNS].sum()
+
+def refresh_accumulators(conn, rebuild=False):
+    """
+    Yeni eklenen ve gerçek fiyatı değişen haftaları baştan toplar
+    (O(etkilenen hafta); forecast_history tamamen taranmaz)
+
+    Args:
+        conn: Yazıcı SQLite bağlantısı
+        rebuild (bool): True ise tüm akümülatörler baştan hesaplanır
+
+    Returns:
+        int: İşlenen saat sayısı
+    """
+    create_accumulator_tables(conn)
+    if not table_exists(conn, 'forecast_history'):
+        return 0
+
+    if rebuild:
+        conn.execute("DELETE FROM metric_accumulators")
+        conn.execute("DELETE FROM metric_accumulator_weeks")
+        conn.execute("DELETE FROM metric_accumulator_state")
+
+    row = conn.execute("SELECT value FROM metric_accumulator_state WHERE name = 'last_mcp_id'").fetchone()
+    last_id = row[0] if row else 0
+    # Okumadan önce alınır: arada eklenen satırlar bir sonraki çalıştırmada işlenir
+    max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM mcp_data").fetchone()[0]
+
+    weeks = set(_register_new_weeks(conn))
+    # Fiyatı son işlenen id'den sonra yazılmış saatlere tahmini olan haftalar
+    changed = [row[0] for row in conn.execute("""
+        SELECT DISTINCT week_start FROM forecast_history
+        WHERE ts IN (SELECT ts FROM mcp_data WHERE id > ?)
+    """, (last_id,))]
+    conn.executemany("DELETE FROM metric_accumulators WHERE week_start = ?",
+                     [(week_start,) for week_start in changed])
+    weeks.update(changed)
+
+    rows = pd.read_sql_query("""
+        SELECT w.version, f.week_start, f.ts, f.predicted_price AS yhat, m.price AS y
+        FROM metric_accumulator_weeks w
+        JOIN forecast_history f ON f.week_start = w.week_start
+        JOIN mcp_data m ON m.ts = f.ts
+        WHERE w.week_start IN (SELECT value FROM json_each(?))
+    """, conn, params=(json.dumps(sorted(weeks)),))
+
+    if len(rows) > 0:
+        sums = accumulate(rows)
+        conn.executemany(f"""
+            INSERT INTO metric_accumulators ({', '.join(KEY_COLUMNS + SUM_COLUMNS)})
+            VALUES ({', '.join('?' * (len(KEY_COLUMNS) + len(SUM_COLUMNS)))})
+        """, sums.astype(object).itertuples(index=False, name=None))
+
+        last_ts = rows.groupby('week_start')['ts'].max()
+        conn.executemany(
+            "UPDATE metric_accumulator_weeks SET last_ts = ? WHERE week_start = ?",
+            [(int(ts), week_start) for week_start, ts in last_ts.items()]
+        )
+
+    conn.execute("INSERT OR REPLACE INTO metric_accumulator_state (name, value) VALUES ('last_mcp_id', ?)",
+                 (max_id,))
+    conn.commit()
+    return len(rows)
+
+@retry_on_lock
+def refresh_pending_accumulators(rebuild=False):
+    """Kendi yazıcı bağlantısıyla güncelleme"""
+    conn = get_writer()
+    try:
+        return refresh_accumulators(conn, rebuild=rebuild)
+    finally:
+        conn.close()
+
+def load_accumulators(start=None, end=None, version=None):
+    """
+    [start, end) aralığında başlayan haftaların akümülatör satırları
+
+    Args:
+        start (str, optional): İlk hafta (YYYY-MM-DD, dahil)
+        end (str, optional): Bitiş (YYYY-MM-DD, dahil değil)
+        version (int, optional): Sadece bu sürüm
+
+    Returns:
+        pd.DataFrame: KEY_COLUMNS + SUM_COLUMNS
+    """
+    conditions = ["week_start >= ?", "week_start < ?"]
+    params = [start or '0000-00-00', end or '9999-99-99']
+    if version is not None:
+        conditions.append("version = ?")
+        params.append(int(version))
+
+    conn = get_reader()
+    try:
+        if not table_exists(conn, 'metric_accumulators'):
+            return pd.DataFrame(columns=KEY_COLUMNS + SUM_COLUMNS)
+        return pd.read_sql_query(f"""
+            SELECT {', '.join(KEY_COLUMNS + SUM_COLUMNS)} FROM metric_accumulators
+            WHERE {' AND '.join(conditions)}
+        """, conn, params=params)
+    finally:
+        conn.close()
+
+def combine(rows, by=None, mape_mask='gt100'):
+    """
+    Akümülatör satırlarını birleştirip metrikleri hesaplar
+
+    Args:
+        rows: load_accumulators çıktısı
+        by: None (tek satır), GROUPINGS'ten biri ya da listesi
+        mape_mask (str): MAPE_MASKS'ten biri
+
+    Returns:
+        pd.DataFrame: index = kırılım, kolonlar = count, mae, rmse, mape, bias
+    """
+    if mape_mask not in MAPE_MASKS:
+        raise ValueError(f"Bilinmeyen MAPE maskesi: {mape_mask} (seçenekler: {', '.join(MAPE_MASKS)})")
+
+    by = [by] if isinstance(by, str) else list(by or [])
+    work = rows.copy()
+    if 'month' in by:
+        # Hafta, Pazartesi'nin ayına sayılır
+        work['month'] = work['week_start'].str[:7]
+    work = work.rename(columns={'week_start': 'week'})
+    if 'price_band' in by:
+        work['price_band'] = pd.Categorical.from_codes(work['price_band'].astype(int), PRICE_BAND_LABELS)
+
+    sums = work.groupby(by, observed=True)[SUM_COLUMNS].sum() if by else work[SUM_COLUMNS].sum().to_frame('all').T
+    count = sums['count'].replace(0, np.nan)
+    ape_count = sums[f'ape_count_{mape_mask}'].replace(0, np.nan)
+    result = pd.DataFrame({
+        'count': sums['count'].astype(int),
+        'mae': sums['sum_abs_error'] / count,
+        'rmse': np.sqrt(sums['sum_sq_error'] / count),
+        'mape': sums[f'ape_sum_{mape_mask}'] / ape_count,
+        'bias': sums['sum_error'] / count,
+    }, index=sums.index)
+    return result.fillna(0.0)
+
+def query_metrics(by='week', start=None, end=None, version=None, mape_mask='gt100'):
+    """
+    Herhangi bir dönem/kırılım için metrikler (forecast_history taranmaz)
+
+    Örnek:
+        query_metrics('week', start='2025-10-20', end='2025-10-27')   # tek hafta
+        query_metrics(['month', 'price_band'], mape_mask='ge500')
+
+    Returns:
+        pd.DataFrame: combine() çıktısı
+    """
+    return combine(load_accumulators(start, end, version), by=by, mape_mask=mape_mask)
+
+def main():
+    """Komut satırı girişi"""
+    parser = argparse.ArgumentParser(description='Birleştirilebilir tahmin metrikleri')
+    parser.add_argument('--by', default='week', help=f"Kırılım(lar), virgülle: {', '.join(GROUPINGS)}")
+    parser.add_argument('--from', dest='start', default=None, help='İlk hafta (YYYY-MM-DD, dahil)')
+    parser.add_argument('--to', dest='end', default=None, help='Bitiş (YYYY-MM-DD, dahil değil)')
+    parser.add_argument('--version', type=int, default=None, help='Sadece bu registry sürümü')
+    parser.add_argument('--mask', default='gt100', choices=MAPE_MASKS, help='MAPE maskesi')
+    parser.add_argument('--rebuild', action='store_true', help='Akümülatörleri baştan hesapla')
+    args = parser.parse_args()
+
+    by = [name.strip() for name in args.by.split(',') if name.strip()]
+    unknown = set(by) - set(GROUPINGS)
+    if unknown:
+        parser.error(f"Bilinmeyen kırılım: {', '.join(sorted(unknown))}")
+
+    print("="*70)
+    print("METRİK AKÜMÜLATÖRLERİ" + (" (YENİDEN)" if args.rebuild else ""))
+    print("="*70)
+
+    processed = refresh_pending_accumulators(rebuild=args.rebuild)
+    print(f"[+] {processed} yeni saat işlendi")
+
+    table = query_metrics(by, args.start, args.end, args.version, args.mask)
+    if len(table) == 0:
+        print("[!] Akümülatörde veri yok")
+        return
+
+    print(f"\n{', '.join(by)} bazında metrikler (MAPE maskesi: {args.mask})\n")
+    print(f"{' / '.join(by):>24} {'Saat':>6} {'MAE':>9} {'RMSE':>9} {'MAPE':>7} {'Bias':>9}")
+    print("-"*70)
+    for key, row in table.iterrows():
+        label = ' / '.join(str(part) for part in key) if isinstance(key, tuple) else str(key)
+        print(f"{label:>24} {int(row['count']):>6} {row['mae']:>9.2f} {row['rmse']:>9.2f} "
+              f"{row['mape']:>6.2f}% {row['bias']:>9.2f}")
+    print("="*70)
+
+if __name__ == "__main__":
+    main()
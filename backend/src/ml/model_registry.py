@@ -0,0 +1,355 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+EPİAŞ MCP Fiyat Tahmini - Model Kayıt Defteri (Registry)
+========================================================
+
+Eğitilen her model bir sürüm numarasıyla model_registry tablosuna yazılır:
+
+    version, name, config_hash, training_cutoff, data_fingerprint,
+    fit_seconds, artifact_hash, artifact_path, artifact_size, metrics, active
+
+Model dosyaları içerik adresli saklanır (models/registry/<sha256>.json.gz):
+aynı model iki kez kaydedilse de disk'te tek kopya olur. Her isim ('prophet',
+'prophet_v2') için bir 'active' sürüm vardır ve bu sürüm eski sabit dosya
+yoluna (prophet_model.json) da yazılır; predict.py vb. değişmeden çalışır.
+
+Registry (ve weekly workflow'un commit ettiği models/registry) büyümesin diye
+her isim için en son RETAIN_VERSIONS sürüm + aktif sürüm tutulur; daha eski
+sürümlerin kaydı, model_predictions satırları ve artık kullanılmayan
+dosyaları her kayıttan sonra silinir (version_for_week bu haftalar için
+kalan en yakın sürümü ya da None döndürür).
+
+Yeniden eğitim gerektirmeyen işlemler:
+    load_version(12)                      # LRU önbellekli yükleme
+    version_for_week('2025-10-20')        # O haftanın tahmini için eğitilmiş model
+    activate(11)                          # Geri alma (rollback)
+    python compare_models.py 11 12        # A/B karşılaştırma
+
+Kullanım:
+    python model_registry.py list [isim]
+    python model_registry.py show <sürüm>
+    python model_registry.py activate <sürüm>
+    python model_registry.py import <model.json> --name prophet_v2 [--cutoff YYYY-MM-DD]
+    python model_registry.py prune [--retain N]
+"""
+
+import os
+import sys
+import gzip
+import json
+import hashlib
+import argparse
+from datetime import datetime
+from functools import lru_cache
+
+from database import get_reader, get_writer, retry_on_lock
+from epoch_hours import table_exists
+from checkpoints import file_hash
+
+MODELS_DIR = os.path.join(os.path.dirname(__file__), '../../models')
+REGISTRY_DIR = os.path.join(MODELS_DIR, 'registry')
+
+# Aktif sürümün yazıldığı eski sabit dosyalar (mevcut script'ler bunları okur)
+ACTIVE_PATHS = {
+    'prophet': os.path.join(MODELS_DIR, 'prophet_model.json'),
+    'prophet_v2': os.path.join(MODELS_DIR, 'prophet_model_v2.json'),
+}
+
+# İsim başına tutulacak en son sürüm sayısı (aktif sürüm her zaman tutulur)
+RETAIN_VERSIONS = 8
+
+# Bellekte tutulacak en fazla model (her biri eğitim geçmişini içerir, ~100 MB'a kadar)
+MODEL_CACHE_SIZE = 4
+
+COLUMNS = (
+    'version', 'name', 'config_hash', 'training_cutoff', 'data_fingerprint', 'fit_seconds',
+    'artifact_hash', 'artifact_path', 'artifact_size', 'metrics', 'active', 'created_at',
+)
+
+def create_registry_table(conn):
+    """model_registry tablosunu oluşturur"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS model_registry (
+            version INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            config_hash TEXT,
+            training_cutoff TEXT,
+            data_fingerprint TEXT,
+            fit_seconds REAL,
+            artifact_hash TEXT NOT NULL,
+            artifact_path TEXT NOT NULL,
+            artifact_size INTEGER NOT NULL,
+            metrics TEXT,
+            active INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_model_registry_name_cutoff ON model_registry(name, training_cutoff)")
+
+def store_artifact(model_json):
+    """
+    Model JSON'unu içerik adresli olarak saklar
+
+    Args:
+        model_json (str): prophet.serialize.model_to_json çıktısı
+
+    Returns:
+        tuple: (artifact_hash, artifact_path - MODELS_DIR'e göre, artifact_size - byte)
+    """
+    payload = model_json.encode('utf-8')
+    artifact_hash = hashlib.sha256(payload).hexdigest()
+    relative_path = os.path.join('registry', f'{artifact_hash}.json.gz')
+    path = os.path.join(MODELS_DIR, relative_path)
+
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Önce geçici dosyaya yaz: yarım kalan dosya hash adını almasın
+        tmp_path = f'{path}.tmp'
+        # mtime=0: aynı model her zaman aynı byte'lar
+        with open(tmp_path, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+
+    return artifact_hash, relative_path, os.path.getsize(path)
+
+def read_artifact(artifact_path):
+    """Saklanan model JSON'unu okur"""
+    with gzip.open(os.path.join(MODELS_DIR, artifact_path), 'rt', encoding='utf-8') as f:
+        return f.read()
+
+def _row_to_dict(row):
+    entry = dict(zip(COLUMNS, row))
+    entry['metrics'] = json.loads(entry['metrics']) if entry['metrics'] else {}
+    entry['active'] = bool(entry['active'])
+    return entry
+
+def _query(where='', params=()):
+    conn = get_reader()
+    try:
+        if not table_exists(conn, 'model_registry'):
+            return []
+        rows = conn.execute(
+            f"SELECT {', '.join(COLUMNS)} FROM model_registry {where}", params
+        ).fetchall()
+    finally:
+        conn.close()
+    return [_row_to_dict(row) for row in rows]
+
+@retry_on_lock
+def register_model(model_json, name='prophet', training_cutoff=None, data_fingerprint=None,
+                   config_hash=None, fit_seconds=None, metrics=None, activate_version=False):
+    """
+    Modeli registry'ye kaydeder
+
+    Args:
+        model_json (str): Serileştirilmiş model
+        name (str): Model ailesi ('prophet', 'prophet_v2', ...)
+        training_cutoff (str, optional): Eğitim verisinin bitişi (dahil değil, YYYY-MM-DD)
+        data_fingerprint (str, optional): Eğitim verisinin hash'i
+        config_hash (str, optional): Model ayarlarının hash'i
+        fit_seconds (float, optional): Eğitim süresi
+        metrics (dict, optional): Değerlendirme metrikleri
+        activate_version (bool): Bu sürümü aktif yap (ACTIVE_PATHS dosyasına da yazar)
+
+    Returns:
+        int: Sürüm numarası
+    """
+    artifact_hash, artifact_path, artifact_size = store_artifact(model_json)
+
+    with get_writer() as conn:
+        create_registry_table(conn)
+        cursor = conn.execute("""
+            INSERT INTO model_registry (
+                name, config_hash, training_cutoff, data_fingerprint, fit_seconds,
+                artifact_hash, artifact_path, artifact_size, metrics, created_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            name, config_hash, training_cutoff, data_fingerprint,
+            float(fit_seconds) if fit_seconds is not None else None,
+            artifact_hash, artifact_path, artifact_size,
+            json.dumps(metrics or {}, sort_keys=True, default=float),
+            datetime.now().isoformat(timespec='seconds'),
+        ))
+        version = cursor.lastrowid
+
+    print(f"[+] Model registry: {name} v{version} ({artifact_size / 1024:.0f} KB, {artifact_hash[:12]})")
+
+    if activate_version:
+        activate(version, model_json=model_json)
+    prune_registry()
+    return version
+
+@retry_on_lock
+def prune_registry(retain=RETAIN_VERSIONS):
+    """
+    Her isim için en son `retain` sürüm ve aktif sürüm dışındakileri siler
+
+    Args:
+        retain (int): İsim başına tutulacak sürüm sayısı
+
+    Returns:
+        list: Silinen sürüm numaraları
+    """
+    with get_writer() as conn:
+        create_registry_table(conn)
+        pruned = conn.execute("""
+            SELECT version, artifact_path FROM (
+                SELECT version, artifact_path, active,
+                       ROW_NUMBER() OVER (PARTITION BY name ORDER BY version DESC) AS rank
+                FROM model_registry
+            ) WHERE rank > ? AND active = 0
+        """, (retain,)).fetchall()
+        if not pruned:
+            return []
+
+        params = [(version,) for version, _ in pruned]
+        conn.executemany("DELETE FROM model_registry WHERE version = ?", params)
+        if table_exists(conn, 'model_predictions'):
+            conn.executemany("DELETE FROM model_predictions WHERE version = ?", params)
+        # Aynı içerik kalan bir sürüme de aitse dosya silinmez
+        kept = {row[0] for row in conn.execute("SELECT artifact_path FROM model_registry")}
+
+    removed = {artifact_path for _, artifact_path in pruned} - kept
+    for artifact_path in removed:
+        path = os.path.join(MODELS_DIR, artifact_path)
+        if os.path.exists(path):
+            os.remove(path)
+    load_version.cache_clear()
+
+    print(f"[*] Model registry: {len(pruned)} eski sürüm silindi ({len(removed)} dosya)")
+    return [version for version, _ in pruned]
+
+def get_version(version):
+    """Sürümün registry kaydı (yoksa None)"""
+    rows = _query("WHERE version = ?", (int(version),))
+    return rows[0] if rows else None
+
+def list_versions(name=None):
+    """Tüm sürümler (yeniden eskiye)"""
+    if name:
+        return _query("WHERE name = ? ORDER BY version DESC", (name,))
+    return _query("ORDER BY version DESC")
+
+def active_version(name='prophet'):
+    """İsmin aktif sürümünün kaydı (yoksa None)"""
+    rows = _query("WHERE name = ? AND active = 1", (name,))
+    return rows[0] if rows else None
+
+def latest_version(name='prophet'):
+    """İsmin en son kaydedilen sürümü (yoksa None)"""
+    rows = _query("WHERE name = ? ORDER BY version DESC LIMIT 1", (name,))
+    return rows[0] if rows else None
+
+def version_for_week(week_start, name='prophet'):
+    """
+    Haftanın tahmini için kullanılacak model: eğitim kesimi haftanın
+    başına eşit ya da öncesindeki en yeni sürüm (data leakage yok)
+
+    Args:
+        week_start (str): Pazartesi (YYYY-MM-DD)
+
+    Returns:
+        dict veya None: Registry kaydı
+    """
+    rows = _query("""
+        WHERE name = ? AND training_cutoff IS NOT NULL AND training_cutoff <= ?
+        ORDER BY training_cutoff DESC, version DESC LIMIT 1
+    """, (name, week_start))
+    return rows[0] if rows else None
+
+@lru_cache(maxsize=MODEL_CACHE_SIZE)
+def load_version(version):
+    """
+    Sürümü yükler (süreç içi LRU önbellek: aynı sürüm tekrar diskten okunmaz)
+
+    Not: Dönen model paylaşılır; çağıran değiştirmemeli (predict değiştirmez).
+    """
+    entry = get_version(version)
+    if entry is None:
+        raise ValueError(f"Model registry'de v{version} yok")
+
+    from prophet.serialize import model_from_json
+    return model_from_json(read_artifact(entry['artifact_path']))
+
+@retry_on_lock
+def activate(version, model_json=None):
+    """
+    Sürümü ismi için aktif yapar ve sabit model dosyasına yazar (geri alma)
+
+    Args:
+        version (int): Aktif olacak sürüm
+        model_json (str, optional): Zaten bellekteyse tekrar okumamak için
+    """
+    entry = get_version(version)
+    if entry is None:
+        raise ValueError(f"Model registry'de v{version} yok")
+
+    path = ACTIVE_PATHS.get(entry['name'])
+    # Dosya zaten bu sürümse (ör. eğitim az önce yazdıysa) tekrar yazılmaz
+    if path and file_hash(path) != entry['artifact_hash']:
+        with open(path, 'w') as f:
+            f.write(model_json if model_json is not None else read_artifact(entry['artifact_path']))
+
+    with get_writer() as conn:
+        conn.execute("UPDATE model_registry SET active = (version = ?) WHERE name = ?", (entry['version'], entry['name']))
+
+    print(f"[+] Aktif model: {entry['name']} v{entry['version']}" + (f" -> {path}" if path else ''))
+
+def print_versions(entries):
+    """Sürüm tablosunu yazdırır"""
+    print(f"{'Sürüm':>6} {'İsim':12} {'Kesim':12} {'Fit (s)':>8} {'Boyut':>9} {'MAE':>9} {'MAPE':>7}  Aktif")
+    print("-"*78)
+    for entry in entries:
+        metrics = entry['metrics']
+        mae = f"{metrics['mae']:.2f}" if 'mae' in metrics else '-'
+        mape = f"{metrics['mape']:.2f}" if 'mape' in metrics else '-'
+        fit = f"{entry['fit_seconds']:.1f}" if entry['fit_seconds'] is not None else '-'
+        print(f"{entry['version']:>6} {entry['name']:12} {entry['training_cutoff'] or '-':12} {fit:>8} "
+              f"{entry['artifact_size'] / 1024:>6.0f} KB {mae:>9} {mape:>7}  {'*' if entry['active'] else ''}")
+
+def main():
+    """Komut satırı girişi"""
+    parser = argparse.ArgumentParser(description='Model registry')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    list_parser = commands.add_parser('list', help='Sürümleri listele')
+    list_parser.add_argument('name', nargs='?', default=None)
+
+    show_parser = commands.add_parser('show', help='Sürüm detayı')
+    show_parser.add_argument('version', type=int)
+
+    activate_parser = commands.add_parser('activate', help='Sürümü aktif yap (rollback)')
+    activate_parser.add_argument('version', type=int)
+
+    import_parser = commands.add_parser('import', help='Mevcut model dosyasını kaydet')
+    import_parser.add_argument('path')
+    import_parser.add_argument('--name', default='prophet')
+    import_parser.add_argument('--cutoff', default=None, help='Eğitim kesimi (YYYY-MM-DD)')
+    import_parser.add_argument('--activate', action='store_true')
+
+    prune_parser = commands.add_parser('prune', help='Eski sürümleri ve dosyalarını sil')
+    prune_parser.add_argument('--retain', type=int, default=RETAIN_VERSIONS)
+
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        print_versions(list_versions(args.name))
+    elif args.command == 'show':
+        entry = get_version(args.version)
+        if entry is None:
+            print(f"[!] v{args.version} bulunamadı")
+            sys.exit(1)
+        print(json.dumps(entry, indent=2, ensure_ascii=False))
+    elif args.command == 'activate':
+        activate(args.version)
+    elif args.command == 'import':
+        with open(args.path, 'r') as f:
+            model_json = f.read()
+        register_model(model_json, name=args.name, training_cutoff=args.cutoff,
+                       activate_version=args.activate)
+    elif args.command == 'prune':
+        prune_registry(args.retain)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+EPİAŞ MCP Fiyat Tahmini - Sync Sonrası Artımlı Güncellemeler
+============================================================
+
+Günlük veri senkronizasyonundan (catchUpSync.ts) hemen sonra çalışır ve
+sadece yeni gelen saatler için türetilmiş tabloları günceller:
+1. ts (epoch saat) kolonları ve index'ler (gerekirse migration)
+2. Yeni satırların veri kalitesi kontrolü (data_quality_issues)
+3. hourly_facts geniş tablosu
+4. Fiyat rollup'ları (price_rollups; sadece yeni fiyatların dokunduğu dönemler)
+5. Haftanın saati fiyat profili (price_profile; veri kalitesi kontrolünden sonra)
+6. Tahmin metrik akümülatörleri (metric_accumulators)
+7. Blok ürünleri (forecast_blocks; baz/puant ortalamaları)
+8. Aktif model için drift kontrolü (drift_monitor; haftalık eğitim kararı)
+
+GitHub Actions (daily-sync.yml) tarafından çalıştırılır.
+"""
+
+import sys
+import os
+from datetime import datetime
+
+# Script'in çalıştığı dizin
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(script_dir)
+
+from data_quality import validate_new_rows
+from hourly_facts import refresh_hourly_facts
+from price_rollups import refresh_rollups
+from price_profile import refresh_profile
+from metric_accumulators import refresh_accumulators
+from forecast_blocks import refresh_pending_blocks
+from drift_monitor import run_drift_check
+from database import get_writer
+
+def run_post_sync():
+    """
+    Sync sonrası artımlı güncellemeleri çalıştırır
+
+    Returns:
+        bool: Tüm adımlar başarılıysa True
+    """
+    print("\n" + "="*70)
+    print("SYNC SONRASI GÜNCELLEMELER")
+    print("="*70)
+    print(f"Tarih: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+
+    # Yazıcı bağlantı: ts migration'ı gerekiyorsa açılırken yapılır
+    conn = get_writer()
+    success = True
+
+    try:
+        print("\n[*] Veri kalitesi kontrol ediliyor...")
+        summary = validate_new_rows(conn)
+        conn.commit()
+        for table, counts in summary.items():
+            marker = "[!]" if counts['issues'] else "[+]"
+            print(f"{marker} {table}: {counts['rows']} yeni satır, {counts['issues']} bulgu")
+    except Exception as e:
+        print(f"\n❌ data_quality HATA: {e}")
+        conn.rollback()
+        import traceback
+        traceback.print_exc()
+        success = False
+
+    try:
+        print("\n[*] hourly_facts güncelleniyor...")
+        written = refresh_hourly_facts(conn)
+        print(f"[+] {written} saat güncellendi")
+    except Exception as e:
+        print(f"\n❌ hourly_facts HATA: {e}")
+        import traceback
+        traceback.print_exc()
+        success = False
+
+    try:
+        print("\n[*] Fiyat rollup'ları güncelleniyor...")
+        refreshed = refresh_rollups(conn)
+        conn.commit()
+        print(f"[+] {refreshed} dönem yeniden hesaplandı")
+    except Exception as e:
+        print(f"\n❌ price_rollups HATA: {e}")
+        import traceback
+        traceback.print_exc()
+        success = False
+
+    try:
+        print("\n[*] Fiyat profili güncelleniyor...")
+        updated = refresh_profile(conn)
+        conn.commit()
+        print(f"[+] {updated} dilim güncellendi")
+    except Exception as e:
+        print(f"\n❌ price_profile HATA: {e}")
+        import traceback
+        traceback.print_exc()
+        success = False
+
+    try:
+        print("\n[*] Metrik akümülatörleri güncelleniyor...")
+        processed = refresh_accumulators(conn)
+        print(f"[+] {processed} tahmin saati eklendi")
+    except Exception as e:
+        print(f"\n❌ metric_accumulators HATA: {e}")
+        import traceback
+        traceback.print_exc()
+        success = False
+    finally:
+        conn.close()
+
+    try:
+        print("\n[*] Blok ürünleri güncelleniyor...")
+        written = refresh_pending_blocks()
+        print(f"[+] {written} blok satırı güncellendi")
+    except Exception as e:
+        print(f"\n❌ forecast_blocks HATA: {e}")
+        import traceback
+        traceback.print_exc()
+        success = False
+
+    try:
+        print("\n[*] Drift kontrolü...")
+        run_drift_check()
+    except Exception as e:
+        print(f"\n❌ drift_monitor HATA: {e}")
+        import traceback
+        traceback.print_exc()
+        success = False
+
+    print("="*70)
+    return success
+
+def main():
+    """Ana fonksiyon"""
+    sys.exit(0 if run_post_sync() else 1)
+
+if __name__ == "__main__":
+    main()
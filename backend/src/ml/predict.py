@@ -10,70 +10,91 @@ gelecek günler için MCP fiyat tahminleri yapar.
 
 import pandas as pd
 import numpy as np
-from prophet.serialize import model_from_json
 import matplotlib.pyplot as plt
-import sqlite3
 import os
 from datetime import datetime, timedelta
 
-# Model ve database yolu
+from calendar_features import add_time_features
+from database import get_writer, retry_on_lock
+from metric_accumulators import reset_weeks
+from conformal import ConformalIntervals
+from quantile_store import add_quantile_columns, save_quantiles
+from forecast_blocks import refresh_blocks
+from epoch_hours import to_epoch_hour
+
+# Model ve çıktı yolu
 MODEL_PATH = os.path.join(os.path.dirname(__file__), '../../models/prophet_model.json')
 OUTPUT_DIR = os.path.join(os.path.dirname(__file__), '../../models')
-DB_PATH = os.path.join(os.path.dirname(__file__), '../../data/energy.db')
 
 def load_model():
     """Eğitilmiş Prophet modelini yükler"""
     print("[*] Model yukleniyor...")
 
+    from prophet.serialize import model_from_json
     with open(MODEL_PATH, 'r') as f:
         model = model_from_json(f.read())
 
     print(f"[+] Model basariyla yuklendi: {MODEL_PATH}")
     return model
 
-def make_forecast(model, days=7):
+def make_forecast(model, days=7, start=None):
     """
     Gelecek için tahmin yapar
 
     Args:
         model: Eğitilmiş Prophet modeli
         days: Kaç gün ileriye tahmin yapılacak
+        start (str, optional): İlk tahmin saati (ör. haftanın Pazartesi'si).
+            Verilmezse eğitim verisinin bitişinden sonraki saat
 
     Returns:
         pd.DataFrame: Tahmin sonuçları
     """
     print(f"\n[*] {days} gun ileriye tahmin yapiliyor...")
 
-    # Gelecek tarihler için dataframe oluştur (saatlik)
-    future = model.make_future_dataframe(periods=days*24, freq='H')
+    # Sadece tahmin saatleri (eğitim geçmişi yeniden tahmin edilmez)
+    last_date = model.history['ds'].max()
+    first_hour = pd.Timestamp(start) if start is not None else last_date + timedelta(hours=1)
+    future = pd.DataFrame({'ds': pd.date_range(first_hour, periods=days*24, freq='h')})
 
     # FEATURE ENGINEERING: Gelecek tarihler için de feature'ları ekle
     print("[*] Feature engineering (gelecek tarihler icin)...")
-    future['hour'] = future['ds'].dt.hour
-    future['is_weekend'] = (future['ds'].dt.dayofweek >= 5).astype(int)
-    future['is_peak_hour'] = future['hour'].isin([8, 9, 10, 18, 19, 20, 21]).astype(int)
-    future['is_daytime'] = future['hour'].isin(range(10, 16)).astype(int)
-    future['day_of_week'] = future['ds'].dt.dayofweek
+    add_time_features(future)
+
+    # Güven aralığı: yeterli geçmiş tahmin hatası varsa conformal aralıklar
+    # kullanılır ve Prophet'in Monte Carlo simülasyonu atlanır
+    intervals = ConformalIntervals.from_history(before=first_hour.strftime('%Y-%m-%d'))
+    use_conformal = intervals.is_calibrated(model.interval_width)
 
     # Tahmin yap
-    forecast = model.predict(future)
+    saved_samples = model.uncertainty_samples
+    if use_conformal:
+        model.uncertainty_samples = 0
+    try:
+        forecast = model.predict(future)
+    finally:
+        model.uncertainty_samples = saved_samples
 
-    # Sadece gelecek tarihleri al
-    last_date = model.history['ds'].max()
-    future_forecast = forecast[forecast['ds'] > last_date]
+    if use_conformal:
+        intervals.apply(forecast, coverage=model.interval_width)
+        print(f"[+] Conformal %{model.interval_width * 100:g} aralıkları ({intervals.weeks} haftalık hata tamponu)")
+
+    # Kantil tahminleri (forecast_quantiles tablosuna nokta tahminiyle birlikte yazılır)
+    add_quantile_columns(forecast, intervals if use_conformal else None, model.interval_width)
 
-    print(f"[+] Tahmin tamamlandi: {len(future_forecast)} saatlik veri")
-    print(f"[*] Tarih araligi: {future_forecast['ds'].min()} -> {future_forecast['ds'].max()}")
+    print(f"[+] Tahmin tamamlandi: {len(forecast)} saatlik veri")
+    print(f"[*] Tarih araligi: {forecast['ds'].min()} -> {forecast['ds'].max()}")
 
-    return future_forecast
+    return forecast
 
-def visualize_forecast(forecast, days=7):
+def visualize_forecast(forecast, days=7, output_dir=None):
     """
     Tahmin sonuçlarını görselleştirir
 
     Args:
         forecast: Tahmin dataframe'i
         days: Gösterilecek gün sayısı
+        output_dir (str, optional): Grafik klasörü (varsayılan: OUTPUT_DIR)
     """
     print(f"\n[*] Tahmin grafigi olusturuluyor...")
 
@@ -120,7 +141,7 @@ def visualize_forecast(forecast, days=7):
     plt.tight_layout()
 
     # Kaydet
-    chart_path = os.path.join(OUTPUT_DIR, f'forecast_{days}days.png')
+    chart_path = os.path.join(output_dir or OUTPUT_DIR, f'forecast_{days}days.png')
     plt.savefig(chart_path, dpi=150)
     print(f"[+] Grafik kaydedildi: {chart_path}")
 
@@ -146,6 +167,7 @@ def save_forecast_csv(forecast, days=7):
 
     print(f"[+] CSV kaydedildi: {csv_path}")
 
+@retry_on_lock
 def save_forecast_to_db(forecast, week_start, week_end):
     """
     Tahminleri forecast_history tablosuna kaydeder
@@ -158,31 +180,40 @@ def save_forecast_to_db(forecast, week_start, week_end):
     print(f"\n[*] Tahminler database'e kaydediliyor...")
     print(f"   Hafta: {week_start} - {week_end}")
 
-    conn = sqlite3.connect(DB_PATH)
-
-    # Önce bu hafta için eski kayıtları sil (varsa)
-    delete_query = "DELETE FROM forecast_history WHERE week_start = ?"
-    conn.execute(delete_query, (week_start,))
-
-    # Yeni tahminleri ekle
-    insert_query = """
-        INSERT INTO forecast_history (week_start, week_end, forecast_datetime, predicted_price)
-        VALUES (?, ?, ?, ?)
-    """
-
-    inserted = 0
-    for _, row in forecast.iterrows():
-        # Tarihi string'e çevir (timezone'suz)
-        forecast_dt = row['ds'].strftime('%Y-%m-%d %H:%M:%S')
-        predicted = float(row['yhat'])
-
-        conn.execute(insert_query, (week_start, week_end, forecast_dt, predicted))
-        inserted += 1
-
-    conn.commit()
-    conn.close()
-
-    print(f"[+] {inserted} tahmin kaydı database'e eklendi")
+    # Tarihler string'e çevrilir (timezone'suz); tek executemany ile eklenir
+    rows = list(zip(
+        [week_start] * len(forecast),
+        [week_end] * len(forecast),
+        forecast['ds'].dt.strftime('%Y-%m-%d %H:%M:%S'),
+        forecast['yhat'].astype(float),
+    ))
+
+    conn = get_writer()
+    try:
+        # Önce bu hafta için eski kayıtları sil (varsa)
+        delete_query = "DELETE FROM forecast_history WHERE week_start = ?"
+        conn.execute(delete_query, (week_start,))
+        # Haftanın eski tahminlerine ait metrik toplamları geçersiz
+        reset_weeks(conn, [week_start])
+
+        # Yeni tahminleri ekle
+        insert_query = """
+            INSERT INTO forecast_history (week_start, week_end, forecast_datetime, predicted_price)
+            VALUES (?, ?, ?, ?)
+        """
+        conn.executemany(insert_query, rows)
+
+        # Kantiller aynı transaction'da (kolonları yoksa eski kayıt silinir)
+        save_quantiles(conn, week_start, forecast)
+        # Haftaya dokunan gün/hafta/ay blokları
+        refresh_blocks(conn, to_epoch_hour(week_start), to_epoch_hour(week_end) + 24)
+
+        conn.commit()
+    finally:
+        # Hata durumunda close() açık transaction'ı geri alır (kilit bırakılır)
+        conn.close()
+
+    print(f"[+] {len(rows)} tahmin kaydı database'e eklendi")
 
 def print_summary(forecast, daily_avg):
     """
@@ -235,4 +266,6 @@ def main():
     print("\n[+] Tahmin islemi tamamlandi!")
 
 if __name__ == "__main__":
-    main()
+    from profiling import profiled
+    with profiled('predict'):
+        main()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+EPİAŞ MCP Fiyat Tahmini - Model Tahmin Deposu (model_predictions)
+=================================================================
+
+Eğitim sonunda modelin eğitim geçmişindeki her saat için fitted değeri,
+bileşen katkıları (trend, günlük, haftalık, yıllık, tatil, regressor) ve
+artığı model_predictions tablosuna yazılır (anahtar: registry sürümü + ts).
+
+Analiz script'leri (evaluation motoru üzerinden) aylarca geçmişi her
+çalıştırmada yeniden tahmin etmek yerine bu tablodan dilim okur. Tabloda
+olmayan saatler (ör. eğitim kesiminden sonraki holdout saatleri) bir kez
+tahmin edilip eklenir; yeniden tahmin sadece model sürümü değişince olur.
+
+Tahminler uncertainty sampling olmadan üretilir (sadece yhat ve bileşenler).
+Tablo büyümesin diye en son RETAIN_VERSIONS sürüm (+ aktif sürümler) tutulur.
+"""
+
+import numpy as np
+import pandas as pd
+
+from database import get_reader, get_writer, retry_on_lock
+from epoch_hours import table_exists, to_epoch_hour, local_to_epoch_hours, epoch_hours_to_local
+
+# Saklanan Prophet bileşenleri (modelde olmayanlar NULL)
+COMPONENTS = ('trend', 'daily', 'weekly', 'yearly', 'holidays', 'extra_regressors_additive')
+
+# Tutulacak en son sürüm sayısı (aktif sürümler her zaman tutulur)
+RETAIN_VERSIONS = 4
+
+def create_predictions_table(conn):
+    """model_predictions tablosunu oluşturur"""
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS model_predictions (
+            version INTEGER NOT NULL,
+            ts INTEGER NOT NULL,
+            y REAL,
+            yhat REAL NOT NULL,
+            residual REAL,
+            {', '.join(f'{name} REAL' for name in COMPONENTS)},
+            PRIMARY KEY (version, ts)
+        ) WITHOUT ROWID
+    """)
+
+def predict_components(model, data):
+    """
+    Modelin fitted değerleri ve bileşenleri (uncertainty sampling yok)
+
+    Args:
+        model: Prophet modeli
+        data: ds, y ve modelin regressor kolonları
+
+    Returns:
+        pd.DataFrame: ds, y, yhat, residual + COMPONENTS
+    """
+    saved_samples = model.uncertainty_samples
+    model.uncertainty_samples = 0
+    try:
+        forecast = model.predict(data[['ds'] + list(model.extra_regressors)])
+    finally:
+        model.uncertainty_samples = saved_samples
+
+    result = data[['ds', 'y']].reset_index(drop=True)
+    result['yhat'] = forecast['yhat'].to_numpy()
+    result['residual'] = result['y'] - result['yhat']
+    for name in COMPONENTS:
+        result[name] = forecast[name].to_numpy() if name in forecast else np.nan
+    return result
+
+@retry_on_lock
+def save_predictions(version, frame):
+    """
+    Tahminleri tek transaction'da yazar (aynı sürüm + saat varsa günceller)
+
+    Args:
+        version (int): Registry sürümü
+        frame: predict_components çıktısı
+    """
+    columns = ['y', 'yhat', 'residual', *COMPONENTS]
+    values = frame[columns].astype(float).to_numpy()
+    values = np.where(np.isnan(values), None, values.astype(object))
+    rows = [
+        (int(version), int(ts), *row)
+        for ts, row in zip(local_to_epoch_hours(frame['ds']), values.tolist())
+    ]
+
+    with get_writer() as conn:
+        create_predictions_table(conn)
+        conn.executemany(f"""
+            INSERT OR REPLACE INTO model_predictions (version, ts, {', '.join(columns)})
+            VALUES ({', '.join('?' * (len(columns) + 2))})
+        """, rows)
+
+def store_training_predictions(version, model, history):
+    """
+    Eğitim sonrası: geçmişin tamamı için fitted değerleri kaydeder ve eski sürümleri temizler
+
+    Args:
+        version (int): Yeni registry sürümü
+        model: Eğitilmiş Prophet modeli
+        history: Eğitim verisi (ds, y, regressor kolonları)
+
+    Returns:
+        int: Yazılan satır sayısı
+    """
+    frame = predict_components(model, history)
+    save_predictions(version, frame)
+    prune_predictions()
+    return len(frame)
+
+def load_predictions(version, start=None, end=None):
+    """
+    Sürümün [start, end) aralığındaki kayıtlı tahminleri
+
+    Returns:
+        pd.DataFrame: ds, y, yhat, residual + COMPONENTS (kayıt yoksa boş)
+    """
+    columns = ['y', 'yhat', 'residual', *COMPONENTS]
+    conn = get_reader()
+    try:
+        if not table_exists(conn, 'model_predictions'):
+            return pd.DataFrame(columns=['ds', *columns])
+        df = pd.read_sql_query(f"""
+            SELECT ts, {', '.join(columns)} FROM model_predictions
+            WHERE version = ? AND ts >= ? AND ts < ?
+            ORDER BY ts
+        """, conn, params=(
+            int(version),
+            to_epoch_hour(start) if start is not None else -2**62,
+            to_epoch_hour(end) if end is not None else 2**62,
+        ))
+    finally:
+        conn.close()
+    df.insert(0, 'ds', epoch_hours_to_local(df.pop('ts')))
+    return df
+
+def cached_predictions(version, data, load_model):
+    """
+    data'daki saatler için sürümün tahminleri: kayıtlı olanlar okunur,
+    eksikler bir kez tahmin edilip kaydedilir
+
+    Args:
+        version (int): Registry sürümü
+        data: ds, y ve regressor kolonları (ardışık pencere)
+        load_model: Eksik saat varsa modeli döndüren fonksiyon (yoksa çağrılmaz)
+
+    Returns:
+        pd.DataFrame: data satırlarıyla hizalı ds, y, yhat, residual + COMPONENTS.
+                      y ve residual güncel veriden hesaplanır.
+    """
+    if len(data) == 0:
+        return pd.DataFrame(columns=['ds', 'y', 'yhat', 'residual', *COMPONENTS])
+
+    stored = load_predictions(version, data['ds'].min(), data['ds'].max() + pd.Timedelta(hours=1))
+    missing = data[~data['ds'].isin(stored['ds'])]
+    if len(missing) > 0:
+        fresh = predict_components(load_model(), missing)
+        save_predictions(version, fresh)
+        stored = pd.concat([stored, fresh], ignore_index=True) if len(stored) else fresh
+
+    # Gerçek fiyatlar sonradan düzeltilmiş olabilir: y güncel veriden alınır
+    result = data[['ds', 'y']].reset_index(drop=True).merge(
+        stored.drop(columns=['y', 'residual']), on='ds', how='left'
+    )
+    result['residual'] = result['y'] - result['yhat']
+    return result
+
+@retry_on_lock
+def prune_predictions(retain=RETAIN_VERSIONS):
+    """En son `retain` sürüm ve aktif sürümler dışındaki tahminleri siler"""
+    with get_writer() as conn:
+        create_predictions_table(conn)
+        keep = {row[0] for row in conn.execute(
+            "SELECT DISTINCT version FROM model_predictions ORDER BY version DESC LIMIT ?", (retain,)
+        )}
+        if table_exists(conn, 'model_registry'):
+            keep |= {row[0] for row in conn.execute("SELECT version FROM model_registry WHERE active = 1")}
+        if keep:
+            placeholders = ', '.join('?' * len(keep))
+            conn.execute(f"DELETE FROM model_predictions WHERE version NOT IN ({placeholders})", tuple(keep))
@@ -0,0 +1,421 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+EPİAŞ MCP Fiyat Tahmini - Haftanın Saati Fiyat Profili
+======================================================
+
+"Bu gün ve saatte tipik fiyat nedir?" sorusu naive baseline'da, 0 TRY
+"perfect storm" analizinde ve aykırı değer kontrolünde tekrar tekrar
+soruluyor. Bu modül haftanın her saati (Pazartesi 00:00 = 0 ... 167) için
+fiyat profilini price_profile tablosunda tutar; tatil günleri ayrı bir
+varyanttır (VARIANTS x 168 dilim):
+
+    ew_mean, ew_zero   Üstel ağırlıklı ortalama ve 0 TRY sıklığı (yarı ömür EW_HALFLIFE_WEEKS hafta)
+    median, mad        Pencere medyanı ve medyan mutlak sapma
+    q10 ... q90        Pencere kantilleri
+    zero_freq          Penceredeki 0 TRY oranı
+    samples            Penceredeki gözlem sayısı
+
+Pencere normal günler için son WINDOW_WEEKS hafta, (seyrek) tatiller için son
+HOLIDAY_WINDOW_WEEKS haftadır.
+
+Güncelleme artımlıdır: son işlenen mcp_data id'sinden sonraki satırlar
+üstel ortalamalara sırayla eklenir (sadece son işlenen saatten yeni olanlar;
+geriye dönük düzeltmeler EW değerlerini değiştirmez) ve dokunulan dilimlerin
+pencere istatistikleri sabit boyutlu pencereden yeniden hesaplanır.
+
+Sorgu tarafında profil (VARIANTS, 168, STATS) NumPy dizisi olarak süreç
+içinde önbelleğe alınır; lookup() ts dizisi için mikro saniyeler içinde
+dilim değerlerini döndürür (mevsimsel naive tahmin ve model özelliği).
+
+Kullanım:
+    python price_profile.py                      # güncelle + medyan tablosu
+    python price_profile.py --stat zero_freq
+    python price_profile.py --variant holiday --stat ew_mean
+    python price_profile.py --rebuild
+"""
+
+import argparse
+import json
+
+import numpy as np
+import pandas as pd
+
+from database import get_reader, get_writer, retry_on_lock
+import database
+from epoch_hours import (table_exists, epoch_hours_to_local, local_to_epoch_hours, local_hour_of_week,
+                        local_day_start, dates_to_days)
+from calendar_features import HOURS_PER_WEEK, holiday_days, is_holiday
+
+# Profil varyantları (dizinin ilk ekseni)
+VARIANTS = ('normal', 'holiday')
+
+# Üstel ortalama: dilim başına haftada bir gözlem, yarı ömür hafta cinsinden
+EW_HALFLIFE_WEEKS = 4
+EW_ALPHA = 1 - 0.5 ** (1 / EW_HALFLIFE_WEEKS)
+
+# Pencere istatistikleri (medyan, kantiller, 0 TRY oranı)
+WINDOW_WEEKS = 12
+HOLIDAY_WINDOW_WEEKS = 156
+
+QUANTILES = {'q10': 0.10, 'q25': 0.25, 'q75': 0.75, 'q90': 0.90}
+
+STATS = ['ew_mean', 'ew_zero', 'median', 'mad', *QUANTILES, 'zero_freq', 'samples']
+
+WEEKDAY_NAMES = ['Pzt', 'Sal', 'Car', 'Per', 'Cum', 'Cmt', 'Paz']
+
+# Süreç içi önbellek: DB yolu -> (VARIANTS, 168, STATS) dizisi
+_profile_cache = {}
+
+def create_profile_tables(conn):
+    """price_profile ve price_profile_state tablolarını oluşturur"""
+    stat_sql = ',\n            '.join(f"{stat} REAL" for stat in STATS)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS price_profile (
+            variant INTEGER NOT NULL,
+            slot INTEGER NOT NULL,
+            {stat_sql},
+            PRIMARY KEY (variant, slot)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS price_profile_state (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+    """)
+
+def holiday_flags(ts):
+    """Epoch saatlerin tatil bayrağı (0/1, vektörel)"""
+    ts = np.asarray(ts, dtype='int64')
+    return is_holiday(pd.Series(epoch_hours_to_local(ts))).to_numpy()
+
+def _holiday_hours(start_ts, end_ts):
+    """(start_ts, end_ts] aralığındaki tatil saatleri (epoch saat dizisi)"""
+    first, last = epoch_hours_to_local(np.array([start_ts, end_ts]))
+    days = holiday_days(range(first.year, last.year + 1))
+    starts = [local_day_start(day) for day in dates_to_days(sorted(days))]
+    hours = (np.asarray(starts, dtype='int64')[:, None] + np.arange(24)).ravel()
+    return hours[(hours > start_ts) & (hours <= end_ts)]
+
+def profile_keys(ts, holiday=None):
+    """
+    Saatlerin profil anahtarı: variant * 168 + dilim
+
+    Args:
+        ts: Epoch saatler
+        holiday: Tatil bayrakları (verilmezse takvimden hesaplanır)
+
+    Returns:
+        np.ndarray: int anahtarlar (0 ... len(VARIANTS) * 168 - 1)
+    """
+    holiday = holiday_flags(ts) if holiday is None else np.asarray(holiday)
+    return holiday.astype('int64') * HOURS_PER_WEEK + local_hour_of_week(ts)
+
+def ew_update(current, keys, price):
+    """
+    Üstel ortalamaları yeni gözlemlerle günceller (ts sırasında, vektörel)
+
+    Her anahtar için m_n = (1-a)^n m_0 + sum a (1-a)^(n-i) x_i; ilk gözlemde
+    m_0 = x_1 (pandas ewm(adjust=False) ile aynı).
+
+    Args:
+        current: key -> (ew_mean, ew_zero) DataFrame'i (eksik anahtarlar yeni)
+        keys: Gözlemlerin anahtarları (ts sırasında)
+        price: Fiyatlar
+
+    Returns:
+        pd.DataFrame: index = key, kolonlar = ew_mean, ew_zero
+    """
+    obs = pd.DataFrame({'key': keys, 'price': price, 'zero': (np.asarray(price) == 0).astype(float)})
+    grouped = obs.groupby('key', sort=True)
+    count = grouped['price'].transform('size').to_numpy()
+    rank = grouped.cumcount().to_numpy()
+    weight = EW_ALPHA * (1 - EW_ALPHA) ** (count - 1 - rank)
+
+    first = grouped[['price', 'zero']].first().rename(columns={'price': 'ew_mean', 'zero': 'ew_zero'})
+    start = current.reindex(first.index)[['ew_mean', 'ew_zero']].fillna(first)
+    decay = (1 - EW_ALPHA) ** grouped.size()
+    weighted = obs[['price', 'zero']].mul(weight, axis=0).groupby(obs['key']).sum()
+    return pd.DataFrame({
+        'ew_mean': decay * start['ew_mean'] + weighted['price'],
+        'ew_zero': decay * start['ew_zero'] + weighted['zero'],
+    })
+
+def window_stats(keys, price):
+    """
+    Anahtar başına pencere istatistikleri
+
+    Args:
+        keys: Gözlemlerin anahtarları
+        price: Fiyatlar
+
+    Returns:
+        pd.DataFrame: index = key, kolonlar = median, mad, kantiller, zero_freq, samples
+    """
+    obs = pd.DataFrame({'key': keys, 'price': price, 'zero': (np.asarray(price) == 0).astype(float)})
+    grouped = obs.groupby('key')['price']
+    median = grouped.median()
+    deviation = (obs['price'] - obs['key'].map(median)).abs()
+    return pd.DataFrame({
+        'median': median,
+        'mad': deviation.groupby(obs['key']).median(),
+        **{name: grouped.quantile(q) for name, q in QUANTILES.items()},
+        'zero_freq': obs.groupby('key')['zero'].mean(),
+        'samples': grouped.size(),
+    })
+
+def _window_mask(ts, keys, end_ts):
+    """Gözlem anahtarının varyantına göre pencere içinde mi?"""
+    weeks = np.where(keys >= HOURS_PER_WEEK, HOLIDAY_WINDOW_WEEKS, WINDOW_WEEKS)
+    return (ts > end_ts - weeks * HOURS_PER_WEEK) & (ts <= end_ts)
+
+def compute_profile(ts, price, holiday=None):
+    """
+    Saatlik seriden profil dizisi (bellekte; backtest için tabloya yazmadan)
+
+    Args:
+        ts: Epoch saatler
+        price: Fiyatlar
+        holiday: Tatil bayrakları (verilmezse takvimden hesaplanır)
+
+    Returns:
+        np.ndarray: (len(VARIANTS), 168, len(STATS)); gözlemsiz dilimler NaN
+    """
+    ts = np.asarray(ts, dtype='int64')
+    price = np.asarray(price, dtype=float)
+    order = np.argsort(ts, kind='stable')
+    ts, price = ts[order], price[order]
+    keys = profile_keys(ts, None if holiday is None else np.asarray(holiday)[order])
+
+    ew = ew_update(pd.DataFrame(columns=['ew_mean', 'ew_zero'], dtype=float), keys, price)
+    inside = _window_mask(ts, keys, ts.max())
+    stats = window_stats(keys[inside], price[inside])
+    return _to_array(ew.join(stats, how='outer'))
+
+def _to_array(frame):
+    """key indeksli STATS DataFrame'i -> (VARIANTS, 168, STATS) dizisi"""
+    array = np.full((len(VARIANTS) * HOURS_PER_WEEK, len(STATS)), np.nan)
+    frame = frame.reindex(columns=STATS)
+    array[frame.index.to_numpy(dtype='int64')] = frame.to_numpy(dtype=float)
+    return array.reshape(len(VARIANTS), HOURS_PER_WEEK, len(STATS))
+
+def refresh_profile(conn, rebuild=False):
+    """
+    Son işlenen id'den sonra eklenen fiyatlarla profili günceller
+    (çağıranın transaction'ında; commit çağırana ait)
+
+    Args:
+        conn: Yazıcı SQLite bağlantısı
+        rebuild (bool): True ise profil tüm geçmişten yeniden hesaplanır
+
+    Returns:
+        int: Güncellenen (varyant, dilim) sayısı
+    """
+    create_profile_tables(conn)
+    if not table_exists(conn, 'mcp_data'):
+        return 0
+    if rebuild:
+        conn.execute("DELETE FROM price_profile")
+        conn.execute("DELETE FROM price_profile_state")
+
+    state = dict(conn.execute("SELECT name, value FROM price_profile_state").fetchall())
+    last_id, last_ts = state.get('last_id', 0), state.get('last_ts')
+    new = pd.read_sql_query(
+        "SELECT id, ts, price FROM mcp_data WHERE id > ? AND ts IS NOT NULL AND price IS NOT NULL ORDER BY ts, id",
+        conn, params=[last_id]
+    )
+    if len(new) == 0:
+        return 0
+
+    current = pd.read_sql_query(
+        f"SELECT variant * {HOURS_PER_WEEK} + slot AS key, {', '.join(STATS)} FROM price_profile", conn
+    ).set_index('key')
+
+    # Üstel ortalamalar: sadece son işlenen saatten yeni saatler (aynı saatin son yazımı)
+    fresh = new.drop_duplicates('ts', keep='last')
+    if last_ts is not None:
+        fresh = fresh[fresh['ts'] > last_ts]
+    ew = current[['ew_mean', 'ew_zero']]
+    if len(fresh):
+        fresh_ts = fresh['ts'].to_numpy(dtype='int64')
+        ew = ew_update(current, profile_keys(fresh_ts), fresh['price'].to_numpy(dtype=float))
+        ew = ew.combine_first(current[['ew_mean', 'ew_zero']])
+
+    # Pencere istatistikleri: dokunulan anahtarlar, sabit boyutlu pencereden
+    end_ts = int(new['ts'].max()) if last_ts is None else max(int(new['ts'].max()), last_ts)
+    touched = np.unique(profile_keys(new['ts'].to_numpy(dtype='int64')))
+    window = pd.read_sql_query(
+        "SELECT ts, price FROM mcp_data WHERE ts > ? AND ts <= ? AND price IS NOT NULL",
+        conn, params=[end_ts - WINDOW_WEEKS * HOURS_PER_WEEK, end_ts]
+    )
+    if (touched >= HOURS_PER_WEEK).any():
+        holiday_ts = _holiday_hours(end_ts - HOLIDAY_WINDOW_WEEKS * HOURS_PER_WEEK, end_ts)
+        older = pd.read_sql_query(
+            "SELECT ts, price FROM mcp_data WHERE ts IN (SELECT value FROM json_each(?)) AND ts <= ? "
+            "AND price IS NOT NULL",
+            conn, params=[json.dumps(holiday_ts.tolist()),
+                          end_ts - WINDOW_WEEKS * HOURS_PER_WEEK]
+        )
+        window = pd.concat([older, window], ignore_index=True) if len(older) else window
+    window_ts = window['ts'].to_numpy(dtype='int64')
+    window_keys = profile_keys(window_ts)
+    keep = np.isin(window_keys, touched) & _window_mask(window_ts, window_keys, end_ts)
+    stats = window_stats(window_keys[keep], window['price'].to_numpy(dtype=float)[keep])
+
+    rows = ew.reindex(touched).join(stats.reindex(touched)).reindex(columns=STATS)
+    rows = rows.combine_first(current.reindex(touched)[STATS]).reindex(columns=STATS)
+    conn.executemany(
+        f"INSERT OR REPLACE INTO price_profile (variant, slot, {', '.join(STATS)}) "
+        f"VALUES ({', '.join('?' * (len(STATS) + 2))})",
+        [(int(key) // HOURS_PER_WEEK, int(key) % HOURS_PER_WEEK,
+          *(None if pd.isna(value) else float(value) for value in values))
+         for key, *values in rows.itertuples(name=None)]
+    )
+    conn.executemany(
+        "INSERT OR REPLACE INTO price_profile_state (name, value) VALUES (?, ?)",
+        [('last_id', int(new['id'].max())), ('last_ts', end_ts)]
+    )
+    _profile_cache.clear()
+    return len(rows)
+
+@retry_on_lock
+def refresh_pending_profile(rebuild=False):
+    """Kendi yazıcı bağlantısıyla güncelleme"""
+    with get_writer() as conn:
+        return refresh_profile(conn, rebuild=rebuild)
+
+def load_profile(conn=None):
+    """
+    Profil dizisi (süreç içi önbellekten; ilk çağrıda tablodan okunur)
+
+    Args:
+        conn: Açık bağlantı (verilirse önbellek kullanılmaz; transaction içi okuma)
+
+    Returns:
+        np.ndarray: (len(VARIANTS), 168, len(STATS)); tablo yoksa tamamı NaN
+    """
+    if conn is None and database.DB_PATH in _profile_cache:
+        return _profile_cache[database.DB_PATH]
+
+    own = conn is None
+    reader = conn or get_reader()
+    try:
+        if table_exists(reader, 'price_profile'):
+            frame = pd.read_sql_query(
+                f"SELECT variant * {HOURS_PER_WEEK} + slot AS key, {', '.join(STATS)} FROM price_profile", reader
+            ).set_index('key')
+        else:
+            frame = pd.DataFrame(columns=STATS, index=pd.Index([], dtype='int64'))
+    finally:
+        if own:
+            reader.close()
+
+    array = _to_array(frame)
+    if own:
+        _profile_cache[database.DB_PATH] = array
+    return array
+
+def profile_array(stat='median', variant='normal', profile=None):
+    """
+    Tek istatistiğin 168 dilimlik dizisi (kopya yok)
+
+    Args:
+        stat (str): STATS elemanı
+        variant (str): VARIANTS elemanı
+        profile: load_profile / compute_profile çıktısı (varsayılan: kayıtlı profil)
+
+    Returns:
+        np.ndarray: (168,)
+    """
+    profile = load_profile() if profile is None else profile
+    return profile[VARIANTS.index(variant), :, STATS.index(stat)]
+
+def lookup(ts, stat='median', holiday=None, profile=None):
+    """
+    Saatlerin profil değerleri (tatil dilimi boşsa normal dilime düşer)
+
+    Args:
+        ts: Epoch saatler
+        stat (str): STATS elemanı
+        holiday: Tatil bayrakları (verilmezse takvimden; False = hep normal)
+        profile: load_profile / compute_profile çıktısı (varsayılan: kayıtlı profil)
+
+    Returns:
+        np.ndarray: Değerler (float)
+    """
+    profile = load_profile() if profile is None else profile
+    column = STATS.index(stat)
+    slots = local_hour_of_week(ts)
+    values = profile[0, slots, column]
+    if holiday is False:
+        return values
+    holiday = holiday_flags(ts) if holiday is None else np.asarray(holiday, dtype=bool)
+    special = profile[1, slots, column]
+    return np.where(holiday & ~np.isnan(special), special, values)
+
+def seasonal_naive(start, periods=HOURS_PER_WEEK, stat='ew_mean', profile=None):
+    """
+    Profilden mevsimsel naive tahmin (model gerektirmez)
+
+    Args:
+        start: İlk tahmin saati (Türkiye saati)
+        periods (int): Saat sayısı
+        stat (str): Tahmin olarak kullanılacak istatistik
+        profile: load_profile / compute_profile çıktısı
+
+    Returns:
+        pd.DataFrame: ds, yhat
+    """
+    ds = pd.Series(pd.date_range(pd.Timestamp(start), periods=periods, freq='h'))
+    ts = local_to_epoch_hours(ds)
+    return pd.DataFrame({'ds': ds, 'yhat': lookup(ts, stat, profile=profile)})
+
+def add_profile_features(df, stats=('ew_mean', 'zero_freq'), profile=None):
+    """
+    DataFrame'e profile_<stat> özellik kolonları ekler (in-place)
+
+    Args:
+        df: 'ds' kolonu (Türkiye saati) olan DataFrame
+        stats: Eklenecek istatistikler
+        profile: load_profile / compute_profile çıktısı
+
+    Returns:
+        pd.DataFrame: Aynı DataFrame
+    """
+    ts = local_to_epoch_hours(df['ds'])
+    holiday = holiday_flags(ts)
+    for stat in stats:
+        df[f'profile_{stat}'] = lookup(ts, stat, holiday, profile)
+    return df
+
+def main():
+    """Komut satırı girişi"""
+    parser = argparse.ArgumentParser(description='Haftanın saati fiyat profili')
+    parser.add_argument('--stat', default='median', choices=STATS, help='Gösterilecek istatistik')
+    parser.add_argument('--variant', default='normal', choices=VARIANTS, help='Profil varyantı')
+    parser.add_argument('--rebuild', action='store_true', help='Profili baştan hesapla')
+    args = parser.parse_args()
+
+    print("="*70)
+    print("HAFTANIN SAATİ FİYAT PROFİLİ" + (" (YENİDEN)" if args.rebuild else ""))
+    print("="*70)
+
+    updated = refresh_pending_profile(rebuild=args.rebuild)
+    print(f"[+] {updated} dilim güncellendi")
+
+    grid = profile_array(args.stat, args.variant).reshape(7, 24)
+    if np.isnan(grid).all():
+        print("[!] Profil verisi yok")
+        return
+
+    scale = 100 if args.stat in ('ew_zero', 'zero_freq') else 1
+    print(f"\n{args.stat} ({args.variant}{', %' if scale == 100 else ''})")
+    print(f"{'Saat':>6}" + ''.join(f"{name:>9}" for name in WEEKDAY_NAMES))
+    print("-"*70)
+    for hour in range(24):
+        print(f"{hour:02d}:00 " + ''.join(f"{value * scale:>9.1f}" for value in grid[:, hour]))
+    print("="*70)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+EPİAŞ MCP Fiyat Tahmini - Fiyat Rollup Tabloları
+================================================
+
+mcp_data fiyatlarının gün, hafta ve ay bazında (günün saati kırılımıyla)
+birleştirilebilir özetleri price_rollups tablosunda tutulur:
+
+    count, sum, sum_sq, min, max, zero_count (fiyat = 0), low_count (fiyat < LOW_PRICE)
+
+Ortalama, standart sapma, min/max, 0 TRY ve ekstrem düşük fiyat sayıları ile
+saat/gün dağılımları herhangi bir aralık için bu satırlardan hesaplanır;
+mcp_data yeniden taranmaz.
+
+Güncelleme artımlıdır: mcp_data'nın AUTOINCREMENT id'si her eklemede (Node
+sync'in INSERT OR REPLACE'i dahil) artar. Son işlenen id'den sonraki
+satırların dokunduğu gün, hafta ve aylar yeniden hesaplanır; diğer dönemlere
+dokunulmaz. Günlük sync sonrası post_sync.py çalıştırır.
+
+Kullanım:
+    python price_rollups.py                              # güncelle + aylık tablo
+    python price_rollups.py --by hour --from 2025-08-17  # saat dağılımı
+    python price_rollups.py --by weekday
+    python price_rollups.py --rebuild
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from database import get_reader, get_writer, retry_on_lock
+from epoch_hours import table_exists, local_days, local_day_start, days_to_dates, TR_UTC_OFFSET_HOURS
+from calendar_features import PERIODS, period_starts, covering_runs
+
+# Ekstrem düşük fiyat eşiği (TRY/MWh; evaluation 'lt100' maskesi ile aynı)
+LOW_PRICE = 100
+
+ROLLUP_COLUMNS = ['count', 'sum', 'sum_sq', 'min', 'max', 'zero_count', 'low_count']
+
+# price_stats 'by' seçenekleri
+GROUPINGS = ('period', 'hour', 'weekday')
+
+WEEKDAY_NAMES = ['Pzt', 'Sal', 'Car', 'Per', 'Cum', 'Cmt', 'Paz']
+
+def create_rollup_tables(conn):
+    """price_rollups ve price_rollup_state tablolarını oluşturur"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS price_rollups (
+            period TEXT NOT NULL,
+            period_start TEXT NOT NULL,
+            hour INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            sum REAL NOT NULL,
+            sum_sq REAL NOT NULL,
+            min REAL NOT NULL,
+            max REAL NOT NULL,
+            zero_count INTEGER NOT NULL,
+            low_count INTEGER NOT NULL,
+            PRIMARY KEY (period, period_start, hour)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS price_rollup_state (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+    """)
+
+def compute_rollups(ts, price, periods=PERIODS):
+    """
+    Saatlik fiyatların (dönem, dönem başı, saat) özetleri (vektörel groupby)
+
+    Args:
+        ts: Epoch saatler
+        price: Fiyatlar
+        periods: PERIODS alt kümesi
+
+    Returns:
+        pd.DataFrame: period, period_start, hour + ROLLUP_COLUMNS
+    """
+    ts = np.asarray(ts, dtype='int64')
+    price = np.asarray(price, dtype=float)
+    dates = days_to_dates(local_days(ts))
+    work = pd.DataFrame({
+        'hour': (ts + TR_UTC_OFFSET_HOURS) % 24,
+        'price': price,
+        'sq': price ** 2,
+        'zero': (price == 0).astype(int),
+        'low': (price < LOW_PRICE).astype(int),
+    })
+
+    frames = []
+    for period in periods:
+        work['period_start'] = period_starts(dates, period).astype(str)
+        grouped = work.groupby(['period_start', 'hour'])
+        frame = pd.DataFrame({
+            'count': grouped.size(),
+            'sum': grouped['price'].sum(),
+            'sum_sq': grouped['sq'].sum(),
+            'min': grouped['price'].min(),
+            'max': grouped['price'].max(),
+            'zero_count': grouped['zero'].sum(),
+            'low_count': grouped['low'].sum(),
+        }).reset_index()
+        frame.insert(0, 'period', period)
+        frames.append(frame)
+
+    columns = ['period', 'period_start', 'hour'] + ROLLUP_COLUMNS
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True)[columns]
+
+def refresh_rollups(conn, rebuild=False):
+    """
+    Son işlenen id'den sonra eklenen fiyatların dokunduğu dönemleri yeniden
+    hesaplar (çağıranın transaction'ında; commit çağırana ait)
+
+    Args:
+        conn: Yazıcı SQLite bağlantısı
+        rebuild (bool): True ise tablo baştan hesaplanır
+
+    Returns:
+        int: Yeniden hesaplanan (dönem, dönem başı) sayısı
+    """
+    create_rollup_tables(conn)
+    if not table_exists(conn, 'mcp_data'):
+        return 0
+    if rebuild:
+        conn.execute("DELETE FROM price_rollups")
+        conn.execute("DELETE FROM price_rollup_state")
+
+    row = conn.execute("SELECT value FROM price_rollup_state WHERE name = 'last_id'").fetchone()
+    last_id = row[0] if row else 0
+    changed = np.array(conn.execute(
+        "SELECT id, ts FROM mcp_data WHERE id > ? AND ts IS NOT NULL", (last_id,)
+    ).fetchall(), dtype='int64').reshape(-1, 2)
+    if len(changed) == 0:
+        return 0
+
+    changed_dates = days_to_dates(np.unique(local_days(changed[:, 1])))
+    affected = pd.DataFrame([
+        (period, key) for period in PERIODS
+        for key in np.unique(period_starts(changed_dates, period)).astype(str)
+    ], columns=['period', 'period_start'])
+
+    # Her pencere etkilenen dönemleri tam kapsar; kenardaki kısmi dönemler yazılmaz
+    frames = []
+    for first_day, last_day in covering_runs(np.unique(local_days(changed[:, 1]))):
+        prices = np.array(conn.execute(
+            "SELECT ts, price FROM mcp_data WHERE ts >= ? AND ts < ?",
+            (local_day_start(first_day), local_day_start(last_day + 1))
+        ).fetchall(), dtype=float).reshape(-1, 2)
+        frames.append(compute_rollups(prices[:, 0], prices[:, 1]).merge(affected, on=['period', 'period_start']))
+    rollups = pd.concat(frames, ignore_index=True)
+
+    conn.executemany("DELETE FROM price_rollups WHERE period = ? AND period_start = ?",
+                     affected.itertuples(index=False, name=None))
+    columns = ['period', 'period_start', 'hour'] + ROLLUP_COLUMNS
+    conn.executemany(
+        f"INSERT INTO price_rollups ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+        rollups[columns].astype(object).itertuples(index=False, name=None)
+    )
+    conn.execute("INSERT OR REPLACE INTO price_rollup_state (name, value) VALUES ('last_id', ?)",
+                 (int(changed[:, 0].max()),))
+    return len(affected)
+
+@retry_on_lock
+def refresh_pending_rollups(rebuild=False):
+    """Kendi yazıcı bağlantısıyla güncelleme"""
+    with get_writer() as conn:
+        return refresh_rollups(conn, rebuild=rebuild)
+
+def load_rollups(period='month', start=None, end=None, conn=None):
+    """
+    [start, end) aralığında başlayan dönemlerin rollup satırları
+
+    Args:
+        period (str): 'day' | 'week' | 'month'
+        start (str, optional): İlk dönem başı (YYYY-MM-DD, dahil)
+        end (str, optional): Bitiş (YYYY-MM-DD, dahil değil)
+        conn: Açık bağlantı (yoksa okuyucu açılır)
+
+    Returns:
+        pd.DataFrame: period_start, hour + ROLLUP_COLUMNS
+    """
+    own = conn is None
+    conn = conn or get_reader()
+    try:
+        if not table_exists(conn, 'price_rollups'):
+            return pd.DataFrame(columns=['period_start', 'hour'] + ROLLUP_COLUMNS)
+        return pd.read_sql_query(f"""
+            SELECT period_start, hour, {', '.join(ROLLUP_COLUMNS)} FROM price_rollups
+            WHERE period = ? AND period_start >= ? AND period_start < ?
+            ORDER BY period_start, hour
+        """, conn, params=(period, start or '0000-00-00', end or '9999-99-99'))
+    finally:
+        if own:
+            conn.close()
+
+def combine_rollups(rows, by=None):
+    """
+    Rollup satırlarını birleştirip istatistiklere çevirir
+
+    Args:
+        rows: load_rollups çıktısı
+        by: None (tek satır), 'period' (dönem başı), 'hour' veya
+            'weekday' (sadece gün satırlarından)
+
+    Returns:
+        pd.DataFrame: count, mean, std, min, max, zero_count, low_count
+    """
+    if by is None:
+        keys = pd.Series('toplam', index=rows.index)
+    elif by == 'period':
+        keys = rows['period_start']
+    elif by == 'hour':
+        keys = rows['hour']
+    elif by == 'weekday':
+        weekday = pd.to_datetime(rows['period_start']).dt.dayofweek
+        keys = pd.Categorical(weekday.map(dict(enumerate(WEEKDAY_NAMES))), categories=WEEKDAY_NAMES)
+    else:
+        raise ValueError(f"Bilinmeyen kırılım: {by} ({', '.join(GROUPINGS)})")
+
+    grouped = rows.groupby(keys, observed=True)
+    totals = grouped[['count', 'sum', 'sum_sq', 'zero_count', 'low_count']].sum()
+    count = totals['count'].astype(float)
+    mean = totals['sum'] / count
+    # Popülasyon varyansı: E[x^2] - E[x]^2 (yuvarlama hatasına karşı 0'da kırpılır)
+    variance = np.maximum(totals['sum_sq'] / count - mean ** 2, 0)
+    return pd.DataFrame({
+        'count': totals['count'].astype(int),
+        'mean': mean,
+        'std': np.sqrt(variance),
+        'min': grouped['min'].min(),
+        'max': grouped['max'].max(),
+        'zero_count': totals['zero_count'].astype(int),
+        'low_count': totals['low_count'].astype(int),
+    })
+
+def _grain(start, end):
+    """Aralığı tam kapsayan en kaba dönem (sınırlar ayın ilk günü ise ay, Pazartesi ise hafta)"""
+    bounds = [pd.Timestamp(value) for value in (start, end) if value is not None]
+    if all(stamp.day == 1 for stamp in bounds):
+        return 'month'
+    if all(stamp.dayofweek == 0 for stamp in bounds):
+        return 'week'
+    return 'day'
+
+def price_stats(start=None, end=None, by=None, period=None):
+    """
+    [start, end) günleri için fiyat istatistikleri (rollup satırlarından)
+
+    Args:
+        start (str, optional): İlk gün (YYYY-MM-DD, dahil)
+        end (str, optional): Bitiş günü (YYYY-MM-DD, dahil değil)
+        by: combine_rollups kırılımı
+        period (str, optional): Okunacak dönem; verilmezse aralığı tam
+            kapsayan en kaba dönem ('weekday' kırılımı için gün)
+
+    Returns:
+        pd.DataFrame: combine_rollups çıktısı
+    """
+    if period is None:
+        period = 'day' if by == 'weekday' else _grain(start, end)
+    return combine_rollups(load_rollups(period, start, end), by)
+
+def main():
+    """Komut satırı girişi"""
+    parser = argparse.ArgumentParser(description='Fiyat rollup istatistikleri')
+    parser.add_argument('--by', default='period', choices=GROUPINGS, help='Kırılım')
+    parser.add_argument('--period', default=None, choices=PERIODS, help='Dönem (varsayılan: aralığa göre)')
+    parser.add_argument('--from', dest='start', default=None, help='İlk gün (YYYY-MM-DD, dahil)')
+    parser.add_argument('--to', dest='end', default=None, help='Bitiş (YYYY-MM-DD, dahil değil)')
+    parser.add_argument('--rebuild', action='store_true', help='Tabloyu baştan hesapla')
+    args = parser.parse_args()
+
+    print("="*70)
+    print("FİYAT ROLLUP'LARI" + (" (YENİDEN)" if args.rebuild else ""))
+    print("="*70)
+
+    refreshed = refresh_pending_rollups(rebuild=args.rebuild)
+    print(f"[+] {refreshed} dönem yeniden hesaplandı")
+
+    table = price_stats(args.start, args.end, args.by, args.period)
+    if len(table) == 0:
+        print("[!] Rollup verisi yok")
+        return
+
+    print(f"\n{'':>12}{'Saat':>7}{'Ort.':>10}{'Std':>9}{'Min':>9}{'Maks':>9}{'0 TRY':>7}{f'<{LOW_PRICE}':>7}")
+    print("-"*70)
+    for row in table.itertuples():
+        print(f"{str(row.Index):>12}{row.count:>7}{row.mean:>10.2f}{row.std:>9.2f}"
+              f"{row.min:>9.2f}{row.max:>9.2f}{row.zero_count:>7}{row.low_count:>7}")
+    print("="*70)
+
+if __name__ == "__main__":
+    main()
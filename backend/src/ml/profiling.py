@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+EPİAŞ MCP Fiyat Tahmini - İsteğe Bağlı Profil Çıkarma
+=====================================================
+
+train_prophet, predict, compare_forecasts, export_json ve weekly_workflow
+giriş noktaları için ortak profil anahtarı. Kapalıyken hiçbir maliyeti yoktur.
+
+Modlar:
+- cprofile:    Fonksiyon bazında süreler (.prof + kümülatif süre raporu)
+- tracemalloc: Satır bazında bellek tahsisleri (top-N rapor)
+- sample:      Düşük maliyetli örnekleme (her SAMPLE_INTERVAL saniyede bir
+               tüm thread'lerin stack'i; flamegraph için .folded + özet)
+- all:         cprofile + tracemalloc
+
+Açma:
+    ML_PROFILE=cprofile python src/ml/weekly_workflow.py
+    python src/ml/train_prophet.py 2025-10-20 --profile=sample
+    python src/ml/export_json.py --profile          # = all
+
+Çıktılar ML_PROFILE_DIR (varsayılan backend/profiles) altına
+<script>-<zaman>.* adıyla yazılır. .prof dosyası snakeviz veya
+'python -m pstats' ile açılabilir.
+"""
+
+import os
+import sys
+import time
+import threading
+import traceback
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+PROFILE_DIR = os.environ.get(
+    'ML_PROFILE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../profiles')
+)
+
+MODES = ('cprofile', 'tracemalloc', 'sample')
+
+# Raporlarda listelenecek satır sayısı
+TOP_N = 40
+
+# Örnekleme aralığı (saniye); 10 ms yeterli çözünürlük, ihmal edilebilir yük
+SAMPLE_INTERVAL = 0.01
+
+def parse_modes(value):
+    """
+    'cprofile,sample', 'all', '1' gibi değerleri mod kümesine çevirir
+
+    Returns:
+        set: Geçerli modlar (boş küme = kapalı)
+    """
+    if value is None:
+        return set()
+    value = value.strip().lower()
+    if value in ('', '0', 'false', 'off', 'no'):
+        return set()
+    if value in ('1', 'true', 'on', 'yes', 'all'):
+        return {'cprofile', 'tracemalloc'}
+
+    modes = {part.strip() for part in value.split(',') if part.strip()}
+    if 'all' in modes:
+        modes = (modes - {'all'}) | {'cprofile', 'tracemalloc'}
+    unknown = modes - set(MODES)
+    if unknown:
+        print(f"[!] Bilinmeyen profil modu: {', '.join(sorted(unknown))} (geçerli: {', '.join(MODES)}, all)")
+    return modes & set(MODES)
+
+def modes_from_cli_or_env():
+    """
+    --profile[=mod] argümanını sys.argv'den çıkarır, yoksa ML_PROFILE'a bakar
+
+    Argüman sys.argv'den silinir ki scriptlerin kendi argüman okuması
+    (ör. train_prophet.py <end_date>) etkilenmesin.
+    """
+    cli_value = None
+    remaining = []
+    for arg in sys.argv[1:]:
+        if arg == '--profile':
+            cli_value = 'all'
+        elif arg.startswith('--profile='):
+            cli_value = arg.split('=', 1)[1]
+        else:
+            remaining.append(arg)
+    sys.argv[1:] = remaining
+
+    if cli_value is not None:
+        return parse_modes(cli_value)
+    return parse_modes(os.environ.get('ML_PROFILE'))
+
+class StackSampler:
+    """
+    Arka plan thread'i ile periyodik stack örnekleyici
+
+    sys._current_frames() ile ölçülen thread'i durdurmadan stack'i okur;
+    cProfile'ın aksine her fonksiyon çağrısına yük bindirmez.
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, base_path, top=TOP_N):
+        """Flamegraph (.folded) ve en sık görülen fonksiyon raporunu yazar"""
+        with open(base_path + '-samples.folded', 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        # Self: stack'in tepesindeki fonksiyon; total: stack'te herhangi bir yerde
+        self_counts = Counter()
+        total_counts = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(';')
+            self_counts[frames[-1]] += count
+            for frame in set(frames):
+                total_counts[frame] += count
+
+        total = sum(self.stacks.values()) or 1
+        with open(base_path + '-samples.txt', 'w', encoding='utf-8') as f:
+            f.write(f"{self.samples} örnek, aralık {self.interval * 1000:.0f} ms\n\n")
+            f.write(f"En çok örneklenen (self) {top} fonksiyon:\n")
+            for frame, count in self_counts.most_common(top):
+                f.write(f"{100 * count / total:6.1f}%  {count:7d}  {frame}\n")
+            f.write(f"\nStack'te en çok görülen (total) {top} fonksiyon:\n")
+            for frame, count in total_counts.most_common(top):
+                f.write(f"{100 * count / total:6.1f}%  {count:7d}  {frame}\n")
+
+def write_allocation_report(snapshot, path, top=TOP_N):
+    """tracemalloc snapshot'ından satır ve dosya bazında top-N rapor yazar"""
+    import tracemalloc
+
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    ))
+
+    with open(path, 'w', encoding='utf-8') as f:
+        for key_type, title in (('lineno', 'satır'), ('filename', 'dosya')):
+            stats = snapshot.statistics(key_type)
+            total = sum(stat.size for stat in stats)
+            f.write(f"En çok bellek tutan {top} {title} (toplam {total / 1024 / 1024:.1f} MB):\n")
+            for stat in stats[:top]:
+                frame = stat.traceback[0]
+                f.write(f"{stat.size / 1024 / 1024:9.2f} MB {stat.count:9d} blok  "
+                        f"{frame.filename}:{frame.lineno if key_type == 'lineno' else ''}\n")
+            f.write("\n")
+
+@contextmanager
+def profiled(name, modes=None):
+    """
+    Bloğu seçilen modlarla profiller; kapalıysa hiçbir şey yapmaz
+
+    Args:
+        name (str): Rapor dosyası ön eki (script adı)
+        modes (set, optional): Verilmezse --profile / ML_PROFILE okunur
+    """
+    modes = modes_from_cli_or_env() if modes is None else set(modes)
+    if not modes:
+        yield
+        return
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base_path = os.path.join(PROFILE_DIR, f"{name}-{datetime.now().strftime('%Y%m%d-%H%M%S')}")
+    print(f"[*] Profil açık ({', '.join(sorted(modes))}): {base_path}.*")
+
+    profiler = sampler = None
+    if 'tracemalloc' in modes:
+        import tracemalloc
+        tracemalloc.start(25)
+    if 'sample' in modes:
+        sampler = StackSampler()
+        sampler.start()
+    if 'cprofile' in modes:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        # SystemExit (sys.exit) dahil her çıkışta rapor yazılır
+        elapsed = time.perf_counter() - start
+        try:
+            # Önce tüm ölçümler durdurulur ki rapor yazımı ölçüme karışmasın
+            snapshot = None
+            if profiler is not None:
+                profiler.disable()
+            if sampler is not None:
+                sampler.stop()
+            if 'tracemalloc' in modes:
+                import tracemalloc
+                snapshot = tracemalloc.take_snapshot()
+                current, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+
+            if profiler is not None:
+                import pstats
+                profiler.dump_stats(base_path + '.prof')
+                with open(base_path + '-cprofile.txt', 'w', encoding='utf-8') as f:
+                    stats = pstats.Stats(profiler, stream=f).strip_dirs()
+                    stats.sort_stats('cumulative').print_stats(TOP_N)
+                    stats.sort_stats('tottime').print_stats(TOP_N)
+            if sampler is not None:
+                sampler.write(base_path)
+            if snapshot is not None:
+                write_allocation_report(snapshot, base_path + '-alloc.txt')
+                print(f"[*] tracemalloc: şu an {current / 1024 / 1024:.1f} MB, tepe {peak / 1024 / 1024:.1f} MB")
+            print(f"[+] Profil raporları yazıldı ({elapsed:.1f}s): {base_path}.*")
+        except Exception:
+            print("[!] Profil raporu yazılamadı:")
+            traceback.print_exc()
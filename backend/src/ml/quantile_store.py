@@ -0,0 +1,290 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+EPİAŞ MCP Fiyat Tahmini - Kantil Tahmin Deposu (forecast_quantiles)
+===================================================================
+
+forecast_history sadece nokta tahmini (predicted_price) saklar. Her haftanın
+kantil tahminleri forecast_quantiles tablosunda hafta başına TEK satırda
+tutulur:
+
+    week_start | start_ts | hours | levels (JSON) | data (BLOB)
+
+data, little-endian float32 [seviye x saat] matrisidir (seviye-major). 9 kantil
+x 168 saat = 6 KB/hafta; uzun formatlı (hafta, saat, seviye) satırlara göre
+hem daha küçük hem de tek satır okumasıyla çözülür. Seviyeler satırda
+saklandığı için QUANTILE_LEVELS değişse de eski haftalar okunabilir.
+
+Kantiller nokta tahminiyle birlikte aynı transaction'da yazılır
+(predict.save_forecast_to_db, backfill.write_forecasts):
+- Conformal tampon kalibre ise: yhat + haftanın saati bazında artık kantilleri
+- Değilse: Prophet aralığından (yhat_lower/yhat_upper) iki parçalı normal
+  yaklaşım
+
+Değerlendirme pinball (quantile) loss ve merkezi bantların kapsamasıyla yapılır.
+
+Kullanım:
+    python quantile_store.py                       # haftalık pinball loss + kapsama
+    python quantile_store.py --from 2025-06-02 --to 2025-10-20
+"""
+
+import json
+import argparse
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from database import get_reader
+from epoch_hours import table_exists, local_to_epoch_hours
+
+# Saklanan kantil seviyeleri
+QUANTILE_LEVELS = (0.025, 0.05, 0.1, 0.25, 0.5, 0.75, 0.9, 0.95, 0.975)
+
+# Exporter'ın alt/üst sınır olarak kullandığı bant (%95)
+BAND_LEVELS = (0.025, 0.975)
+
+def quantile_column(level):
+    """Tahmin DataFrame'indeki kantil kolonunun adı (ör. 'q0.025')"""
+    return f'q{level:g}'
+
+def frame_levels(frame):
+    """DataFrame'de kolonu bulunan kantil seviyeleri"""
+    return [level for level in QUANTILE_LEVELS if quantile_column(level) in frame]
+
+def create_quantiles_table(conn):
+    """forecast_quantiles tablosunu oluşturur"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS forecast_quantiles (
+            week_start TEXT PRIMARY KEY,
+            start_ts INTEGER NOT NULL,
+            hours INTEGER NOT NULL,
+            levels TEXT NOT NULL,
+            data BLOB NOT NULL
+        )
+    """)
+
+def add_quantile_columns(forecast, intervals=None, interval_width=0.95, levels=QUANTILE_LEVELS):
+    """
+    Tahmine kantil kolonlarını ekler (yerinde)
+
+    Args:
+        forecast: ds, yhat (conformal yoksa yhat_lower, yhat_upper da) kolonları
+        intervals (ConformalIntervals, optional): Kalibre artık tamponu
+        interval_width (float): yhat_lower/yhat_upper'ın nominal kapsaması
+        levels: Kantil seviyeleri
+
+    Returns:
+        pd.DataFrame: forecast
+    """
+    yhat = forecast['yhat'].to_numpy(dtype=float)
+
+    if intervals is not None:
+        from calendar_features import hour_of_week
+        residuals = intervals.residual_quantiles(levels)[:, hour_of_week(forecast['ds'])]
+        for level, offsets in zip(levels, residuals):
+            forecast[quantile_column(level)] = yhat + offsets
+        return forecast
+
+    # Alt ve üst yarı için ayrı sigma: Prophet aralığının asimetrisi korunur
+    z = NormalDist().inv_cdf((1 + interval_width) / 2)
+    sigma_lower = (yhat - forecast['yhat_lower'].to_numpy(dtype=float)) / z
+    sigma_upper = (forecast['yhat_upper'].to_numpy(dtype=float) - yhat) / z
+    for level in levels:
+        score = NormalDist().inv_cdf(level)
+        forecast[quantile_column(level)] = yhat + score * (sigma_lower if level < 0.5 else sigma_upper)
+    return forecast
+
+def pack_quantiles(forecast):
+    """
+    Tahminin kantil kolonlarını BLOB satırına çevirir
+
+    Returns:
+        tuple: (start_ts, hours, levels JSON, data bytes) veya kantil yoksa None
+    """
+    levels = frame_levels(forecast)
+    if not levels or len(forecast) == 0:
+        return None
+
+    ts = local_to_epoch_hours(forecast['ds'])
+    start_ts = int(ts.min())
+    hours = int(ts.max()) - start_ts + 1
+    matrix = np.full((len(levels), hours), np.nan, dtype='<f4')
+    matrix[:, ts - start_ts] = forecast[[quantile_column(level) for level in levels]].to_numpy(dtype=float).T
+    return start_ts, hours, json.dumps(levels), matrix.tobytes()
+
+def save_quantiles(conn, week_start, forecast):
+    """
+    Haftanın kantillerini yazar; tahminde kantil yoksa eski kayıt silinir
+    (çağıranın transaction'ında; commit çağırana ait)
+
+    Args:
+        conn: Yazıcı SQLite bağlantısı
+        week_start (str): Pazartesi (YYYY-MM-DD)
+        forecast: ds + kantil kolonları
+    """
+    create_quantiles_table(conn)
+    packed = pack_quantiles(forecast)
+    if packed is None:
+        conn.execute("DELETE FROM forecast_quantiles WHERE week_start = ?", (week_start,))
+        return
+    conn.execute("""
+        INSERT OR REPLACE INTO forecast_quantiles (week_start, start_ts, hours, levels, data)
+        VALUES (?, ?, ?, ?, ?)
+    """, (week_start, *packed))
+
+def load_quantiles(start=None, end=None, conn=None):
+    """
+    [start, end) aralığında başlayan haftaların kantilleri
+
+    Args:
+        start (str, optional): İlk hafta (YYYY-MM-DD, dahil)
+        end (str, optional): Bitiş (YYYY-MM-DD, dahil değil)
+        conn (optional): Açık okuyucu bağlantı (yoksa açılıp kapatılır)
+
+    Returns:
+        pd.DataFrame: week_start, ts + seviye başına bir kolon (quantile_column)
+    """
+    own_conn = conn is None
+    conn = conn or get_reader()
+    try:
+        if not table_exists(conn, 'forecast_quantiles'):
+            return pd.DataFrame(columns=['week_start', 'ts'])
+        rows = conn.execute("""
+            SELECT week_start, start_ts, hours, levels, data FROM forecast_quantiles
+            WHERE week_start >= ? AND week_start < ?
+            ORDER BY week_start
+        """, (start or '0000-00-00', end or '9999-99-99')).fetchall()
+    finally:
+        if own_conn:
+            conn.close()
+
+    frames = []
+    for week_start, start_ts, hours, levels, data in rows:
+        levels = json.loads(levels)
+        matrix = np.frombuffer(data, dtype='<f4').reshape(len(levels), hours)
+        frame = pd.DataFrame(matrix.T.astype(float), columns=[quantile_column(level) for level in levels])
+        frame.insert(0, 'ts', np.arange(start_ts, start_ts + hours))
+        frame.insert(0, 'week_start', week_start)
+        frames.append(frame)
+    if not frames:
+        return pd.DataFrame(columns=['week_start', 'ts'])
+    return pd.concat(frames, ignore_index=True)
+
+def pinball_loss(y, predictions, levels):
+    """
+    Seviye başına ortalama pinball (quantile) loss
+
+    Args:
+        y: Gerçek değerler (n)
+        predictions: (n, seviye) kantil tahminleri
+        levels: Kantil seviyeleri
+
+    Returns:
+        np.ndarray: Seviye başına ortalama kayıp (TRY)
+    """
+    levels = np.asarray(levels, dtype=float)
+    diff = np.asarray(y, dtype=float)[:, None] - np.asarray(predictions, dtype=float)
+    return np.nanmean(np.maximum(levels * diff, (levels - 1) * diff), axis=0)
+
+def evaluate_quantiles(start=None, end=None):
+    """
+    Gerçekleşmiş saatler için haftalık pinball loss ve bant kapsaması
+
+    Args:
+        start (str, optional): İlk hafta (YYYY-MM-DD, dahil)
+        end (str, optional): Bitiş (YYYY-MM-DD, dahil değil)
+
+    Returns:
+        pd.DataFrame: index = week_start; hours, pinball (seviyelerin ortalaması),
+                      pinball_<seviye>, coverage_<bant> (merkezi bantlar, 0-1)
+    """
+    conn = get_reader()
+    try:
+        quantiles = load_quantiles(start, end, conn=conn)
+        if len(quantiles) == 0:
+            return pd.DataFrame()
+        actuals = pd.read_sql_query(
+            "SELECT ts, price AS y FROM mcp_data WHERE ts >= ? AND ts <= ?",
+            conn, params=(int(quantiles['ts'].min()), int(quantiles['ts'].max()))
+        )
+    finally:
+        conn.close()
+
+    frame = quantiles.merge(actuals, on='ts', how='inner')
+    levels = [level for level in QUANTILE_LEVELS if quantile_column(level) in frame]
+    # Merkezi bantlar: (q, 1-q) çiftlerinin ikisi de saklandıysa
+    bands = [(level, round(1 - level, 6)) for level in levels if level < 0.5 and round(1 - level, 6) in levels]
+
+    rows = {}
+    for week_start, group in frame.groupby('week_start', sort=True):
+        y = group['y'].to_numpy(dtype=float)
+        predictions = group[[quantile_column(level) for level in levels]].to_numpy(dtype=float)
+        valid = ~np.isnan(predictions).any(axis=1)
+        if not valid.any():
+            continue
+        losses = pinball_loss(y[valid], predictions[valid], levels)
+
+        row = {'hours': int(valid.sum()), 'pinball': float(np.mean(losses))}
+        row.update({f'pinball_{level:g}': float(loss) for level, loss in zip(levels, losses)})
+        for lower, upper in bands:
+            inside = (y[valid] >= group[quantile_column(lower)].to_numpy()[valid]) & \
+                     (y[valid] <= group[quantile_column(upper)].to_numpy()[valid])
+            row[f'coverage_{round((upper - lower) * 100):d}'] = float(inside.mean())
+        rows[week_start] = row
+
+    return pd.DataFrame.from_dict(rows, orient='index')
+
+def print_week_evaluation(week_start):
+    """compare_week için: haftanın kantil değerlendirmesini yazdırır (kayıt yoksa sessiz)"""
+    end = (pd.Timestamp(week_start) + pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+    report = evaluate_quantiles(week_start, end)
+    if len(report) == 0:
+        return None
+
+    row = report.iloc[0]
+    coverages = ', '.join(
+        f"%{name.split('_')[1]} bant: %{value * 100:.1f}"
+        for name, value in row.items() if name.startswith('coverage_')
+    )
+    print(f"   Pinball Loss (kantil ort.)   : {row['pinball']:.2f} TRY")
+    if coverages:
+        print(f"   Gerçekleşen kapsama          : {coverages}")
+    return row.to_dict()
+
+def main():
+    """Komut satırı girişi"""
+    parser = argparse.ArgumentParser(description='Kantil tahminlerinin pinball loss değerlendirmesi')
+    parser.add_argument('--from', dest='start', default=None, help='İlk hafta (YYYY-MM-DD, dahil)')
+    parser.add_argument('--to', dest='end', default=None, help='Bitiş (YYYY-MM-DD, dahil değil)')
+    args = parser.parse_args()
+
+    print("="*70)
+    print("KANTİL TAHMİN DEĞERLENDİRMESİ (pinball loss)")
+    print("="*70)
+
+    report = evaluate_quantiles(args.start, args.end)
+    if len(report) == 0:
+        print("[!] Gerçekleşmiş saati olan kantil kaydı yok")
+        return
+
+    coverage_columns = [column for column in report.columns if column.startswith('coverage_')]
+    header = ''.join(f"{'%' + column.split('_')[1] + ' bant':>10}" for column in coverage_columns)
+    print(f"\n{'Hafta':12}{'Saat':>6}{'Pinball':>10}{'q0.5':>10}{header}")
+    print("-"*70)
+    for week_start, row in report.iterrows():
+        median = f"{row['pinball_0.5']:>10.2f}" if 'pinball_0.5' in row else f"{'-':>10}"
+        cells = ''.join(f"{row[column] * 100:>9.1f}%" for column in coverage_columns)
+        print(f"{week_start:12}{int(row['hours']):>6}{row['pinball']:>10.2f}{median}{cells}")
+
+    print("-"*70)
+    weights = report['hours']
+    print(f"[*] Ortalama pinball loss: {np.average(report['pinball'], weights=weights):.2f} TRY "
+          f"({len(report)} hafta, {int(weights.sum())} saat)")
+    for column in coverage_columns:
+        print(f"[*] %{column.split('_')[1]} bant gerçekleşen kapsama: "
+              f"%{np.average(report[column], weights=weights) * 100:.1f}")
+    print("="*70)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+EPİAŞ MCP Fiyat Tahmini - Senaryo (What-if) Analizi
+===================================================
+
+"Çarşamba bayram sayılsaydı" ya da "Cuma 13:00 extreme_low_risk taşısaydı"
+fiyatlar nasıl değişirdi? Her senaryo için model.predict çağırmak (trend +
+tüm mevsimsellik özelliklerinin yeniden üretimi) yüzlerce senaryoda dakikalar
+sürer. Prophet tahmini ise özellik matrisine göre doğrusaldır:
+
+    yhat = trend * (1 + X @ beta_çarpımsal) + X @ beta_toplamsal * y_scale
+
+Bu modül trend, X ve beta'yı haftanın saatleri için BİR kez çıkarır.
+Senaryolar X'in birkaç hücresini (regressor değeri, tatil kolonu) değiştirir;
+sadece değişen kolonlar (senaryo, saat, kolon) tensörüne yazılır ve tüm
+senaryolar tek bir toplu matris çarpımıyla (senaryo x saat) fiyat matrisine
+çevrilir.
+
+Senaryo formatı:
+    {'name': 'Car bayram', 'overrides': [
+        {'holiday': 'Ramazan_Bayrami', 'day': '2026-10-21'},
+        {'regressor': 'extreme_low_risk', 'value': 1, 'day': '2026-10-23', 'hours': [13]},
+    ]}
+
+    holiday    Modelin tatil adı (train_holiday_names); None = tüm tatillerin
+               ortalama etkisi. Tatilin pencere günleri (ör. bayram ertesi)
+               de işaretlenir.
+    regressor  Modelin regressor'ü; 'value' ham değerdir (standardizasyon
+               burada yapılır). 'day' ve 'hours' (günün saatleri) verilmezse
+               haftanın tüm saatleri.
+
+Kullanım:
+    python scenarios.py                          # aktif model, bu hafta, her gün bayram
+    python scenarios.py 14 --week 2026-10-19 --regressor is_weekend
+"""
+
+import sys
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from calendar_features import add_time_features, add_extreme_low_risk
+
+class ScenarioEngine:
+    """
+    Bir model ve tahmin penceresi için doğrusal tahmin bileşenleri
+
+    Args:
+        model: Eğitilmiş Prophet modeli
+        start (str): İlk tahmin saati (ör. haftanın Pazartesi'si)
+        days (int): Pencere uzunluğu (gün)
+    """
+
+    def __init__(self, model, start, days=7):
+        self.model = model
+        future = pd.DataFrame({'ds': pd.date_range(pd.Timestamp(start), periods=days*24, freq='h')})
+        add_time_features(future)
+        add_extreme_low_risk(future)
+        self.ds = future['ds']
+
+        data = model.setup_dataframe(future[['ds'] + list(model.extra_regressors)].copy())
+        features, _, component_cols, _ = model.make_all_seasonality_features(data)
+        self.trend = np.asarray(model.predict_trend(data), dtype=float)
+        self.columns = {name: i for i, name in enumerate(features.columns)}
+        self.features = features.to_numpy(dtype=float)
+
+        # MAP fit'te tek örnek; MCMC'de örneklerin ortalaması
+        beta = np.mean(model.params['beta'], axis=0)
+        # (kolon, 2): toplamsal katkı (TRY) ve trend çarpanı
+        self.weights = np.column_stack([
+            beta * component_cols['additive_terms'].to_numpy() * model.y_scale,
+            beta * component_cols['multiplicative_terms'].to_numpy(),
+        ])
+        contributions = self.features @ self.weights
+        self.base = self.trend * (1 + contributions[:, 1]) + contributions[:, 0]
+
+        self._days = self.ds.dt.normalize().to_numpy()
+        self._hours = self.ds.dt.hour.to_numpy()
+
+    def _select_hours(self, override):
+        """Override'ın pencere içindeki saat indeksleri"""
+        mask = np.ones(len(self.ds), dtype=bool)
+        if override.get('day') is not None:
+            mask &= self._days == np.datetime64(pd.Timestamp(override['day']))
+        if override.get('hours') is not None:
+            mask &= np.isin(self._hours, override['hours'])
+        return np.flatnonzero(mask)
+
+    def _holiday_cells(self, override):
+        """Tatil override'ı: (saat, kolon, değer) dizileri"""
+        if override.get('day') is None:
+            raise ValueError(f"Tatil senaryosu için 'day' gerekli: {override}")
+        name = override.get('holiday')
+        names = list(self.model.train_holiday_names) if name is None else [name]
+        if not set(names) <= set(self.model.train_holiday_names):
+            raise ValueError(f"Model bu tatili bilmiyor: {name} "
+                             f"(bilinenler: {', '.join(self.model.train_holiday_names)})")
+
+        day = pd.Timestamp(override['day'])
+        hours, cols, values = [], [], []
+        for holiday in names:
+            # Pencere günleri: '<ad>_delim_+0' (gün), '_delim_+1' (ertesi gün) ...
+            for column, index in self.columns.items():
+                prefix, _, offset = column.rpartition('_delim_')
+                if prefix != holiday:
+                    continue
+                selected = self._select_hours({'day': day + pd.Timedelta(days=int(offset))})
+                hours.append(selected)
+                cols.append(np.full(len(selected), index))
+                # Ortalama tatil: her tatilin katkısının 1/n'i
+                values.append(np.full(len(selected), 1.0 / len(names)))
+        return hours, cols, values
+
+    def _regressor_cells(self, override):
+        """Regressor override'ı: (saat, kolon, değer) dizileri"""
+        name = override['regressor']
+        if name not in self.model.extra_regressors:
+            raise ValueError(f"Model bu regressor'ü kullanmıyor: {name} "
+                             f"(kullanılanlar: {', '.join(self.model.extra_regressors)})")
+        spec = self.model.extra_regressors[name]
+        selected = self._select_hours(override)
+        value = (float(override['value']) - spec['mu']) / spec['std']
+        return [selected], [np.full(len(selected), self.columns[name])], [np.full(len(selected), value)]
+
+    def _cells(self, scenarios):
+        """Tüm senaryoların değişen hücreleri: (senaryo, saat, kolon, değer) dizileri"""
+        parts = []
+        for i, scenario in enumerate(scenarios):
+            for override in scenario.get('overrides', []):
+                if 'holiday' in override:
+                    hours, cols, values = self._holiday_cells(override)
+                elif 'regressor' in override:
+                    hours, cols, values = self._regressor_cells(override)
+                else:
+                    raise ValueError(f"Bilinmeyen override: {override}")
+                for h, c, v in zip(hours, cols, values):
+                    parts.append((np.full(len(h), i), h, c, v))
+        if not parts:
+            empty = np.empty(0, dtype=int)
+            return empty, empty, empty, np.empty(0)
+        return tuple(np.concatenate(arrays) for arrays in zip(*parts))
+
+    def evaluate(self, scenarios):
+        """
+        Senaryoların fiyat matrisi (tek toplu matris çarpımı; model.predict yok)
+
+        Args:
+            scenarios: Senaryo dict listesi (modül açıklamasındaki format)
+
+        Returns:
+            pd.DataFrame: index = senaryo adı, kolonlar = ds, değerler = yhat (TRY)
+        """
+        names = [scenario.get('name', f'senaryo_{i}') for i, scenario in enumerate(scenarios)]
+        rows, hours, cols, values = self._cells(scenarios)
+
+        # Sadece en az bir senaryonun değiştirdiği kolonlar
+        touched, slots = np.unique(cols, return_inverse=True)
+        baseline = self.features[:, touched]
+        overridden = np.broadcast_to(baseline, (len(scenarios),) + baseline.shape).copy()
+        overridden[rows, hours, slots] = values
+
+        # (senaryo, saat, kolon) @ (kolon, 2) -> (senaryo, saat, 2)
+        delta = (overridden - baseline) @ self.weights[touched]
+        yhat = self.base + delta[..., 0] + self.trend * delta[..., 1]
+        return pd.DataFrame(yhat, index=pd.Index(names, name='scenario'), columns=self.ds)
+
+def holiday_scenarios(engine, holiday=None):
+    """
+    Penceredeki her gün için 'bu gün tatil olsaydı' senaryosu
+
+    Args:
+        engine: ScenarioEngine
+        holiday (str, optional): Tatil adı (None = ortalama tatil)
+
+    Returns:
+        list: Senaryo dict'leri
+    """
+    return [
+        {'name': f"{day:%Y-%m-%d} tatil", 'overrides': [{'holiday': holiday, 'day': day}]}
+        for day in engine.ds.dt.normalize().drop_duplicates()
+    ]
+
+def regressor_scenarios(engine, regressor, value=1):
+    """
+    Penceredeki her saat için 'bu saat regressor=value olsaydı' senaryosu
+
+    Args:
+        engine: ScenarioEngine
+        regressor (str): Regressor adı (ör. extreme_low_risk)
+        value: Ham regressor değeri
+
+    Returns:
+        list: Senaryo dict'leri (saat başına bir tane)
+    """
+    return [
+        {'name': f"{ds:%Y-%m-%d %H}:00 {regressor}={value}",
+         'overrides': [{'regressor': regressor, 'value': value, 'day': ds.normalize(), 'hours': [ds.hour]}]}
+        for ds in engine.ds
+    ]
+
+def main():
+    """Komut satırı: gün/saat bazında senaryo etkileri"""
+    from model_registry import active_version, load_version
+    from export_json import get_current_week_monday
+
+    parser = argparse.ArgumentParser(description='What-if senaryo analizi')
+    parser.add_argument('version', nargs='?', type=int, help='Registry sürümü (varsayılan: aktif prophet)')
+    parser.add_argument('--week', default=None, help='Haftanın Pazartesi\'si (YYYY-MM-DD)')
+    parser.add_argument('--holiday', default=None, help='Tatil adı (varsayılan: ortalama tatil)')
+    parser.add_argument('--regressor', default=None, help='Saat bazında override edilecek regressor')
+    parser.add_argument('--value', type=float, default=1, help='Regressor değeri')
+    parser.add_argument('--top', type=int, default=10, help='Gösterilecek en etkili senaryo sayısı')
+    args = parser.parse_args()
+
+    version = args.version
+    if version is None:
+        entry = active_version('prophet')
+        if entry is None:
+            print("[!] Registry'de aktif model yok")
+            sys.exit(1)
+        version = entry['version']
+    week_start = args.week or get_current_week_monday()
+
+    start_time = time.perf_counter()
+    engine = ScenarioEngine(load_version(version), week_start)
+    if args.regressor:
+        scenarios = regressor_scenarios(engine, args.regressor, args.value)
+    else:
+        scenarios = holiday_scenarios(engine, args.holiday)
+    try:
+        matrix = engine.evaluate(scenarios)
+    except ValueError as e:
+        print(f"[!] {e}")
+        sys.exit(1)
+    elapsed = time.perf_counter() - start_time
+
+    delta = matrix - engine.base
+    summary = pd.DataFrame({
+        'mean_delta': delta.mean(axis=1),
+        'min_delta': delta.min(axis=1),
+        'max_delta': delta.max(axis=1),
+    })
+    summary = summary.reindex(summary['mean_delta'].abs().sort_values(ascending=False).index)
+
+    print("="*70)
+    print(f"SENARYO ANALIZI: v{version}, hafta {week_start}")
+    print("="*70)
+    print(f"   Baz haftalık ortalama: {engine.base.mean():.2f} TRY")
+    print(f"   {len(scenarios)} senaryo x {len(engine.ds)} saat ({elapsed:.2f} s)")
+    print(f"\n{'Senaryo':40}{'Ort. Δ':>10}{'Min Δ':>10}{'Maks Δ':>10}")
+    print("-"*70)
+    for name, row in summary.head(args.top).iterrows():
+        print(f"{name:40}{row['mean_delta']:>10.2f}{row['min_delta']:>10.2f}{row['max_delta']:>10.2f}")
+    print("="*70)
+
+if __name__ == "__main__":
+    main()
@@ -6,54 +6,29 @@ Mevcut modelin farklı zaman dilimlerindeki performansını kontrol eder
 
 import pandas as pd
 import numpy as np
-from prophet.serialize import model_from_json
-import sqlite3
 from datetime import timedelta
-import os
-
-DB_PATH = os.path.join(os.path.dirname(__file__), '../../data/energy.db')
-MODEL_PATH = os.path.join(os.path.dirname(__file__), '../../models/prophet_model.json')
-
-def load_data():
-    """Veri tabanından veri yükle"""
-    conn = sqlite3.connect(DB_PATH)
-    query = "SELECT date as ds, price as y FROM mcp_data ORDER BY date"
-    df = pd.read_sql_query(query, conn)
-    conn.close()
-    df['ds'] = pd.to_datetime(df['ds']).dt.tz_localize(None)
-    return df
-
-def load_model():
-    """Eğitilmiş modeli yükle"""
-    with open(MODEL_PATH, 'r') as f:
-        model = model_from_json(f.read())
-    return model
-
-def evaluate_period(model, test_data, period_name):
-    """Belirli bir dönem için tahmin yap ve değerlendir"""
+
+from hourly_facts import refresh_pending_facts
+from evaluation import EvaluationEngine, metrics
+
+def evaluate_period(engine, start, end, period_name):
+    """Belirli bir dönem için aktif modelin performansını değerlendir"""
+    # Fitted değerler model_predictions tablosundan (yoksa bir kez tahmin edilir)
+    test_data = engine.predict_active(start, end)
+
     print(f"\n{'='*60}")
     print(f"Donem: {period_name}")
     print(f"{'='*60}")
     print(f"Tarih araligi: {test_data['ds'].min()} -> {test_data['ds'].max()}")
     print(f"Kayit sayisi: {len(test_data)}")
 
-    # Tahmin
-    forecast = model.predict(test_data[['ds']])
-
-    # Metrikler
-    y_true = test_data['y'].values
-    y_pred = forecast['yhat'].values
-
-    mae = np.mean(np.abs(y_true - y_pred))
-    rmse = np.sqrt(np.mean((y_true - y_pred)**2))
-
-    mask = y_true != 0
-    mape = np.mean(np.abs((y_true[mask] - y_pred[mask]) / y_true[mask])) * 100 if mask.sum() > 0 else 0
+    # Metrikler (MAPE: 0 TRY hariç)
+    result = metrics(test_data, mape_mask='nonzero')
+    mae, rmse, mape = result['mae'], result['rmse'], result['mape']
 
     # Residual analizi
-    residuals = y_true - y_pred
-    residual_mean = np.mean(residuals)
-    residual_std = np.std(residuals)
+    residual_mean = result['bias']
+    residual_std = result['residual_std']
 
     print(f"\nPerformans Metrikleri:")
     print(f"  MAE:  {mae:.2f} TRY")
@@ -78,51 +53,34 @@ def main():
     print("Overfitting Kontrolu - Mevcut Modelin Tutarliligi")
     print("="*60)
 
-    # Model ve veri yükle
-    print("\n[*] Model yukleniyor...")
-    model = load_model()
-    print("[*] Veri yukleniyor...")
-    df = load_data()
+    # Son sync'te gelen saatler hourly_facts'e işlenir
+    refresh_pending_facts()
+    # Veri yükle (model sadece kayıtlı tahmin yoksa yüklenir)
+    print("\n[*] Veri yukleniyor...")
+    engine = EvaluationEngine()
+    df = engine.df
 
-    # Farklı zaman dilimlerini tanımla
+    # Farklı zaman dilimlerini tanımla: (ad, başlangıç, bitiş - dahil değil)
     periods = []
 
     # İlk 3 ay (Ekim-Aralık 2023)
     p1_start = df['ds'].min()
-    p1_end = p1_start + timedelta(days=90)
-    periods.append({
-        'name': 'Ilk 3 Ay (2023 Ekim-Aralik)',
-        'data': df[(df['ds'] >= p1_start) & (df['ds'] < p1_end)]
-    })
+    periods.append(('Ilk 3 Ay (2023 Ekim-Aralik)', p1_start, p1_start + timedelta(days=90)))
 
     # Orta dönem - Yaz 2024 (Haziran-Ağustos)
-    p2_start = pd.to_datetime('2024-06-01')
-    p2_end = pd.to_datetime('2024-09-01')
-    periods.append({
-        'name': 'Yaz Donemi (2024 Haziran-Agustos)',
-        'data': df[(df['ds'] >= p2_start) & (df['ds'] < p2_end)]
-    })
+    periods.append(('Yaz Donemi (2024 Haziran-Agustos)', pd.to_datetime('2024-06-01'), pd.to_datetime('2024-09-01')))
 
     # Kış 2024-2025 (Aralık-Şubat)
-    p3_start = pd.to_datetime('2024-12-01')
-    p3_end = pd.to_datetime('2025-03-01')
-    periods.append({
-        'name': 'Kis Donemi (2024 Aralik-2025 Subat)',
-        'data': df[(df['ds'] >= p3_start) & (df['ds'] < p3_end)]
-    })
+    periods.append(('Kis Donemi (2024 Aralik-2025 Subat)', pd.to_datetime('2024-12-01'), pd.to_datetime('2025-03-01')))
 
     # Son 60 gün
-    p4_start = df['ds'].max() - timedelta(days=60)
-    periods.append({
-        'name': 'Son 60 Gun (2025 Agustos-Ekim)',
-        'data': df[df['ds'] >= p4_start]
-    })
+    periods.append(('Son 60 Gun (2025 Agustos-Ekim)', df['ds'].max() - timedelta(days=60), None))
 
     # Her dönemi değerlendir
     results = []
-    for period in periods:
-        if len(period['data']) > 0:
-            result = evaluate_period(model, period['data'], period['name'])
+    for name, start, end in periods:
+        if len(engine.window(start, end)) > 0:
+            result = evaluate_period(engine, start, end, name)
             results.append(result)
 
     # Sonuçları özetle
@@ -0,0 +1,273 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+EPİAŞ MCP Fiyat Tahmini - Sentetik Piyasa Verisi Üreteci
+========================================================
+
+Benchmark ve yük testleri için gerçekçi ama deterministik saatlik veri üretir
+ve ayrı bir (scratch) SQLite dosyasına yazar:
+
+- mcp_data: günlük profil (gece düşük, akşam peak, öğlen güneş çukuru),
+  haftalık desen, yıllık mevsimsellik, enflasyon trendi
+- Bahar/yaz Pazar öğlenleri ve bayramlarda 0 TRY saatler
+- generation_data: güneş (gündüz çan eğrisi), rüzgar, hidro (ilkbahar) ve
+  kalan termik üretim; total = bileşenlerin toplamı
+- consumption_data: günlük/haftalık/yıllık desen, tatillerde düşüş
+
+Tablolar Node tarafındaki (services/database.ts) şema ile aynıdır; üzerine
+forecast tabloları ve ts kolonları eklenir. Aynı seed ve yıl sayısı her
+zaman aynı veriyi üretir.
+
+Kullanım:
+    python src/ml/synthetic_data.py --years 5 --output /tmp/synthetic_5y.db
+"""
+
+import os
+import sqlite3
+import argparse
+import numpy as np
+import pandas as pd
+
+from calendar_features import holiday_days
+from epoch_hours import migrate_epoch_hours
+from init_db_tables import create_forecast_tables
+from hourly_facts import GENERATION_COLUMNS
+
+# Veri bu Pazartesi'den (dahil değil) geriye doğru üretilir; sabit olması
+# farklı günlerde çalışan benchmark'ların aynı veriyi görmesini sağlar
+DEFAULT_END_DATE = '2025-10-27'
+
+DEFAULT_SEED = 42
+
+# EPİAŞ azami uzlaştırma fiyatı (TRY/MWh)
+PRICE_CAP = 3400.0
+
+SOURCE_TABLES_SQL = """
+    CREATE TABLE IF NOT EXISTS mcp_data (
+      id INTEGER PRIMARY KEY AUTOINCREMENT,
+      date TEXT NOT NULL,
+      hour TEXT NOT NULL,
+      price REAL NOT NULL,
+      price_usd REAL,
+      price_eur REAL,
+      created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+      UNIQUE(date, hour)
+    );
+    CREATE INDEX IF NOT EXISTS idx_mcp_date ON mcp_data(date);
+    CREATE INDEX IF NOT EXISTS idx_mcp_date_hour ON mcp_data(date, hour);
+
+    CREATE TABLE IF NOT EXISTS generation_data (
+      id INTEGER PRIMARY KEY AUTOINCREMENT,
+      date TEXT NOT NULL,
+      hour TEXT NOT NULL,
+      total REAL NOT NULL,
+      biomass REAL,
+      fueloil REAL,
+      geothermal REAL,
+      hydro REAL,
+      import_export REAL,
+      lignite REAL,
+      lng REAL,
+      natural_gas REAL,
+      naphtha REAL,
+      river REAL,
+      solar REAL,
+      wind REAL,
+      wasteheat REAL,
+      asphaltite_coal REAL,
+      black_coal REAL,
+      import_coal REAL,
+      created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+      UNIQUE(date, hour)
+    );
+    CREATE INDEX IF NOT EXISTS idx_generation_date ON generation_data(date);
+    CREATE INDEX IF NOT EXISTS idx_generation_date_hour ON generation_data(date, hour);
+
+    CREATE TABLE IF NOT EXISTS consumption_data (
+      id INTEGER PRIMARY KEY AUTOINCREMENT,
+      date TEXT NOT NULL,
+      hour TEXT NOT NULL,
+      consumption REAL NOT NULL,
+      created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+      UNIQUE(date, hour)
+    );
+    CREATE INDEX IF NOT EXISTS idx_consumption_date ON consumption_data(date);
+    CREATE INDEX IF NOT EXISTS idx_consumption_date_hour ON consumption_data(date, hour);
+"""
+
+# Termik/diğer kaynakların kalan üretimdeki payları (toplam 1)
+THERMAL_SHARES = {
+    'natural_gas': 0.30, 'import_coal': 0.22, 'lignite': 0.20, 'river': 0.07,
+    'geothermal': 0.04, 'biomass': 0.04, 'black_coal': 0.03, 'import_export': 0.03,
+    'asphaltite_coal': 0.02, 'lng': 0.02, 'wasteheat': 0.015, 'fueloil': 0.01,
+    'naphtha': 0.005,
+}
+
+def hourly_index(years, end_date=DEFAULT_END_DATE):
+    """Bitiş tarihinden geriye 'years' yıllık saatlik Türkiye saati indeksi"""
+    end = pd.Timestamp(end_date)
+    start = end - pd.DateOffset(years=years)
+    return pd.date_range(start, end, freq='h', inclusive='left')
+
+def generate_market_data(years, seed=DEFAULT_SEED, end_date=DEFAULT_END_DATE):
+    """
+    Saatlik fiyat, üretim ve tüketim verisini üretir (vektörel)
+
+    Args:
+        years (int): Kaç yıllık veri
+        seed (int): Rastgele sayı üreteci seed'i
+        end_date (str): Bitiş tarihi (dahil değil)
+
+    Returns:
+        pd.DataFrame: ds, price, consumption ve GENERATION_COLUMNS kolonları
+    """
+    rng = np.random.default_rng(seed)
+    ds = hourly_index(years, end_date)
+    n = len(ds)
+
+    hour = ds.hour.to_numpy()
+    dow = ds.dayofweek.to_numpy()
+    day_of_year = ds.dayofyear.to_numpy()
+    month = ds.month.to_numpy()
+    years_elapsed = np.arange(n) / (24 * 365.25)
+    day_index = np.arange(n) // 24
+
+    holidays = holiday_days(range(ds[0].year, ds[-1].year + 1))
+    is_holiday = pd.Index(ds.date).isin(holidays)
+    is_sunday = dow == 6
+    is_saturday = dow == 5
+
+    # --- Tüketim (MWh) ---
+    daily_load = 0.82 + 0.18 * np.clip(np.sin(np.pi * (hour - 5) / 17), 0, None) + 0.05 * (hour >= 18) * (hour <= 22)
+    yearly_load = 1 + 0.10 * np.cos(2 * np.pi * (day_of_year - 20) / 365.25) + 0.08 * np.exp(-((day_of_year - 210) / 30.0) ** 2)
+    weekly_load = np.where(is_sunday, 0.85, np.where(is_saturday, 0.93, 1.0))
+    consumption = 36000 * daily_load * yearly_load * weekly_load * (1 + 0.02 * years_elapsed)
+    consumption *= np.where(is_holiday, 0.82, 1.0)
+    consumption *= 1 + rng.normal(0, 0.015, n)
+
+    # --- Yenilenebilir üretim ---
+    daylight = np.clip(np.sin(np.pi * (hour - 6) / 13), 0, None)
+    solar_season = 0.65 + 0.35 * np.sin(2 * np.pi * (day_of_year - 80) / 365.25)
+    cloud = np.repeat(rng.uniform(0.55, 1.0, day_index[-1] + 1), 24)[:n]
+    solar = 9000 * (1 + 0.25 * years_elapsed) * daylight * solar_season * cloud
+
+    wind_daily = np.repeat(rng.gamma(2.0, 0.5, day_index[-1] + 1), 24)[:n]
+    wind = np.clip(3500 * wind_daily * (1 + 0.2 * np.sin(2 * np.pi * hour / 24)) + rng.normal(0, 300, n), 0, 12000)
+
+    hydro_season = 0.55 + 0.45 * np.exp(-((day_of_year - 130) / 45.0) ** 2)
+    hydro = 8000 * hydro_season * (0.9 + 0.2 * daylight) * (1 + rng.normal(0, 0.05, n))
+
+    # --- Kalan talep termik kaynaklardan (en az bir baz yük) ---
+    residual = consumption - solar - wind - hydro
+    thermal = np.maximum(residual, 6000)
+    generation = {'solar': solar, 'wind': wind, 'hydro': hydro}
+    for source, share in THERMAL_SHARES.items():
+        generation[source] = thermal * share * (1 + rng.normal(0, 0.03, n))
+    total = sum(generation.values())
+
+    # --- Fiyat (TRY/MWh) ---
+    base = 1400 * (1 + 0.35) ** years_elapsed                       # enflasyon trendi
+    daily_price = 1 + 0.25 * np.sin(np.pi * (hour - 6) / 16) * (hour >= 6) + 0.20 * ((hour >= 18) & (hour <= 21))
+    yearly_price = 1 + 0.15 * np.cos(2 * np.pi * (day_of_year - 15) / 365.25) + 0.12 * np.exp(-((day_of_year - 215) / 25.0) ** 2)
+    scarcity = np.clip(residual / consumption, 0.05, 1.0) ** 0.6     # yenilenebilir payı yüksekse ucuz
+    daily_shock = np.repeat(rng.normal(0, 0.08, day_index[-1] + 1), 24)[:n]
+    price = base * daily_price * yearly_price * scarcity * (1 + daily_shock + rng.normal(0, 0.05, n))
+    price *= np.where(is_sunday, 0.80, np.where(is_saturday, 0.92, 1.0))
+    price *= np.where(is_holiday, 0.70, 1.0)
+
+    # Güneşli bahar/yaz Pazar ve bayram öğlenleri: arz fazlası -> 0 TRY
+    midday = (hour >= 10) & (hour <= 15)
+    spring_summer = (month >= 3) & (month <= 8)
+    zero_candidate = midday & ((is_sunday & spring_summer) | is_holiday)
+    price = np.where(zero_candidate & (rng.random(n) < 0.6), 0.0, price)
+    price = np.round(np.clip(price, 0, PRICE_CAP), 2)
+
+    df = pd.DataFrame({'ds': ds, 'price': price, 'consumption': np.round(consumption, 2)})
+    for column in GENERATION_COLUMNS:
+        if column == 'total':
+            continue
+        df[column] = np.round(generation[column], 2)
+    df['total'] = df[[c for c in GENERATION_COLUMNS if c != 'total']].sum(axis=1).round(2)
+    return df
+
+def create_source_tables(conn):
+    """mcp_data, generation_data ve consumption_data tablolarını oluşturur (Node şeması)"""
+    conn.executescript(SOURCE_TABLES_SQL)
+
+def write_market_data(conn, df):
+    """
+    Üretilen veriyi kaynak tablolara toplu yazar
+
+    Args:
+        conn: SQLite bağlantısı
+        df: generate_market_data() çıktısı
+    """
+    # Node sync ile aynı metin formatları
+    dates = df['ds'].dt.strftime('%Y-%m-%dT%H:%M:%S+03:00').tolist()
+    hours = df['ds'].dt.strftime('%H:%M').tolist()
+
+    conn.executemany(
+        "INSERT INTO mcp_data (date, hour, price) VALUES (?, ?, ?)",
+        zip(dates, hours, df['price'].tolist())
+    )
+    generation_sql = ', '.join(GENERATION_COLUMNS)
+    conn.executemany(
+        f"INSERT INTO generation_data (date, hour, {generation_sql}) "
+        f"VALUES (?, ?, {', '.join('?' * len(GENERATION_COLUMNS))})",
+        zip(dates, hours, *(df[column].tolist() for column in GENERATION_COLUMNS))
+    )
+    conn.executemany(
+        "INSERT INTO consumption_data (date, hour, consumption) VALUES (?, ?, ?)",
+        zip(dates, hours, df['consumption'].tolist())
+    )
+
+def build_database(path, years, seed=DEFAULT_SEED, end_date=DEFAULT_END_DATE):
+    """
+    Verilen yola sıfırdan sentetik veri tabanı oluşturur
+
+    Args:
+        path (str): SQLite dosya yolu (varsa silinir)
+        years (int): Kaç yıllık veri
+        seed (int): Rastgele sayı üreteci seed'i
+        end_date (str): Bitiş tarihi (dahil değil)
+
+    Returns:
+        int: Üretilen saat sayısı
+    """
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+    df = generate_market_data(years, seed=seed, end_date=end_date)
+
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    create_source_tables(conn)
+    create_forecast_tables(conn)
+    write_market_data(conn, df)
+    conn.commit()
+    migrate_epoch_hours(conn)
+    conn.close()
+
+    return len(df)
+
+def main():
+    """Komut satırından sentetik veri tabanı üretir"""
+    parser = argparse.ArgumentParser(description='Sentetik EPİAŞ veri tabanı üretir')
+    parser.add_argument('--years', type=int, default=2, help='Kaç yıllık veri (varsayılan 2)')
+    parser.add_argument('--output', required=True, help='Oluşturulacak SQLite dosyası')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--end-date', default=DEFAULT_END_DATE, help='Bitiş tarihi (dahil değil)')
+    args = parser.parse_args()
+
+    print("="*70)
+    print(f"SENTETİK VERİ: {args.years} yıl -> {args.output}")
+    print("="*70)
+
+    hours = build_database(args.output, args.years, seed=args.seed, end_date=args.end_date)
+
+    print(f"[+] {hours} saat yazıldı ({os.path.getsize(args.output) / 1024 / 1024:.1f} MB)")
+    print("="*70)
+
+if __name__ == "__main__":
+    main()
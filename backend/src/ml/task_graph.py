@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+EPİAŞ MCP Fiyat Tahmini - Küçük Bağımlılık Grafı Çalıştırıcı
+============================================================
+
+Birbirinden bağımsız pipeline adımlarını paralel çalıştırır:
+
+- Her Task, bağımlılıkları (deps) başarıyla bittiğinde başlar
+- 'after' sadece sıralama içindir: o adımlar bitince (başarılı ya da değil) başlar
+- Bir adım hata verirse sadece ona (deps ile) bağlı adımlar 'skipped' olur;
+  diğer dallar çalışmaya devam eder
+- Adımlar thread havuzunda çalışır; process=True olanlar (ör. matplotlib
+  pyplot, thread-safe değil) ayrı bir süreçte çalıştırılır ve thread sadece
+  sonucu bekler
+
+Kullanım:
+    results = run_graph([
+        Task('compare', compare_step),
+        Task('train', train_step),
+        Task('forecast', forecast_step, deps=('train',)),
+    ])
+    results['train'].ok
+"""
+
+import time
+import traceback
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from instrumentation import span, current_span, attach
+
+# Aynı anda çalışacak en fazla adım (haftalık grafın genişliği 3)
+MAX_WORKERS = 4
+
+class Task:
+    """
+    Graf düğümü
+
+    Args:
+        name (str): Adım adı (span adı olarak da kullanılır)
+        func: Çağrılacak fonksiyon; deps sonuçlarını keyword argüman olarak alır
+        deps (tuple): Başarıyla bitmesi gereken adımlar (değerleri func'a geçer)
+        after (tuple): Sadece bitmesi beklenen adımlar
+        process (bool): Ayrı süreçte çalıştır (func ve argümanları pickle'lanabilir olmalı)
+    """
+
+    def __init__(self, name, func, deps=(), after=(), process=False):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.after = tuple(after)
+        self.process = process
+
+class TaskResult:
+    """Adımın sonucu: status 'ok' | 'failed' | 'skipped'"""
+
+    def __init__(self, status, value=None, error=None, seconds=0.0):
+        self.status = status
+        self.value = value
+        self.error = error
+        self.seconds = seconds
+
+    @property
+    def ok(self):
+        return self.status == 'ok'
+
+def _run_measured(func, kwargs):
+    """Süreç havuzunda çalışır: sonuç ve worker sürecin harcadığı CPU süresi"""
+    cpu_start = time.process_time()
+    value = func(**kwargs)
+    return value, time.process_time() - cpu_start
+
+def _execute(task, kwargs, process_pool, parent):
+    """Worker thread'de adımı çalıştırır (process adımları için süreci bekler)"""
+    start = time.perf_counter()
+    with attach(parent):
+        try:
+            with span(task.name) as current:
+                if task.process:
+                    # Havuz süreci adım bitince beklenmediği için RUSAGE_CHILDREN'da
+                    # görünmez; CPU'su worker'da ölçülüp span'e eklenir
+                    value, cpu = process_pool.submit(_run_measured, task.func, kwargs).result()
+                    current.external_cpu_seconds += cpu
+                else:
+                    value = task.func(**kwargs)
+            return TaskResult('ok', value, seconds=time.perf_counter() - start)
+        except Exception as e:
+            print(f"\n❌ {task.name} HATA: {e}")
+            traceback.print_exc()
+            return TaskResult('failed', error=e, seconds=time.perf_counter() - start)
+
+def run_graph(tasks, max_workers=MAX_WORKERS):
+    """
+    Görevleri bağımlılık sırasına göre paralel çalıştırır
+
+    Args:
+        tasks (list): Task listesi (isimler benzersiz)
+        max_workers (int): Thread havuzu boyutu
+
+    Returns:
+        dict: {isim: TaskResult}
+    """
+    by_name = {task.name: task for task in tasks}
+    for task in tasks:
+        unknown = (set(task.deps) | set(task.after)) - set(by_name)
+        if unknown:
+            raise ValueError(f"{task.name}: bilinmeyen bağımlılık {sorted(unknown)}")
+
+    results = {}
+    running = {}
+    pending = list(tasks)
+    parent = current_span()
+    process_pool = None
+    if any(task.process for task in tasks):
+        # fork + thread'ler kilitlenmeye yol açabilir; spawn güvenli
+        process_pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'))
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='step') as pool:
+            while pending or running:
+                # Atlanan bir adım başka adımları da hazır hale getirebilir
+                progressed = True
+                while progressed:
+                    progressed = False
+                    for task in list(pending):
+                        waits_for = task.deps + task.after
+                        if not all(name in results for name in waits_for):
+                            continue
+                        pending.remove(task)
+                        progressed = True
+                        failed = [name for name in task.deps if not results[name].ok]
+                        if failed:
+                            print(f"\n⏭️  {task.name} atlandı ({', '.join(failed)} başarısız)")
+                            results[task.name] = TaskResult('skipped')
+                            continue
+                        kwargs = {name: results[name].value for name in task.deps}
+                        running[pool.submit(_execute, task, kwargs, process_pool, parent)] = task.name
+
+                if not running:
+                    if pending:
+                        raise ValueError(f"Döngüsel bağımlılık: {[task.name for task in pending]}")
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[running.pop(future)] = future.result()
+    finally:
+        if process_pool is not None:
+            process_pool.shutdown()
+
+    return results
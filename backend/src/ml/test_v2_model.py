@@ -4,18 +4,16 @@
 v2 Model Test - Extreme price handling kontrolu
 """
 
-import pandas as pd
 import numpy as np
-import sqlite3
-from datetime import timedelta
-import os
-
-DB_PATH = os.path.join(os.path.dirname(__file__), '../../data/energy.db')
 
 # v2 model egitimi yaptik, simdi manuel test yapalim
-# Model dosyasini yukleyemiyoruz (bug), ama egitim scriptini import edebiliriz
+# Holdout icin model yeniden egitilir; veri ve metrikler ortak motordan
 
-from train_prophet_improved import load_data, create_holidays, add_extreme_low_regressor
+from train_prophet_improved import create_holidays
+from hourly_facts import refresh_pending_facts
+from evaluation import EvaluationEngine, mask_variants
+from epoch_hours import local_to_epoch_hours
+from price_profile import compute_profile, lookup
 from prophet import Prophet
 
 def test_v2_performance():
@@ -24,14 +22,16 @@ def test_v2_performance():
     print("v2 MODEL TEST - Extreme Price Handling")
     print("="*70)
 
-    # Veri yukle
-    df = load_data()
-    df = add_extreme_low_regressor(df)
+    # hourly_facts'i güncelle (load_facts yalnızca okur)
+    refresh_pending_facts()
+    # Veri yukle (extreme_low_risk kolonu dahil)
+    engine = EvaluationEngine()
+    df = engine.df
 
     # Son 60 gun test
-    test_start = df['ds'].max() - timedelta(days=60)
-    train = df[df['ds'] <= test_start]
-    test = df[df['ds'] > test_start]
+    test_start = engine.last_days(60)
+    train = df[df['ds'] < test_start]
+    test = engine.window(test_start)
 
     print(f"\n[*] Train: {len(train)} kayit")
     print(f"[*] Test:  {len(test)} kayit")
@@ -59,26 +59,19 @@ def test_v2_performance():
 
     # Tahmin
     print(f"\n[*] Test seti icin tahmin yapiliyor...")
-    test_with_reg = add_extreme_low_regressor(test)
-    forecast = model.predict(test_with_reg[['ds', 'extreme_low_risk']])
-
-    # Degerlendir
-    y_true = test['y'].values
-    y_pred = forecast['yhat'].values
+    frame = engine.predict(model, test_start, key='v2_holdout')
 
-    # Tum veri
-    mae_all = np.mean(np.abs(y_true - y_pred))
-    rmse_all = np.sqrt(np.mean((y_true - y_pred)**2))
+    # Degerlendir: tum veri, normal (>=100), ekstrem (<100)
+    variants = mask_variants(frame, names=('all', 'ge100', 'lt100'), mape_mask='ge100')
+    mae_all, rmse_all = variants.loc['all', 'mae'], variants.loc['all', 'rmse']
+    mae_normal, mape_normal = variants.loc['ge100', 'mae'], variants.loc['ge100', 'mape']
+    mae_extreme = variants.loc['lt100', 'mae']
 
-    # Normal (>=100)
+    y_true = frame['y'].values
+    y_pred = frame['yhat'].values
     normal_mask = y_true >= 100
-    mae_normal = np.mean(np.abs(y_true[normal_mask] - y_pred[normal_mask]))
-    mape_normal = np.mean(np.abs((y_true[normal_mask] - y_pred[normal_mask]) / y_true[normal_mask])) * 100
-
-    # Ekstrem (<100)
     extreme_mask = y_true < 100
     extreme_count = extreme_mask.sum()
-    mae_extreme = np.mean(np.abs(y_true[extreme_mask] - y_pred[extreme_mask])) if extreme_count > 0 else 0
 
     # Rapor
     print(f"\n{'='*70}")
@@ -121,9 +114,19 @@ def test_v2_performance():
     print(f"\nNaive Model (yarin = bugun):")
     print(f"  MAE: {naive_mae:.2f} TRY")
 
+    # Mevsimsel naive: egitim verisinin haftanin saati profili (test sizintisi yok)
+    profile = compute_profile(local_to_epoch_hours(train['ds']), train['y'])
+    seasonal_pred = lookup(local_to_epoch_hours(frame['ds']), 'ew_mean', profile=profile)
+    seasonal_mae = np.nanmean(np.abs(y_true - seasonal_pred))
+
+    print(f"\nMevsimsel Naive (haftanin saati profili, EW ortalama):")
+    print(f"  MAE: {seasonal_mae:.2f} TRY")
+
     improvement = ((naive_mae - mae_all) / naive_mae) * 100
+    seasonal_improvement = ((seasonal_mae - mae_all) / seasonal_mae) * 100
     print(f"\nv2 Prophet Iyilesmesi:")
-    print(f"  {improvement:.1f}% daha iyi!")
+    print(f"  {improvement:.1f}% daha iyi! (naive)")
+    print(f"  {seasonal_improvement:.1f}% (mevsimsel naive)")
 
     # Sonuc
     print(f"\n{'='*70}")
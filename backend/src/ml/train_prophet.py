@@ -13,18 +13,51 @@ Bu script:
 """
 
 import pandas as pd
-import numpy as np
-from prophet import Prophet
-import sqlite3
-import json
-from datetime import datetime, timedelta
+import time
 import matplotlib.pyplot as plt
 import os
 
-# Veri tabanı yolu
-DB_PATH = os.path.join(os.path.dirname(__file__), '../../data/energy.db')
+from epoch_hours import to_epoch_hour
+from hourly_facts import load_facts, refresh_pending_facts
+from calendar_features import BAYRAM_DAYS, add_time_features
+from instrumentation import span
+from evaluation import EvaluationEngine, metrics
+
+# Model yolu
 MODEL_PATH = os.path.join(os.path.dirname(__file__), '../../models/prophet_model.json')
 
+# Prophet ayarları (checkpoint anahtarına da girer; değişince model yeniden eğitilir)
+MODEL_CONFIG = {
+    # Mevsimsellik ayarları
+    'daily_seasonality': True,    # Gün içi saatlik desenleri yakala (00:00-23:00)
+    'weekly_seasonality': True,   # Hafta sonu etkisini yakala (Pazar 0 TRY fiyatları)
+    'yearly_seasonality': True,   # Mevsimsel desenleri yakala (yaz/kış)
+
+    # Değişim noktaları (trend değişiklikleri)
+    'changepoint_prior_scale': 0.05,  # Trend esnekliği (düşük = daha stabil)
+
+    # Bayram etkisi gücü
+    'holidays_prior_scale': 10.0,  # Yüksek = bayramlar güçlü etki
+
+    # Mevsimsellik esnekliği
+    'seasonality_prior_scale': 10.0,
+
+    # Tahmin aralığı genişliği
+    'interval_width': 0.95,  # %95 güven aralığı
+}
+
+# Türkiye resmi tatilleri (23 Nisan, 1 Mayıs, 19 Mayıs, 30 Ağustos, 29 Ekim)
+COUNTRY_HOLIDAYS = 'TR'
+
+# FEATURE ENGINEERING: Ekstra bilgiler regressor olarak (prior_scale)
+REGRESSORS = {
+    'hour': 5.0,           # Saat bilgisi (gece vs gündüz)
+    'is_weekend': 15.0,    # Hafta sonu etkisi güçlü
+    'is_peak_hour': 10.0,  # Peak saat etkisi
+    'is_daytime': 12.0,    # Güneş enerjisi etkisi
+    'day_of_week': 3.0,    # Haftanın günü
+}
+
 def load_data_from_db(end_date=None):
     """
     SQLite veri tabanından MCP verilerini yükler
@@ -41,33 +74,11 @@ def load_data_from_db(end_date=None):
     if end_date:
         print(f"[*] Data leakage önleme: {end_date} tarihine KADAR veri kullanılacak (dahil değil)")
 
-    conn = sqlite3.connect(DB_PATH)
-
-    # MCP verilerini çek (date kolonu zaten ISO8601 formatında tam tarih-saat içeriyor)
-    if end_date:
-        query = """
-            SELECT
-                date as ds,
-                price as y
-            FROM mcp_data
-            WHERE date < ?
-            ORDER BY date
-        """
-        df = pd.read_sql_query(query, conn, params=[end_date])
-    else:
-        query = """
-            SELECT
-                date as ds,
-                price as y
-            FROM mcp_data
-            ORDER BY date
-        """
-        df = pd.read_sql_query(query, conn)
-
-    conn.close()
-
-    # Tarih formatını düzelt ve timezone kaldır (Prophet timezone desteklemiyor)
-    df['ds'] = pd.to_datetime(df['ds']).dt.tz_localize(None)
+    # hourly_facts'ten tek ardışık ts aralığı (salt-okunur; tabloyu giriş noktaları günceller)
+    end_ts = to_epoch_hour(end_date) if end_date else None
+    with span('sql_read') as step:
+        df = load_facts(end_ts=end_ts, columns=('price AS y',))
+        step.rows = len(df)
 
     print(f"[+] {len(df)} kayit yuklendi")
     print(f"[*] Tarih araligi: {df['ds'].min()} -> {df['ds'].max()}")
@@ -77,20 +88,10 @@ def load_data_from_db(end_date=None):
     # FEATURE ENGINEERING: Ekstra bilgiler ekle
     print("\n[*] Feature engineering yapiliyor...")
 
-    # 1. Saat bilgisi (0-23)
-    df['hour'] = df['ds'].dt.hour
-
-    # 2. Hafta sonu mu? (Cumartesi=5, Pazar=6)
-    df['is_weekend'] = (df['ds'].dt.dayofweek >= 5).astype(int)
-
-    # 3. Peak saat mi? (Sabah 8-10, Akşam 18-21)
-    df['is_peak_hour'] = df['hour'].isin([8, 9, 10, 18, 19, 20, 21]).astype(int)
-
-    # 4. Gündüz mü? (Güneş var, 10:00-16:00)
-    df['is_daytime'] = df['hour'].isin(range(10, 16)).astype(int)
-
-    # 5. Haftanın günü (0=Pazartesi, 6=Pazar)
-    df['day_of_week'] = df['ds'].dt.dayofweek
+    # hour (0-23), is_weekend (Cumartesi=5, Pazar=6), is_peak_hour (Sabah 8-10, Akşam 18-21),
+    # is_daytime (Güneş var, 10:00-16:00), day_of_week (0=Pazartesi, 6=Pazar)
+    with span('feature_build', rows=len(df)):
+        add_time_features(df)
 
     print(f"[+] Feature'lar eklendi:")
     print(f"   - hour (saat): 0-23")
@@ -101,6 +102,23 @@ def load_data_from_db(end_date=None):
 
     return df
 
+def build_holidays_frame():
+    """Bayram günlerinden Prophet holidays tablosunu üretir (çıktısız)"""
+    holidays = pd.DataFrame([
+        {'holiday': name, 'ds': pd.Timestamp(day)}
+        for name, days in BAYRAM_DAYS.items()
+        for day in days
+    ]).sort_values('ds').reset_index(drop=True)
+    holidays['lower_window'] = 0
+    holidays['upper_window'] = 1  # Bayram öncesi gün etkisini de yakala
+    return holidays
+
+def config_fingerprint():
+    """Model ayarlarının hash'i (registry'de aynı ayarlı sürümleri eşler)"""
+    from checkpoints import hash_values, hash_frame, prophet_version
+    return hash_values(MODEL_CONFIG, REGRESSORS, COUNTRY_HOLIDAYS,
+                       hash_frame(build_holidays_frame()), prophet_version())
+
 def create_turkish_holidays():
     """
     Türkiye'ye özel tatil günlerini oluşturur
@@ -110,41 +128,7 @@ def create_turkish_holidays():
     """
     print("\n[*] Turk tatilleri olusturuluyor...")
 
-    holidays = pd.DataFrame({
-        'holiday': [
-            # 2024 Ramazan Bayramı (6-14 Nisan, uzatmalı)
-            'Ramazan_Bayrami', 'Ramazan_Bayrami', 'Ramazan_Bayrami',
-            'Ramazan_Bayrami', 'Ramazan_Bayrami', 'Ramazan_Bayrami',
-            'Ramazan_Bayrami', 'Ramazan_Bayrami', 'Ramazan_Bayrami',
-
-            # 2024 Kurban Bayramı (15-19 Haziran)
-            'Kurban_Bayrami', 'Kurban_Bayrami', 'Kurban_Bayrami',
-            'Kurban_Bayrami', 'Kurban_Bayrami',
-
-            # 2025 Ramazan Bayramı (29 Mart - 1 Nisan)
-            'Ramazan_Bayrami', 'Ramazan_Bayrami', 'Ramazan_Bayrami',
-
-            # 2025 Kurban Bayramı (5-9 Haziran)
-            'Kurban_Bayrami', 'Kurban_Bayrami', 'Kurban_Bayrami',
-            'Kurban_Bayrami', 'Kurban_Bayrami',
-        ],
-        'ds': pd.to_datetime([
-            # 2024 Ramazan (9 günlük uzatma)
-            '2024-04-06', '2024-04-07', '2024-04-08', '2024-04-09', '2024-04-10',
-            '2024-04-11', '2024-04-12', '2024-04-13', '2024-04-14',
-
-            # 2024 Kurban
-            '2024-06-15', '2024-06-16', '2024-06-17', '2024-06-18', '2024-06-19',
-
-            # 2025 Ramazan
-            '2025-03-29', '2025-03-30', '2025-04-01',
-
-            # 2025 Kurban
-            '2025-06-05', '2025-06-06', '2025-06-07', '2025-06-08', '2025-06-09',
-        ]),
-        'lower_window': 0,
-        'upper_window': 1,  # Bayram öncesi gün etkisini de yakala
-    })
+    holidays = build_holidays_frame()
 
     print(f"[+] {len(holidays)} bayram gunu eklendi:")
     print(f"   - Ramazan Bayrami: {len(holidays[holidays['holiday']=='Ramazan_Bayrami'])} gun")
@@ -165,41 +149,20 @@ def train_prophet_model(df, holidays):
     """
     print("\n[*] Prophet modeli egitiliyor...")
 
-    model = Prophet(
-        # Tatil günleri
-        holidays=holidays,
-
-        # Mevsimsellik ayarları
-        daily_seasonality=True,   # Gün içi saatlik desenleri yakala (00:00-23:00)
-        weekly_seasonality=True,  # Hafta sonu etkisini yakala (Pazar 0 TRY fiyatları)
-        yearly_seasonality=True,  # Mevsimsel desenleri yakala (yaz/kış)
-
-        # Değişim noktaları (trend değişiklikleri)
-        changepoint_prior_scale=0.05,  # Trend esnekliği (düşük = daha stabil)
-
-        # Bayram etkisi gücü
-        holidays_prior_scale=10.0,  # Yüksek = bayramlar güçlü etki
-
-        # Mevsimsellik esnekliği
-        seasonality_prior_scale=10.0,
+    # Stan/cmdstanpy yüklemesi pahalı; sadece eğitimde import edilir
+    from prophet import Prophet
 
-        # Tahmin aralığı genişliği
-        interval_width=0.95,  # %95 güven aralığı
-    )
+    model = Prophet(holidays=holidays, **MODEL_CONFIG)
 
-    # Türkiye resmi tatillerini ekle (23 Nisan, 1 Mayıs, 19 Mayıs, 30 Ağustos, 29 Ekim)
-    model.add_country_holidays(country_name='TR')
+    model.add_country_holidays(country_name=COUNTRY_HOLIDAYS)
 
-    # FEATURE ENGINEERING: Ekstra bilgileri regressor olarak ekle
     print("   [*] Custom regressor'lar ekleniyor...")
-    model.add_regressor('hour', prior_scale=5.0)  # Saat bilgisi (gece vs gündüz)
-    model.add_regressor('is_weekend', prior_scale=15.0)  # Hafta sonu etkisi güçlü
-    model.add_regressor('is_peak_hour', prior_scale=10.0)  # Peak saat etkisi
-    model.add_regressor('is_daytime', prior_scale=12.0)  # Güneş enerjisi etkisi
-    model.add_regressor('day_of_week', prior_scale=3.0)  # Haftanın günü
+    for name, prior_scale in REGRESSORS.items():
+        model.add_regressor(name, prior_scale=prior_scale)
 
     print("   [*] Egitim basliyor (bu birkac dakika surebilir)...")
-    model.fit(df)
+    with span('stan_fit', rows=len(df), children=True):
+        model.fit(df)
 
     print("[+] Model egitimi tamamlandi!")
 
@@ -215,35 +178,31 @@ def evaluate_model(model, df):
     """
     print("\n[*] Model performansi degerlendiriliyor...")
 
-    # Train/test split (son 30 gün test)
-    split_date = df['ds'].max() - timedelta(days=30)
-    test = df[df['ds'] > split_date]
+    # Train/test split (son 30 gün test); eğitim verisi zaten regressor kolonlarını içerir
+    engine = EvaluationEngine(df)
+    split_date = engine.last_days(30)
 
-    print(f"   Test seti: {len(test)} kayit ({test['ds'].min()} -> {test['ds'].max()})")
+    # Mevcut model ile test seti için tahmin (yeniden eğitim yapmadan; grafik için aralıklar dahil)
+    with span('evaluate_predict') as step:
+        test = engine.predict(model, split_date, intervals=True)
+        step.rows = len(test)
 
-    # Mevcut model ile test seti için tahmin (yeniden eğitim yapmadan)
-    # NOT: Model regressorlar kullanıyor, test verisinde de bu kolonlar olmalı
-    test_features = test[['ds', 'hour', 'is_weekend', 'is_peak_hour', 'is_daytime', 'day_of_week']].copy()
-    forecast = model.predict(test_features)
+    print(f"   Test seti: {len(test)} kayit ({test['ds'].min()} -> {test['ds'].max()})")
 
-    # Performans metrikleri
     y_true = test['y'].values
-    y_pred = forecast['yhat'].values
-
-    mae = np.mean(np.abs(y_true - y_pred))
-    rmse = np.sqrt(np.mean((y_true - y_pred)**2))
+    y_pred = test['yhat'].values
 
     # MAPE hesapla (düşük fiyatları filtrele - outlier protection)
     # 500 TRY altı fiyatlar anormal (güneş patlaması/hafta sonu anomali)
     # Bu değerleri MAPE hesabına dahil etmek %795 gibi yanıltıcı sonuçlar verir
+    result = metrics(test, mape_mask='ge500')
+    mae, rmse, mape = result['mae'], result['rmse'], result['mape']
     mask = y_true >= 500
 
     if mask.sum() > 0:
-        mape = np.mean(np.abs((y_true[mask] - y_pred[mask]) / y_true[mask])) * 100
         print(f"   MAPE hesabinda kullanilan: {mask.sum()} / {len(y_true)} kayit (500+ TRY)")
         print(f"   Filtrelenen dusuk fiyat: {len(y_true) - mask.sum()} kayit (<500 TRY)")
     else:
-        mape = 0.0
         print(f"   UYARI: Tum test verileri 500 TRY altinda, MAPE hesaplanamadi!")
 
     print(f"\n[*] Performans Metrikleri (Son 30 Gun):")
@@ -252,24 +211,25 @@ def evaluate_model(model, df):
     print(f"   MAPE (Ortalama Yuzde Hata): {mape:.2f}%")
 
     # Görselleştirme
-    plt.figure(figsize=(15, 6))
-    plt.plot(test['ds'], y_true, label='Gercek', color='blue', alpha=0.7)
-    plt.plot(test['ds'], y_pred, label='Tahmin', color='red', alpha=0.7)
-    plt.fill_between(test['ds'],
-                     forecast['yhat_lower'],
-                     forecast['yhat_upper'],
-                     alpha=0.2, color='red', label='%95 Guven Araligi')
-    plt.xlabel('Tarih')
-    plt.ylabel('Fiyat (TRY/MWh)')
-    plt.title('Prophet Model Performansi - Son 30 Gun')
-    plt.legend()
-    plt.grid(True, alpha=0.3)
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-
-    chart_path = os.path.join(os.path.dirname(__file__), '../../models/test_performance.png')
-    plt.savefig(chart_path, dpi=150)
-    print(f"\n[*] Grafik kaydedildi: {chart_path}")
+    with span('plot'):
+        plt.figure(figsize=(15, 6))
+        plt.plot(test['ds'], y_true, label='Gercek', color='blue', alpha=0.7)
+        plt.plot(test['ds'], y_pred, label='Tahmin', color='red', alpha=0.7)
+        plt.fill_between(test['ds'],
+                         test['yhat_lower'],
+                         test['yhat_upper'],
+                         alpha=0.2, color='red', label='%95 Guven Araligi')
+        plt.xlabel('Tarih')
+        plt.ylabel('Fiyat (TRY/MWh)')
+        plt.title('Prophet Model Performansi - Son 30 Gun')
+        plt.legend()
+        plt.grid(True, alpha=0.3)
+        plt.xticks(rotation=45)
+        plt.tight_layout()
+
+        chart_path = os.path.join(os.path.dirname(__file__), '../../models/test_performance.png')
+        plt.savefig(chart_path, dpi=150)
+        print(f"\n[*] Grafik kaydedildi: {chart_path}")
 
     return mae, rmse, mape
 
@@ -279,15 +239,21 @@ def save_model(model):
 
     Args:
         model: Eğitilmiş Prophet modeli
+
+    Returns:
+        str: Model JSON'u (registry'ye de kaydedilir)
     """
     print(f"\n[*] Model kaydediliyor: {MODEL_PATH}")
 
     # Model parametrelerini kaydet
     from prophet.serialize import model_to_json
-    with open(MODEL_PATH, 'w') as f:
-        f.write(model_to_json(model))
+    with span('save_model'):
+        model_json = model_to_json(model)
+        with open(MODEL_PATH, 'w') as f:
+            f.write(model_json)
 
     print("[+] Model basariyla kaydedildi!")
+    return model_json
 
 def main(end_date=None):
     """
@@ -301,20 +267,38 @@ def main(end_date=None):
     print("EPIAS MCP Fiyat Tahmini - Prophet Model Egitimi")
     print("="*60)
 
-    # 1. Veri yükleme
+    # 1. Veri yükleme (önce yeni/değişen saatler hourly_facts'e işlenir)
+    refresh_pending_facts()
     df = load_data_from_db(end_date=end_date)
 
     # 2. Tatil günlerini oluştur
     holidays = create_turkish_holidays()
 
     # 3. Modeli eğit
+    fit_start = time.perf_counter()
     model = train_prophet_model(df, holidays)
+    fit_seconds = time.perf_counter() - fit_start
 
     # 4. Performansı değerlendir
     mae, rmse, mape = evaluate_model(model, df)
 
-    # 5. Modeli kaydet
-    save_model(model)
+    # 5. Modeli kaydet ve registry'ye aktif sürüm olarak ekle
+    model_json = save_model(model)
+
+    from checkpoints import hash_frame
+    from model_registry import register_model
+    version = register_model(
+        model_json, name='prophet', training_cutoff=end_date,
+        data_fingerprint=hash_frame(df[['ds', 'y']]), config_hash=config_fingerprint(),
+        fit_seconds=fit_seconds,
+        metrics={'mae': float(mae), 'rmse': float(rmse), 'mape': float(mape)},
+        activate_version=True,
+    )
+
+    # 6. Geçmişin fitted değerleri ve bileşenleri (analiz script'leri yeniden tahmin etmez)
+    from prediction_store import store_training_predictions
+    with span('store_predictions') as step:
+        step.rows = store_training_predictions(version, model, df)
 
     print("\n" + "="*60)
     print("[+] Egitim tamamlandi!")
@@ -322,14 +306,17 @@ def main(end_date=None):
     print(f"[*] Model Ozeti:")
     print(f"   - Toplam veri: {len(df)} saat")
     print(f"   - Test performansi: MAE={mae:.2f} TRY, MAPE={mape:.2f}%")
-    print(f"   - Model dosyasi: {MODEL_PATH}")
+    print(f"   - Model dosyasi: {MODEL_PATH} (registry v{version})")
     print("="*60)
 
     return model, mae, rmse, mape
 
 if __name__ == "__main__":
     import sys
+    from profiling import profiled
     # Komut satırından end_date parametresi al
-    # Kullanım: python train_prophet.py 2025-10-20
-    end_date = sys.argv[1] if len(sys.argv) > 1 else None
-    main(end_date=end_date)
+    # Kullanım: python train_prophet.py 2025-10-20 [--profile=cprofile|tracemalloc|sample|all]
+    # (--profile argümanı profiled() tarafından sys.argv'den çıkarılır)
+    with profiled('train_prophet'):
+        end_date = sys.argv[1] if len(sys.argv) > 1 else None
+        main(end_date=end_date)
@@ -7,43 +7,27 @@ Iyilestirilmis Prophet Modeli - Extreme Fiyat Handling
 import pandas as pd
 import numpy as np
 from prophet import Prophet
-import sqlite3
 import os
 
-DB_PATH = os.path.join(os.path.dirname(__file__), '../../data/energy.db')
+from hourly_facts import load_facts, refresh_pending_facts
+from calendar_features import BAYRAM_DAYS, add_extreme_low_risk
+
 MODEL_PATH = os.path.join(os.path.dirname(__file__), '../../models/prophet_model_v2.json')
 
 def load_data():
-    conn = sqlite3.connect(DB_PATH)
-    query = "SELECT date as ds, price as y FROM mcp_data ORDER BY date"
-    df = pd.read_sql_query(query, conn)
-    conn.close()
-    df['ds'] = pd.to_datetime(df['ds']).dt.tz_localize(None)
+    refresh_pending_facts()
+    df = load_facts(columns=('price AS y',))
     return df
 
 def create_holidays():
     """Tatilleri olustur"""
-    holidays = pd.DataFrame({
-        'holiday': [
-            'Ramazan_Bayrami', 'Ramazan_Bayrami', 'Ramazan_Bayrami',
-            'Ramazan_Bayrami', 'Ramazan_Bayrami', 'Ramazan_Bayrami',
-            'Ramazan_Bayrami', 'Ramazan_Bayrami', 'Ramazan_Bayrami',
-            'Kurban_Bayrami', 'Kurban_Bayrami', 'Kurban_Bayrami',
-            'Kurban_Bayrami', 'Kurban_Bayrami',
-            'Ramazan_Bayrami', 'Ramazan_Bayrami', 'Ramazan_Bayrami',
-            'Kurban_Bayrami', 'Kurban_Bayrami', 'Kurban_Bayrami',
-            'Kurban_Bayrami', 'Kurban_Bayrami',
-        ],
-        'ds': pd.to_datetime([
-            '2024-04-06', '2024-04-07', '2024-04-08', '2024-04-09', '2024-04-10',
-            '2024-04-11', '2024-04-12', '2024-04-13', '2024-04-14',
-            '2024-06-15', '2024-06-16', '2024-06-17', '2024-06-18', '2024-06-19',
-            '2025-03-29', '2025-03-30', '2025-04-01',
-            '2025-06-05', '2025-06-06', '2025-06-07', '2025-06-08', '2025-06-09',
-        ]),
-        'lower_window': 0,
-        'upper_window': 1,
-    })
+    holidays = pd.DataFrame([
+        {'holiday': name, 'ds': pd.Timestamp(day)}
+        for name, days in BAYRAM_DAYS.items()
+        for day in days
+    ]).sort_values('ds').reset_index(drop=True)
+    holidays['lower_window'] = 0
+    holidays['upper_window'] = 1
     return holidays
 
 def add_extreme_low_regressor(df):
@@ -51,14 +35,8 @@ def add_extreme_low_regressor(df):
     Ekstrem dusuk fiyat regressoru ekle
     Pazar + ogle saati kombinasyonu
     """
-    df = df.copy()
-
     # Pazar gunu + ogle saatleri (10-14)
-    df['is_sunday'] = df['ds'].dt.dayofweek == 6
-    df['is_midday'] = df['ds'].dt.hour.isin([10, 11, 12, 13, 14])
-    df['extreme_low_risk'] = (df['is_sunday'] & df['is_midday']).astype(int)
-
-    return df
+    return add_extreme_low_risk(df.copy())
 
 def train_improved_model():
     """Iyilestirilmis model egitimi"""
@@ -102,10 +80,16 @@ def train_improved_model():
 
     # Model kaydet
     from prophet.serialize import model_to_json
+    model_json = model_to_json(model)
     with open(MODEL_PATH, 'w') as f:
-        f.write(model_to_json(model))
+        f.write(model_json)
 
     print(f"\n[+] Model kaydedildi: {MODEL_PATH}")
+
+    from checkpoints import hash_frame
+    from model_registry import register_model
+    register_model(model_json, name='prophet_v2', data_fingerprint=hash_frame(df[['ds', 'y']]),
+                   activate_version=True)
     print("="*60)
 
     return model
@@ -4,12 +4,17 @@
 Ekstrem dusuk fiyatlarin dogrulamasi - EPİAŞ verisinde hata var mi?
 """
 
+import numpy as np
 import pandas as pd
-import sqlite3
-import os
-from datetime import datetime
 
-DB_PATH = os.path.join(os.path.dirname(__file__), '../../data/energy.db')
+from epoch_hours import epoch_hours_to_local, table_exists
+from database import get_reader
+from price_rollups import price_stats, LOW_PRICE
+from price_profile import lookup, profile_array, WEEKDAY_NAMES
+
+# Profilde 0 TRY sikligi bu orandan yuksek dilimler "perfect storm" dilimi sayilir
+STORM_ZERO_FREQ = 0.2
+
 
 def analyze_extreme_prices():
     """Ekstrem dusuk fiyatlari detayli analiz et"""
@@ -17,34 +22,42 @@ def analyze_extreme_prices():
     print("EKSTREM DUSUK FIYAT ANALIZI - Veri Kalitesi Kontrolu")
     print("="*70)
 
-    conn = sqlite3.connect(DB_PATH)
+    # Salt-okunur rapor: hourly_facts, price_rollups ve price_profile'i
+    # post_sync.py (veya modullerin --rebuild komutlari) gunceller
+    conn = get_reader()
+    missing = [name for name in ('hourly_facts', 'price_rollups', 'price_profile') if not table_exists(conn, name)]
+    if missing:
+        conn.close()
+        print(f"[!] Turetilmis tablolar yok: {', '.join(missing)} (once post_sync.py calistirin)")
+        return
 
-    # Ekstrem dusuk fiyatlari cek (< 100 TRY)
+    # Ekstrem dusuk fiyatlari cek (< 100 TRY) - hourly_facts zaten birlesik, join yok
     query = """
         SELECT
-            m.date,
-            m.hour,
-            m.price as mcp_price,
-            c.consumption,
-            g.solar,
-            g.wind,
-            g.hydro,
-            g.total as total_generation,
-            CAST(strftime('%w', m.date) AS INTEGER) as day_of_week
-        FROM mcp_data m
-        LEFT JOIN consumption_data c ON m.date = c.date
-        LEFT JOIN generation_data g ON m.date = g.date
-        WHERE m.price < 100
-        ORDER BY m.price, m.date
+            ts,
+            price as mcp_price,
+            consumption,
+            solar,
+            wind,
+            hydro,
+            total as total_generation,
+            day_of_week
+        FROM hourly_facts
+        WHERE price < 100
+        ORDER BY price, ts
     """
 
     df = pd.read_sql_query(query, conn)
     conn.close()
 
-    df['datetime'] = pd.to_datetime(df['date'])
+    df['datetime'] = epoch_hours_to_local(df['ts'])
     df['day_name'] = df['datetime'].dt.day_name()
 
-    print(f"\n[*] Toplam ekstrem dusuk fiyat: {len(df)} kayit")
+    # Sayim ve dagilimlar price_rollups'tan (mcp_data taranmaz)
+    totals = price_stats()
+    low_count, hour_count, zero_count = (int(totals[name].iloc[0]) for name in ('low_count', 'count', 'zero_count'))
+    print(f"\n[*] Toplam ekstrem dusuk fiyat (< {LOW_PRICE} TRY): {low_count} / {hour_count} saat "
+          f"({low_count / hour_count * 100:.2f}%), 0 TRY: {zero_count}")
     print(f"[*] Fiyat araligi: {df['mcp_price'].min():.2f} - {df['mcp_price'].max():.2f} TRY")
 
     # Fiyat kategorileri
@@ -63,9 +76,9 @@ def analyze_extreme_prices():
     print(f"\n{'='*70}")
     print("HAFTA GUNU DAGILIMI")
     print(f"{'='*70}")
-    day_counts = df['day_name'].value_counts()
-    for day, count in day_counts.items():
-        pct = count / len(df) * 100
+    day_counts = price_stats(by='weekday')['low_count'].sort_values(ascending=False)
+    for day, count in day_counts[day_counts > 0].items():
+        pct = count / low_count * 100
         print(f"  {day:10s}: {count:3d} kayit ({pct:5.1f}%)")
 
     # Saat analizi
@@ -73,9 +86,9 @@ def analyze_extreme_prices():
     print("SAAT DAGILIMI")
     print(f"{'='*70}")
     df['hour_num'] = df['datetime'].dt.hour
-    hour_counts = df.groupby('hour_num').size().sort_index()
-    for hour, count in hour_counts.items():
-        pct = count / len(df) * 100
+    hour_counts = price_stats(by='hour')['low_count']
+    for hour, count in hour_counts[hour_counts > 0].items():
+        pct = count / low_count * 100
         bar = '#' * int(pct / 2)
         print(f"  {hour:02d}:00 | {bar:20s} {count:3d} kayit ({pct:5.1f}%)")
 
@@ -159,6 +172,20 @@ def analyze_extreme_prices():
     print(f"\n[*] 'Perfect Storm' (Pazar + Ogle + Arz fazlasi):")
     print(f"    {len(perfect_storm)}/{len(df)} kayit ({len(perfect_storm)/len(df)*100:.1f}%)")
 
+    # Veriden ogrenilen firtina dilimleri: haftanin saati profilinde 0 TRY sikligi yuksek
+    zero_freq = profile_array('ew_zero')
+    storm_slots = np.flatnonzero(zero_freq >= STORM_ZERO_FREQ)
+    df['slot_zero_freq'] = lookup(df['ts'], 'ew_zero', holiday=False)
+    profile_storm = df[(df['slot_zero_freq'] >= STORM_ZERO_FREQ) & (df['total_generation'] > df['consumption'])]
+
+    print(f"\n[*] Profil bazli 'Perfect Storm' (0 TRY sikligi >= %{STORM_ZERO_FREQ*100:.0f} dilim + Arz fazlasi):")
+    if len(storm_slots) == 0:
+        print(f"    Profilde bu esigi gecen dilim yok (en yuksek: %{np.nanmax(zero_freq, initial=0)*100:.1f})")
+    else:
+        print(f"    Dilimler: {', '.join(f'{WEEKDAY_NAMES[s // 24]} {s % 24:02d}:00' for s in storm_slots[:12])}"
+              f"{' ...' if len(storm_slots) > 12 else ''}")
+        print(f"    {len(profile_storm)}/{len(df)} kayit ({len(profile_storm)/len(df)*100:.1f}%)")
+
     # Sonuc
     print(f"\n{'='*70}")
     print("DEGERLENDIRME")
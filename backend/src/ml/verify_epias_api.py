@@ -5,12 +5,12 @@ EPİAŞ API Dogrulama - Veritabanindaki degerler API ile ayni mi?
 """
 
 import requests
-import sqlite3
 import os
 import time
 from datetime import datetime
 
-DB_PATH = os.path.join(os.path.dirname(__file__), '../../data/energy.db')
+from database import get_reader
+
 
 # EPİAŞ credentials (environment variables'dan al)
 EPIAS_USERNAME = os.getenv('EPIAS_USERNAME', 'your_username')
@@ -96,7 +96,7 @@ def verify_suspicious_prices():
     print(f"[+] TGT alindi: {tgt[:10]}...")
 
     # Veritabanindan suphelileri cek
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_reader()
     cursor = conn.cursor()
 
     cursor.execute("""
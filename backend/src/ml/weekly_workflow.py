@@ -6,25 +6,58 @@ EPİAŞ MCP Fiyat Tahmini - Haftalık İş Akışı
 
 Bu script haftalık döngüyü orkestre eder:
 1. Geçen hafta tahmin vs gerçek karşılaştırması
-2. Model eğitimi (dün'e kadar veriyle)
+2. Model eğitimi (dün'e kadar veriyle) - sadece drift varsa (drift_monitor.py)
 3. Bu hafta tahmini
 4. JSON export
 
+Adımlar küçük bir bağımlılık grafı olarak çalışır (task_graph.py):
+
+    compare ──────────────────────────┐
+    train ── forecast ─┬─ csv ────────┼─ (predict checkpoint)
+                       ├─ plot (ayrı süreç)
+                       └─ export ◄────┘
+
+Karşılaştırma eğitimle paralel; CSV, grafik ve JSON export tahmin DB'ye
+yazıldıktan sonra paralel çalışır. Toplam süre ~ eğitim + tahmin.
+
+Eğitim adımı önce drift kararına bakar: günlük kontrollerde eşik aşılmadıysa
+ve model MAX_MODEL_AGE_DAYS'ten gençse eğitim atlanır, bu hafta aktif
+modelle tahmin edilir. ML_RETRAIN=1 yeniden eğitimi zorlar.
+Karşılaştırma ve export hataları akışı düşürmez; eğitim/tahmin hataları
+çıkış kodunu 1 yapar.
+
+Aynı hafta tekrar çalıştırıldığında girdileri değişmeyen adımlar atlanır
+(checkpoints.py); --force veya ML_FORCE=1 tüm adımları zorla çalıştırır.
+
+Her adımın süresi, CPU ve bellek kullanımı pipeline_runs tablosuna ve
+logs/pipeline_runs.jsonl dosyasına kaydedilir (instrumentation.py).
+
 Her Pazartesi sabah 03:00'da GitHub Actions tarafından çalıştırılır.
 """
 
 import sys
 import os
 from datetime import datetime, timedelta
+from functools import partial
 
 # Script'in çalıştığı dizin
 script_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(script_dir)
 
 # Modülleri import et
-from train_prophet import main as train_model
+from train_prophet import main as train_model, MODEL_PATH
 from compare_forecasts import compare_week
-from export_json import export_forecasts
+import predict
+import export_json
+from export_json import export_forecasts, get_current_week_monday
+from instrumentation import pipeline_run, span
+from hourly_facts import refresh_pending_facts
+from task_graph import Task, run_graph
+from drift_monitor import retrain_decision
+from checkpoints import (
+    is_fresh, record_checkpoint, file_hash, hash_values,
+    training_key, compare_key, export_key, forecast_rows_hash, performance_row_hash,
+)
 
 def get_monday_date(offset_weeks=0):
     """
@@ -56,6 +89,67 @@ def get_sunday_date(monday_date):
     sunday = monday + timedelta(days=6)
     return sunday.strftime('%Y-%m-%d')
 
+def forecast_outputs(week_start):
+    """Tahmin adımının çıktılarının şu anki hash'leri (DB satırları, CSV, grafik)"""
+    return {
+        'forecast_rows': forecast_rows_hash(week_start),
+        'csv': file_hash(os.path.join(predict.OUTPUT_DIR, 'forecast_7days.csv')),
+        'chart': file_hash(os.path.join(predict.OUTPUT_DIR, 'forecast_7days.png')),
+    }
+
+def export_outputs():
+    """Export dosyalarının şu anki hash'leri"""
+    return {
+        'json': file_hash(export_json.OUTPUT_PATH),
+        'binary': file_hash(export_json.BINARY_PATH),
+        'weeks_index': file_hash(os.path.join(export_json.WEEKS_DIR, 'index.json')),
+    }
+
+def produce_weekly_forecast(week_start, week_end):
+    """
+    Kayıtlı modelle haftalık tahmini üretir ve DB'ye kaydeder
+
+    Args:
+        week_start (str): Pazartesi (YYYY-MM-DD)
+        week_end (str): Pazar (YYYY-MM-DD)
+
+    Returns:
+        pd.DataFrame: 168 saatlik tahmin (CSV ve grafik adımlarının girdisi)
+    """
+    # Prophet modelini yükle
+    from prophet.serialize import model_from_json
+
+    with span('load_model'):
+        with open(MODEL_PATH, 'r') as f:
+            model = model_from_json(f.read())
+
+    # Bu haftanın 168 saati: feature'lar, conformal aralıklar ve kantiller
+    # make_forecast'ta üretilir
+    with span('predict', rows=7*24):
+        future_forecast = predict.make_forecast(model, days=7, start=week_start)
+
+    print(f"✅ {len(future_forecast)} saatlik tahmin üretildi")
+
+    # Tahminleri database'e kaydet
+    from predict import save_forecast_to_db
+
+    with span('db_write', rows=len(future_forecast)):
+        save_forecast_to_db(future_forecast, week_start, week_end)
+
+    return future_forecast
+
+def render_forecast_chart(forecast, output_dir):
+    """
+    Tahmin grafiğini çizer
+
+    Ayrı süreçte çalışır (pyplot thread-safe değil). Çocuk süreç modülleri
+    yeniden import ettiği için grafik klasörü açıkça geçirilir.
+    """
+    if forecast is None:
+        return
+    from predict import visualize_forecast
+    visualize_forecast(forecast, days=7, output_dir=output_dir)
+
 def run_weekly_cycle():
     """
     Haftalık döngüyü çalıştırır
@@ -76,15 +170,27 @@ def run_weekly_cycle():
     print(f"\n📅 BU HAFTA: {this_week_monday} (Pazartesi) - {this_week_sunday} (Pazar)")
     print(f"📅 GEÇEN HAFTA: {last_week_monday} (Pazartesi) - {last_week_sunday} (Pazar)")
 
+    # Eğitim ve karşılaştırma hourly_facts'ten okur (load_facts güncelleme yapmaz)
+    with span('hourly_facts') as step:
+        step.rows = refresh_pending_facts()
+
     # =====================================================================
     # ADIM 1: Geçen hafta tahmin vs gerçek karşılaştırması
     # =====================================================================
-    print("\n" + "="*70)
-    print("ADIM 1: Geçen hafta tahmin vs gerçek karşılaştırması")
-    print("="*70)
-
-    try:
-        result = compare_week(last_week_monday, last_week_sunday)
+    def compare_step():
+        print("\n[ADIM 1] Geçen hafta tahmin vs gerçek karşılaştırması")
+        compare_input = compare_key(last_week_monday, last_week_sunday)
+        fresh, checkpoint = is_fresh('compare', compare_input,
+                                     {'performance': performance_row_hash(last_week_monday)})
+        if fresh:
+            print("\n♻️  Tahmin ve gerçek veriler değişmedi, karşılaştırma atlandı")
+            result = checkpoint['metadata']
+        else:
+            result = compare_week(last_week_monday, last_week_sunday)
+            if result:
+                result = {key: float(value) for key, value in result.items()}
+                record_checkpoint('compare', compare_input,
+                                  {'performance': performance_row_hash(last_week_monday)}, result)
         if result:
             print(f"\n✅ Geçen hafta karşılaştırması tamamlandı!")
             print(f"   MAPE: {result['mape']:.2f}%")
@@ -92,97 +198,90 @@ def run_weekly_cycle():
             print(f"   RMSE: {result['rmse']:.2f} TRY")
         else:
             print("\n⚠️  Geçen hafta karşılaştırması yapılamadı (veri eksik olabilir)")
-    except Exception as e:
-        print(f"\n❌ Geçen hafta karşılaştırması HATA: {e}")
+        return result
 
     # =====================================================================
     # ADIM 2: Model eğitimi
     # =====================================================================
-    print("\n" + "="*70)
-    print("ADIM 2: Model eğitimi")
-    print("="*70)
-    print(f"📚 Eğitim verisi: {this_week_monday} tarihine KADAR (dahil değil)")
-
-    try:
-        model, mae, rmse, mape = train_model(end_date=this_week_monday)
-        print(f"\n✅ Model eğitimi tamamlandı!")
+    def train_step():
+        print(f"\n[ADIM 2] Model eğitimi: {this_week_monday} tarihine KADAR veri (dahil değil)")
+        # Drift yoksa mevcut model bu haftayı da tahmin eder
+        with span('drift_check'):
+            decision = retrain_decision(as_of=this_week_monday)
+        if not decision['retrain'] and os.path.exists(MODEL_PATH):
+            print(f"\n♻️  Drift yok, aktif model v{decision['version']} kullanılıyor (eğitim atlandı)")
+            return
+        print(f"   Yeniden eğitim nedeni: {'; '.join(decision['reasons']) or 'model dosyası yok'}")
+
+        # Veri, model ayarları ve tatiller aynıysa kayıtlı model yeterli
+        train_input = training_key(this_week_monday)
+        fresh, checkpoint = is_fresh('train', train_input, {'model': file_hash(MODEL_PATH)})
+        if fresh:
+            print("\n♻️  Eğitim verisi ve model ayarları değişmedi, kayıtlı model kullanılıyor (atlandı)")
+            mae, rmse, mape = (checkpoint['metadata'][key] for key in ('mae', 'rmse', 'mape'))
+        else:
+            model, mae, rmse, mape = train_model(end_date=this_week_monday)
+            record_checkpoint('train', train_input, {'model': file_hash(MODEL_PATH)},
+                              {'mae': float(mae), 'rmse': float(rmse), 'mape': float(mape)})
+            print(f"\n✅ Model eğitimi tamamlandı!")
         print(f"   Test performansı: MAE={mae:.2f} TRY, MAPE={mape:.2f}%")
-    except Exception as e:
-        print(f"\n❌ Model eğitimi HATA: {e}")
-        import traceback
-        traceback.print_exc()
-        return False
 
     # =====================================================================
-    # ADIM 3: Bu hafta tahmini
+    # ADIM 3: Bu hafta tahmini (DB) + CSV ve grafik
     # =====================================================================
-    print("\n" + "="*70)
-    print("ADIM 3: Bu hafta tahmini")
-    print("="*70)
-    print(f"🔮 Tahmin aralığı: {this_week_monday} - {this_week_sunday}")
-
-    try:
-        # Prophet modelini yükle
-        from prophet.serialize import model_from_json
-        model_path = os.path.join(script_dir, '../../models/prophet_model.json')
-
-        with open(model_path, 'r') as f:
-            model = model_from_json(f.read())
-
-        # Bu hafta için 7 günlük tahmin yap
-        import pandas as pd
-        future = model.make_future_dataframe(periods=7*24, freq='H')
-
-        # FEATURE ENGINEERING: Gelecek tarihler için de feature'ları ekle
-        print("   [*] Feature engineering uygulanıyor...")
-        future['hour'] = future['ds'].dt.hour
-        future['is_weekend'] = (future['ds'].dt.dayofweek >= 5).astype(int)
-        future['is_peak_hour'] = future['hour'].isin([8, 9, 10, 18, 19, 20, 21]).astype(int)
-        future['is_daytime'] = future['hour'].isin(range(10, 16)).astype(int)
-        future['day_of_week'] = future['ds'].dt.dayofweek
-
-        forecast = model.predict(future)
-
-        # Sadece bu haftanın tahminlerini al
-        last_history_date = model.history['ds'].max()
-        future_forecast = forecast[forecast['ds'] > last_history_date]
-
-        # İlk 168 saati al (7 gün * 24 saat)
-        future_forecast = future_forecast.head(168)
-
-        print(f"✅ {len(future_forecast)} saatlik tahmin üretildi")
-
-        # Tahminleri database'e kaydet
-        from predict import save_forecast_to_db, save_forecast_csv, visualize_forecast
-
-        save_forecast_to_db(future_forecast, this_week_monday, this_week_sunday)
-
-        # CSV ve grafik kaydet
-        save_forecast_csv(future_forecast, days=7)
-        visualize_forecast(future_forecast, days=7)
-
-        print(f"✅ Tahminler CSV ve grafiğe kaydedildi")
-
-    except Exception as e:
-        print(f"\n❌ Tahmin yapma HATA: {e}")
-        import traceback
-        traceback.print_exc()
-        return False
+    predict_state = {}
+
+    def forecast_step(train):
+        print(f"\n[ADIM 3] Bu hafta tahmini: {this_week_monday} - {this_week_sunday}")
+        # Model dosyası değişmediyse bu haftanın tahminleri zaten güncel
+        predict_state['input'] = hash_values('predict', file_hash(MODEL_PATH), this_week_monday, this_week_sunday)
+        fresh, _ = is_fresh('predict', predict_state['input'], forecast_outputs(this_week_monday))
+        if fresh:
+            print("\n♻️  Model ve hafta değişmedi, kayıtlı tahminler kullanılıyor (atlandı)")
+            return None
+        return produce_weekly_forecast(this_week_monday, this_week_sunday)
+
+    def csv_step(forecast):
+        if forecast is not None:
+            from predict import save_forecast_csv
+            save_forecast_csv(forecast, days=7)
+
+    def record_predict_step(forecast, csv, plot):
+        if forecast is not None:
+            record_checkpoint('predict', predict_state['input'], forecast_outputs(this_week_monday))
+            print(f"✅ Tahminler DB, CSV ve grafiğe kaydedildi")
 
     # =====================================================================
     # ADIM 4: JSON Export
     # =====================================================================
-    print("\n" + "="*70)
-    print("ADIM 4: JSON Export (Frontend için)")
-    print("="*70)
-
-    try:
+    def export_step(forecast):
+        print("\n[ADIM 4] JSON Export (Frontend için)")
+        export_input = export_key(get_current_week_monday())
+        fresh, _ = is_fresh('export', export_input, export_outputs())
+        if fresh:
+            print("♻️  Tahmin ve performans tabloları değişmedi, export atlandı")
+            return
         export_forecasts()
+        record_checkpoint('export', export_input, export_outputs())
         print(f"✅ JSON export tamamlandı")
-    except Exception as e:
-        print(f"\n❌ JSON export HATA: {e}")
-        import traceback
-        traceback.print_exc()
+
+    results = run_graph([
+        Task('compare', compare_step),
+        Task('train', train_step),
+        Task('forecast', forecast_step, deps=('train',)),
+        Task('csv', csv_step, deps=('forecast',)),
+        Task('plot', partial(render_forecast_chart, output_dir=predict.OUTPUT_DIR),
+             deps=('forecast',), process=True),
+        Task('record_predict', record_predict_step, deps=('forecast', 'csv', 'plot')),
+        # Export geçen haftanın metriklerini de içerir: karşılaştırmayı bekler
+        Task('export', export_step, deps=('forecast',), after=('compare',)),
+    ])
+
+    print("\n[*] Adım durumları: " + ', '.join(f"{name}={result.status}" for name, result in results.items()))
+
+    # Eğitim ve tahmin zorunlu; karşılaştırma ve export hataları akışı düşürmez
+    if not all(results[name].ok for name in ('train', 'forecast', 'csv', 'plot', 'record_predict')):
+        return False
 
     # =====================================================================
     # ÖZET
@@ -200,7 +299,10 @@ def run_weekly_cycle():
 def main():
     """Ana fonksiyon"""
     try:
-        success = run_weekly_cycle()
+        with pipeline_run('weekly') as run:
+            success = run_weekly_cycle()
+            if not success:
+                run.status = 'failed'
         if success:
             print("\n✅ İşlem başarılı!")
             sys.exit(0)
@@ -214,4 +316,6 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
+    from profiling import profiled
+    with profiled('weekly_workflow'):
+        main()
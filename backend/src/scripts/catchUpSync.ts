@@ -105,6 +105,7 @@ async function catchUpSync() {
 
   const dbPath = path.join(__dirname, '../../data/energy.db');
   const db = Database(dbPath);
+  db.pragma('busy_timeout = 30000');
 
   try {
     // 1. En son tarihi bul
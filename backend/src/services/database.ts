@@ -17,6 +17,9 @@ export const db = new Database(dbPath);
 // WAL mode etkinleştir (daha iyi performans)
 db.pragma('journal_mode = WAL');
 
+// Python ML scriptleri aynı dosyaya yazarken kilitte hemen hata verme
+db.pragma('busy_timeout = 30000');
+
 /**
  * Database tablolarını oluşturur
  */